@@ -317,7 +317,11 @@ class ComprarEntradaUseCase:
             "transaccion_id": transaccion.id,
             "cliente_id": transaccion.cliente_id,
             "pelicula_id": transaccion.pelicula_id,
+            "funcion_id": transaccion.funcion_id,
+            "canal_venta": transaccion.canal_venta,
             "monto": transaccion.total,
+            "cantidad_asientos": transaccion.cantidad_asientos,
+            "fecha_creacion": transaccion.fecha_creacion.isoformat(),
             "timestamp": datetime.now().isoformat()
         }
         await self.redis_service.xadd("stream:ventas", evento)
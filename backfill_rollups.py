@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir los rollups de ventas desde las transacciones históricas
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+
+from infrastructure.cache.redis_service import RedisService
+from infrastructure.database.mongodb_service import MongoDBService
+from services.rollup_service import RollupService
+
+
+async def backfill_rollups(desde: datetime = None):
+    """Reconstruye los buckets de rollups de ventas"""
+
+    print("📊 Reconstruyendo rollups de ventas...")
+
+    mongodb_service = MongoDBService()
+    redis_service = RedisService()
+
+    try:
+        await mongodb_service.connect()
+        await redis_service.connect()
+
+        rollup_service = RollupService(mongodb_service, redis_service)
+        resultado = await rollup_service.reconstruir(desde)
+
+        print(f"✅ Transacciones procesadas: {resultado['transacciones']}")
+        print(f"✅ Buckets escritos: {resultado['buckets']}")
+
+    except Exception as e:
+        print(f"❌ Error reconstruyendo rollups: {e}")
+    finally:
+        await redis_service.disconnect()
+        await mongodb_service.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye los rollups de ventas")
+    parser.add_argument("--desde", help="Fecha desde la cual reconstruir (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    desde = datetime.fromisoformat(args.desde) if args.desde else None
+    asyncio.run(backfill_rollups(desde))
@@ -33,7 +33,7 @@ class Settings(BaseSettings):
     payment_gateway_url: str = "https://api.payment-provider.com"
     payment_gateway_api_key: str = "tu-api-key-del-gateway"
     
-    # Metrics
+    # Metrics (/metrics en la API; otro puerto levanta un servidor aparte)
     enable_metrics: bool = True
     metrics_port: int = 8000
     
@@ -50,6 +50,8 @@ class Settings(BaseSettings):
     smtp_verify_ssl: bool = Field(default=True, validation_alias="SMTP_VERIFY_SSL")
     smtp_max_retries: int = Field(default=3, validation_alias="SMTP_MAX_RETRIES")
     smtp_timeout: int = Field(default=30, validation_alias="SMTP_TIMEOUT")
+    smtp_pool_size: int = Field(default=4, validation_alias="SMTP_POOL_SIZE")
+    smtp_pool_max_inactividad: int = Field(default=120, validation_alias="SMTP_POOL_MAX_INACTIVIDAD")
     
     # Email Templates
     email_from_name: str = Field(default="Cinemax", validation_alias="EMAIL_FROM_NAME")
@@ -61,6 +63,131 @@ class Settings(BaseSettings):
     email_batch_size: int = Field(default=10, validation_alias="EMAIL_BATCH_SIZE")
     email_retry_delay: int = Field(default=5, validation_alias="EMAIL_RETRY_DELAY")
     
+    # Worker de correos (grupo de consumidores, reintentos y cola de muertos)
+    email_worker_habilitado: bool = Field(default=False, validation_alias="EMAIL_WORKER_HABILITADO")
+    email_consumer_group: str = Field(default="email_processor", validation_alias="EMAIL_CONSUMER_GROUP")
+    email_workers: int = Field(default=4, validation_alias="EMAIL_WORKERS")
+    email_max_intentos: int = Field(default=5, validation_alias="EMAIL_MAX_INTENTOS")
+    email_backoff_base: float = Field(default=2.0, validation_alias="EMAIL_BACKOFF_BASE")
+    email_backoff_max: float = Field(default=300.0, validation_alias="EMAIL_BACKOFF_MAX")
+    email_reclamo_segundos: int = Field(default=60, validation_alias="EMAIL_RECLAMO_SEGUNDOS")
+    email_shutdown_timeout: float = Field(default=30.0, validation_alias="EMAIL_SHUTDOWN_TIMEOUT")
+    
+    # Retención de correos (recorte de la DLQ, compactación del stream y archivo en MongoDB)
+    email_dlq_maxlen: int = Field(default=10000, validation_alias="EMAIL_DLQ_MAXLEN")
+    email_retencion_habilitada: bool = Field(default=True, validation_alias="EMAIL_RETENCION_HABILITADA")
+    email_retencion_segundos: int = Field(default=3600, validation_alias="EMAIL_RETENCION_SEGUNDOS")
+    email_compactacion_intervalo: int = Field(default=300, validation_alias="EMAIL_COMPACTACION_INTERVALO")
+    email_archivo_lote: int = Field(default=500, validation_alias="EMAIL_ARCHIVO_LOTE")
+    email_archivo_max_pendientes: int = Field(default=50000, validation_alias="EMAIL_ARCHIVO_MAX_PENDIENTES")
+    
+    # Rollups de ventas
+    rollups_habilitados: bool = Field(default=True, validation_alias="ROLLUPS_HABILITADOS")
+    rollups_consumer_group: str = Field(default="rollups", validation_alias="ROLLUPS_CONSUMER_GROUP")
+    rollups_batch_size: int = Field(default=100, validation_alias="ROLLUPS_BATCH_SIZE")
+    rollups_reclamo_segundos: int = Field(default=60, validation_alias="ROLLUPS_RECLAMO_SEGUNDOS")
+    rollups_pausa_ttl: int = Field(default=3600, validation_alias="ROLLUPS_PAUSA_TTL")
+    rollups_pausa_espera: float = Field(default=2.0, validation_alias="ROLLUPS_PAUSA_ESPERA")
+    
+    # Dashboard
+    dashboard_cache_ttl: int = Field(default=5, validation_alias="DASHBOARD_CACHE_TTL")
+    dashboard_stale_ttl: int = Field(default=30, validation_alias="DASHBOARD_STALE_TTL")
+    dashboard_refresh_interval: int = Field(default=5, validation_alias="DASHBOARD_REFRESH_INTERVAL")
+    
+    # Cache de películas y funciones (TTLs en segundos)
+    cache_entidades_habilitada: bool = Field(default=True, validation_alias="CACHE_ENTIDADES_HABILITADA")
+    cache_l1_max_items: int = Field(default=2048, validation_alias="CACHE_L1_MAX_ITEMS")
+    cache_l1_ttl: int = Field(default=5, validation_alias="CACHE_L1_TTL")
+    cache_pelicula_ttl: int = Field(default=600, validation_alias="CACHE_PELICULA_TTL")
+    cache_funcion_ttl: int = Field(default=60, validation_alias="CACHE_FUNCION_TTL")
+    cache_negativo_ttl: int = Field(default=10, validation_alias="CACHE_NEGATIVO_TTL")
+    
+    # Pagos asíncronos (202 + workers alimentados por stream:pagos)
+    pagos_async_habilitado: bool = Field(default=True, validation_alias="PAGOS_ASYNC_HABILITADO")
+    pagos_workers: int = Field(default=4, validation_alias="PAGOS_WORKERS")
+    pagos_consumer_group: str = Field(default="pagos", validation_alias="PAGOS_CONSUMER_GROUP")
+    pagos_latencia_ms: int = Field(default=1000, validation_alias="PAGOS_LATENCIA_MS")
+    pagos_tasa_exito: float = Field(default=0.9, validation_alias="PAGOS_TASA_EXITO")
+    pagos_retencion_segundos: int = Field(default=600, validation_alias="PAGOS_RETENCION_SEGUNDOS")
+    pagos_estado_ttl: int = Field(default=3600, validation_alias="PAGOS_ESTADO_TTL")
+    pagos_reclamo_segundos: int = Field(default=60, validation_alias="PAGOS_RECLAMO_SEGUNDOS")
+    # Vigencia del reclamo de una transacción por un worker (mayor que el timeout de la pasarela)
+    pagos_lease_segundos: int = Field(default=120, validation_alias="PAGOS_LEASE_SEGUNDOS")
+    pagos_long_poll_intervalo: float = Field(default=0.5, validation_alias="PAGOS_LONG_POLL_INTERVALO")
+    
+    # Outbox transaccional (efectos posteriores a la compra)
+    outbox_habilitado: bool = Field(default=True, validation_alias="OUTBOX_HABILITADO")
+    outbox_batch_size: int = Field(default=100, validation_alias="OUTBOX_BATCH_SIZE")
+    outbox_intervalo: float = Field(default=0.5, validation_alias="OUTBOX_INTERVALO")
+    outbox_lease_segundos: int = Field(default=30, validation_alias="OUTBOX_LEASE_SEGUNDOS")
+    outbox_expiracion_segundos: int = Field(default=300, validation_alias="OUTBOX_EXPIRACION_SEGUNDOS")
+    
+    # Claves de idempotencia (Idempotency-Key)
+    idempotencia_ttl: int = Field(default=86400, validation_alias="IDEMPOTENCIA_TTL")
+    idempotencia_bloqueo_ttl: int = Field(default=60, validation_alias="IDEMPOTENCIA_BLOQUEO_TTL")
+    idempotencia_espera_segundos: float = Field(default=5.0, validation_alias="IDEMPOTENCIA_ESPERA_SEGUNDOS")
+    idempotencia_intervalo: float = Field(default=0.1, validation_alias="IDEMPOTENCIA_INTERVALO")
+    
+    # Generación de códigos QR (pool de procesos + cache LRU/Redis)
+    qr_procesos: int = Field(default=2, validation_alias="QR_PROCESOS")
+    qr_box_size: int = Field(default=10, validation_alias="QR_BOX_SIZE")
+    qr_border: int = Field(default=4, validation_alias="QR_BORDER")
+    qr_cache_max_items: int = Field(default=1024, validation_alias="QR_CACHE_MAX_ITEMS")
+    qr_cache_ttl: int = Field(default=604800, validation_alias="QR_CACHE_TTL")
+    qr_redis_habilitado: bool = Field(default=True, validation_alias="QR_REDIS_HABILITADO")
+    
+    # Entradas con QR pregenerado (TTLs en segundos)
+    entrada_qr_duracion_funcion: int = Field(default=14400, validation_alias="ENTRADA_QR_DURACION_FUNCION")
+    entrada_qr_ttl_defecto: int = Field(default=604800, validation_alias="ENTRADA_QR_TTL_DEFECTO")
+    entrada_qr_ttl_minimo: int = Field(default=3600, validation_alias="ENTRADA_QR_TTL_MINIMO")
+    
+    # Trazas de la compra (muestreo 0-1; exportador: ninguno, json u otlp).
+    # Por defecto solo el buffer en memoria; json rota al superar el tamaño máximo
+    tracing_habilitado: bool = Field(default=True, validation_alias="TRACING_HABILITADO")
+    tracing_muestreo: float = Field(default=0.1, validation_alias="TRACING_MUESTREO")
+    tracing_max_trazas: int = Field(default=200, validation_alias="TRACING_MAX_TRAZAS")
+    tracing_exportador: str = Field(default="ninguno", validation_alias="TRACING_EXPORTADOR")
+    tracing_archivo: str = Field(default="logs/trazas.jsonl", validation_alias="TRACING_ARCHIVO")
+    tracing_archivo_max_bytes: int = Field(default=50 * 1024 * 1024, validation_alias="TRACING_ARCHIVO_MAX_BYTES")
+    tracing_archivo_respaldos: int = Field(default=3, validation_alias="TRACING_ARCHIVO_RESPALDOS")
+    tracing_otlp_endpoint: str = Field(default="http://localhost:4318/v1/traces", validation_alias="TRACING_OTLP_ENDPOINT")
+    tracing_servicio: str = Field(default="cinemax-api", validation_alias="TRACING_SERVICIO")
+    
+    # Logging estructurado (formato: json o texto; niveles: modulo=NIVEL,...)
+    log_nivel: str = Field(default="INFO", validation_alias="LOG_NIVEL")
+    log_formato: str = Field(default="json", validation_alias="LOG_FORMATO")
+    log_niveles: str = Field(default="", validation_alias="LOG_NIVELES")
+    log_muestreo_debug: float = Field(default=0.01, validation_alias="LOG_MUESTREO_DEBUG")
+    log_cola_max: int = Field(default=10000, validation_alias="LOG_COLA_MAX")
+    
+    # Consultas lentas de MongoDB (umbral en ms; explain de cada forma nueva)
+    mongodb_lentas_habilitado: bool = Field(default=True, validation_alias="MONGODB_LENTAS_HABILITADO")
+    mongodb_lentas_umbral_ms: float = Field(default=100.0, validation_alias="MONGODB_LENTAS_UMBRAL_MS")
+    mongodb_lentas_max_formas: int = Field(default=200, validation_alias="MONGODB_LENTAS_MAX_FORMAS")
+    mongodb_lentas_explain: bool = Field(default=True, validation_alias="MONGODB_LENTAS_EXPLAIN")
+    
+    # Salud del event loop (lag en ms para /health degradado; detector de bloqueos en depuración)
+    loop_monitor_habilitado: bool = Field(default=True, validation_alias="LOOP_MONITOR_HABILITADO")
+    loop_intervalo: float = Field(default=0.5, validation_alias="LOOP_INTERVALO")
+    loop_ventana: int = Field(default=120, validation_alias="LOOP_VENTANA")
+    loop_lag_degradado_ms: float = Field(default=250.0, validation_alias="LOOP_LAG_DEGRADADO_MS")
+    loop_detector_habilitado: bool = Field(default=False, validation_alias="LOOP_DETECTOR_HABILITADO")
+    loop_bloqueo_ms: float = Field(default=100.0, validation_alias="LOOP_BLOQUEO_MS")
+    
+    # Latencia de comandos de Redis y muestreo del keyspace por prefijo (SCAN + MEMORY USAGE)
+    redis_monitor_habilitado: bool = Field(default=True, validation_alias="REDIS_MONITOR_HABILITADO")
+    redis_keyspace_intervalo: float = Field(default=60.0, validation_alias="REDIS_KEYSPACE_INTERVALO")
+    redis_keyspace_prefijos: str = Field(default="selection:,sala:asientos:,reserva:,email:", validation_alias="REDIS_KEYSPACE_PREFIJOS")
+    redis_keyspace_max_claves: int = Field(default=50000, validation_alias="REDIS_KEYSPACE_MAX_CLAVES")
+    redis_keyspace_lote: int = Field(default=500, validation_alias="REDIS_KEYSPACE_LOTE")
+    redis_keyspace_top: int = Field(default=10, validation_alias="REDIS_KEYSPACE_TOP")
+    
+    # Perfilador por muestreo (endpoint de administración)
+    perfil_hz: int = Field(default=100, validation_alias="PERFIL_HZ")
+    perfil_hz_tareas: int = Field(default=10, validation_alias="PERFIL_HZ_TAREAS")
+    perfil_max_segundos: float = Field(default=60.0, validation_alias="PERFIL_MAX_SEGUNDOS")
+    perfil_max_tareas: int = Field(default=500, validation_alias="PERFIL_MAX_TAREAS")
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,125 @@
+"""
+Controlador de administración (diagnóstico en producción)
+"""
+
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Depends, status
+from fastapi.responses import PlainTextResponse
+
+from config.settings import settings
+from controllers.usuarios_controller import get_current_user
+from infrastructure.cache.monitor_redis import monitor_redis
+from infrastructure.database.consultas_lentas import monitor_consultas
+from infrastructure.utils.perfilador import perfilar, PerfilEnCurso
+from services.global_services import get_redis_service
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Administración"])
+
+
+async def verificar_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Solo administradores (simulado por dominio del correo)"""
+    if not current_user.get("email", "").endswith("@admin.com"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo administradores pueden acceder a este recurso"
+        )
+    return current_user
+
+
+@router.get("/mongodb/consultas-lentas")
+async def obtener_consultas_lentas(
+    limite: int = Query(20, ge=1, le=200),
+    orden: str = Query("total_ms", pattern="^(total_ms|promedio_ms|max_ms|conteo)$"),
+    current_user: dict = Depends(verificar_admin)
+):
+    """Formas de consulta más lentas con su plan (si usaron índice o COLLSCAN)"""
+    try:
+        return {
+            **monitor_consultas.obtener_estadisticas(),
+            "formas": monitor_consultas.top(limite, orden),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener consultas lentas: {str(e)}"
+        )
+
+
+@router.delete("/mongodb/consultas-lentas")
+async def reiniciar_consultas_lentas(current_user: dict = Depends(verificar_admin)):
+    """Descarta las formas acumuladas (p. ej. después de crear un índice)"""
+    monitor_consultas.reiniciar()
+    return {"mensaje": "Consultas lentas reiniciadas", "timestamp": datetime.now().isoformat()}
+
+
+@router.get("/redis")
+async def obtener_estadisticas_redis(
+    muestrear: bool = Query(False, description="Recorrer el keyspace ahora en lugar de usar la última muestra"),
+    current_user: dict = Depends(verificar_admin)
+):
+    """Latencia por comando, tamaño de pipelines y claves/memoria por prefijo (claves más grandes y sin TTL)"""
+    redis_service = get_redis_service()
+    try:
+        if muestrear:
+            if not redis_service:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Redis no está disponible"
+                )
+            await monitor_redis.muestrear(redis_service.redis_client)
+
+        return {
+            **monitor_redis.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de Redis: {str(e)}"
+        )
+
+
+@router.post("/perfil")
+async def perfilar_proceso(
+    segundos: float = Query(10, gt=0, le=settings.perfil_max_segundos),
+    hz: int = Query(None, ge=1, le=1000),
+    formato: str = Query("json", pattern="^(json|colapsado)$"),
+    limite: int = Query(30, ge=1, le=200),
+    current_user: dict = Depends(verificar_admin)
+):
+    """
+    Perfila este worker por muestreo durante ``segundos`` (hilos y tareas asyncio)
+
+    ``formato=colapsado`` devuelve el archivo de pilas colapsadas para
+    flamegraph.pl o speedscope; ``json`` devuelve la tabla de funciones y
+    las pilas colapsadas.
+    """
+    try:
+        perfil = await perfilar(segundos, hz)
+    except PerfilEnCurso:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya hay un perfil en curso en este proceso"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al perfilar el proceso: {str(e)}"
+        )
+
+    if formato == "colapsado":
+        nombre = f"perfil-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}.folded"
+        return PlainTextResponse(perfil.colapsado(), headers={"Content-Disposition": f"attachment; filename=\"{nombre}\""})
+
+    return {
+        **perfil.resumen(limite),
+        "colapsado": perfil.colapsado(),
+        "timestamp": datetime.now().isoformat()
+    }
@@ -3,10 +3,11 @@ Controlador para algoritmos de estructuras de datos
 Expone métodos recursivos, ordenamiento y búsqueda
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from services.algorithms_service import algorithms_service
+from services.qr_service import qr_service
 from controllers.usuarios_controller import get_current_user
 
 router = APIRouter(prefix="/api/v1/algoritmos", tags=["Algoritmos"])
@@ -69,25 +70,22 @@ async def contar_asientos_recursivo(
 @router.post("/recursivos/generar-qr")
 async def generar_qr_recursivo(
     datos: str,
+    formato: str = Query("png", pattern="^(png|svg)$"),
     current_user: Dict = Depends(get_current_user)
 ):
     """
-    Generar QR con reintentos recursivos
+    Generar QR (render en el pool de procesos del servicio de QR, con cache)
     """
     try:
-        qr_image = algorithms_service.generar_qr_recursivo(datos)
-        # Convertir imagen a base64 para respuesta
-        import base64
-        import io
-        img_buffer = io.BytesIO()
-        qr_image.save(img_buffer, format='PNG')
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
+        qr = await qr_service.generar(datos, formato)
         
         return {
             "success": True,
-            "qr_base64": img_str,
-            "algoritmo": "generación_qr_recursiva",
-            "complejidad": "O(1) por intento"
+            "formato": formato,
+            "qr_base64" if formato == "png" else "qr_svg": qr,
+            "algoritmo": "render_qr_pool_procesos",
+            "cache": "LRU en memoria + Redis por hash del contenido",
+            "complejidad": "O(n) en el tamaño de los datos (O(1) con cache)"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
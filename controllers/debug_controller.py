@@ -0,0 +1,34 @@
+"""
+Controlador de depuración (solo se monta con DEBUG=true)
+"""
+
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from infrastructure.utils.tracing import registro_trazas, exportador_trazas
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+
+@router.get("/traces/slowest")
+async def obtener_trazas_mas_lentas(limite: int = Query(10, ge=1, le=100)):
+    """Peticiones muestreadas más lentas entre las recientes, con su árbol de spans"""
+    try:
+        return {
+            **registro_trazas.obtener_estadisticas(),
+            "exportador": {
+                "formato": exportador_trazas.formato,
+                "exportadas": exportador_trazas.exportadas,
+                "descartadas": exportador_trazas.descartadas,
+                "errores": exportador_trazas.errores
+            } if exportador_trazas else None,
+            "trazas": registro_trazas.mas_lentas(limite),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener trazas: {str(e)}"
+        )
@@ -3,6 +3,9 @@ from typing import List, Dict, Any
 from pydantic import BaseModel, Field
 from services.global_services import get_mongodb_service, get_redis_service, get_algorithms_service
 from infrastructure.cache.redis_service import RedisService
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
 
 router = APIRouter(prefix="/api/v1/funciones", tags=["Funciones"])
 
@@ -45,10 +48,10 @@ async def obtener_asientos_funcion(funcion_id: str):
             try:
                 asientos_ocupados = await redis_service.get_asientos_ocupados(funcion_id)
             except Exception as e:
-                print(f"⚠️  Error obteniendo asientos ocupados desde Redis: {e}")
+                logger.warning("Error obteniendo asientos ocupados desde Redis", extra={"error": str(e)})
                 asientos_ocupados = []
         else:
-            print("⚠️  Redis no disponible, usando lista vacía de asientos ocupados")
+            logger.warning("Redis no disponible, usando lista vacía de asientos ocupados", extra={"funcion_id": funcion_id})
             asientos_ocupados = []
         
         # Generar mapa completo de asientos
@@ -78,7 +81,6 @@ async def obtener_asientos_funcion(funcion_id: str):
         
         # Usar algoritmo recursivo para contar asientos disponibles si está disponible
         if algorithms_service:
-            print("🔄 Aplicando conteo recursivo de asientos...")
             # Crear estructura de árbol para el algoritmo recursivo
             sala_tree = {
                 "filas": [
@@ -94,7 +96,7 @@ async def obtener_asientos_funcion(funcion_id: str):
             }
             
             disponibles_recursivo = algorithms_service.contar_asientos_disponibles_recursivo(sala_tree)
-            print(f"✅ Conteo recursivo completado: {disponibles_recursivo} asientos disponibles")
+            logger.debug("Conteo recursivo de asientos", extra={"funcion_id": funcion_id, "disponibles": disponibles_recursivo})
             disponibles = disponibles_recursivo
         else:
             disponibles = total_asientos - ocupados
@@ -1,7 +1,13 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from typing import Dict, Any
-from services.global_services import get_mongodb_service, get_redis_service, get_algorithms_service
+import asyncio
+from datetime import datetime
+from services.global_services import get_mongodb_service, get_redis_service, get_algorithms_service, get_rollup_service, get_dashboard_service, get_outbox_relay_service
 from infrastructure.cache.redis_service import RedisService
+from infrastructure.utils.single_flight import obtener_estadisticas_single_flight
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
 
 router = APIRouter(prefix="/api/v1/metricas", tags=["Métricas"])
 
@@ -18,8 +24,13 @@ async def obtener_ranking_peliculas(limite: int = Query(10, le=50, description="
         
         redis_service = get_redis_service()
         
-        # Obtener ranking desde MongoDB
-        ranking_mongo = await mongodb_service.obtener_peliculas_mas_vendidas(limite)
+        # Obtener ranking desde los rollups pre-agregados (o MongoDB mientras
+        # no se hayan reconstruido)
+        rollup_service = get_rollup_service()
+        if rollup_service and await rollup_service.cubre():
+            ranking_mongo = await rollup_service.obtener_peliculas_mas_vendidas(limite)
+        else:
+            ranking_mongo = await mongodb_service.obtener_peliculas_mas_vendidas(limite)
         
         # Obtener ranking desde Redis (si está disponible)
         ranking_redis = []
@@ -27,10 +38,10 @@ async def obtener_ranking_peliculas(limite: int = Query(10, le=50, description="
             try:
                 ranking_redis = await redis_service.get_ranking_peliculas(limite)
             except Exception as e:
-                print(f"⚠️  Error obteniendo ranking desde Redis: {e}")
+                logger.warning("Error obteniendo ranking desde Redis", extra={"error": str(e)})
                 ranking_redis = []
         else:
-            print("⚠️  Redis no disponible, usando solo MongoDB")
+            logger.warning("Redis no disponible, usando solo MongoDB")
         
         return {
             "ranking_mongodb": ranking_mongo,
@@ -71,7 +82,7 @@ async def obtener_ocupacion_sala(funcion_id: str):
             try:
                 ocupacion_redis = await redis_service.get_sala_ocupacion(funcion_id)
             except Exception as e:
-                print(f"⚠️  Error obteniendo ocupación desde Redis: {e}")
+                logger.warning("Error obteniendo ocupación desde Redis", extra={"funcion_id": funcion_id, "error": str(e)})
                 ocupacion_redis = {
                     "ocupados": 0,
                     "disponibles": 100,
@@ -79,7 +90,7 @@ async def obtener_ocupacion_sala(funcion_id: str):
                     "porcentaje_ocupacion": 0.0
                 }
         else:
-            print("⚠️  Redis no disponible, usando datos por defecto")
+            logger.warning("Redis no disponible, usando datos por defecto", extra={"funcion_id": funcion_id})
             ocupacion_redis = {
                 "ocupados": 0,
                 "disponibles": 100,
@@ -140,7 +151,7 @@ async def obtener_ocupacion_todas_salas(limite: int = Query(50, le=200, descript
                 try:
                     ocupacion_redis = await redis_service.get_sala_ocupacion(funcion_id)
                 except Exception as e:
-                    print(f"⚠️  Error obteniendo ocupación para función {funcion_id}: {e}")
+                    logger.warning("Error obteniendo ocupación de la función", extra={"funcion_id": funcion_id, "error": str(e)})
             
             # Simular datos de ocupación para demostración (solo para las primeras 3 funciones)
             if funcion_id in ["fun_001", "fun_002", "fun_003"]:
@@ -184,7 +195,7 @@ async def obtener_ocupacion_todas_salas(limite: int = Query(50, le=200, descript
         # Ordenar salas por porcentaje de ocupación usando algoritmo de ordenamiento
         algorithms_service = get_algorithms_service()
         if algorithms_service:
-            print("🔄 Aplicando MergeSort para ordenar salas por ocupación...")
+            logger.debug("Ordenando salas por ocupación con MergeSort", extra={"salas": len(ocupacion_salas)})
             
             # Convertir a formato compatible con el algoritmo
             salas_formato = []
@@ -197,7 +208,6 @@ async def obtener_ocupacion_todas_salas(limite: int = Query(50, le=200, descript
             
             # Aplicar MergeSort (ordenar por porcentaje de ocupación descendente)
             salas_ordenadas = algorithms_service.mergesort_funciones_hora(salas_formato)
-            print(f"✅ Salas ordenadas por ocupación usando MergeSort")
             
             # Reconstruir lista con el orden correcto
             ocupacion_salas_ordenadas = [sala["datos_completos"] for sala in salas_ordenadas]
@@ -354,7 +364,12 @@ async def obtener_metricas_ventas(
                 detail="Servicio de base de datos no disponible"
             )
         
-        metricas = await mongodb_service.obtener_metricas_ventas(fecha_inicio, fecha_fin)
+        # Responder desde los rollups pre-agregados si cubren el período
+        rollup_service = get_rollup_service()
+        if rollup_service and await rollup_service.cubre(fecha_inicio):
+            metricas = await rollup_service.obtener_metricas_ventas(fecha_inicio, fecha_fin)
+        else:
+            metricas = await mongodb_service.obtener_metricas_ventas(fecha_inicio, fecha_fin)
         
         return {
             "periodo": {
@@ -381,12 +396,19 @@ async def obtener_resumen_dashboard():
                 detail="Servicio de base de datos no disponible"
             )
         
+        # Resumen cacheado y refrescado en segundo plano
+        dashboard_service = get_dashboard_service()
+        if dashboard_service:
+            return await dashboard_service.obtener_resumen()
+        
         redis_service = get_redis_service()
         
-        # Métricas básicas
-        total_peliculas = await mongodb_service.contar_peliculas_activas()
-        total_funciones_hoy = await mongodb_service.contar_funciones_hoy()
-        total_transacciones_hoy = await mongodb_service.contar_transacciones_hoy()
+        # Métricas básicas (consultas en paralelo)
+        total_peliculas, total_funciones_hoy, total_transacciones_hoy = await asyncio.gather(
+            mongodb_service.contar_peliculas_activas(),
+            mongodb_service.contar_funciones_hoy(),
+            mongodb_service.contar_transacciones_hoy()
+        )
         
         # Ocupación promedio
         ocupacion_promedio = 0.0
@@ -394,10 +416,10 @@ async def obtener_resumen_dashboard():
             try:
                 ocupacion_promedio = await redis_service.get_ocupacion_promedio()
             except Exception as e:
-                print(f"⚠️  Error obteniendo ocupación promedio desde Redis: {e}")
+                logger.warning("Error obteniendo ocupación promedio desde Redis", extra={"error": str(e)})
                 ocupacion_promedio = 0.0
         else:
-            print("⚠️  Redis no disponible, usando ocupación por defecto")
+            logger.warning("Redis no disponible, usando ocupación por defecto")
             ocupacion_promedio = 0.0
         
         return {
@@ -407,11 +429,154 @@ async def obtener_resumen_dashboard():
                 "transacciones_hoy": total_transacciones_hoy,
                 "ocupacion_promedio": ocupacion_promedio
             },
-            "timestamp": "2024-12-20T10:00:00Z"
+            "timestamp": datetime.now().isoformat()
         }
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al obtener resumen: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.get("/cache")
+async def obtener_estadisticas_cache():
+    """Obtiene el hit ratio de la cache de películas y funciones"""
+    try:
+        mongodb_service = get_mongodb_service()
+        if not mongodb_service or not mongodb_service.cache:
+            return {
+                "habilitada": False,
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        return {
+            "habilitada": True,
+            **mongodb_service.cache.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de cache: {str(e)}"
+        )
+
+@router.get("/single-flight")
+async def obtener_estadisticas_coalescencia():
+    """Obtiene el número de lecturas concurrentes coalescidas por helper"""
+    try:
+        return {
+            **obtener_estadisticas_single_flight(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de coalescencia: {str(e)}"
+        )
+
+@router.get("/compras/latencias")
+async def obtener_latencias_compra():
+    """Obtiene el desglose de latencias por paso de las compras recientes (ms)"""
+    try:
+        from use_cases.comprar_entrada_use_case import registro_latencias_compra
+        
+        return {
+            "pasos": registro_latencias_compra.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener latencias de compra: {str(e)}"
+        )
+
+@router.get("/outbox")
+async def obtener_estadisticas_outbox():
+    """Obtiene el estado del outbox transaccional y del relay"""
+    try:
+        relay = get_outbox_relay_service()
+        if not relay:
+            return {"habilitado": False, "timestamp": datetime.now().isoformat()}
+        
+        return {
+            "habilitado": True,
+            **await relay.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas del outbox: {str(e)}"
+        )
+
+@router.get("/idempotencia")
+async def obtener_estadisticas_idempotencia():
+    """Obtiene cuántas compras se ejecutaron, repitieron o chocaron por Idempotency-Key"""
+    try:
+        from services.idempotency_service import estadisticas_idempotencia
+        
+        return {
+            **estadisticas_idempotencia,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de idempotencia: {str(e)}"
+        )
+
+@router.get("/qr")
+async def obtener_estadisticas_qr():
+    """Obtiene hits de cache, renders y tiempo medio de generación de QR"""
+    try:
+        from services.qr_service import qr_service
+        
+        return {
+            **qr_service.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de QR: {str(e)}"
+        )
+
+@router.get("/entradas")
+async def obtener_estadisticas_entradas():
+    """Obtiene QR de entradas pregenerados, servidos, 304 y regenerados"""
+    try:
+        from services.ticket_service import ticket_service
+        
+        return {
+            **ticket_service.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener estadísticas de entradas: {str(e)}"
+        )
+
+@router.get("/event-loop")
+async def obtener_salud_event_loop():
+    """Lag del event loop (p50/p95/p99) y callbacks bloqueantes detectados con su origen"""
+    try:
+        from infrastructure.utils.salud_loop import monitor_loop
+        
+        return {
+            **monitor_loop.obtener_estadisticas(),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener salud del event loop: {str(e)}"
+        )
\ No newline at end of file
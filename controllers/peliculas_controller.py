@@ -3,6 +3,9 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 from services.global_services import get_mongodb_service, get_algorithms_service
 from infrastructure.cache.redis_service import RedisService
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
 
 router = APIRouter(prefix="/api/v1/peliculas", tags=["Películas"])
 
@@ -46,9 +49,8 @@ async def listar_peliculas(
         
         # Aplicar algoritmo de ordenamiento si se solicita
         if ordenar_por_rating and algorithms_service:
-            print("🔄 Aplicando QuickSort para ordenar por rating...")
             peliculas = algorithms_service.quicksort_peliculas_rating(peliculas.copy())
-            print(f"✅ Películas ordenadas por rating usando QuickSort")
+            logger.debug("Películas ordenadas por rating (QuickSort)", extra={"total": len(peliculas)})
         
         # Aplicar paginación
         peliculas_paginadas = peliculas[offset:offset + limite]
@@ -118,22 +120,19 @@ async def buscar_peliculas(request: BuscarPeliculasRequest):
                 detail="Servicio de base de datos no disponible"
             )
         
-        print(f"🔍 Búsqueda iniciada - Texto: '{request.texto}', Género: '{request.genero}', Límite: {request.limite}")
+        logger.debug("Búsqueda iniciada", extra={"texto": request.texto, "genero": request.genero, "limite": request.limite})
         
         # Construir filtros
         filtros = {"activa": True}
         
         if request.genero and request.genero.strip():
             filtros["generos"] = {"$in": [request.genero]}
-            print(f"📝 Filtro de género aplicado: {request.genero}")
         
         # Obtener todas las películas para aplicar algoritmos de búsqueda
         todas_las_peliculas = await mongodb_service.buscar_peliculas({"activa": True}, 1000)
         
         # Aplicar algoritmo de búsqueda lineal con filtros si está disponible
         if algorithms_service and todas_las_peliculas:
-            print("🔄 Aplicando búsqueda lineal con filtros múltiples...")
-            
             filtros_algoritmo = {}
             if request.genero and request.genero.strip():
                 filtros_algoritmo["genero"] = request.genero
@@ -141,33 +140,26 @@ async def buscar_peliculas(request: BuscarPeliculasRequest):
                 filtros_algoritmo["titulo"] = request.texto
             
             resultados = algorithms_service.busqueda_lineal_filtros(todas_las_peliculas, filtros_algoritmo)
-            print(f"✅ Búsqueda lineal completada - {len(resultados)} resultados")
             
             # Limitar resultados según el parámetro
             resultados = resultados[:request.limite]
         else:
             # Fallback a búsqueda normal de MongoDB
             if request.texto and request.texto.strip():
-                print(f"🔤 Búsqueda de texto: '{request.texto}'")
                 try:
                     resultados = await mongodb_service.buscar_peliculas_texto(request.texto, request.limite)
-                    print(f"✅ Búsqueda de texto completada - {len(resultados)} resultados")
                 except Exception as e:
-                    print(f"⚠️ Error en búsqueda de texto: {e}")
+                    logger.warning("Error en búsqueda de texto, usando filtros básicos", extra={"texto": request.texto, "error": str(e)})
                     resultados = await mongodb_service.buscar_peliculas(filtros, request.limite)
-                    print(f"🔄 Fallback a búsqueda normal - {len(resultados)} resultados")
             else:
-                print(f"📋 Búsqueda sin texto - usando filtros básicos")
                 resultados = await mongodb_service.buscar_peliculas(filtros, request.limite)
-                print(f"✅ Búsqueda normal completada - {len(resultados)} resultados")
         
-        # Log de resultados para debug
-        if resultados:
-            print(f"📊 Primeros 3 resultados:")
-            for i, pelicula in enumerate(resultados[:3]):
-                print(f"  {i+1}. {pelicula.get('titulo', 'Sin título')} - ID: {pelicula.get('_id', 'Sin ID')}")
-        else:
-            print(f"❌ No se encontraron resultados")
+        logger.debug("Búsqueda completada", extra={
+            "texto": request.texto,
+            "genero": request.genero,
+            "resultados": len(resultados),
+            "primeros": [p.get("_id") for p in resultados[:3]]
+        })
         
         return {
             "resultados": resultados,
@@ -177,7 +169,7 @@ async def buscar_peliculas(request: BuscarPeliculasRequest):
         }
         
     except Exception as e:
-        print(f"❌ Error en búsqueda: {e}")
+        logger.exception("Error en búsqueda", extra={"texto": request.texto, "genero": request.genero})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error en búsqueda: {str(e)}"
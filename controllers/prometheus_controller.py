@@ -0,0 +1,18 @@
+"""
+Controlador de métricas Prometheus (scrape de monitoring/prometheus.yml)
+"""
+
+from fastapi import APIRouter, Response
+
+from infrastructure.metrics.prometheus_metrics import CONTENT_TYPE_LATEST, actualizar_gauges, exportar
+from services.global_services import get_redis_service
+from services.websocket_service import websocket_service
+
+router = APIRouter(tags=["Monitoreo"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metricas_prometheus():
+    """Exposición de métricas en formato Prometheus"""
+    await actualizar_gauges(get_redis_service(), websocket_service)
+    return Response(content=exportar(), media_type=CONTENT_TYPE_LATEST)
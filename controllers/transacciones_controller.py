@@ -2,8 +2,11 @@
 Controlador de Transacciones para el sistema de cine
 """
 
-from typing import List, Dict, Any
-from fastapi import APIRouter, HTTPException, status, Depends, Header
+import base64
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -11,7 +14,13 @@ from domain.entities.transaccion import MetodoPago, EstadoTransaccion
 from use_cases.comprar_entrada_use_case import ComprarEntradaUseCase
 from controllers.usuarios_controller import get_current_user
 from services.email_service import email_service
-from services.global_services import get_algorithms_service
+from services.global_services import get_algorithms_service, get_rollup_service, get_redis_service, get_payment_worker_service, get_email_worker_service, get_email_retention_service
+from services.payment_worker_service import esperar_estado_pago
+from services.idempotency_service import IdempotencyService
+from services.ticket_service import ticket_service
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
 
 router = APIRouter(prefix="/api/v1/transacciones", tags=["Transacciones"])
 
@@ -40,38 +49,205 @@ class TransaccionResponse(BaseModel):
     resumen: Dict[str, Any] = Field(..., description="Resumen de la transacción")
 
 
+class CompraPendienteResponse(BaseModel):
+    transaccion_id: str = Field(..., description="ID de la transacción")
+    numero_factura: str = Field(..., description="Número de factura")
+    estado: EstadoTransaccion = Field(..., description="Estado de la transacción (pendiente)")
+    total: float = Field(..., description="Total de la transacción")
+    asientos: List[str] = Field(..., description="Asientos reservados")
+    fecha_vencimiento: str = Field(..., description="Fecha de vencimiento")
+    url_estado: str = Field(..., description="URL para consultar el estado del pago")
+
+
 class HistorialComprasResponse(BaseModel):
     transacciones: List[Dict[str, Any]] = Field(..., description="Lista de transacciones")
     total: int = Field(..., description="Total de transacciones")
 
 
+async def _con_idempotencia(
+    idempotency_key: Optional[str],
+    operacion: str,
+    current_user: dict,
+    request: CompraEntradaRequest,
+    ejecutar: Callable[[], Awaitable[BaseModel]],
+    status_code: int = status.HTTP_200_OK,
+    cabeceras: Callable[[BaseModel], Dict[str, str]] = None
+):
+    """
+    Ejecuta la compra respetando la cabecera Idempotency-Key (si viene)
+    
+    Sin clave o sin Redis se ejecuta tal cual. Con clave, la respuesta se
+    renderiza una vez y se guarda para repetirla byte a byte en reintentos.
+    """
+    redis_service = get_redis_service()
+    if not idempotency_key or not redis_service:
+        return await ejecutar()
+    
+    async def renderizar() -> Response:
+        modelo = await ejecutar()
+        return JSONResponse(
+            content=jsonable_encoder(modelo),
+            status_code=status_code,
+            headers=cabeceras(modelo) if cabeceras else None
+        )
+    
+    return await IdempotencyService(redis_service).ejecutar(
+        idempotency_key,
+        f"{current_user['sub']}:{operacion}",
+        request.model_dump(mode="json"),
+        renderizar
+    )
+
+
 @router.post("/comprar-entrada", response_model=TransaccionResponse)
 async def comprar_entrada(
     request: CompraEntradaRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Comprar entradas para una función"""
+    """Comprar entradas para una función (admite Idempotency-Key para reintentos)"""
     try:
-        use_case = ComprarEntradaUseCase()
+        return await _con_idempotencia(
+            idempotency_key, "comprar-entrada", current_user, request,
+            lambda: _comprar_entrada(request, current_user)
+        )
         
-        # Agregar código promocional si existe
-        if request.codigo_promocion:
-            request.datos_pago["codigo_promocion"] = request.codigo_promocion
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
+async def _comprar_entrada(request: CompraEntradaRequest, current_user: dict) -> TransaccionResponse:
+    """Ejecuta el pipeline de compra síncrono"""
+    use_case = ComprarEntradaUseCase()
+    
+    # Agregar código promocional si existe
+    if request.codigo_promocion:
+        request.datos_pago["codigo_promocion"] = request.codigo_promocion
+    
+    # Agregar información del usuario
+    request.datos_pago["ip_origen"] = "127.0.0.1"  # En producción obtener del request
+    request.datos_pago["user_agent"] = "web"  # En producción obtener del request
+    request.datos_pago["canal_venta"] = "web"
+    
+    resultado = await use_case.ejecutar(
+        usuario_id=current_user["sub"],
+        funcion_id=request.funcion_id,
+        asientos=request.asientos,
+        metodo_pago=request.metodo_pago,
+        datos_pago=request.datos_pago
+    )
+    
+    return TransaccionResponse(**resultado)
+
+
+@router.post("/comprar-entrada/async", status_code=status.HTTP_202_ACCEPTED, response_model=CompraPendienteResponse)
+async def comprar_entrada_async(
+    request: CompraEntradaRequest,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Reservar entradas y procesar el pago en segundo plano (202 + URL de estado)"""
+    try:
+        if not get_payment_worker_service():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Pagos asíncronos no disponibles"
+            )
         
-        # Agregar información del usuario
-        request.datos_pago["ip_origen"] = "127.0.0.1"  # En producción obtener del request
-        request.datos_pago["user_agent"] = "web"  # En producción obtener del request
-        request.datos_pago["canal_venta"] = "web"
+        resultado = await _con_idempotencia(
+            idempotency_key, "comprar-entrada-async", current_user, request,
+            lambda: _comprar_entrada_async(request, current_user),
+            status_code=status.HTTP_202_ACCEPTED,
+            cabeceras=lambda pendiente: {"Location": pendiente.url_estado}
+        )
+        if isinstance(resultado, CompraPendienteResponse):
+            response.headers["Location"] = resultado.url_estado
+        return resultado
         
-        resultado = await use_case.ejecutar(
-            usuario_id=current_user["sub"],
-            funcion_id=request.funcion_id,
-            asientos=request.asientos,
-            metodo_pago=request.metodo_pago,
-            datos_pago=request.datos_pago
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
         )
+
+
+async def _comprar_entrada_async(request: CompraEntradaRequest, current_user: dict) -> CompraPendienteResponse:
+    """Reserva las entradas y encola el pago"""
+    use_case = ComprarEntradaUseCase()
+    
+    # Agregar código promocional si existe
+    if request.codigo_promocion:
+        request.datos_pago["codigo_promocion"] = request.codigo_promocion
+    
+    # Agregar información del usuario
+    request.datos_pago["ip_origen"] = "127.0.0.1"  # En producción obtener del request
+    request.datos_pago["user_agent"] = "web"  # En producción obtener del request
+    request.datos_pago["canal_venta"] = "web"
+    
+    resultado = await use_case.ejecutar_asincrono(
+        usuario_id=current_user["sub"],
+        funcion_id=request.funcion_id,
+        asientos=request.asientos,
+        metodo_pago=request.metodo_pago,
+        datos_pago=request.datos_pago
+    )
+    
+    return CompraPendienteResponse(**resultado)
+
+
+@router.get("/{transaccion_id}/estado-pago")
+async def obtener_estado_pago(
+    transaccion_id: str,
+    espera: int = Query(0, ge=0, le=30, description="Segundos de long-poll mientras el pago está pendiente"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Obtener el estado de un pago asíncrono (opcionalmente con long-poll)"""
+    try:
+        redis_service = get_redis_service()
+        if not redis_service:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio de Redis no disponible"
+            )
+        
+        if espera:
+            estado = await esperar_estado_pago(
+                redis_service, transaccion_id, espera, get_payment_worker_service()
+            )
+        else:
+            estado = await redis_service.obtener_estado_pago(transaccion_id)
+        
+        if not estado:
+            # Estado expirado en Redis: consultar la transacción
+            use_case = ComprarEntradaUseCase()
+            transaccion = await use_case.transaccion_repo.obtener_transaccion_por_id(transaccion_id)
+            if not transaccion:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Transacción no encontrada"
+                )
+            estado = {
+                "transaccion_id": transaccion.id,
+                "cliente_id": transaccion.cliente_id,
+                "estado": transaccion.estado
+            }
+        
+        # Verificar que el usuario es el propietario
+        if estado.get("cliente_id") != current_user["sub"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos para ver esta transacción"
+            )
         
-        return TransaccionResponse(**resultado)
+        return estado
         
     except HTTPException:
         raise
@@ -99,8 +275,6 @@ async def obtener_historial_compras(
         # Aplicar algoritmo de ordenamiento si se solicita
         algorithms_service = get_algorithms_service()
         if ordenar_por_fecha and algorithms_service and historial:
-            print("🔄 Aplicando HeapSort para ordenar transacciones por fecha...")
-            
             # Convertir a formato compatible con el algoritmo
             transacciones_formato = []
             for tx in historial:
@@ -122,7 +296,7 @@ async def obtener_historial_compras(
             
             # Aplicar HeapSort
             transacciones_ordenadas = algorithms_service.heapsort_transacciones_fecha(transacciones_formato)
-            print(f"✅ Transacciones ordenadas por fecha usando HeapSort")
+            logger.debug("Transacciones ordenadas por fecha (HeapSort)", extra={"total": len(transacciones_ordenadas)})
             
             # Reconstruir historial con el orden correcto
             historial_ordenado = []
@@ -233,6 +407,62 @@ async def obtener_transaccion(
         )
 
 
+@router.get("/{transaccion_id}/entrada/qr")
+async def obtener_qr_entrada(
+    transaccion_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Obtener el QR (PNG) de una entrada confirmada
+    
+    Se sirve el QR pregenerado al confirmar la compra con ETag fuerte:
+    los escaneos repetidos reciben 304 sin volver a enviar la imagen.
+    """
+    try:
+        use_case = ComprarEntradaUseCase()
+        entrada = await ticket_service.obtener_o_regenerar(
+            transaccion_id, use_case.transaccion_repo.obtener_transaccion_por_id
+        )
+        
+        if not entrada:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Entrada no encontrada o transacción no confirmada"
+            )
+        
+        # Verificar que el usuario es el propietario
+        if entrada["cliente_id"] != current_user["sub"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tienes permisos para ver esta entrada"
+            )
+        
+        # La imagen no cambia hasta que expira (fin de la función)
+        restante = int((datetime.fromisoformat(entrada["expira"]) - datetime.now()).total_seconds())
+        headers = {
+            "ETag": entrada["etag"],
+            "Cache-Control": f"private, max-age={max(restante, 0)}, immutable"
+        }
+        
+        no_modificada = if_none_match is not None and entrada["etag"] in [
+            etag.strip() for etag in if_none_match.split(",")
+        ]
+        ticket_service.registrar_servida(no_modificada)
+        if no_modificada:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        return Response(content=base64.b64decode(entrada["png"]), media_type="image/png", headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
 @router.get("/funciones/{funcion_id}/asientos-ocupados")
 async def obtener_asientos_ocupados_funcion(funcion_id: str):
     """Obtener lista de asientos ocupados en una función"""
@@ -273,10 +503,17 @@ async def obtener_estadisticas_ventas(
         fecha_inicio_dt = datetime.fromisoformat(fecha_inicio)
         fecha_fin_dt = datetime.fromisoformat(fecha_fin)
         
-        use_case = ComprarEntradaUseCase()
-        estadisticas = await use_case.transaccion_repo.obtener_estadisticas_ventas(
-            fecha_inicio_dt, fecha_fin_dt
-        )
+        # Responder desde los rollups pre-agregados si cubren el período
+        rollup_service = get_rollup_service()
+        if rollup_service and await rollup_service.cubre(fecha_inicio_dt):
+            estadisticas = await rollup_service.obtener_estadisticas_ventas(
+                fecha_inicio_dt, fecha_fin_dt
+            )
+        else:
+            use_case = ComprarEntradaUseCase()
+            estadisticas = await use_case.transaccion_repo.obtener_estadisticas_ventas(
+                fecha_inicio_dt, fecha_fin_dt
+            )
         
         return {
             "periodo": {
@@ -343,6 +580,14 @@ async def obtener_estadisticas_correos(
         
         estadisticas = await email_service.obtener_estadisticas_correos()
         
+        # Estadísticas del worker si corre en este proceso
+        worker = get_email_worker_service()
+        if worker:
+            estadisticas["worker"] = worker.obtener_estadisticas()
+        retencion = get_email_retention_service()
+        if retencion:
+            estadisticas["retencion"] = retencion.obtener_estadisticas()
+        
         return estadisticas
         
     except HTTPException:
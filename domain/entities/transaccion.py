@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -43,6 +43,30 @@ class DetallePago(BaseModel):
     monto_procesamiento: float = Field(default=0.0, ge=0)
 
 
+def calcular_snapshot_funcion(fecha_hora_inicio: Union[str, datetime, None], generos: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Calcula los campos desnormalizados de función y película para una transacción
+
+    El día de la semana sigue la convención de MongoDB ($dayOfWeek):
+    1 = domingo ... 7 = sábado.
+    """
+    inicio = fecha_hora_inicio
+    if isinstance(inicio, str):
+        try:
+            inicio = datetime.fromisoformat(inicio.replace("Z", "+00:00"))
+        except ValueError:
+            inicio = None
+    if inicio is not None:
+        inicio = inicio.replace(tzinfo=None)
+
+    return {
+        "generos": list(generos or []),
+        "funcion_inicio": inicio,
+        "funcion_hora": inicio.hour if inicio else None,
+        "funcion_dia_semana": (inicio.isoweekday() % 7) + 1 if inicio else None
+    }
+
+
 class Transaccion(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
     cliente_id: str = Field(..., min_length=1)
@@ -70,6 +94,12 @@ class Transaccion(BaseModel):
     fecha_vencimiento: Optional[datetime] = None
     fecha_confirmacion: Optional[datetime] = None
     
+    # Snapshot desnormalizado de película y función (evita $lookup en analítica)
+    generos: List[str] = Field(default_factory=list)
+    funcion_inicio: Optional[datetime] = None
+    funcion_hora: Optional[int] = Field(None, ge=0, le=23)
+    funcion_dia_semana: Optional[int] = Field(None, ge=1, le=7)
+    
     # Metadata adicional
     codigo_qr: Optional[str] = None
     numero_factura: Optional[str] = None
@@ -120,6 +150,11 @@ class Transaccion(BaseModel):
             asiento.descuento_aplicado = descuento_total
             asiento.precio_final = asiento.precio_unitario * factor_descuento
 
+    def registrar_snapshot_funcion(self, fecha_hora_inicio: Union[str, datetime, None], generos: Optional[List[str]] = None) -> None:
+        """Copia géneros y horario de la función al momento de la compra"""
+        for campo, valor in calcular_snapshot_funcion(fecha_hora_inicio, generos).items():
+            setattr(self, campo, valor)
+
     def puede_ser_cancelada(self) -> bool:
         """Verifica si la transacción puede ser cancelada"""
         estados_cancelables = [
@@ -0,0 +1,155 @@
+"""
+Repositorio del outbox transaccional para MongoDB
+"""
+
+from typing import List, Dict, Any, Callable, Awaitable, Optional
+from datetime import datetime, timedelta
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+from infrastructure.utils.tracing import trazar_metodos
+
+
+@trazar_metodos("repo.outbox")
+class OutboxRepository:
+    """
+    Eventos pendientes de publicar generados por las compras
+
+    Los eventos se escriben junto con la confirmación de la transacción y
+    un relay los publica en Redis en lotes. Cada evento tiene un ID
+    determinista (``{transaccion_id}:{tipo}``) para que reintentar la
+    escritura no lo duplique.
+    """
+
+    def __init__(self, database, client=None):
+        self.database = database
+        self.client = client
+        self.collection = database.outbox
+        self._soporta_transacciones: Optional[bool] = None
+
+    async def crear_indices(self):
+        """Crea los índices usados por el relay"""
+        await self.collection.create_indexes([
+            IndexModel([("estado", 1), ("creado", 1)]),
+            IndexModel([("publicado_en", 1)], expireAfterSeconds=7 * 86400)
+        ])
+
+    async def soporta_transacciones(self) -> bool:
+        """Indica si el servidor admite transacciones multi-documento (replica set)"""
+        if self._soporta_transacciones is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._soporta_transacciones = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+            except Exception:
+                self._soporta_transacciones = False
+        return self._soporta_transacciones
+
+    async def registrar(self, eventos: List[Dict[str, Any]], confirmar: Callable[[Any], Awaitable[Any]]):
+        """
+        Escribe los eventos y ejecuta la confirmación en el mismo paso
+
+        Con replica set ambas escrituras van en una transacción. En un
+        servidor standalone los eventos se escriben primero; el relay solo
+        publica eventos cuya transacción quedó confirmada.
+
+        Args:
+            eventos: Eventos a registrar
+            confirmar: Corrutina que recibe la sesión (o None) y confirma la transacción
+        """
+        ahora = datetime.now()
+        documentos = [
+            {
+                **evento,
+                "_id": f"{evento['transaccion_id']}:{evento['tipo']}",
+                "estado": "pendiente",
+                "intentos": 0,
+                "creado": ahora
+            }
+            for evento in eventos
+        ]
+
+        if self.client and await self.soporta_transacciones():
+            async with await self.client.start_session() as session:
+                async with session.start_transaction():
+                    await self._insertar(documentos, session=session)
+                    return await confirmar(session)
+
+        await self._insertar(documentos)
+        return await confirmar(None)
+
+    async def _insertar(self, documentos: List[Dict[str, Any]], session=None):
+        """Inserta ignorando eventos ya registrados (reintentos)"""
+        try:
+            await self.collection.insert_many(documentos, ordered=False, session=session)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def reclamar_lote(self, relay_id: str, limite: int, lease_segundos: int) -> List[Dict[str, Any]]:
+        """
+        Reclama un lote de eventos pendientes (o con lease vencido) para un relay
+
+        Returns:
+            Lista de eventos reclamados, en orden de creación
+        """
+        ahora = datetime.now()
+        disponibles = {
+            "$or": [
+                {"estado": "pendiente"},
+                {"estado": "procesando", "lease_hasta": {"$lt": ahora}}
+            ]
+        }
+        candidatos = await self.collection.find(disponibles, {"_id": 1}).sort("creado", 1).limit(limite).to_list(limite)
+        if not candidatos:
+            return []
+
+        ids = [doc["_id"] for doc in candidatos]
+        await self.collection.update_many(
+            {"_id": {"$in": ids}, **disponibles},
+            {
+                "$set": {
+                    "estado": "procesando",
+                    "relay": relay_id,
+                    "lease_hasta": ahora + timedelta(seconds=lease_segundos)
+                },
+                "$inc": {"intentos": 1}
+            }
+        )
+
+        cursor = self.collection.find({"_id": {"$in": ids}, "estado": "procesando", "relay": relay_id})
+        return sorted(await cursor.to_list(limite), key=lambda doc: doc["creado"])
+
+    async def marcar_publicados(self, ids: List[str]) -> int:
+        """Marca eventos como publicados (se eliminan por TTL)"""
+        if not ids:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"estado": "publicado", "publicado_en": datetime.now()}, "$unset": {"lease_hasta": ""}}
+        )
+        return result.modified_count
+
+    async def liberar(self, ids: List[str]) -> int:
+        """Devuelve eventos a pendiente (p. ej. su transacción aún no se confirma)"""
+        if not ids:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"estado": "pendiente"}, "$unset": {"lease_hasta": "", "relay": ""}}
+        )
+        return result.modified_count
+
+    async def descartar(self, ids: List[str], motivo: str) -> int:
+        """Descarta eventos que no deben publicarse"""
+        if not ids:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"estado": "descartado", "motivo": motivo, "publicado_en": datetime.now()}}
+        )
+        return result.modified_count
+
+    async def contar_por_estado(self) -> Dict[str, int]:
+        """Cuenta eventos agrupados por estado"""
+        pipeline = [{"$group": {"_id": "$estado", "total": {"$sum": 1}}}]
+        resultado = await self.collection.aggregate(pipeline).to_list(None)
+        return {doc["_id"]: doc["total"] for doc in resultado}
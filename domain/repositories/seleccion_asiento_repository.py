@@ -13,8 +13,13 @@ from domain.entities.seleccion_asiento import (
     SeleccionAsientoResponse,
     HistorialSeleccion
 )
+from infrastructure.utils.tracing import trazar_metodos
+from infrastructure.utils.logs import obtener_logger
 
+logger = obtener_logger(__name__)
 
+
+@trazar_metodos("repo.selecciones")
 class SeleccionAsientoRepository:
     """Repositorio para operaciones de selecciones de asientos"""
     
@@ -64,7 +69,7 @@ class SeleccionAsientoRepository:
             return seleccion_response
             
         except Exception as e:
-            print(f"Error creando selección: {e}")
+            logger.error("Error creando selección", extra={"error": str(e)})
             return None
     
     async def obtener_seleccion_por_id(self, seleccion_id: str) -> Optional[SeleccionAsientoResponse]:
@@ -87,7 +92,7 @@ class SeleccionAsientoRepository:
             )
             
         except Exception as e:
-            print(f"Error obteniendo selección: {e}")
+            logger.error("Error obteniendo selección", extra={"error": str(e)})
             return None
     
     async def obtener_selecciones_por_funcion(self, funcion_id: str) -> List[SeleccionAsientoResponse]:
@@ -112,7 +117,7 @@ class SeleccionAsientoRepository:
             return selecciones
             
         except Exception as e:
-            print(f"Error obteniendo selecciones por función: {e}")
+            logger.error("Error obteniendo selecciones por función", extra={"error": str(e)})
             return []
     
     async def obtener_selecciones_por_usuario(self, usuario_id: str) -> List[SeleccionAsientoResponse]:
@@ -137,7 +142,7 @@ class SeleccionAsientoRepository:
             return selecciones
             
         except Exception as e:
-            print(f"Error obteniendo selecciones por usuario: {e}")
+            logger.error("Error obteniendo selecciones por usuario", extra={"error": str(e)})
             return []
     
     async def actualizar_seleccion(self, seleccion_id: str, datos_actualizacion: SeleccionAsientoUpdate) -> Optional[SeleccionAsientoResponse]:
@@ -162,7 +167,7 @@ class SeleccionAsientoRepository:
             return None
             
         except Exception as e:
-            print(f"Error actualizando selección: {e}")
+            logger.error("Error actualizando selección", extra={"error": str(e)})
             return None
     
     async def cancelar_seleccion(self, seleccion_id: str) -> bool:
@@ -181,7 +186,7 @@ class SeleccionAsientoRepository:
             return result.modified_count > 0
             
         except Exception as e:
-            print(f"Error cancelando selección: {e}")
+            logger.error("Error cancelando selección", extra={"error": str(e)})
             return False
     
     async def confirmar_seleccion(self, seleccion_id: str) -> bool:
@@ -200,7 +205,7 @@ class SeleccionAsientoRepository:
             return result.modified_count > 0
             
         except Exception as e:
-            print(f"Error confirmando selección: {e}")
+            logger.error("Error confirmando selección", extra={"error": str(e)})
             return False
     
     async def actualizar_estado_seleccion(self, usuario_id: str, funcion_id: str, asiento_id: str, nuevo_estado: str, fecha_actualizacion: datetime) -> bool:
@@ -228,9 +233,37 @@ class SeleccionAsientoRepository:
             return result.modified_count > 0
             
         except Exception as e:
-            print(f"Error actualizando estado de selección: {e}")
+            logger.error("Error actualizando estado de selección", extra={"error": str(e)})
             return False
     
+    async def actualizar_estado_selecciones(self, usuario_id: str, funcion_id: str, asientos: List[str], nuevo_estado: str, fecha_actualizacion: datetime) -> int:
+        """Actualizar en una sola operación el estado de varias selecciones temporales"""
+        try:
+            update_data = {
+                "estado": nuevo_estado
+            }
+            
+            if nuevo_estado == "confirmada":
+                update_data["fecha_confirmacion"] = fecha_actualizacion
+            elif nuevo_estado == "cancelada":
+                update_data["fecha_cancelacion"] = fecha_actualizacion
+            
+            result = await self.collection.update_many(
+                {
+                    "usuario_id": usuario_id,
+                    "funcion_id": funcion_id,
+                    "asiento_id": {"$in": asientos},
+                    "estado": "temporal"  # Solo actualizar selecciones temporales
+                },
+                {"$set": update_data}
+            )
+            
+            return result.modified_count
+            
+        except Exception as e:
+            logger.error("Error actualizando estado de selecciones", extra={"error": str(e)})
+            return 0
+    
     async def limpiar_selecciones_expiradas(self) -> int:
         """Limpiar selecciones temporales expiradas"""
         try:
@@ -250,7 +283,7 @@ class SeleccionAsientoRepository:
             return result.modified_count
             
         except Exception as e:
-            print(f"Error limpiando selecciones expiradas: {e}")
+            logger.error("Error limpiando selecciones expiradas", extra={"error": str(e)})
             return 0
     
     async def obtener_historial_funcion(self, funcion_id: str) -> HistorialSeleccion:
@@ -273,7 +306,7 @@ class SeleccionAsientoRepository:
             )
             
         except Exception as e:
-            print(f"Error obteniendo historial de función: {e}")
+            logger.error("Error obteniendo historial de función", extra={"error": str(e)})
             return HistorialSeleccion(
                 funcion_id=funcion_id,
                 selecciones=[],
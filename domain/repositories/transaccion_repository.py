@@ -3,12 +3,18 @@ Repositorio de Transacciones para MongoDB
 """
 
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from domain.entities.transaccion import Transaccion, EstadoTransaccion, MetodoPago, DetalleAsiento, DetallePago
+from infrastructure.utils.tracing import trazar_metodos
+from infrastructure.utils.logs import obtener_logger
 
+logger = obtener_logger(__name__)
 
+
+@trazar_metodos("repo.transacciones")
 class TransaccionRepository:
     """Repositorio para operaciones de transacciones"""
     
@@ -16,6 +22,11 @@ class TransaccionRepository:
         self.database = database
         self.collection = database.transacciones
     
+    @staticmethod
+    def _filtro_id(transaccion_id: str) -> Dict[str, Any]:
+        # Los IDs pueden ser ObjectId o UUID en string
+        return {"_id": ObjectId(transaccion_id)} if ObjectId.is_valid(transaccion_id) else {"_id": transaccion_id}
+    
     async def crear_transaccion(self, transaccion: Transaccion) -> Optional[Transaccion]:
         """Crear una nueva transacción"""
         try:
@@ -32,13 +43,13 @@ class TransaccionRepository:
             return transaccion
             
         except Exception as e:
-            print(f"Error creando transacción: {e}")
+            logger.error("Error creando transacción", extra={"error": str(e)})
             return None
     
     async def obtener_transaccion_por_id(self, transaccion_id: str) -> Optional[Transaccion]:
         """Obtener transacción por ID"""
         try:
-            transaccion_doc = await self.collection.find_one({"_id": ObjectId(transaccion_id)})
+            transaccion_doc = await self.collection.find_one(self._filtro_id(transaccion_id))
             if not transaccion_doc:
                 return None
             
@@ -46,7 +57,7 @@ class TransaccionRepository:
             return Transaccion(**transaccion_doc)
             
         except Exception as e:
-            print(f"Error obteniendo transacción: {e}")
+            logger.error("Error obteniendo transacción", extra={"error": str(e)})
             return None
     
     async def obtener_transacciones_por_cliente(self, cliente_id: str, limit: int = 50) -> List[Transaccion]:
@@ -61,7 +72,7 @@ class TransaccionRepository:
             return transacciones
             
         except Exception as e:
-            print(f"Error obteniendo transacciones del cliente: {e}")
+            logger.error("Error obteniendo transacciones del cliente", extra={"error": str(e)})
             return []
     
     async def obtener_transacciones_por_funcion(self, funcion_id: str) -> List[Transaccion]:
@@ -76,10 +87,10 @@ class TransaccionRepository:
             return transacciones
             
         except Exception as e:
-            print(f"Error obteniendo transacciones de la función: {e}")
+            logger.error("Error obteniendo transacciones de la función", extra={"error": str(e)})
             return []
     
-    async def actualizar_estado_transaccion(self, transaccion_id: str, nuevo_estado: EstadoTransaccion, observacion: str = None) -> bool:
+    async def actualizar_estado_transaccion(self, transaccion_id: str, nuevo_estado: EstadoTransaccion, observacion: str = None, session=None) -> bool:
         """Actualizar el estado de una transacción"""
         try:
             update_data = {
@@ -97,19 +108,122 @@ class TransaccionRepository:
             try:
                 result = await self.collection.update_one(
                     {"_id": ObjectId(transaccion_id)},
-                    {"$set": update_data}
+                    {"$set": update_data},
+                    session=session
                 )
             except:
                 # Si no es un ObjectId válido, buscar por el ID como string
                 result = await self.collection.update_one(
                     {"_id": transaccion_id},
-                    {"$set": update_data}
+                    {"$set": update_data},
+                    session=session
                 )
             
             return result.modified_count > 0
             
         except Exception as e:
-            print(f"Error actualizando estado de transacción: {e}")
+            logger.error("Error actualizando estado de transacción", extra={"error": str(e)})
+            return False
+    
+    async def reclamar_para_pago(self, transaccion_id: str, propietario: str, lease_segundos: int) -> Optional[Dict[str, Any]]:
+        """
+        Reclamar atómicamente una transacción para procesar su pago
+        
+        Pasa ``pendiente`` → ``procesando`` (o toma un reclamo vencido) en un
+        solo ``find_one_and_update``; dos workers con el mismo mensaje no
+        pueden reclamarla a la vez. Devuelve el documento (con
+        ``autorizacion_pago`` si un intento anterior ya cobró) o None si no
+        se pudo reclamar. Los errores se propagan: tratarlos como "no
+        reclamable" confirmaría el mensaje sin procesar el pago.
+        """
+        ahora = datetime.now()
+        return await self.collection.find_one_and_update(
+            {
+                **self._filtro_id(transaccion_id),
+                "$or": [
+                    {"estado": EstadoTransaccion.PENDIENTE},
+                    {"estado": EstadoTransaccion.PROCESANDO, "reclamo_pago.expira": {"$lt": ahora}}
+                ]
+            },
+            {"$set": {
+                "estado": EstadoTransaccion.PROCESANDO,
+                "reclamo_pago": {"propietario": propietario, "expira": ahora + timedelta(seconds=lease_segundos)},
+                "fecha_actualizacion": ahora
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def registrar_autorizacion(self, transaccion_id: str, propietario: str, resultado_pago: Dict[str, Any]) -> bool:
+        """Guardar el resultado de la pasarela antes de finalizar (solo si el reclamo sigue siendo propio)"""
+        result = await self.collection.update_one(
+            {**self._filtro_id(transaccion_id), "estado": EstadoTransaccion.PROCESANDO, "reclamo_pago.propietario": propietario},
+            {"$set": {"autorizacion_pago": resultado_pago, "fecha_actualizacion": datetime.now()}}
+        )
+        return result.modified_count > 0
+    
+    async def liberar_reclamo(self, transaccion_id: str, propietario: str) -> bool:
+        """Devolver a ``pendiente`` una transacción reclamada cuyo intento falló (conserva la autorización)"""
+        try:
+            result = await self.collection.update_one(
+                {**self._filtro_id(transaccion_id), "estado": EstadoTransaccion.PROCESANDO, "reclamo_pago.propietario": propietario},
+                {"$set": {"estado": EstadoTransaccion.PENDIENTE, "fecha_actualizacion": datetime.now()},
+                 "$unset": {"reclamo_pago": ""}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error("Error liberando reclamo de transacción", extra={"error": str(e)})
+            return False
+    
+    async def finalizar_pago(self, transaccion_id: str, propietario: str, nuevo_estado: EstadoTransaccion, observacion: str = None, session=None) -> bool:
+        """
+        Confirmar o marcar como fallida una transacción reclamada
+        
+        Solo escribe si la transacción sigue en ``procesando`` con el reclamo
+        de ``propietario``: una cancelación o un reclamo vencido y tomado por
+        otro intento no se sobrescriben.
+        """
+        ahora = datetime.now()
+        update_data = {"estado": nuevo_estado, "fecha_actualizacion": ahora}
+        if nuevo_estado == EstadoTransaccion.CONFIRMADO:
+            update_data["fecha_confirmacion"] = ahora
+        if observacion:
+            update_data["observaciones"] = observacion
+        
+        result = await self.collection.update_one(
+            {**self._filtro_id(transaccion_id), "estado": EstadoTransaccion.PROCESANDO, "reclamo_pago.propietario": propietario},
+            {"$set": update_data, "$unset": {"reclamo_pago": ""}},
+            session=session
+        )
+        return result.modified_count > 0
+    
+    async def cancelar_si_no_reclamada(self, transaccion_id: str, observacion: str = None) -> bool:
+        """
+        Cancelar una transacción sin pago en curso ni cobrado
+        
+        Cancela si está ``pendiente`` o ``procesando`` con el reclamo vencido
+        o ausente, y nunca si ya hay una autorización exitosa guardada.
+        """
+        ahora = datetime.now()
+        update_data = {"estado": EstadoTransaccion.CANCELADO, "fecha_actualizacion": ahora}
+        if observacion:
+            update_data["observaciones"] = observacion
+        
+        try:
+            result = await self.collection.update_one(
+                {
+                    **self._filtro_id(transaccion_id),
+                    "autorizacion_pago.exitoso": {"$ne": True},
+                    "$or": [
+                        {"estado": EstadoTransaccion.PENDIENTE},
+                        {"estado": EstadoTransaccion.PROCESANDO, "reclamo_pago": {"$exists": False}},
+                        {"estado": EstadoTransaccion.PROCESANDO, "reclamo_pago.expira": {"$lt": ahora}}
+                    ]
+                },
+                {"$set": update_data, "$unset": {"reclamo_pago": ""}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error("Error cancelando transacción", extra={"error": str(e)})
             return False
     
     async def obtener_transacciones_pendientes(self) -> List[Transaccion]:
@@ -124,7 +238,7 @@ class TransaccionRepository:
             return transacciones
             
         except Exception as e:
-            print(f"Error obteniendo transacciones pendientes: {e}")
+            logger.error("Error obteniendo transacciones pendientes", extra={"error": str(e)})
             return []
     
     async def obtener_transacciones_por_fecha(self, fecha_inicio: datetime, fecha_fin: datetime) -> List[Transaccion]:
@@ -144,7 +258,7 @@ class TransaccionRepository:
             return transacciones
             
         except Exception as e:
-            print(f"Error obteniendo transacciones por fecha: {e}")
+            logger.error("Error obteniendo transacciones por fecha", extra={"error": str(e)})
             return []
     
     async def obtener_estadisticas_ventas(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
@@ -184,7 +298,7 @@ class TransaccionRepository:
                 }
                 
         except Exception as e:
-            print(f"Error obteniendo estadísticas de ventas: {e}")
+            logger.error("Error obteniendo estadísticas de ventas", extra={"error": str(e)})
             return {
                 "total_ventas": 0,
                 "cantidad_transacciones": 0,
@@ -219,7 +333,7 @@ class TransaccionRepository:
             return len(result) == 0
             
         except Exception as e:
-            print(f"Error verificando disponibilidad de asientos: {e}")
+            logger.error("Error verificando disponibilidad de asientos", extra={"error": str(e)})
             return False
     
     async def obtener_asientos_ocupados_funcion(self, funcion_id: str) -> List[str]:
@@ -247,5 +361,5 @@ class TransaccionRepository:
             return [doc["_id"] for doc in result]
             
         except Exception as e:
-            print(f"Error obteniendo asientos ocupados: {e}")
+            logger.error("Error obteniendo asientos ocupados", extra={"error": str(e)})
             return [] 
\ No newline at end of file
@@ -8,8 +8,13 @@ from bson import ObjectId
 
 from domain.entities.usuario import Usuario, UsuarioCreate, UsuarioResponse
 from services.auth_service import auth_service
+from infrastructure.utils.tracing import trazar_metodos
+from infrastructure.utils.logs import obtener_logger
 
+logger = obtener_logger(__name__)
 
+
+@trazar_metodos("repo.usuarios")
 class UsuarioRepository:
     """Repositorio para operaciones de usuarios"""
     
@@ -56,7 +61,7 @@ class UsuarioRepository:
             return usuario_response
             
         except Exception as e:
-            print(f"Error creando usuario: {e}")
+            logger.error("Error creando usuario", extra={"error": str(e)})
             return None
     
     async def obtener_usuario_por_id(self, usuario_id: str) -> Optional[UsuarioResponse]:
@@ -77,7 +82,7 @@ class UsuarioRepository:
             )
             
         except Exception as e:
-            print(f"Error obteniendo usuario: {e}")
+            logger.error("Error obteniendo usuario", extra={"error": str(e)})
             return None
     
     async def obtener_usuario_por_email(self, email: str) -> Optional[Usuario]:
@@ -99,7 +104,7 @@ class UsuarioRepository:
             )
             
         except Exception as e:
-            print(f"Error obteniendo usuario por email: {e}")
+            logger.error("Error obteniendo usuario por email", extra={"error": str(e)})
             return None
     
     async def autenticar_usuario(self, email: str, password: str) -> Optional[UsuarioResponse]:
@@ -128,7 +133,7 @@ class UsuarioRepository:
             return None
             
         except Exception as e:
-            print(f"Error autenticando usuario: {e}")
+            logger.error("Error autenticando usuario", extra={"error": str(e)})
             return None
     
     async def actualizar_usuario(self, usuario_id: str, datos_actualizacion: dict) -> Optional[UsuarioResponse]:
@@ -150,7 +155,7 @@ class UsuarioRepository:
             return None
             
         except Exception as e:
-            print(f"Error actualizando usuario: {e}")
+            logger.error("Error actualizando usuario", extra={"error": str(e)})
             return None
     
     async def desactivar_usuario(self, usuario_id: str) -> bool:
@@ -164,7 +169,7 @@ class UsuarioRepository:
             return result.modified_count > 0
             
         except Exception as e:
-            print(f"Error desactivando usuario: {e}")
+            logger.error("Error desactivando usuario", extra={"error": str(e)})
             return False
     
     async def listar_usuarios(self, skip: int = 0, limit: int = 100) -> List[UsuarioResponse]:
@@ -187,5 +192,5 @@ class UsuarioRepository:
             return usuarios
             
         except Exception as e:
-            print(f"Error listando usuarios: {e}")
+            logger.error("Error listando usuarios", extra={"error": str(e)})
             return [] 
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Cache read-through de dos niveles para documentos de películas y funciones
+
+L1: LRU en memoria del proceso (TTL corto, evita round-trips a Redis)
+L2: Redis con el documento serializado en JSON extendido (compartido entre workers)
+"""
+
+import copy
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from bson import json_util
+
+from config.settings import settings
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+# Marcador para ids inexistentes (cache negativa)
+_NO_EXISTE = "__no_existe__"
+
+
+class LRUCache:
+    """LRU en memoria con expiración por entrada"""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Obtiene un valor si existe y no ha expirado"""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        valor, expira_en = item
+        if expira_en < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return valor
+
+    def set(self, key: str, valor: Any, ttl: float):
+        """Guarda un valor con TTL, desalojando el menos usado si está lleno"""
+        self._items[key] = (valor, time.monotonic() + ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        """Elimina una clave"""
+        self._items.pop(key, None)
+
+    def clear(self):
+        """Vacía la cache"""
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class EntityCache:
+    """
+    Cache read-through de dos niveles con TTL por entidad,
+    cache negativa para ids inexistentes y métricas de hit ratio
+    """
+
+    def __init__(self, redis_service=None):
+        self.redis_service = redis_service
+        self.l1 = LRUCache(settings.cache_l1_max_items)
+        self.ttls = {
+            "pelicula": settings.cache_pelicula_ttl,
+            "funcion": settings.cache_funcion_ttl
+        }
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _stats(self, entidad: str) -> Dict[str, int]:
+        return self.stats.setdefault(entidad, {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "negativos": 0,
+            "invalidaciones": 0
+        })
+
+    async def obtener(
+        self,
+        entidad: str,
+        entidad_id: str,
+        cargar: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un documento pasando por L1, L2 y finalmente la fuente
+
+        Siempre devuelve una copia: los llamadores pueden mutar el documento
+        sin contaminar la cache.
+        """
+        key = f"cache:{entidad}:{entidad_id}"
+        stats = self._stats(entidad)
+
+        # L1 - memoria del proceso
+        valor = self.l1.get(key)
+        if valor is not None:
+            stats["l1_hits"] += 1
+            if valor == _NO_EXISTE:
+                stats["negativos"] += 1
+                return None
+            return copy.deepcopy(valor)
+
+        ttl = self.ttls.get(entidad, 60)
+        ttl_l1 = min(ttl, settings.cache_l1_ttl)
+
+        # L2 - Redis
+        if self.redis_service and self.redis_service.redis_client:
+            try:
+                serializado = await self.redis_service.get(key)
+                if serializado is not None:
+                    stats["l2_hits"] += 1
+                    if serializado == _NO_EXISTE:
+                        stats["negativos"] += 1
+                        self.l1.set(key, _NO_EXISTE, min(ttl_l1, settings.cache_negativo_ttl))
+                        return None
+                    documento = json_util.loads(serializado)
+                    self.l1.set(key, documento, ttl_l1)
+                    return copy.deepcopy(documento)
+            except Exception as e:
+                logger.warning("Error leyendo cache L2", extra={"key": key, "error": str(e)})
+
+        # Fuente (MongoDB)
+        stats["misses"] += 1
+        documento = await cargar()
+
+        if documento is None:
+            ttl_negativo = settings.cache_negativo_ttl
+            self.l1.set(key, _NO_EXISTE, min(ttl_l1, ttl_negativo))
+            await self._guardar_l2(key, _NO_EXISTE, ttl_negativo)
+            return None
+
+        self.l1.set(key, documento, ttl_l1)
+        await self._guardar_l2(key, json_util.dumps(documento), ttl)
+        return copy.deepcopy(documento)
+
+    async def invalidar(self, entidad: str, entidad_id: str):
+        """Invalida un documento en ambos niveles"""
+        key = f"cache:{entidad}:{entidad_id}"
+        self._stats(entidad)["invalidaciones"] += 1
+        self.l1.delete(key)
+        if self.redis_service and self.redis_service.redis_client:
+            try:
+                await self.redis_service.delete(key)
+            except Exception as e:
+                logger.warning("Error invalidando cache L2", extra={"key": key, "error": str(e)})
+
+    async def _guardar_l2(self, key: str, valor: str, ttl: int):
+        if self.redis_service and self.redis_service.redis_client:
+            try:
+                await self.redis_service.set(key, valor, expire=ttl)
+            except Exception as e:
+                logger.warning("Error escribiendo cache L2", extra={"key": key, "error": str(e)})
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Métricas de aciertos por entidad y nivel"""
+        resultado = {}
+        for entidad, stats in self.stats.items():
+            total = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+            resultado[entidad] = {
+                **stats,
+                "total": total,
+                "hit_ratio": round((stats["l1_hits"] + stats["l2_hits"]) / total, 4) if total else 0.0,
+                "hit_ratio_l1": round(stats["l1_hits"] / total, 4) if total else 0.0
+            }
+        return {
+            "entidades": resultado,
+            "l1_items": len(self.l1),
+            "l2_habilitado": bool(self.redis_service and self.redis_service.redis_client)
+        }
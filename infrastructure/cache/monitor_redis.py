@@ -0,0 +1,334 @@
+"""
+Latencia de comandos y muestreo del keyspace de Redis
+
+- Comandos: se instrumenta el cliente de redis-py (``execute_command`` y
+  ``pipeline``), no solo los métodos de ``RedisService``, porque buena
+  parte del código usa ``redis_client`` directamente. Cada comando
+  alimenta un histograma por nombre (GET, SETBIT, XREADGROUP...), cada
+  pipeline registra su tamaño y latencia, y se cuentan los comandos por
+  prefijo de la clave para ver qué parte del keyspace está caliente.
+- Keyspace: una tarea recorre las claves con SCAN y obtiene en pipeline
+  ``MEMORY USAGE`` y ``TTL`` de cada una. La tarea se arranca desde el
+  lifespan de la API y, entre todos sus workers, solo muestrea el que
+  tiene ``CLAVE_MUESTREADOR`` (SET NX EX). Por prefijo se publican claves,
+  bytes, claves sin TTL y las más grandes; el crecimiento entre muestras
+  o las claves sin TTL en prefijos temporales (``selection:*``,
+  ``reserva:*``) delatan fugas antes de llegar a ``maxmemory``.
+"""
+
+import asyncio
+import heapq
+import os
+import socket
+import time
+from collections import Counter as Contador
+from typing import Optional, Dict, Any, List, Tuple
+
+from config.settings import settings
+from infrastructure.metrics.prometheus_metrics import (
+    REDIS_COMANDO_LATENCIA, REDIS_COMANDO_ERRORES, REDIS_COMANDOS_PREFIJO, REDIS_PIPELINE_COMANDOS,
+    REDIS_PIPELINE_LATENCIA, REDIS_CLAVES, REDIS_CLAVES_BYTES, REDIS_CLAVES_SIN_TTL
+)
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Grupo de las claves que no coinciden con ningún prefijo
+OTROS = "otros"
+
+# Un solo proceso muestrea el keyspace (SCAN completo por intervalo)
+CLAVE_MUESTREADOR = "monitor:keyspace:muestreador"
+
+
+class EstadisticaComando:
+    """Conteo, errores y latencia acumulada de un comando"""
+
+    __slots__ = ("conteo", "errores", "total", "max")
+
+    def __init__(self):
+        self.conteo = 0
+        self.errores = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def registrar(self, segundos: float, error: bool = False):
+        self.conteo += 1
+        self.errores += error
+        self.total += segundos
+        self.max = max(self.max, segundos)
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "conteo": self.conteo,
+            "errores": self.errores,
+            "promedio_ms": round(self.total / self.conteo * 1000, 3) if self.conteo else 0,
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+
+class MonitorRedis:
+    """
+    Instrumenta clientes de Redis y muestrea el keyspace por prefijo
+    """
+
+    def __init__(self, prefijos: List[str] = None, intervalo: float = None, max_claves: int = None,
+                 lote: int = None, top: int = None):
+        if prefijos is None:
+            prefijos = [p.strip() for p in settings.redis_keyspace_prefijos.split(",") if p.strip()]
+        # Los prefijos más largos primero: "sala:asientos:" antes que "sala:"
+        self.prefijos = sorted(prefijos, key=len, reverse=True)
+        self.intervalo = settings.redis_keyspace_intervalo if intervalo is None else intervalo
+        self.max_claves = max_claves or settings.redis_keyspace_max_claves
+        self.lote = lote or settings.redis_keyspace_lote
+        self.top = top or settings.redis_keyspace_top
+
+        self.comandos: Dict[str, EstadisticaComando] = {}
+        self.pipelines = EstadisticaComando()
+        self.comandos_en_pipeline = 0
+        self.max_pipeline = 0
+        self.por_prefijo: Contador = Contador()
+        self.ultima_muestra: Optional[Dict[str, Any]] = None
+        self.muestras = 0
+        self.errores_muestra = 0
+        self.identidad = f"{socket.gethostname()}-{os.getpid()}"
+        self.es_muestreador = False
+
+        self._metricas: Dict[str, Tuple[Any, Any]] = {}
+        self._metricas_prefijo = {p: REDIS_COMANDOS_PREFIJO.labels(p) for p in self.prefijos + [OTROS]}
+        self._cliente = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    def prefijo(self, clave: str) -> str:
+        """Prefijo configurado al que pertenece la clave (u ``otros``)"""
+        for prefijo in self.prefijos:
+            if clave.startswith(prefijo):
+                return prefijo
+        return OTROS
+
+    # Instrumentación del cliente
+    def instrumentar(self, cliente):
+        """Reemplaza ``execute_command`` y ``pipeline`` del cliente por versiones medidas"""
+        if getattr(cliente, "_monitor_redis", None) is self:
+            return cliente
+        ejecutar = cliente.execute_command
+        crear_pipeline = cliente.pipeline
+        monitor = self
+
+        async def execute_command(*args, **options):
+            inicio = time.perf_counter()
+            error = False
+            try:
+                return await ejecutar(*args, **options)
+            except Exception:
+                error = True
+                raise
+            finally:
+                monitor.registrar_comando(args, time.perf_counter() - inicio, error)
+
+        def pipeline(transaction: bool = True, shard_hint: Optional[str] = None):
+            pipe = crear_pipeline(transaction, shard_hint)
+            ejecutar_pipe = pipe.execute
+
+            async def execute(raise_on_error: bool = True):
+                comandos = [args for args, _ in pipe.command_stack]
+                inicio = time.perf_counter()
+                error = False
+                try:
+                    return await ejecutar_pipe(raise_on_error)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    monitor.registrar_pipeline(comandos, time.perf_counter() - inicio, error)
+
+            pipe.execute = execute
+            return pipe
+
+        cliente.execute_command = execute_command
+        cliente.pipeline = pipeline
+        cliente._monitor_redis = self
+        # El muestreo del keyspace no debe contaminar los tamaños de pipeline
+        cliente._pipeline_sin_medir = crear_pipeline
+        return cliente
+
+    def registrar_comando(self, args: tuple, segundos: float, error: bool = False):
+        """Registra un comando individual (nombre en ``args[0]``, clave en ``args[1]``)"""
+        if not args:
+            return
+        nombre = str(args[0]).upper()
+        metricas = self._metricas.get(nombre)
+        if metricas is None:
+            metricas = self._metricas[nombre] = (REDIS_COMANDO_LATENCIA.labels(nombre), REDIS_COMANDO_ERRORES.labels(nombre))
+            self.comandos[nombre] = EstadisticaComando()
+        metricas[0].observe(segundos)
+        if error:
+            metricas[1].inc()
+        self.comandos[nombre].registrar(segundos, error)
+        self._contar_prefijo(args)
+
+    def registrar_pipeline(self, comandos: List[tuple], segundos: float, error: bool = False):
+        """Registra el tamaño y la latencia de un pipeline"""
+        if not comandos:
+            return
+        REDIS_PIPELINE_COMANDOS.observe(len(comandos))
+        REDIS_PIPELINE_LATENCIA.observe(segundos)
+        self.pipelines.registrar(segundos, error)
+        self.comandos_en_pipeline += len(comandos)
+        self.max_pipeline = max(self.max_pipeline, len(comandos))
+        for args in comandos:
+            self._contar_prefijo(args)
+
+    def _contar_prefijo(self, args: tuple):
+        if len(args) > 1 and isinstance(args[1], str):
+            prefijo = self.prefijo(args[1])
+            self.por_prefijo[prefijo] += 1
+            self._metricas_prefijo[prefijo].inc()
+
+    # Muestreo del keyspace
+    async def iniciar(self, cliente):
+        """Arranca el muestreo periódico del keyspace (solo muestrea el proceso elegido)"""
+        if self._tarea is not None:
+            return
+        self._cliente = cliente
+        if self.intervalo > 0:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self, cliente=None):
+        if cliente is not None and cliente is not self._cliente:
+            return
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        if self.es_muestreador:
+            # Ceder el lock para que otro proceso tome el muestreo sin esperar el TTL
+            try:
+                if await self._cliente.get(CLAVE_MUESTREADOR) == self.identidad:
+                    await self._cliente.delete(CLAVE_MUESTREADOR)
+            except Exception as e:
+                logger.warning("Error liberando el muestreo del keyspace", extra={"error": str(e)})
+            self.es_muestreador = False
+        self._cliente = None
+
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                if await self._es_muestreador():
+                    await self.muestrear()
+            except Exception as e:
+                self.errores_muestra += 1
+                logger.warning("Error muestreando el keyspace de Redis", extra={"error": str(e)})
+
+    async def _es_muestreador(self) -> bool:
+        """Un solo proceso muestrea a la vez (lock con TTL en Redis que el dueño renueva)"""
+        ttl = max(int(self.intervalo * 3), 10)
+        if await self._cliente.set(CLAVE_MUESTREADOR, self.identidad, ex=ttl, nx=True):
+            self.es_muestreador = True
+        elif await self._cliente.get(CLAVE_MUESTREADOR) == self.identidad:
+            self.es_muestreador = await self._cliente.expire(CLAVE_MUESTREADOR, ttl)
+        else:
+            self.es_muestreador = False
+        return self.es_muestreador
+
+    async def muestrear(self, cliente=None) -> Dict[str, Any]:
+        """
+        Recorre el keyspace con SCAN (hasta ``max_claves``) y agrupa por prefijo
+
+        Si el recorrido se corta, los conteos y bytes se extrapolan con
+        DBSIZE (SCAN devuelve las claves en orden de la tabla hash, que no
+        depende del prefijo).
+        """
+        cliente = cliente or self._cliente
+        crear_pipeline = getattr(cliente, "_pipeline_sin_medir", cliente.pipeline)
+        inicio = time.perf_counter()
+        grupos = {p: {"claves": 0, "bytes": 0, "sin_ttl": 0, "mayores": []} for p in self.prefijos + [OTROS]}
+        escaneadas = 0
+        cursor = 0
+
+        while True:
+            cursor, claves = await cliente.scan(cursor, count=self.lote)
+            claves = claves[:self.max_claves - escaneadas]
+            if claves:
+                pipe = crear_pipeline(transaction=False)
+                for clave in claves:
+                    pipe.memory_usage(clave)
+                    pipe.ttl(clave)
+                resultados = await pipe.execute(raise_on_error=False)
+
+                for clave, memoria, ttl in zip(claves, resultados[0::2], resultados[1::2]):
+                    if not isinstance(memoria, int):
+                        # La clave expiró entre SCAN y MEMORY USAGE
+                        continue
+                    grupo = grupos[self.prefijo(clave)]
+                    grupo["claves"] += 1
+                    grupo["bytes"] += memoria
+                    if ttl == -1:
+                        grupo["sin_ttl"] += 1
+                    if len(grupo["mayores"]) < self.top:
+                        heapq.heappush(grupo["mayores"], (memoria, clave))
+                    elif memoria > grupo["mayores"][0][0]:
+                        heapq.heapreplace(grupo["mayores"], (memoria, clave))
+                escaneadas += len(claves)
+            if cursor == 0 or escaneadas >= self.max_claves:
+                break
+
+        completo = cursor == 0
+        total_claves = escaneadas if completo else await cliente.dbsize()
+        factor = total_claves / escaneadas if escaneadas else 1.0
+        anterior = (self.ultima_muestra or {}).get("prefijos", {})
+
+        prefijos = {}
+        for prefijo, grupo in grupos.items():
+            claves = round(grupo["claves"] * factor)
+            memoria = round(grupo["bytes"] * factor)
+            sin_ttl = round(grupo["sin_ttl"] * factor)
+            REDIS_CLAVES.labels(prefijo).set(claves)
+            REDIS_CLAVES_BYTES.labels(prefijo).set(memoria)
+            REDIS_CLAVES_SIN_TTL.labels(prefijo).set(sin_ttl)
+            prefijos[prefijo] = {
+                "claves": claves,
+                "bytes": memoria,
+                "bytes_promedio": round(grupo["bytes"] / grupo["claves"]) if grupo["claves"] else 0,
+                "sin_ttl": sin_ttl,
+                "variacion_claves": claves - anterior[prefijo]["claves"] if prefijo in anterior else None,
+                "mayores": [{"clave": c, "bytes": b} for b, c in sorted(grupo["mayores"], reverse=True)]
+            }
+
+        self.muestras += 1
+        self.ultima_muestra = {
+            "timestamp": time.time(),
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "claves_escaneadas": escaneadas,
+            "claves_totales": total_claves,
+            "completo": completo,
+            "prefijos": prefijos
+        }
+        return self.ultima_muestra
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        comandos = sorted(self.comandos.items(), key=lambda c: c[1].total, reverse=True)
+        return {
+            "comandos": {nombre: estadistica.a_dict() for nombre, estadistica in comandos},
+            "pipelines": {
+                **self.pipelines.a_dict(),
+                "comandos_promedio": round(self.comandos_en_pipeline / self.pipelines.conteo, 1) if self.pipelines.conteo else 0,
+                "comandos_max": self.max_pipeline
+            },
+            "comandos_por_prefijo": dict(self.por_prefijo.most_common()),
+            "keyspace": {
+                "intervalo_segundos": self.intervalo,
+                "muestreador": self.es_muestreador,
+                "muestras": self.muestras,
+                "errores": self.errores_muestra,
+                "ultima": self.ultima_muestra
+            }
+        }
+
+
+# Instancia global (se instrumenta el cliente en RedisService.connect y el
+# muestreo lo arranca el lifespan de la API)
+monitor_redis = MonitorRedis()
@@ -3,8 +3,16 @@ import asyncio
 import json
 from typing import Optional, Dict, List, Any, Union
 from config.settings import settings
+from infrastructure.utils.single_flight import single_flight
+from infrastructure.utils import tracing
+from infrastructure.metrics.prometheus_metrics import instrumentar_operaciones, REDIS_LATENCIA, REDIS_ERRORES
+from infrastructure.cache.monitor_redis import monitor_redis
+from infrastructure.utils.logs import obtener_logger
 
+logger = obtener_logger(__name__)
 
+
+@instrumentar_operaciones(REDIS_LATENCIA, REDIS_ERRORES, "redis")
 class RedisService:
     """
     Servicio de Redis optimizado para el sistema de cine
@@ -51,9 +59,15 @@ class RedisService:
                     print(f"⚠️  Intento {attempt + 1} fallido, reintentando...")
                     await asyncio.sleep(1)
         
+        # Latencia por comando y tamaño de pipelines (el muestreo del keyspace
+        # lo arranca solo el lifespan de la API)
+        if settings.redis_monitor_habilitado:
+            monitor_redis.instrumentar(self.redis_client)
+        
     async def disconnect(self):
         """Cierra la conexión con Redis"""
         if self.redis_client:
+            await monitor_redis.detener(self.redis_client)
             await self.redis_client.close()
     
     # Operaciones básicas de cache
@@ -61,6 +75,10 @@ class RedisService:
         """Obtiene un valor por clave"""
         return await self.redis_client.get(key)
     
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Obtiene varios valores en un solo comando (None si la clave no existe)"""
+        return await self.redis_client.mget(keys)
+    
     async def set(self, key: str, value: str, expire: Optional[int] = None) -> bool:
         """Establece un valor con TTL opcional"""
         return await self.redis_client.set(key, value, ex=expire)
@@ -126,6 +144,23 @@ class RedisService:
         """Obtiene el ranking de un miembro (orden descendente)"""
         return await self.redis_client.zrevrank(key, member)
     
+    # Operaciones de listas
+    async def rpush(self, key: str, *values: str) -> int:
+        """Agrega elementos al final de una lista"""
+        return await self.redis_client.rpush(key, *values)
+    
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        """Obtiene un rango de elementos de una lista"""
+        return await self.redis_client.lrange(key, start, end)
+    
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        """Recorta una lista al rango indicado"""
+        return await self.redis_client.ltrim(key, start, end)
+    
+    async def llen(self, key: str) -> int:
+        """Obtiene la longitud de una lista"""
+        return await self.redis_client.llen(key)
+    
     # Operaciones de HyperLogLog (para conteo único)
     async def pfadd(self, key: str, *elements: str) -> int:
         """Agrega elementos a un HyperLogLog"""
@@ -136,9 +171,9 @@ class RedisService:
         return await self.redis_client.pfcount(key)
     
     # Operaciones de Streams (para eventos)
-    async def xadd(self, stream: str, fields: Dict[str, Any], id: str = "*") -> str:
-        """Agrega un mensaje a un stream"""
-        return await self.redis_client.xadd(stream, fields, id=id)
+    async def xadd(self, stream: str, fields: Dict[str, Any], id: str = "*", maxlen: Optional[int] = None, approximate: bool = True) -> str:
+        """Agrega un mensaje a un stream (con recorte aproximado opcional por MAXLEN)"""
+        return await self.redis_client.xadd(stream, fields, id=id, maxlen=maxlen, approximate=approximate)
     
     async def xread(self, streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None) -> List:
         """Lee mensajes de streams"""
@@ -148,14 +183,64 @@ class RedisService:
         """Confirma el procesamiento de un mensaje en un stream"""
         return await self.redis_client.xack(stream, group, message_id)
     
+    async def xgroup_create(self, stream: str, group: str, id: str = "0", mkstream: bool = True) -> bool:
+        """Crea un grupo de consumidores (ignora si ya existe)"""
+        try:
+            return await self.redis_client.xgroup_create(stream, group, id=id, mkstream=mkstream)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" in str(e):
+                return False
+            raise
+    
+    async def xreadgroup(self, group: str, consumer: str, streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None) -> List:
+        """Lee mensajes de streams como parte de un grupo de consumidores"""
+        return await self.redis_client.xreadgroup(group, consumer, streams, count=count, block=block)
+    
+    async def xautoclaim(self, stream: str, group: str, consumer: str, min_idle_time: int, start_id: str = "0-0", count: int = 100) -> List:
+        """Reclama mensajes pendientes de otros consumidores inactivos por más de min_idle_time ms"""
+        return await self.redis_client.xautoclaim(stream, group, consumer, min_idle_time, start_id=start_id, count=count)
+    
     async def xlen(self, stream: str) -> int:
         """Obtiene el número de mensajes en un stream"""
         return await self.redis_client.xlen(stream)
     
+    async def xrange(self, stream: str, min: str = "-", max: str = "+", count: Optional[int] = None) -> List:
+        """Obtiene mensajes de un stream en un rango de IDs"""
+        return await self.redis_client.xrange(stream, min=min, max=max, count=count)
+    
+    async def xtrim(self, stream: str, maxlen: Optional[int] = None, minid: Optional[str] = None, approximate: bool = True) -> int:
+        """Recorta un stream por longitud o por ID mínimo"""
+        return await self.redis_client.xtrim(stream, maxlen=maxlen, minid=minid, approximate=approximate)
+    
+    async def xinfo_groups(self, stream: str) -> List[Dict[str, Any]]:
+        """Información de los grupos de consumidores de un stream"""
+        try:
+            return await self.redis_client.xinfo_groups(stream)
+        except redis.ResponseError:
+            # El stream no existe
+            return []
+    
+    async def xpending(self, stream: str, group: str) -> Dict[str, Any]:
+        """Resumen de mensajes pendientes (sin ACK) de un grupo"""
+        return await self.redis_client.xpending(stream, group)
+    
+    async def memory_usage(self, key: str) -> int:
+        """Bytes usados por una clave (0 si no existe)"""
+        return await self.redis_client.memory_usage(key) or 0
+    
     async def zcount(self, key: str, min_score: Union[float, str], max_score: Union[float, str]) -> int:
         """Cuenta elementos en un sorted set dentro de un rango de scores"""
         return await self.redis_client.zcount(key, min_score, max_score)
     
+    async def zrangebyscore(self, key: str, min_score: Union[float, str], max_score: Union[float, str],
+                            start: Optional[int] = None, num: Optional[int] = None, withscores: bool = False) -> List:
+        """Obtiene elementos de un sorted set dentro de un rango de scores"""
+        return await self.redis_client.zrangebyscore(key, min_score, max_score, start=start, num=num, withscores=withscores)
+    
+    async def zrem(self, key: str, *members: str) -> int:
+        """Elimina miembros de un sorted set"""
+        return await self.redis_client.zrem(key, *members)
+    
     # Operaciones avanzadas
     async def set_with_expiry(self, key: str, value: str, expire_seconds: int, only_if_not_exists: bool = False) -> bool:
         """Establece un valor con TTL y opción NX"""
@@ -169,6 +254,7 @@ class RedisService:
     
     async def pipeline_execute(self, operations: List[tuple]) -> List:
         """Ejecuta múltiples operaciones en un pipeline"""
+        tracing.anotar(comandos=len(operations))
         pipe = self.redis_client.pipeline()
         
         for operation in operations:
@@ -178,7 +264,19 @@ class RedisService:
         
         return await pipe.execute()
     
+    async def script_lote(self, script: str, llamadas: List[tuple]) -> List:
+        """Ejecuta un script Lua (atómico en Redis) una vez por cada (keys, args) en un pipeline"""
+        tracing.anotar(comandos=len(llamadas))
+        registrado = self.redis_client.register_script(script)
+        pipe = self.redis_client.pipeline(transaction=False)
+    
+        for keys, args in llamadas:
+            await registrado(keys=keys, args=args, client=pipe)
+    
+        return await pipe.execute()
+    
     # Utilidades para el sistema de cine
+    @single_flight("redis.get_sala_ocupacion")
     async def get_sala_ocupacion(self, funcion_id: str) -> Dict[str, Any]:
         """Obtiene el estado de ocupación de una sala usando bitmap"""
         bitmap_key = f"sala:asientos:{funcion_id}"
@@ -200,6 +298,7 @@ class RedisService:
             "porcentaje_ocupacion": round(porcentaje_ocupacion, 2)
         }
     
+    @single_flight("redis.get_ranking_peliculas")
     async def get_ranking_peliculas(self, limite: int = 10) -> List[Dict[str, Any]]:
         """Obtiene el ranking de películas más vendidas"""
         ranking = await self.zrange(
@@ -235,6 +334,7 @@ class RedisService:
         return reservas_eliminadas
     
     # Métodos adicionales para controladores
+    @single_flight("redis.get_asientos_ocupados")
     async def get_asientos_ocupados(self, funcion_id: str) -> List[str]:
         """Obtiene lista de asientos ocupados para una función"""
         bitmap_key = f"sala:asientos:{funcion_id}"
@@ -291,13 +391,131 @@ class RedisService:
             return result > 0
             
         except Exception as e:
-            print(f"Error liberando asiento: {e}")
+            logger.error("Error liberando asiento", extra={"error": str(e)})
             return False
     
-    async def get_ocupacion_promedio(self) -> float:
-        """Obtiene el porcentaje promedio de ocupación de todas las salas"""
-        # Simular cálculo de ocupación promedio
-        return 65.5  # Porcentaje de ejemplo
+    async def liberar_asientos_usuario(self, funcion_id: str, asientos: List[str], usuario_id: str) -> int:
+        """Libera varias reservas temporales de un usuario en un solo pipeline"""
+        try:
+            if not self.redis_client or not asientos:
+                return 0
+            
+            bitmap_key = f"sala:asientos:{funcion_id}"
+            pipe = self.redis_client.pipeline(transaction=False)
+            for asiento in asientos:
+                pipe.delete(f"reserva:{funcion_id}:{asiento}:{usuario_id}")
+            for asiento in asientos:
+                pipe.setbit(bitmap_key, hash(asiento) % 1000, 0)
+            resultados = await pipe.execute()
+            
+            return sum(resultados[:len(asientos)])
+            
+        except Exception as e:
+            logger.error("Error liberando asientos", extra={"error": str(e)})
+            return 0
+    
+    async def retener_asientos(self, funcion_id: str, asientos: List[str], propietario: str, ttl_segundos: int) -> bool:
+        """
+        Retiene asientos para un propietario (p. ej. una transacción pendiente)
+        
+        Todos o ninguno: si algún asiento ya está retenido por otro
+        propietario se liberan los obtenidos y se devuelve False.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for asiento in asientos:
+            pipe.set(f"retencion:{funcion_id}:{asiento}", propietario, nx=True, ex=ttl_segundos)
+        resultados = await pipe.execute()
+        
+        if all(resultados):
+            return True
+        
+        obtenidos = [asiento for asiento, ok in zip(asientos, resultados) if ok]
+        await self.soltar_asientos(funcion_id, obtenidos, propietario)
+        return False
+    
+    async def soltar_asientos(self, funcion_id: str, asientos: List[str], propietario: str) -> int:
+        """Libera las retenciones de asientos que pertenecen al propietario"""
+        if not asientos:
+            return 0
+        keys = [f"retencion:{funcion_id}:{asiento}" for asiento in asientos]
+        duenos = await self.redis_client.mget(keys)
+        propias = [key for key, dueno in zip(keys, duenos) if dueno == propietario]
+        return await self.redis_client.delete(*propias) if propias else 0
+    
+    async def renovar_retencion(self, funcion_id: str, asientos: List[str], propietario: str, ttl_segundos: int) -> bool:
+        """
+        Extiende las retenciones del propietario y recupera las que vencieron
+        
+        Devuelve False si algún asiento quedó retenido por otro propietario
+        (la retención venció y otra compra lo tomó).
+        """
+        if not asientos:
+            return True
+        keys = [f"retencion:{funcion_id}:{asiento}" for asiento in asientos]
+        duenos = await self.redis_client.mget(keys)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, dueno in zip(keys, duenos):
+            if dueno == propietario:
+                pipe.expire(key, ttl_segundos)
+            else:
+                pipe.set(key, propietario, nx=True, ex=ttl_segundos)
+        resultados = await pipe.execute()
+        return all(resultados)
+    
+    async def asientos_retenidos(self, funcion_id: str, asientos: List[str]) -> List[str]:
+        """Devuelve los asientos que tienen una retención activa"""
+        if not self.redis_client or not asientos:
+            return []
+        duenos = await self.redis_client.mget([f"retencion:{funcion_id}:{asiento}" for asiento in asientos])
+        return [asiento for asiento, dueno in zip(asientos, duenos) if dueno]
+    
+    async def guardar_estado_pago(self, transaccion_id: str, estado: Dict[str, Any]) -> bool:
+        """Guarda el estado de un pago asíncrono para consultas de estado"""
+        return await self.set(
+            f"pago:estado:{transaccion_id}",
+            json.dumps(estado, default=str),
+            expire=settings.pagos_estado_ttl
+        )
+    
+    async def obtener_estado_pago(self, transaccion_id: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el estado de un pago asíncrono"""
+        valor = await self.get(f"pago:estado:{transaccion_id}")
+        return json.loads(valor) if valor else None
+    
+    async def get_ocupacion_promedio(self, batch_size: int = 500) -> float:
+        """
+        Obtiene el porcentaje promedio de ocupación de todas las salas
+        
+        Recorre los bitmaps ``sala:asientos:*`` con SCAN y obtiene en un solo
+        pipeline por lote el BITCOUNT y la capacidad de cada función.
+        """
+        porcentajes = []
+        claves = []
+        
+        async def procesar_lote(lote: List[str]):
+            pipe = self.redis_client.pipeline()
+            for bitmap_key in lote:
+                funcion_id = bitmap_key.split(":", 2)[2]
+                pipe.bitcount(bitmap_key)
+                pipe.hget(f"funcion:{funcion_id}", "capacidad_total")
+            resultados = await pipe.execute()
+            
+            for ocupados, capacidad in zip(resultados[0::2], resultados[1::2]):
+                capacidad = int(capacidad) if capacidad else 100  # default
+                if capacidad > 0:
+                    porcentajes.append(min(ocupados / capacidad, 1.0) * 100)
+        
+        async for bitmap_key in self.redis_client.scan_iter(match="sala:asientos:*", count=batch_size):
+            claves.append(bitmap_key)
+            if len(claves) >= batch_size:
+                await procesar_lote(claves)
+                claves = []
+        if claves:
+            await procesar_lote(claves)
+        
+        if not porcentajes:
+            return 0.0
+        return round(sum(porcentajes) / len(porcentajes), 2)
     
     async def marcar_asiento_ocupado(self, funcion_id: str, asiento: str) -> bool:
         """Marca un asiento como ocupado permanentemente"""
@@ -318,9 +536,29 @@ class RedisService:
             offset = hash(asiento) % 1000  # Hash simple para offset
             await self.redis_client.setbit(bitmap_key, offset, 1)
             
-            print(f"✅ Asiento {asiento} marcado como ocupado permanentemente para función {funcion_id}")
+            logger.debug("Asiento marcado como ocupado", extra={"funcion_id": funcion_id, "asiento": asiento})
+            return True
+            
+        except Exception as e:
+            logger.error("Error marcando asiento como ocupado", extra={"funcion_id": funcion_id, "asiento": asiento, "error": str(e)})
+            return False
+    
+    async def marcar_asientos_ocupados(self, funcion_id: str, asientos: List[str]) -> bool:
+        """Marca varios asientos como ocupados permanentemente en un solo pipeline"""
+        try:
+            if not self.redis_client or not asientos:
+                return False
+            
+            bitmap_key = f"sala:asientos:{funcion_id}"
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.sadd(f"funcion:asientos_ocupados_permanente:{funcion_id}", *asientos)
+            pipe.srem(f"funcion:asientos_ocupados:{funcion_id}", *asientos)
+            for asiento in asientos:
+                pipe.setbit(bitmap_key, hash(asiento) % 1000, 1)
+            await pipe.execute()
+            
             return True
             
         except Exception as e:
-            print(f"❌ Error marcando asiento {asiento} como ocupado: {e}")
-            return False 
\ No newline at end of file
+            logger.error("Error marcando asientos como ocupados", extra={"funcion_id": funcion_id, "asientos": asientos, "error": str(e)})
+            return False
@@ -0,0 +1,276 @@
+"""
+Captura de consultas lentas de MongoDB
+
+Un ``CommandListener`` de pymongo mide cada comando de lectura/escritura.
+Los que superan el umbral se agrupan por forma normalizada (los valores
+literales se reemplazan por ``"?"``; operadores y campos se conservan),
+y para cada forma nueva se lanza un ``explain`` en segundo plano que
+indica si la consulta usó un índice o recorrió la colección completa.
+
+Los callbacks del listener corren en los hilos de motor, así que el
+estado compartido se protege con un lock y el explain se agenda en el
+event loop con ``call_soon_threadsafe``.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+from pymongo import monitoring
+
+from config.settings import settings
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Campo con el filtro/pipeline de cada comando monitoreado
+CAMPOS_CONSULTA = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+
+# Etapas del plan que implican uso de índice
+ETAPAS_INDICE = {"IXSCAN", "EXPRESS_IXSCAN", "IDHACK", "EXPRESS_IDHACK", "COUNT_SCAN", "DISTINCT_SCAN", "TEXT", "TEXT_MATCH", "GEO_NEAR_2DSPHERE"}
+
+# Campos del comando que no se envían al explain
+CAMPOS_SESION = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern", "writeConcern", "startTransaction", "autocommit"}
+
+
+# Claves cuyo valor es estructura de la consulta, no literales
+CLAVES_ESTRUCTURA = {"sort", "projection", "key", "$sort", "$project", "$group", "$unwind", "$count"}
+
+
+def normalizar(valor: Any, clave: str = None) -> Any:
+    """Reemplaza los literales por ``"?"`` conservando campos, operadores y orden"""
+    if clave in CLAVES_ESTRUCTURA:
+        return valor
+    if isinstance(valor, dict):
+        return {k: normalizar(v, k) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        # Listas de documentos (pipelines, $or, $and) se normalizan elemento a elemento
+        if valor and all(isinstance(v, dict) for v in valor):
+            return [normalizar(v) for v in valor]
+        return "?"
+    if isinstance(valor, str) and valor.startswith("$"):
+        # Referencia a un campo dentro de una expresión
+        return valor
+    return "?"
+
+
+def forma_comando(nombre: str, comando: Dict[str, Any]) -> Dict[str, Any]:
+    """Forma normalizada de un comando (solo los campos que definen la consulta)"""
+    forma = {}
+    for campo in CAMPOS_CONSULTA.get(nombre, ()):
+        if campo not in comando:
+            continue
+        if campo in ("updates", "deletes"):
+            # Solo el filtro de la sentencia; el documento de actualización no afecta el plan
+            forma[campo] = [normalizar(s.get("q", {})) for s in comando[campo][:1]]
+        else:
+            forma[campo] = normalizar(comando[campo], campo)
+    return forma
+
+
+def resumir_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Etapas del plan ganador y si usó índice o recorrió la colección"""
+    etapas: List[str] = []
+    indices: List[str] = []
+
+    def recorrer(nodo: Any):
+        if isinstance(nodo, dict):
+            if "stage" in nodo:
+                etapas.append(nodo["stage"])
+                if "indexName" in nodo:
+                    indices.append(nodo["indexName"])
+            for clave, valor in nodo.items():
+                if clave in ("winningPlan", "inputStage", "inputStages", "queryPlan", "stages", "$cursor", "queryPlanner", "shards"):
+                    recorrer(valor)
+        elif isinstance(nodo, list):
+            for elemento in nodo:
+                recorrer(elemento)
+
+    recorrer(explain)
+    return {
+        "usa_indice": any(etapa in ETAPAS_INDICE for etapa in etapas),
+        "coleccion_completa": "COLLSCAN" in etapas,
+        "etapas": etapas,
+        "indices": sorted(set(indices))
+    }
+
+
+class FormaLenta:
+    """Estadísticas acumuladas de una forma de consulta lenta"""
+
+    __slots__ = ("id", "comando", "namespace", "forma", "conteo", "total_ms", "max_ms", "ultima", "plan", "ejemplo")
+
+    def __init__(self, id: str, comando: str, namespace: str, forma: Dict[str, Any], ejemplo: Dict[str, Any]):
+        self.id = id
+        self.comando = comando
+        self.namespace = namespace
+        self.forma = forma
+        self.conteo = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.ultima = 0.0
+        self.plan: Optional[Dict[str, Any]] = None
+        self.ejemplo = ejemplo
+
+    def registrar(self, duracion_ms: float):
+        self.conteo += 1
+        self.total_ms += duracion_ms
+        self.max_ms = max(self.max_ms, duracion_ms)
+        self.ultima = time.time()
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "comando": self.comando,
+            "namespace": self.namespace,
+            "forma": self.forma,
+            "conteo": self.conteo,
+            "total_ms": round(self.total_ms, 1),
+            "promedio_ms": round(self.total_ms / self.conteo, 1) if self.conteo else 0,
+            "max_ms": round(self.max_ms, 1),
+            "ultima": self.ultima,
+            "plan": self.plan
+        }
+
+
+class MonitorConsultasLentas(monitoring.CommandListener):
+    """
+    Listener de comandos que registra las consultas sobre el umbral
+    """
+
+    def __init__(self, umbral_ms: float = None, max_formas: int = None, explain: bool = None):
+        self.umbral_ms = settings.mongodb_lentas_umbral_ms if umbral_ms is None else umbral_ms
+        self.max_formas = max_formas or settings.mongodb_lentas_max_formas
+        self.explain = settings.mongodb_lentas_explain if explain is None else explain
+        self._pendientes: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any]]] = {}
+        self._formas: Dict[str, FormaLenta] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._tareas = set()
+
+        self.lentas = 0
+        self.descartadas = 0
+        self.explains = 0
+        self.errores_explain = 0
+
+    def iniciar(self, client, loop: asyncio.AbstractEventLoop = None):
+        """Cliente y loop con los que se ejecutan los explain"""
+        self._client = client
+        self._loop = loop or asyncio.get_running_loop()
+
+    # Callbacks de pymongo (hilos de motor)
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in CAMPOS_CONSULTA:
+            self._pendientes[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pendiente = self._pendientes.pop((event.connection_id, event.request_id), None)
+        if pendiente is None:
+            return
+        duracion_ms = event.duration_micros / 1000
+        if duracion_ms >= self.umbral_ms:
+            self.registrar(event.command_name, pendiente[0], pendiente[1], duracion_ms)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._pendientes.pop((event.connection_id, event.request_id), None)
+
+    def registrar(self, nombre: str, base_datos: str, comando: Dict[str, Any], duracion_ms: float) -> Optional[FormaLenta]:
+        """Acumula una ejecución lenta en su forma; agenda el explain si es nueva"""
+        namespace = f"{base_datos}.{comando.get(nombre)}"
+        forma = forma_comando(nombre, comando)
+        id_forma = hashlib.sha1(
+            json.dumps([nombre, namespace, forma], sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+
+        nueva = False
+        with self._lock:
+            self.lentas += 1
+            entrada = self._formas.get(id_forma)
+            if entrada is None:
+                if len(self._formas) >= self.max_formas:
+                    self.descartadas += 1
+                    return None
+                # El comando con sus valores solo se guarda hasta obtener el explain
+                ejemplo = {k: v for k, v in comando.items() if k not in CAMPOS_SESION} if self.explain else None
+                entrada = self._formas[id_forma] = FormaLenta(id_forma, nombre, namespace, forma, ejemplo)
+                nueva = True
+            entrada.registrar(duracion_ms)
+
+        logger.warning("Consulta lenta de MongoDB", extra={
+            "comando": nombre, "namespace": namespace, "duracion_ms": round(duracion_ms, 1), "forma_id": id_forma,
+            "muestreo": 1 if nueva else 0.1
+        })
+        if nueva and self.explain and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._lanzar_explain, entrada, base_datos)
+        return entrada
+
+    def _lanzar_explain(self, entrada: FormaLenta, base_datos: str):
+        tarea = asyncio.ensure_future(self.capturar_explain(entrada, base_datos))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def capturar_explain(self, entrada: FormaLenta, base_datos: str):
+        """Ejecuta ``explain`` (queryPlanner) sobre el ejemplo de la forma"""
+        comando = entrada.ejemplo
+        if entrada.comando in ("update", "delete"):
+            clave = entrada.comando + "s"
+            comando = {**comando, clave: comando[clave][:1]}
+        try:
+            respuesta = await self._client[base_datos].command({"explain": comando, "verbosity": "queryPlanner"})
+            entrada.plan = resumir_plan(respuesta)
+            entrada.ejemplo = None
+            self.explains += 1
+            if entrada.plan["coleccion_completa"]:
+                logger.warning("Consulta lenta sin índice (COLLSCAN)", extra={
+                    "namespace": entrada.namespace, "forma": entrada.forma, "forma_id": entrada.id
+                })
+        except Exception as e:
+            self.errores_explain += 1
+            entrada.plan = {"error": str(e)}
+
+    def top(self, limite: int = 20, orden: str = "total_ms") -> List[Dict[str, Any]]:
+        """Formas más lentas (por tiempo total, promedio, máximo o conteo)"""
+        with self._lock:
+            formas = list(self._formas.values())
+        clave = {
+            "total_ms": lambda f: f.total_ms,
+            "promedio_ms": lambda f: f.total_ms / f.conteo,
+            "max_ms": lambda f: f.max_ms,
+            "conteo": lambda f: f.conteo
+        }[orden]
+        return [f.a_dict() for f in sorted(formas, key=clave, reverse=True)[:limite]]
+
+    def reiniciar(self):
+        with self._lock:
+            self._formas.clear()
+            self.lentas = 0
+            self.descartadas = 0
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            formas = list(self._formas.values())
+        return {
+            "umbral_ms": self.umbral_ms,
+            "lentas": self.lentas,
+            "total_formas": len(formas),
+            "formas_sin_indice": sum(1 for f in formas if f.plan and f.plan.get("coleccion_completa")),
+            "descartadas": self.descartadas,
+            "explains": self.explains,
+            "errores_explain": self.errores_explain
+        }
+
+
+# Instancia global (se registra en el cliente de MongoDBService)
+monitor_consultas = MonitorConsultasLentas()
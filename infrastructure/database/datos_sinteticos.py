@@ -0,0 +1,491 @@
+"""
+Generador determinista de datos para benchmarks y pruebas de carga
+
+Cada documento se genera con su propio ``random.Random`` sembrado con
+``semilla:colección:índice``, así que el documento ``i`` es idéntico sin
+importar el tamaño de lote, la concurrencia de la carga o si la colección
+se genera completa o por rangos. Las referencias (función -> película,
+transacción -> función) se recalculan a partir del índice sin mantener
+las colecciones grandes en memoria.
+
+Los documentos siguen los esquemas de ``domain/entities`` (ids en string
+como en ``generate_massive_data.js``; usuarios con ObjectId como los crea
+``UsuarioRepository``).
+"""
+
+import asyncio
+import random
+import time
+import math
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterator, Callable
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from domain.entities.funcion import Asiento
+from domain.entities.transaccion import calcular_snapshot_funcion
+
+# Mismos tamaños que scripts/data_config.json
+PERFILES: Dict[str, Dict[str, int]] = {
+    "pequeno": {"salas": 10, "peliculas": 100, "usuarios": 1000, "funciones": 1000, "transacciones": 5000},
+    "mediano": {"salas": 100, "peliculas": 1000, "usuarios": 10000, "funciones": 10000, "transacciones": 50000},
+    "grande": {"salas": 1000, "peliculas": 50000, "usuarios": 100000, "funciones": 1000000, "transacciones": 500000},
+    "masivo": {"salas": 5000, "peliculas": 200000, "usuarios": 500000, "funciones": 5000000, "transacciones": 2000000}
+}
+
+# Orden de carga (las referencias apuntan siempre a colecciones anteriores)
+COLECCIONES = ["salas", "peliculas", "usuarios", "clientes", "funciones", "transacciones"]
+
+# Contraseña de todos los usuarios generados y su hash bcrypt (fijo para que
+# el documento sea determinista y la carga no pague un bcrypt por usuario)
+CONTRASENA = "CinemaxDatos2024!"
+HASH_CONTRASENA = "$2b$12$qZ.5tksEswVmQkXeyDTPAeI1llLfnQR9vYdIOMbXUveLl5DgQuP9q"
+
+GENEROS = ["accion", "aventura", "comedia", "drama", "terror", "ciencia_ficcion",
+           "romance", "thriller", "animacion", "documental"]
+CLASIFICACIONES = ["G", "PG", "PG-13", "R", "NC-17"]
+IDIOMAS = ["español", "inglés", "francés", "alemán", "italiano", "portugués"]
+PALABRAS_TITULO = ["El", "La", "Los", "Aventura", "Misterio", "Destino", "Camino", "Viaje", "Sueño",
+                   "Realidad", "Futuro", "Pasado", "Mundo", "Vida", "Amor", "Guerra", "Paz",
+                   "Libertad", "Victoria", "Noche", "Ciudad", "Sombra", "Fuego", "Océano"]
+NOMBRES = ["Juan", "María", "Carlos", "Ana", "Luis", "Sofía", "Pedro", "Elena", "Miguel", "Carmen"]
+APELLIDOS = ["García", "Rodríguez", "López", "Martínez", "González", "Pérez", "Sánchez", "Ramírez", "Torres", "Flores"]
+
+# Geometría por tipo de sala: (filas, asientos por fila, filas VIP)
+# La estándar coincide con el mapa de /funciones/{id}/asientos (A-H x 15)
+GEOMETRIA_SALAS = {
+    "estandar": (8, 15, 2),
+    "vip": (5, 10, 5),
+    "imax": (12, 20, 3),
+    "4dx": (6, 12, 0),
+    "dolby_atmos": (10, 16, 2)
+}
+PESOS_TIPO_SALA = [60, 10, 10, 10, 10]
+
+ESTADOS_TRANSACCION = ["confirmado", "pendiente", "cancelado", "reembolsado", "fallido"]
+PESOS_ESTADO_TRANSACCION = [80, 5, 8, 4, 3]
+METODOS_PAGO = ["tarjeta_credito", "tarjeta_debito", "efectivo", "transferencia", "puntos"]
+
+
+def _sesgado(rng: random.Random, n: int) -> int:
+    """Índice en ``[0, n)`` con sesgo hacia los primeros (títulos y funciones populares)"""
+    return min(n - 1, int(n * rng.random() ** 2))
+
+
+def asientos_sala(sala: Dict[str, Any]) -> List[str]:
+    return [f"{a['fila']}{a['numero']}" for a in sala["asientos"]]
+
+
+class GeneradorDatos:
+    """
+    Documentos reproducibles de un perfil
+
+    ``conteos`` sobrescribe el tamaño de cualquier colección del perfil
+    (``GeneradorDatos("pequeno", funciones=50)``).
+    """
+
+    def __init__(self, perfil: str = "pequeno", semilla: int = 42, fecha_base: Optional[datetime] = None, **conteos: int):
+        if perfil not in PERFILES:
+            raise ValueError(f"Perfil desconocido: {perfil} (disponibles: {', '.join(PERFILES)})")
+        self.perfil = perfil
+        self.semilla = semilla
+        self.fecha_base = fecha_base or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.conteos = {**PERFILES[perfil], **conteos}
+        self.conteos["clientes"] = self.conteos["usuarios"]
+        self._salas: Optional[List[Dict[str, Any]]] = None
+        self._peliculas: Dict[int, tuple] = {}
+        self._asientos: Dict[str, tuple] = {}
+
+    def _rng(self, coleccion: str, i: int) -> random.Random:
+        return random.Random(f"{self.semilla}:{coleccion}:{i}")
+
+    def total(self, coleccion: str) -> int:
+        return self.conteos[coleccion]
+
+    def documentos(self, coleccion: str, desde: int = 0, hasta: int = None) -> Iterator[Dict[str, Any]]:
+        """Documentos ``[desde, hasta)`` de una colección"""
+        generar = {
+            "salas": self._sala,
+            "peliculas": self._pelicula,
+            "usuarios": self._usuario,
+            "clientes": self._cliente,
+            "funciones": self._funcion,
+            "transacciones": self._transaccion
+        }[coleccion]
+        total = self.total(coleccion)
+        for i in range(desde, total if hasta is None else min(total, hasta)):
+            yield generar(i)
+
+    # Salas
+
+    @property
+    def salas(self) -> List[Dict[str, Any]]:
+        if self._salas is None:
+            self._salas = [self._sala_nueva(i) for i in range(self.total("salas"))]
+        return self._salas
+
+    def _sala(self, i: int) -> Dict[str, Any]:
+        return self.salas[i]
+
+    def _sala_nueva(self, i: int) -> Dict[str, Any]:
+        rng = self._rng("salas", i)
+        tipo = rng.choices(list(GEOMETRIA_SALAS), PESOS_TIPO_SALA)[0]
+        filas, por_fila, filas_vip = GEOMETRIA_SALAS[tipo]
+        asientos = []
+        for f in range(filas):
+            fila = chr(ord("A") + f)
+            for numero in range(1, por_fila + 1):
+                vip = f < filas_vip
+                asientos.append({
+                    "fila": fila,
+                    "numero": numero,
+                    "tipo": "vip" if vip else "estandar",
+                    "precio_adicional": 0.0
+                })
+        return {
+            "_id": f"sala_{i + 1:06d}",
+            "id": f"sala_{i + 1:06d}",
+            "nombre": f"Sala {tipo.upper()} {i + 1}",
+            "tipo": tipo,
+            "capacidad_total": filas * por_fila,
+            "filas": filas,
+            "asientos_por_fila": por_fila,
+            "asientos": asientos,
+            "equipamiento": {"imax": ["IMAX", "Dolby Atmos"], "vip": ["Butacas reclinables", "Servicio a asiento"]}.get(
+                tipo, ["Sonido digital", "Proyección HD"])
+        }
+
+    # Películas
+
+    def _datos_pelicula(self, j: int) -> tuple:
+        """(duración, precio_base, géneros) de la película ``j`` (cacheado para las funciones)"""
+        if j not in self._peliculas:
+            rng = self._rng("peliculas", j)
+            generos = rng.sample(GENEROS, rng.randint(1, 3))
+            self._peliculas[j] = (rng.randint(80, 180), float(rng.randrange(8000, 18001, 500)), generos)
+        return self._peliculas[j]
+
+    def _pelicula(self, i: int) -> Dict[str, Any]:
+        duracion, precio, generos = self._datos_pelicula(i)
+        rng = self._rng("peliculas-detalle", i)
+        estreno = self.fecha_base - timedelta(days=rng.randint(0, 1500))
+        return {
+            "_id": f"pel_{i + 1:06d}",
+            "titulo": " ".join(rng.choices(PALABRAS_TITULO, k=rng.randint(2, 4))) + f" {i + 1}",
+            "titulo_original": " ".join(rng.choices(PALABRAS_TITULO, k=2)),
+            "sinopsis": f"Sinopsis de la película {i + 1}. Una historia emocionante que cautivará a la audiencia.",
+            "director": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+            "actores_principales": [f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}" for _ in range(3)],
+            "generos": generos,
+            "duracion_minutos": duracion,
+            "clasificacion": rng.choice(CLASIFICACIONES),
+            "idioma_original": rng.choice(IDIOMAS),
+            "subtitulos": [rng.choice(IDIOMAS)],
+            "fecha_estreno": estreno,
+            "fecha_disponible_desde": estreno,
+            "fecha_disponible_hasta": estreno + timedelta(days=rng.randint(180, 720)),
+            "poster_url": f"https://example.com/posters/pelicula-{i + 1}.jpg",
+            "trailer_url": f"https://example.com/trailers/pelicula-{i + 1}.mp4",
+            "precio_base": precio,
+            "rating": round(rng.uniform(1, 5), 1),
+            "activa": rng.random() > 0.1,
+            "created_at": self.fecha_base,
+            "updated_at": self.fecha_base
+        }
+
+    # Usuarios y clientes (mismo índice, mismo correo)
+
+    def _identidad(self, i: int) -> tuple:
+        rng = self._rng("usuarios", i)
+        return rng, rng.choice(NOMBRES), rng.choice(APELLIDOS), f"usuario{i + 1}@datos.cinemax.com"
+
+    def usuario_id(self, i: int) -> str:
+        return f"{i + 1:024x}"
+
+    def _usuario(self, i: int) -> Dict[str, Any]:
+        rng, nombre, apellido, email = self._identidad(i)
+        return {
+            "_id": ObjectId(self.usuario_id(i)),
+            "email": email,
+            "nombre": nombre,
+            "apellido": apellido,
+            "telefono": f"+57{rng.randint(3000000000, 3509999999)}",
+            "password_hash": HASH_CONTRASENA,
+            "fecha_registro": self.fecha_base - timedelta(days=rng.randint(0, 1000)),
+            "activo": rng.random() > 0.05
+        }
+
+    def _cliente(self, i: int) -> Dict[str, Any]:
+        _, nombre, apellido, email = self._identidad(i)
+        rng = self._rng("clientes", i)
+        return {
+            "_id": f"cliente_{i + 1:06d}",
+            "nombre": f"{nombre} {apellido}",
+            "email": email,
+            "telefono": f"+57{rng.randint(3000000000, 3509999999)}",
+            "tipo": rng.choices(["regular", "frecuente", "premium"], [70, 20, 10])[0],
+            "fecha_registro": self.fecha_base - timedelta(days=rng.randint(0, 1000)),
+            "historial_compras": [],
+            "puntos_acumulados": rng.randint(0, 1000),
+            "activo": rng.random() > 0.05
+        }
+
+    # Funciones
+
+    def _datos_funcion(self, i: int) -> tuple:
+        """
+        (rng, película, sala, inicio, precio_base, cancelada, vendidos) de la función ``i``
+
+        ``vendidos`` = (a, b, k): los asientos ocupados son ``codigos[(a * j + b) % n]``
+        para ``j < k`` (permutación afín), así una transacción elige asientos
+        vendidos sin construir la lista completa.
+        """
+        rng = self._rng("funciones", i)
+        pelicula = _sesgado(rng, self.total("peliculas"))
+        sala = self.salas[rng.randrange(self.total("salas"))]
+        inicio = self.fecha_base + timedelta(days=rng.randint(-30, 150), hours=rng.choice([12, 14, 16, 18, 20, 22]))
+        precio = self._datos_pelicula(pelicula)[1] + rng.randrange(0, 5001, 500)
+        cancelada = rng.random() < 0.03
+        n = sala["capacidad_total"]
+        a = rng.randrange(1, n)
+        while math.gcd(a, n) != 1:
+            a += 1
+        b = rng.randrange(n)
+        ocupacion = 0 if cancelada else 0.9 if inicio < self.fecha_base else rng.random() * 0.8
+        return rng, pelicula, sala, inicio, precio, cancelada, (a, b, int(n * ocupacion))
+
+    def _ocupados(self, sala: Dict[str, Any], vendidos: tuple) -> List[str]:
+        codigos = self._codigos_sala(sala)[0]
+        a, b, k = vendidos
+        return [codigos[(a * j + b) % len(codigos)] for j in range(k)]
+
+    def _codigos_sala(self, sala: Dict[str, Any]) -> tuple:
+        """(códigos, tipo por código) de los asientos de una sala"""
+        if sala["id"] not in self._asientos:
+            codigos = asientos_sala(sala)
+            self._asientos[sala["id"]] = (codigos, {c: a["tipo"] for c, a in zip(codigos, sala["asientos"])})
+        return self._asientos[sala["id"]]
+
+    def asientos_ocupados(self, i: int) -> List[str]:
+        """Asientos vendidos de la función ``i`` (los mismos que usan bitmaps y transacciones)"""
+        datos = self._datos_funcion(i)
+        return self._ocupados(datos[2], datos[6])
+
+    def _funcion(self, i: int) -> Dict[str, Any]:
+        rng, pelicula, sala, inicio, precio, cancelada, vendidos = self._datos_funcion(i)
+        ocupados = self._ocupados(sala, vendidos)
+        duracion = self._datos_pelicula(pelicula)[0]
+        if cancelada:
+            estado = "cancelada"
+        elif inicio < self.fecha_base:
+            estado = "finalizada"
+        else:
+            estado = "programada"
+        return {
+            "_id": f"fun_{i + 1:06d}",
+            "pelicula_id": f"pel_{pelicula + 1:06d}",
+            "sala": {k: v for k, v in sala.items() if k != "_id"},
+            "fecha_hora_inicio": inicio,
+            "fecha_hora_fin": inicio + timedelta(minutes=duracion + 30),
+            "precio_base": precio,
+            "precio_vip": precio + 7000,
+            "estado": estado,
+            "subtitulos": rng.random() > 0.3,
+            "idioma_audio": rng.choice(IDIOMAS),
+            "asientos_ocupados": ocupados,
+            "asientos_reservados": [],
+            "ventas_totales": len(ocupados),
+            "ingresos_totales": float(len(ocupados) * precio),
+            "created_at": self.fecha_base,
+            "updated_at": self.fecha_base
+        }
+
+    # Transacciones
+
+    def _rebanada(self, f: int, ronda: int, k: int, n: int) -> tuple:
+        """
+        Posiciones ``[inicio, fin)`` de la permutación de asientos de la función ``f``
+
+        Las transacciones se reparten por rondas (``i % funciones``) y cada
+        ronda toma la rebanada siguiente a la anterior, así las transacciones
+        de una función nunca comparten asientos. Las rebanadas no cruzan
+        ``k``: dentro de ``[0, k)`` son asientos vendidos y desde ``k``
+        asientos libres (``k + (j - k) % (n - k)``, se reutilizan si se
+        agotan). La cantidad de cada ronda es el primer valor de su rng.
+        """
+        total = self.total("funciones")
+        inicio = 0
+        for r in range(ronda + 1):
+            cantidad = self._rng("transacciones", r * total + f).randint(1, 4)
+            fin = min(inicio + cantidad, k) if inicio < k else inicio + min(cantidad, n - k)
+            if r == ronda:
+                return inicio, fin
+            inicio = fin
+
+    def _transaccion(self, i: int) -> Dict[str, Any]:
+        rng = self._rng("transacciones", i)
+        rng.randint(1, 4)  # cantidad, ya usada por _rebanada
+        f, ronda = i % self.total("funciones"), i // self.total("funciones")
+        _, pelicula, sala, inicio, precio, cancelada, (a, b, k) = self._datos_funcion(f)
+        codigos, tipos = self._codigos_sala(sala)
+        n = len(codigos)
+        desde, hasta = self._rebanada(f, ronda, k, n)
+
+        asientos = []
+        for j in range(desde, hasta):
+            if j >= k:
+                j = k + (j - k) % (n - k)
+            codigo = codigos[(a * j + b) % n]
+            unitario = precio + 7000 if tipos[codigo] == "vip" else precio
+            asientos.append({
+                "codigo": codigo,
+                "fila": codigo[0],
+                "numero": int(codigo[1:]),
+                "tipo": tipos[codigo],
+                "precio_unitario": unitario,
+                "descuento_aplicado": 0.0,
+                "precio_final": unitario
+            })
+        subtotal = sum(a["precio_unitario"] for a in asientos)
+        impuestos = round(subtotal * 0.19, 2)
+        creada = inicio - timedelta(days=rng.randint(0, 14), minutes=rng.randint(0, 1439))
+        estado = rng.choices(ESTADOS_TRANSACCION, PESOS_ESTADO_TRANSACCION)[0]
+        if desde >= k and estado in ("confirmado", "pendiente"):
+            # Fuera de los asientos vendidos (función cancelada o ya repartidos): no vigente
+            estado = "reembolsado" if cancelada and estado == "confirmado" else "cancelado"
+        metodo = rng.choice(METODOS_PAGO)
+
+        return {
+            "_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "cliente_id": self.usuario_id(rng.randrange(self.total("usuarios"))),
+            "pelicula_id": f"pel_{pelicula + 1:06d}",
+            "funcion_id": f"fun_{f + 1:06d}",
+            "asientos": asientos,
+            "cantidad_asientos": len(asientos),
+            "subtotal": subtotal,
+            "descuento_cliente": 0.0,
+            "descuento_promocional": 0.0,
+            "impuestos": impuestos,
+            "total": round(subtotal + impuestos, 2),
+            "pago": {
+                "metodo": metodo,
+                "referencia_externa": f"PAY-{i + 1:010d}",
+                "ultimos_4_digitos": f"{rng.randint(0, 9999):04d}" if metodo.startswith("tarjeta") else None,
+                "banco_emisor": None,
+                "fecha_procesamiento": creada if estado == "confirmado" else None,
+                "codigo_autorizacion": f"AUT{rng.randint(0, 999999):06d}" if estado == "confirmado" else None,
+                "tasa_procesamiento": 0.0,
+                "monto_procesamiento": 0.0
+            },
+            "estado": estado,
+            "fecha_creacion": creada,
+            "fecha_actualizacion": creada,
+            "fecha_vencimiento": creada + timedelta(minutes=30),
+            "fecha_confirmacion": creada if estado == "confirmado" else None,
+            **calcular_snapshot_funcion(inicio, self._datos_pelicula(pelicula)[2]),
+            "codigo_qr": str(uuid.UUID(int=rng.getrandbits(128), version=4)) if estado == "confirmado" else None,
+            "numero_factura": f"CIN-{creada:%Y%m%d%H%M%S}-{i + 1:08X}",
+            "observaciones": None,
+            "datos_adicionales": {},
+            "ip_origen": None,
+            "user_agent": None,
+            "canal_venta": rng.choices(["web", "app", "taquilla"], [60, 30, 10])[0]
+        }
+
+
+async def cargar_coleccion(database, generador: GeneradorDatos, coleccion: str, lote: int = 5000,
+                           concurrencia: int = 4, progreso: Callable[[str, int, int], None] = None) -> int:
+    """
+    Inserta la colección en lotes con hasta ``concurrencia`` ``insert_many`` en vuelo
+
+    Mientras motor envía un lote en su hilo, el loop genera el siguiente.
+    Los duplicados (recarga sobre datos existentes) se ignoran.
+    """
+    total = generador.total(coleccion)
+    limite = asyncio.Semaphore(concurrencia)
+    insertados = 0
+    pendientes = set()
+
+    async def insertar(documentos: List[Dict[str, Any]]):
+        nonlocal insertados
+        try:
+            resultado = await database[coleccion].insert_many(documentos, ordered=False)
+            insertados += len(resultado.inserted_ids)
+        except BulkWriteError as e:
+            insertados += e.details.get("nInserted", 0)
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        finally:
+            limite.release()
+        if progreso:
+            progreso(coleccion, insertados, total)
+
+    for desde in range(0, total, lote):
+        await limite.acquire()
+        documentos = list(generador.documentos(coleccion, desde, desde + lote))
+        tarea = asyncio.create_task(insertar(documentos))
+        pendientes.add(tarea)
+        tarea.add_done_callback(pendientes.discard)
+        await asyncio.sleep(0)
+
+    if pendientes:
+        await asyncio.gather(*pendientes)
+    return insertados
+
+
+async def poblar_bitmaps(redis_client, generador: GeneradorDatos, lote: int = 1000,
+                         progreso: Callable[[str, int, int], None] = None) -> int:
+    """
+    Bitmaps ``sala:asientos:{funcion_id}`` y hash ``funcion:{id}`` con la capacidad
+
+    Los bits siguen ``Asiento.to_bit_position`` con los asientos por fila
+    de la sala. Solo se pueblan las funciones programadas.
+    """
+    total = generador.total("funciones")
+    poblados = 0
+    for desde in range(0, total, lote):
+        pipe = redis_client.pipeline(transaction=False)
+        for i in range(desde, min(total, desde + lote)):
+            _, pelicula, sala, inicio, _, cancelada, vendidos = generador._datos_funcion(i)
+            if cancelada or inicio < generador.fecha_base:
+                continue
+            funcion_id = f"fun_{i + 1:06d}"
+            clave = f"sala:asientos:{funcion_id}"
+            pipe.delete(clave)
+            for codigo in generador._ocupados(sala, vendidos):
+                posicion = Asiento(fila=codigo[0], numero=int(codigo[1:])).to_bit_position(sala["asientos_por_fila"])
+                pipe.setbit(clave, posicion, 1)
+            pipe.hset(f"funcion:{funcion_id}", mapping={
+                "capacidad_total": sala["capacidad_total"],
+                "pelicula_id": f"pel_{pelicula + 1:06d}"
+            })
+            poblados += 1
+        await pipe.execute()
+        if progreso:
+            progreso("bitmaps", min(total, desde + lote), total)
+    return poblados
+
+
+async def cargar_datos(database, generador: GeneradorDatos, redis_client=None, colecciones: List[str] = None,
+                       lote: int = 5000, concurrencia: int = 4,
+                       progreso: Callable[[str, int, int], None] = None) -> Dict[str, Any]:
+    """Carga las colecciones en orden (y los bitmaps si se pasa ``redis_client``)"""
+    resultado = {}
+    for coleccion in colecciones or COLECCIONES:
+        inicio = time.perf_counter()
+        insertados = await cargar_coleccion(database, generador, coleccion, lote, concurrencia, progreso)
+        duracion = time.perf_counter() - inicio
+        resultado[coleccion] = {
+            "insertados": insertados,
+            "segundos": round(duracion, 2),
+            "docs_por_segundo": round(insertados / duracion) if duracion else 0
+        }
+    if redis_client is not None:
+        inicio = time.perf_counter()
+        resultado["bitmaps"] = {
+            "funciones": await poblar_bitmaps(redis_client, generador, progreso=progreso),
+            "segundos": round(time.perf_counter() - inicio, 2)
+        }
+    return resultado
@@ -1,9 +1,17 @@
+import asyncio
 import motor.motor_asyncio
 from typing import Optional, List, Dict, Any
-from pymongo import IndexModel
+from pymongo import IndexModel, UpdateOne
 from config.settings import settings
+from infrastructure.utils.single_flight import single_flight
+from infrastructure.metrics.prometheus_metrics import instrumentar_operaciones, MONGODB_LATENCIA, MONGODB_ERRORES
+from infrastructure.database.consultas_lentas import monitor_consultas
+from infrastructure.utils.logs import obtener_logger
 
+logger = obtener_logger(__name__)
 
+
+@instrumentar_operaciones(MONGODB_LATENCIA, MONGODB_ERRORES, "mongodb")
 class MongoDBService:
     """
     Servicio de MongoDB para persistencia de datos del sistema de cine
@@ -12,13 +20,22 @@ class MongoDBService:
     def __init__(self):
         self.client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
         self.database = None
+        self.cache = None
+        
+    def habilitar_cache(self, redis_service=None):
+        """Activa la cache read-through de películas y funciones"""
+        from infrastructure.cache.entity_cache import EntityCache
+        self.cache = EntityCache(redis_service)
         
     async def connect(self):
         """Establece conexión con MongoDB"""
         self.client = motor.motor_asyncio.AsyncIOMotorClient(
             settings.mongodb_url,
-            maxPoolSize=settings.mongodb_max_connections
+            maxPoolSize=settings.mongodb_max_connections,
+            event_listeners=[monitor_consultas] if settings.mongodb_lentas_habilitado else []
         )
+        if settings.mongodb_lentas_habilitado:
+            monitor_consultas.iniciar(self.client, asyncio.get_running_loop())
         
         self.database = self.client[settings.mongodb_database]
         
@@ -69,7 +86,10 @@ class MongoDBService:
             IndexModel([("estado", 1)]),
             IndexModel([("fecha_creacion", -1)]),
             IndexModel([("numero_factura", 1)], unique=True),
-            IndexModel([("cliente_id", 1), ("fecha_creacion", -1)])
+            IndexModel([("cliente_id", 1), ("fecha_creacion", -1)]),
+            # Snapshot desnormalizado para analítica sin $lookup
+            IndexModel([("estado", 1), ("generos", 1)]),
+            IndexModel([("estado", 1), ("fecha_creacion", 1), ("funcion_hora", 1), ("funcion_dia_semana", 1)])
         ])
     
     # Operaciones para clientes
@@ -100,10 +120,19 @@ class MongoDBService:
         """Crea una nueva película"""
         result = await self.database.peliculas.insert_one(pelicula_data)
         pelicula_data["_id"] = str(result.inserted_id)
+        if self.cache:
+            # Descarta una posible entrada negativa para el nuevo ID
+            await self.cache.invalidar("pelicula", pelicula_data["_id"])
         return pelicula_data
     
-    async def obtener_pelicula(self, pelicula_id: str) -> Optional[Dict[str, Any]]:
+    @single_flight("mongodb.obtener_pelicula")
+    async def obtener_pelicula(self, pelicula_id: str, usar_cache: bool = True) -> Optional[Dict[str, Any]]:
         """Obtiene una película por ID"""
+        if self.cache and usar_cache:
+            return await self.cache.obtener(
+                "pelicula", pelicula_id,
+                lambda: self.database.peliculas.find_one({"_id": pelicula_id})
+            )
         return await self.database.peliculas.find_one({"_id": pelicula_id})
     
     async def buscar_peliculas(self, filtros: Dict[str, Any], limite: int = 50) -> List[Dict[str, Any]]:
@@ -128,7 +157,7 @@ class MongoDBService:
             
             # Si no hay resultados con búsqueda de texto, usar búsqueda regex como fallback
             if not resultados:
-                print(f"⚠️ Búsqueda de texto no encontró resultados, usando fallback regex")
+                logger.debug("Búsqueda de texto sin resultados, usando fallback regex", extra={"texto": texto})
                 filtros_fallback = {
                     "activa": True,
                     "$or": [
@@ -143,7 +172,7 @@ class MongoDBService:
             return resultados
             
         except Exception as e:
-            print(f"❌ Error en búsqueda de texto: {e}")
+            logger.warning("Error en búsqueda de texto, usando fallback regex", extra={"error": str(e)})
             # Fallback a búsqueda regex si falla la búsqueda de texto
             filtros_fallback = {
                 "activa": True,
@@ -161,10 +190,24 @@ class MongoDBService:
         """Crea una nueva función"""
         result = await self.database.funciones.insert_one(funcion_data)
         funcion_data["_id"] = str(result.inserted_id)
+        if self.cache:
+            await self.cache.invalidar("funcion", funcion_data["_id"])
         return funcion_data
     
-    async def obtener_funcion(self, funcion_id: str) -> Optional[Dict[str, Any]]:
-        """Obtiene una función por ID"""
+    @single_flight("mongodb.obtener_funcion")
+    async def obtener_funcion(self, funcion_id: str, usar_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene una función por ID
+
+        Args:
+            funcion_id: ID de la función
+            usar_cache: False para leer directo de MongoDB (read-modify-write)
+        """
+        if self.cache and usar_cache:
+            return await self.cache.obtener(
+                "funcion", funcion_id,
+                lambda: self.database.funciones.find_one({"_id": funcion_id})
+            )
         return await self.database.funciones.find_one({"_id": funcion_id})
     
     async def listar_funciones_pelicula(self, pelicula_id: str) -> List[Dict[str, Any]]:
@@ -189,6 +232,18 @@ class MongoDBService:
             {"_id": funcion_id},
             {"$set": update_data}
         )
+        if self.cache:
+            await self.cache.invalidar("funcion", funcion_id)
+        return result.modified_count > 0
+    
+    async def agregar_asientos_ocupados(self, funcion_id: str, asientos: List[str]) -> bool:
+        """Agrega asientos a la lista de ocupados de una función (atómico, sin lectura previa)"""
+        result = await self.database.funciones.update_one(
+            {"_id": funcion_id},
+            {"$addToSet": {"asientos_ocupados": {"$each": asientos}}}
+        )
+        if self.cache:
+            await self.cache.invalidar("funcion", funcion_id)
         return result.modified_count > 0
     
     # Operaciones para transacciones
@@ -333,27 +388,17 @@ class MongoDBService:
     
     async def obtener_generos_populares(self, limite: int = 10) -> List[Dict[str, Any]]:
         """Obtiene los géneros más populares basado en ventas"""
+        # Usa el snapshot de géneros guardado en la transacción (sin $lookup)
         pipeline = [
             {
-                "$match": {"estado": "confirmado"}
-            },
-            {
-                "$lookup": {
-                    "from": "peliculas",
-                    "localField": "pelicula_id",
-                    "foreignField": "_id",
-                    "as": "pelicula"
-                }
-            },
-            {
-                "$unwind": "$pelicula"
+                "$match": {"estado": "confirmado", "generos.0": {"$exists": True}}
             },
             {
-                "$unwind": "$pelicula.generos"
+                "$unwind": "$generos"
             },
             {
                 "$group": {
-                    "_id": "$pelicula.generos",
+                    "_id": "$generos",
                     "total_ventas": {"$sum": "$total"},
                     "total_transacciones": {"$sum": 1},
                     "total_asientos": {"$sum": "$cantidad_asientos"},
@@ -384,31 +429,22 @@ class MongoDBService:
         """Obtiene los horarios pico basado en ventas de los últimos días"""
         from datetime import datetime, timedelta
         
-        fecha_inicio = (datetime.now() - timedelta(days=dias_atras)).isoformat()
+        fecha_inicio = datetime.now() - timedelta(days=dias_atras)
         
+        # Usa el snapshot de hora/día de la función guardado en la transacción
         pipeline = [
             {
                 "$match": {
                     "estado": "confirmado",
-                    "fecha_creacion": {"$gte": fecha_inicio}
+                    "fecha_creacion": {"$gte": fecha_inicio},
+                    "funcion_hora": {"$ne": None}
                 }
             },
-            {
-                "$lookup": {
-                    "from": "funciones",
-                    "localField": "funcion_id",
-                    "foreignField": "_id",
-                    "as": "funcion"
-                }
-            },
-            {
-                "$unwind": "$funcion"
-            },
             {
                 "$group": {
                     "_id": {
-                        "hora": {"$hour": {"$dateFromString": {"dateString": "$funcion.fecha_hora_inicio"}}},
-                        "dia_semana": {"$dayOfWeek": {"$dateFromString": {"dateString": "$funcion.fecha_hora_inicio"}}}
+                        "hora": "$funcion_hora",
+                        "dia_semana": "$funcion_dia_semana"
                     },
                     "total_ventas": {"$sum": "$total"},
                     "total_transacciones": {"$sum": 1},
@@ -435,4 +471,57 @@ class MongoDBService:
             }
         ]
         
-        return await self.database.transacciones.aggregate(pipeline).to_list(20) 
\ No newline at end of file
+        return await self.database.transacciones.aggregate(pipeline).to_list(20)
+    
+    async def migrar_snapshot_transacciones(self, batch_size: int = 1000) -> int:
+        """
+        Rellena géneros y horario de función en transacciones antiguas
+        
+        Procesa solo las transacciones sin snapshot, por lotes, resolviendo
+        películas y funciones con una consulta $in por lote.
+        
+        Returns:
+            int: Número de transacciones actualizadas
+        """
+        from domain.entities.transaccion import calcular_snapshot_funcion
+        
+        actualizadas = 0
+        peliculas_cache: Dict[str, List[str]] = {}
+        funciones_cache: Dict[str, Any] = {}
+        
+        while True:
+            lote = await self.database.transacciones.find(
+                {"funcion_hora": {"$exists": False}},
+                {"pelicula_id": 1, "funcion_id": 1}
+            ).limit(batch_size).to_list(batch_size)
+            
+            if not lote:
+                break
+            
+            # Resolver películas y funciones faltantes del lote
+            peliculas_ids = list({t.get("pelicula_id") for t in lote} - peliculas_cache.keys())
+            funciones_ids = list({t.get("funcion_id") for t in lote} - funciones_cache.keys())
+            
+            if peliculas_ids:
+                async for pelicula in self.database.peliculas.find({"_id": {"$in": peliculas_ids}}, {"generos": 1}):
+                    peliculas_cache[pelicula["_id"]] = pelicula.get("generos", [])
+            if funciones_ids:
+                async for funcion in self.database.funciones.find({"_id": {"$in": funciones_ids}}, {"fecha_hora_inicio": 1}):
+                    funciones_cache[funcion["_id"]] = funcion.get("fecha_hora_inicio")
+            
+            operaciones = [
+                UpdateOne(
+                    {"_id": t["_id"]},
+                    {"$set": calcular_snapshot_funcion(
+                        funciones_cache.get(t.get("funcion_id")),
+                        peliculas_cache.get(t.get("pelicula_id"), [])
+                    )}
+                )
+                for t in lote
+            ]
+            
+            result = await self.database.transacciones.bulk_write(operaciones, ordered=False)
+            actualizadas += result.modified_count
+            logger.info("Lote migrado", extra={"transacciones": len(operaciones)})
+        
+        return actualizadas
\ No newline at end of file
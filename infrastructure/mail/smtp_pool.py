@@ -0,0 +1,167 @@
+"""
+Pool de conexiones SMTP persistentes
+
+``smtplib`` es bloqueante, así que cada envío se ejecuta en un pool de
+hilos dedicado en lugar de en el event loop. Las sesiones ya autenticadas
+(EHLO + STARTTLS + LOGIN) se reutilizan entre mensajes y se reabren si el
+servidor las cerró.
+"""
+
+import asyncio
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Optional, Dict, Any, Tuple
+
+
+class SMTPPool:
+    """
+    Pool de sesiones SMTP autenticadas
+
+    ``tamano`` limita tanto los hilos como las conexiones abiertas: como
+    mucho hay un envío en curso por conexión.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        usuario: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        verify_ssl: bool = True,
+        tamano: int = 4,
+        timeout: float = 30,
+        max_inactividad: float = 120
+    ):
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.password = password
+        self.use_tls = use_tls
+        self.verify_ssl = verify_ssl
+        self.tamano = tamano
+        self.timeout = timeout
+        self.max_inactividad = max_inactividad
+
+        self._executor = ThreadPoolExecutor(max_workers=tamano, thread_name_prefix="smtp")
+        # Conexiones libres como (conexión, último uso); LIFO para reutilizar las más recientes
+        self._libres: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+        self.enviados = 0
+        self.errores = 0
+        self.conexiones_abiertas = 0
+        self.reconexiones = 0
+
+    async def enviar(self, mensaje: Message) -> None:
+        """Envía un mensaje sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._enviar_bloqueante, mensaje)
+
+    def _enviar_bloqueante(self, mensaje: Message) -> None:
+        conexion = self._tomar()
+        try:
+            conexion.send_message(mensaje)
+        except smtplib.SMTPServerDisconnected:
+            # Sesión cerrada por el servidor: reabrir y reintentar una vez
+            self._cerrar(conexion)
+            self._contar("reconexiones")
+            conexion = self._conectar()
+            try:
+                conexion.send_message(mensaje)
+            except Exception:
+                self._cerrar(conexion)
+                self._contar("errores")
+                raise
+        except smtplib.SMTPException:
+            # Mensaje rechazado (remitente, destinatarios o datos): smtplib ya
+            # hizo RSET y la sesión sigue siendo válida
+            self._devolver(conexion)
+            self._contar("errores")
+            raise
+        except OSError:
+            self._cerrar(conexion)
+            self._contar("errores")
+            raise
+
+        self._devolver(conexion)
+        self._contar("enviados")
+
+    def _tomar(self) -> smtplib.SMTP:
+        """Toma una conexión libre reciente o abre una nueva"""
+        while True:
+            try:
+                conexion, ultimo_uso = self._libres.get_nowait()
+            except queue.Empty:
+                return self._conectar()
+
+            if time.monotonic() - ultimo_uso <= self.max_inactividad:
+                return conexion
+            # Probablemente el servidor ya la cerró por inactividad
+            self._cerrar(conexion)
+
+    def _devolver(self, conexion: smtplib.SMTP) -> None:
+        self._libres.put((conexion, time.monotonic()))
+
+    def _conectar(self) -> smtplib.SMTP:
+        """Abre y autentica una sesión SMTP"""
+        conexion = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conexion.ehlo()
+            if self.use_tls:
+                contexto = ssl.create_default_context()
+                if not self.verify_ssl:
+                    contexto.check_hostname = False
+                    contexto.verify_mode = ssl.CERT_NONE
+                conexion.starttls(context=contexto)
+                conexion.ehlo()
+            if self.usuario and self.password:
+                conexion.login(self.usuario, self.password)
+        except Exception:
+            conexion.close()
+            raise
+
+        self._contar("conexiones_abiertas")
+        return conexion
+
+    def _cerrar(self, conexion: smtplib.SMTP) -> None:
+        try:
+            conexion.quit()
+        except Exception:
+            conexion.close()
+        self._contar("conexiones_abiertas", -1)
+
+    def _contar(self, contador: str, cantidad: int = 1) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + cantidad)
+
+    async def cerrar(self) -> None:
+        """Cierra las conexiones libres y el pool de hilos"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._cerrar_bloqueante)
+
+    def _cerrar_bloqueante(self) -> None:
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                conexion, _ = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._cerrar(conexion)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas del pool"""
+        return {
+            "servidor": f"{self.host}:{self.port}",
+            "tamano": self.tamano,
+            "conexiones_abiertas": self.conexiones_abiertas,
+            "conexiones_libres": self._libres.qsize(),
+            "enviados": self.enviados,
+            "errores": self.errores,
+            "reconexiones": self.reconexiones
+        }
@@ -0,0 +1,120 @@
+"""
+Servidor SMTP local que descarta los mensajes (sink)
+
+Sirve para pruebas de throughput del envío de correos sin tocar un
+proveedor real. Acepta cualquier AUTH PLAIN y no ofrece STARTTLS, así que
+se usa con ``SMTP_USE_TLS=false``.
+
+Uso:
+    python -m infrastructure.mail.smtp_sink --port 1025
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional, Set
+
+
+class SMTPSink:
+    """Servidor SMTP mínimo en asyncio que cuenta los mensajes recibidos"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, guardar: int = 0):
+        self.host = host
+        self.port = port
+        self.guardar = guardar
+        self.mensajes = 0
+        self.conexiones = 0
+        self.recibidos: List[bytes] = []
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._clientes: Set[asyncio.StreamWriter] = set()
+
+    async def iniciar(self) -> int:
+        """Empieza a escuchar; devuelve el puerto real (útil con port=0)"""
+        self._server = await asyncio.start_server(self._atender, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def detener(self):
+        """Cierra el servidor y las sesiones abiertas"""
+        self.desconectar_clientes()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def desconectar_clientes(self):
+        """Corta las sesiones abiertas (simula un servidor que cierra conexiones)"""
+        for writer in list(self._clientes):
+            writer.close()
+        self._clientes.clear()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.conexiones += 1
+        self._clientes.add(writer)
+        try:
+            writer.write(b"220 sink ESMTP\r\n")
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                comando = linea[:4].upper()
+
+                if comando == b"EHLO":
+                    writer.write(b"250-sink\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+                elif comando == b"HELO":
+                    writer.write(b"250 sink\r\n")
+                elif comando == b"AUTH":
+                    writer.write(b"235 2.7.0 Authentication successful\r\n")
+                elif comando == b"DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    datos = []
+                    while True:
+                        linea = await reader.readline()
+                        if not linea or linea == b".\r\n":
+                            break
+                        datos.append(linea)
+                    self.mensajes += 1
+                    if len(self.recibidos) < self.guardar:
+                        self.recibidos.append(b"".join(datos))
+                    writer.write(b"250 2.0.0 OK\r\n")
+                elif comando == b"QUIT":
+                    writer.write(b"221 2.0.0 Bye\r\n")
+                    await writer.drain()
+                    break
+                elif comando in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                    writer.write(b"250 OK\r\n")
+                else:
+                    writer.write(b"502 5.5.2 Command not implemented\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clientes.discard(writer)
+            writer.close()
+
+
+async def _main(host: str, port: int):
+    sink = SMTPSink(host, port)
+    await sink.iniciar()
+    print(f"📭 SMTP sink escuchando en {host}:{sink.port}")
+
+    anterior = 0
+    while True:
+        inicio = time.monotonic()
+        await asyncio.sleep(1)
+        if sink.mensajes != anterior:
+            tasa = (sink.mensajes - anterior) / (time.monotonic() - inicio)
+            print(f"   {sink.mensajes} mensajes ({tasa:.0f}/s, {sink.conexiones} conexiones)")
+            anterior = sink.mensajes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor SMTP local para pruebas de throughput")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,230 @@
+"""
+Métricas Prometheus de la API
+
+- HTTP: contador y histograma de latencia por método, plantilla de ruta
+  (``/api/v1/transacciones/{transaccion_id}``, no la URL concreta) y status.
+- MongoDB y Redis: histograma por operación de ``MongoDBService`` y
+  ``RedisService`` (decorador de clase ``instrumentar_operaciones``).
+- Redis (cliente): histograma por comando, tamaño de pipelines, comandos
+  por prefijo de clave y, por muestreo del keyspace, claves/bytes/sin TTL
+  por prefijo (``infrastructure/cache/monitor_redis.py``).
+- WebSocket: conexiones y salas activas.
+- Correo: profundidad del stream, cola de prioridad, reintentos y DLQ.
+- Event loop: lag de planificación, callbacks bloqueantes y salud.
+
+Los gauges que requieren consultar Redis se actualizan al hacer scrape.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+from typing import Dict, Any, Callable
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, start_http_server
+
+from config.settings import settings
+from infrastructure.utils import tracing
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Buckets pensados para una API (ms a segundos) y para operaciones de BD
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BD = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_PETICIONES = Counter(
+    "http_requests_total", "Peticiones HTTP por ruta y status",
+    ["method", "route", "status"]
+)
+HTTP_LATENCIA = Histogram(
+    "http_request_duration_seconds", "Latencia de peticiones HTTP por ruta y status",
+    ["method", "route", "status"], buckets=BUCKETS_HTTP
+)
+HTTP_EN_CURSO = Gauge(
+    "http_requests_in_progress", "Peticiones HTTP en curso", ["method"]
+)
+
+MONGODB_LATENCIA = Histogram(
+    "cinemax_mongodb_operation_duration_seconds", "Latencia de operaciones de MongoDBService",
+    ["operation"], buckets=BUCKETS_BD
+)
+MONGODB_ERRORES = Counter(
+    "cinemax_mongodb_operation_errors_total", "Operaciones de MongoDBService con excepción", ["operation"]
+)
+REDIS_LATENCIA = Histogram(
+    "cinemax_redis_operation_duration_seconds", "Latencia de operaciones de RedisService",
+    ["operation"], buckets=BUCKETS_BD
+)
+REDIS_ERRORES = Counter(
+    "cinemax_redis_operation_errors_total", "Operaciones de RedisService con excepción", ["operation"]
+)
+
+REDIS_COMANDO_LATENCIA = Histogram(
+    "cinemax_redis_command_duration_seconds", "Latencia de comandos de Redis (fuera de pipelines)",
+    ["command"], buckets=BUCKETS_BD
+)
+REDIS_COMANDO_ERRORES = Counter(
+    "cinemax_redis_command_errors_total", "Comandos de Redis con excepción", ["command"]
+)
+REDIS_COMANDOS_PREFIJO = Counter(
+    "cinemax_redis_commands_by_prefix_total", "Comandos de Redis (incluidos los de pipelines) por prefijo de clave", ["prefix"]
+)
+REDIS_PIPELINE_COMANDOS = Histogram(
+    "cinemax_redis_pipeline_commands", "Comandos por pipeline de Redis",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+)
+REDIS_PIPELINE_LATENCIA = Histogram(
+    "cinemax_redis_pipeline_duration_seconds", "Latencia de ejecución de pipelines de Redis", buckets=BUCKETS_BD
+)
+REDIS_CLAVES = Gauge("cinemax_redis_keys", "Claves de Redis por prefijo (último muestreo)", ["prefix"])
+REDIS_CLAVES_BYTES = Gauge("cinemax_redis_keys_memory_bytes", "MEMORY USAGE de las claves por prefijo (último muestreo)", ["prefix"])
+REDIS_CLAVES_SIN_TTL = Gauge("cinemax_redis_keys_without_ttl", "Claves sin TTL por prefijo (último muestreo)", ["prefix"])
+
+WEBSOCKET_CONEXIONES = Gauge("cinemax_websocket_connections", "Conexiones WebSocket activas")
+WEBSOCKET_SALAS = Gauge("cinemax_websocket_rooms", "Salas (funciones) WebSocket con clientes")
+
+CORREO_PROFUNDIDAD = Gauge(
+    "cinemax_email_queue_depth", "Mensajes en las estructuras de correo de Redis", ["queue"]
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "cinemax_event_loop_lag_seconds", "Retraso de planificación del event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_BLOQUEOS = Counter(
+    "cinemax_event_loop_blocking_callbacks_total", "Callbacks que bloquearon el event loop más del umbral"
+)
+EVENT_LOOP_SALUDABLE = Gauge("cinemax_event_loop_healthy", "1 si el lag del event loop está bajo el umbral de degradación")
+
+# Ruta para peticiones que no coinciden con ninguna (evita una serie por URL)
+SIN_RUTA = "sin_ruta"
+
+
+def instrumentar_operaciones(histograma: Histogram, errores: Counter, prefijo: str):
+    """
+    Decorador de clase: mide cada método async público en ``histograma``
+
+    Los hijos del histograma se resuelven una vez por método para no
+    pagar la búsqueda de etiquetas en cada llamada. Con una traza activa
+    cada llamada es también un span ``<prefijo>.<método>``.
+    """
+    def decorador(cls):
+        for nombre, metodo in list(vars(cls).items()):
+            if nombre.startswith("_") or not inspect.iscoroutinefunction(metodo):
+                continue
+            if settings.tracing_habilitado:
+                metodo = tracing.trazar(f"{prefijo}.{nombre}")(metodo)
+            if settings.enable_metrics:
+                metodo = _medir(metodo, histograma.labels(nombre), errores.labels(nombre))
+            setattr(cls, nombre, metodo)
+        return cls
+
+    return decorador
+
+
+def _medir(metodo, hijo, errores):
+    @functools.wraps(metodo)
+    async def wrapper(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return await metodo(*args, **kwargs)
+        except Exception:
+            errores.inc()
+            raise
+        finally:
+            hijo.observe(time.perf_counter() - inicio)
+
+    return wrapper
+
+
+class MetricasHTTPMiddleware:
+    """
+    Middleware ASGI que registra peticiones y latencia por plantilla de ruta
+
+    La plantilla se lee de ``scope["route"]`` una vez resuelto el routing.
+    """
+
+    def __init__(self, app, excluir=("/metrics",)):
+        self.app = app
+        self.excluir = set(excluir)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluir:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        status_code = 500
+        inicio = time.perf_counter()
+
+        async def send_con_status(mensaje):
+            nonlocal status_code
+            if mensaje["type"] == "http.response.start":
+                status_code = mensaje["status"]
+            await send(mensaje)
+
+        en_curso = HTTP_EN_CURSO.labels(metodo)
+        en_curso.inc()
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            en_curso.dec()
+            ruta = scope.get("route")
+            etiquetas = (metodo, getattr(ruta, "path", SIN_RUTA), str(status_code))
+            HTTP_PETICIONES.labels(*etiquetas).inc()
+            HTTP_LATENCIA.labels(*etiquetas).observe(time.perf_counter() - inicio)
+
+
+async def actualizar_gauges(redis_service=None, websocket_service=None) -> Dict[str, Any]:
+    """Actualiza los gauges que se calculan al hacer scrape (WebSocket y correo)"""
+    if websocket_service is not None:
+        WEBSOCKET_CONEXIONES.set(len(websocket_service.active_connections))
+        WEBSOCKET_SALAS.set(len(websocket_service.room_connections))
+
+    if redis_service is None:
+        return {}
+
+    from services.email_service import email_service
+    from services.email_worker_service import CLAVE_REINTENTOS
+
+    colas = {
+        "stream": ("xlen", email_service.email_stream),
+        "prioridad": ("zcard", email_service.email_queue),
+        "reintentos": ("zcard", CLAVE_REINTENTOS),
+        "dlq": ("xlen", f"{email_service.email_stream}:dlq")
+    }
+    try:
+        valores = await redis_service.pipeline_execute([(comando, (clave,), {}) for comando, clave in colas.values()])
+    except Exception as e:
+        logger.warning("Error leyendo profundidad de colas de correo", extra={"error": str(e)})
+        return {}
+
+    profundidad = dict(zip(colas, valores))
+    for cola, valor in profundidad.items():
+        CORREO_PROFUNDIDAD.labels(cola).set(valor or 0)
+    return profundidad
+
+
+def exportar() -> bytes:
+    """Exposición en formato de texto de Prometheus"""
+    return generate_latest()
+
+
+
+def iniciar_servidor_metricas(puerto: int, obtener_redis: Callable, websocket_service=None,
+                              intervalo: float = 10.0) -> asyncio.Task:
+    """
+    Sirve /metrics en un puerto propio y refresca los gauges periódicamente
+
+    Returns:
+        asyncio.Task: Tarea de refresco (cancelar al cerrar)
+    """
+    start_http_server(puerto)
+
+    async def refrescar():
+        while True:
+            await actualizar_gauges(obtener_redis(), websocket_service)
+            await asyncio.sleep(intervalo)
+
+    return asyncio.create_task(refrescar())
@@ -0,0 +1,70 @@
+"""
+Desglose de latencias por paso para flujos multi-etapa (p. ej. la compra)
+"""
+
+import time
+from collections import deque
+from typing import Dict, Any, Deque
+
+from infrastructure.utils import tracing
+
+
+class Cronometro:
+    """
+    Mide la duración de pasos consecutivos de un flujo
+
+    Con una traza activa cada paso es además un span, padre de las
+    operaciones (Mongo, Redis, pago...) que se ejecutan durante el paso.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+        self.pasos: Dict[str, float] = {}
+        self._span = tracing.abrir_paso()
+
+    def marcar(self, paso: str) -> float:
+        """Registra el tiempo transcurrido desde la marca anterior (ms)"""
+        ahora = time.perf_counter()
+        duracion = (ahora - self._ultimo) * 1000
+        self.pasos[paso] = round(duracion, 3)
+        self._ultimo = ahora
+        if self._span is not None:
+            self._span = tracing.siguiente_paso(self._span, paso)
+        return duracion
+
+    def total(self) -> float:
+        """Duración total desde el inicio (ms)"""
+        return round((time.perf_counter() - self.inicio) * 1000, 3)
+
+
+class RegistroLatencias:
+    """Ventana deslizante de latencias por paso con percentiles"""
+
+    def __init__(self, ventana: int = 1000):
+        self.ventana = ventana
+        self.muestras: Dict[str, Deque[float]] = {}
+
+    def registrar(self, cronometro: Cronometro):
+        """Agrega los pasos y el total de un cronómetro"""
+        for paso, duracion in {**cronometro.pasos, "total": cronometro.total()}.items():
+            self.muestras.setdefault(paso, deque(maxlen=self.ventana)).append(duracion)
+
+    @staticmethod
+    def _percentil(ordenadas, p: float) -> float:
+        indice = min(len(ordenadas) - 1, int(round(p * (len(ordenadas) - 1))))
+        return ordenadas[indice]
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """p50/p95/p99 y máximo por paso (ms)"""
+        resultado = {}
+        for paso, muestras in self.muestras.items():
+            ordenadas = sorted(muestras)
+            resultado[paso] = {
+                "muestras": len(ordenadas),
+                "p50": self._percentil(ordenadas, 0.50),
+                "p95": self._percentil(ordenadas, 0.95),
+                "p99": self._percentil(ordenadas, 0.99),
+                "max": ordenadas[-1]
+            }
+        return resultado
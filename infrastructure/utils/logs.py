@@ -0,0 +1,201 @@
+"""
+Logging estructurado y no bloqueante
+
+Los ``print()`` del camino caliente escribían en stdout de forma síncrona
+desde el event loop. Aquí:
+
+- El handler raíz solo encola el registro (``QueueHandler``); el formateo
+  y la escritura ocurren en el hilo de un ``QueueListener``.
+- Salida JSON (una línea por evento, con los ``extra`` como campos) o texto.
+- Niveles por módulo (``LOG_NIVELES=services.email_service=DEBUG,...``).
+- Muestreo de eventos DEBUG frecuentes (``LOG_MUESTREO_DEBUG``) o por
+  evento con ``extra={"muestreo": 0.1}``; el descarte ocurre antes de
+  crear el ``LogRecord``. Solo aplica a los loggers del proyecto
+  (``obtener_logger``) y no a los módulos con nivel en ``LOG_NIVELES``.
+
+Uso: ``logger = obtener_logger(__name__)`` y
+``logger.info("Compra completada", extra={"transaccion_id": ..., "duracion_ms": ...})``.
+"""
+
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Dict, Set
+
+from config.settings import settings
+from infrastructure.utils import tracing
+
+# Atributos estándar de LogRecord (lo demás son campos ``extra``)
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "muestreo"}
+
+_listener: Optional[QueueListener] = None
+_manejador: Optional["ManejadorCola"] = None
+# Módulos con nivel explícito en LOG_NIVELES (sus DEBUG no se muestrean)
+_modulos_explicitos: Set[str] = set()
+
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea con los campos ``extra`` del evento"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage()
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_RECORD:
+                evento[clave] = valor
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    """Formato legible para desarrollo: mensaje seguido de los campos ``extra``"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        linea = super().format(record)
+        extras = {k: v for k, v in record.__dict__.items() if k not in _ATRIBUTOS_RECORD}
+        return f"{linea} {extras}" if extras else linea
+
+
+class LoggerMuestreado(logging.Logger):
+    """
+    Logger que muestrea antes de construir el registro
+
+    Los DEBUG pasan con probabilidad ``settings.log_muestreo_debug``
+    (salvo ``muestrear_debug`` en False); cualquier evento con
+    ``extra={"muestreo": tasa}`` usa esa tasa. Tampoco busca el
+    archivo/línea del llamador (ningún formato los usa y recorrer la pila
+    es la parte más cara de crear el registro).
+    """
+
+    muestrear_debug = True
+
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+        tasa = extra.get("muestreo") if extra else None
+        if tasa is None and level == logging.DEBUG and self.muestrear_debug:
+            tasa = settings.log_muestreo_debug
+        if tasa is not None and tasa < 1 and random.random() >= tasa:
+            return
+        super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel)
+
+    def findCaller(self, stack_info=False, stacklevel=1):
+        return "(desconocido)", 0, "(desconocido)", None
+
+
+class ManejadorCola(QueueHandler):
+    """
+    Encola el registro sin formatearlo
+
+    ``QueueHandler.prepare`` formatea en el hilo que loguea; aquí solo se
+    adjunta la traza activa (el contextvar solo existe en este hilo) y el
+    formateo queda para el listener. Con la cola llena se descarta.
+    """
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if tracing.trazando():
+            record.traza_id = tracing._span_actual.get().traza.id
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class ListenerCola(QueueListener):
+    """Listener que cede el GIL tras cada registro para no retrasar el event loop"""
+
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        time.sleep(0)
+
+
+def _niveles_por_modulo(configuracion: str) -> Dict[str, str]:
+    """Parsea ``modulo=NIVEL,otro.modulo=NIVEL``"""
+    niveles = {}
+    for par in filter(None, (p.strip() for p in configuracion.split(","))):
+        modulo, _, nivel = par.partition("=")
+        niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging():
+    """
+    Instala el handler con cola en el logger raíz y arranca el listener
+
+    Los ``FileHandler`` ya configurados (p. ej. el de WebSocket) pasan a
+    escribirse desde el listener; los de consola se reemplazan.
+    """
+    global _listener, _manejador
+    if _listener is not None:
+        return
+
+    raiz = logging.getLogger()
+    consola = logging.StreamHandler(sys.stdout)
+    consola.setFormatter(FormatoJSON() if settings.log_formato == "json" else FormatoTexto())
+    destinos = [consola] + [h for h in raiz.handlers if isinstance(h, logging.FileHandler)]
+
+    _manejador = ManejadorCola(queue.Queue(maxsize=settings.log_cola_max))
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_manejador)
+    raiz.setLevel(settings.log_nivel.upper())
+
+    niveles = _niveles_por_modulo(settings.log_niveles)
+    for modulo, nivel in niveles.items():
+        logging.getLogger(modulo).setLevel(nivel)
+    _modulos_explicitos.clear()
+    _modulos_explicitos.update(niveles)
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, LoggerMuestreado):
+            logger.muestrear_debug = not _nivel_explicito(logger.name)
+
+    _listener = ListenerCola(_manejador.queue, *destinos, respect_handler_level=True)
+    _listener.start()
+
+
+def detener_logging():
+    """Vacía la cola y detiene el listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def estadisticas_logging() -> Dict[str, int]:
+    """Eventos en cola y descartados por cola llena"""
+    if _manejador is None:
+        return {"en_cola": 0, "descartados": 0}
+    return {"en_cola": _manejador.queue.qsize(), "descartados": _manejador.descartados}
+
+
+def _nivel_explicito(nombre: str) -> bool:
+    return any(nombre == modulo or nombre.startswith(modulo + ".") for modulo in _modulos_explicitos)
+
+
+def obtener_logger(nombre: str) -> logging.Logger:
+    """Logger del módulo (usar ``__name__``); muestrea los DEBUG"""
+    logger = logging.getLogger(nombre)
+    if type(logger) is logging.Logger:
+        # Solo los loggers del proyecto; los de terceros conservan su clase
+        # (y su findCaller) aunque se creen después
+        logger.__class__ = LoggerMuestreado
+        logger.muestrear_debug = not _nivel_explicito(nombre)
+    return logger
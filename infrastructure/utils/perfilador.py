@@ -0,0 +1,173 @@
+"""
+Perfilador por muestreo para workers en producción
+
+Un hilo toma ``sys._current_frames()`` ``hz`` veces por segundo durante
+la ventana pedida y cuenta las pilas de todos los hilos (sin detener el
+proceso ni instalar hooks de trazado). Las pilas de las tareas asyncio
+suspendidas se muestrean a menor frecuencia desde el propio event loop
+(``call_soon_threadsafe``), que es el único hilo donde recorrerlas es
+seguro.
+
+Resultado: pilas colapsadas (formato de flamegraph.pl / speedscope) y una
+tabla de funciones con muestras propias e inclusivas.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter as Contador
+from typing import Optional, Dict, Any, List
+
+from config.settings import settings
+
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Profundidad máxima de una pila muestreada
+MAX_PROFUNDIDAD = 128
+
+
+class PerfilEnCurso(Exception):
+    """Ya hay un perfil ejecutándose en este proceso"""
+
+
+def _etiqueta(codigo) -> str:
+    """``función (archivo:línea)`` con la línea de definición para agrupar"""
+    archivo = codigo.co_filename
+    if archivo.startswith(RAIZ_PROYECTO):
+        archivo = os.path.relpath(archivo, RAIZ_PROYECTO)
+    else:
+        archivo = "/".join(archivo.split(os.sep)[-2:])
+    return f"{codigo.co_name} ({archivo}:{codigo.co_firstlineno})"
+
+
+def _pila(frame) -> List[str]:
+    """Pila desde la raíz hasta ``frame``"""
+    etiquetas = []
+    while frame is not None and len(etiquetas) < MAX_PROFUNDIDAD:
+        etiquetas.append(_etiqueta(frame.f_code))
+        frame = frame.f_back
+    etiquetas.reverse()
+    return etiquetas
+
+
+class PerfiladorMuestreo:
+    """
+    Muestrea las pilas de los hilos y de las tareas asyncio durante ``segundos``
+    """
+
+    def __init__(self, segundos: float, hz: int = None, hz_tareas: int = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.segundos = segundos
+        self.hz = hz or settings.perfil_hz
+        self.hz_tareas = settings.perfil_hz_tareas if hz_tareas is None else hz_tareas
+        self.loop = loop
+        self.pilas: Contador = Contador()
+        self.muestras = 0
+        self.muestras_tareas = 0
+        self.duracion = 0.0
+
+    def ejecutar(self) -> "PerfiladorMuestreo":
+        """Bloquea el hilo que lo llama durante la ventana (usar fuera del loop)"""
+        propio = threading.get_ident()
+        nombres = {}
+        intervalo = 1 / self.hz
+        cada_tareas = max(1, round(self.hz / self.hz_tareas)) if self.hz_tareas and self.loop else 0
+
+        inicio = time.perf_counter()
+        siguiente = inicio
+        while (ahora := time.perf_counter()) - inicio < self.segundos:
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == propio:
+                    continue
+                if ident not in nombres:
+                    nombres = {t.ident: t.name for t in threading.enumerate()}
+                pila = _pila(frame)
+                self.pilas[(f"hilo:{nombres.get(ident, ident)}", *pila)] += 1
+            del frames
+            self.muestras += 1
+
+            if cada_tareas and self.muestras % cada_tareas == 0 and not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self._muestrear_tareas)
+
+            siguiente += intervalo
+            time.sleep(max(0.0, siguiente - time.perf_counter()))
+
+        self.duracion = time.perf_counter() - inicio
+        return self
+
+    def _muestrear_tareas(self):
+        """En el loop: pila de cada tarea suspendida (dónde está esperando)"""
+        self.muestras_tareas += 1
+        for tarea in list(asyncio.all_tasks(self.loop))[:settings.perfil_max_tareas]:
+            pila = []
+            for frame in tarea.get_stack(limit=MAX_PROFUNDIDAD):
+                pila.append(_etiqueta(frame.f_code))
+            if pila:
+                self.pilas[("asyncio", f"tarea:{tarea.get_coro().__qualname__}", *pila)] += 1
+
+    def colapsado(self) -> str:
+        """Una línea ``raiz;...;hoja conteo`` por pila distinta"""
+        return "\n".join(
+            f"{';'.join(pila)} {conteo}" for pila, conteo in sorted(self.pilas.items(), key=lambda p: -p[1])
+        ) + "\n"
+
+    def top_funciones(self, limite: int = 30, incluir_tareas: bool = False) -> List[Dict[str, Any]]:
+        """
+        Funciones con más muestras en los hilos
+
+        ``propias``: la función estaba en la cima de la pila (consumiendo CPU
+        o bloqueada en C). ``inclusivas``: estaba en algún punto de la pila.
+        """
+        propias: Contador = Contador()
+        inclusivas: Contador = Contador()
+        total = 0
+        for pila, conteo in self.pilas.items():
+            if pila[0] == "asyncio" and not incluir_tareas:
+                continue
+            total += conteo
+            funciones = pila[1:]
+            if funciones:
+                propias[funciones[-1]] += conteo
+            for funcion in set(funciones):
+                inclusivas[funcion] += conteo
+
+        return [{
+            "funcion": funcion,
+            "propias": propias[funcion],
+            "inclusivas": conteo,
+            "propias_pct": round(propias[funcion] / total * 100, 2) if total else 0,
+            "inclusivas_pct": round(conteo / total * 100, 2) if total else 0
+        } for funcion, conteo in sorted(inclusivas.items(), key=lambda f: (-propias[f[0]], -f[1]))[:limite]]
+
+    def resumen(self, limite: int = 30) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "segundos": round(self.duracion, 2),
+            "hz": self.hz,
+            "muestras": self.muestras,
+            "muestras_tareas": self.muestras_tareas,
+            "pilas_distintas": len(self.pilas),
+            "top_funciones": self.top_funciones(limite)
+        }
+
+
+_perfil_en_curso = threading.Lock()
+
+
+async def perfilar(segundos: float, hz: int = None) -> PerfiladorMuestreo:
+    """
+    Perfila el proceso actual sin bloquear el event loop
+
+    Raises:
+        PerfilEnCurso: si ya hay un perfil ejecutándose
+    """
+    if not _perfil_en_curso.acquire(blocking=False):
+        raise PerfilEnCurso()
+    try:
+        perfilador = PerfiladorMuestreo(segundos, hz, loop=asyncio.get_running_loop())
+        return await asyncio.to_thread(perfilador.ejecutar)
+    finally:
+        _perfil_en_curso.release()
@@ -1,26 +1,57 @@
-import qrcode
+"""
+Render de códigos QR
+
+Funciones puras de módulo (se envían al pool de procesos de
+``services.qr_service``, que añade cache y single-flight).
+"""
+
+import asyncio
 import base64
 from io import BytesIO
+from typing import List
+
+import qrcode
+import qrcode.image.svg
+
+# PNG transparente de 1x1 para cuando el render falla
+QR_PLACEHOLDER = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+
+def renderizar_qr(datos: str, formato: str = "png", box_size: int = 10, border: int = 4) -> str:
+    """
+    Renderiza un QR (función de módulo para poder enviarla al pool de procesos)
+
+    Returns:
+        str: PNG en base64 (sin prefijo ``data:``) o el documento SVG
+    """
+    qr = qrcode.QRCode(error_correction=qrcode.ERROR_CORRECT_L, box_size=box_size, border=border)
+    qr.add_data(datos)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if formato == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+        return buffer.getvalue().decode()
+
+    qr.make_image(fill_color="black", back_color="white").save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def renderizar_lote(datos: List[str], formato: str = "png", box_size: int = 10, border: int = 4) -> List[str]:
+    """Renderiza varios QR en una sola tarea del pool"""
+    return [renderizar_qr(d, formato, box_size, border) for d in datos]
+
 
 class QRGenerator:
     async def generar(self, codigo: str) -> str:
         """
         Genera un código QR en base64 a partir de un string.
+        El render corre en un hilo para no bloquear el event loop; con pool
+        de procesos y cache se inyecta ``services.qr_service.qr_service``,
+        que expone el mismo ``generar``.
         Args:
             codigo (str): El texto/código a codificar en el QR.
         Returns:
             str: Imagen QR en formato base64 (sin prefijo data:image/png;base64,)
         """
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(codigo)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, 'PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return img_str 
\ No newline at end of file
+        return await asyncio.to_thread(renderizar_qr, codigo)
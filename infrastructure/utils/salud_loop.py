@@ -0,0 +1,166 @@
+"""
+Salud del event loop
+
+- Lag: una tarea duerme ``intervalo`` segundos y mide cuánto tarda de más
+  en despertar. El percentil 95 de la ventana reciente decide si el
+  worker está degradado (``/health`` responde 503 para que el balanceador
+  lo saque de rotación).
+- Detector de bloqueos (modo depuración): un hilo vigía envía un ping al
+  loop con ``call_soon_threadsafe``; si no se atiende en ``bloqueo_ms``,
+  captura la pila del hilo del loop en ese momento (bcrypt, smtplib,
+  render de QR, algoritmos recursivos...) y mide cuánto duró el bloqueo.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque, Counter as Contador
+from typing import Optional, Dict, Any, Deque
+
+from config.settings import settings
+from infrastructure.metrics.prometheus_metrics import EVENT_LOOP_LAG, EVENT_LOOP_BLOQUEOS, EVENT_LOOP_SALUDABLE
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Raíz del proyecto: el origen de un bloqueo es el último frame propio
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def origen_pila(pila: traceback.StackSummary) -> str:
+    """Último frame del proyecto en la pila (``archivo:línea función``)"""
+    for frame in reversed(pila):
+        if frame.filename.startswith(RAIZ_PROYECTO) and "site-packages" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, RAIZ_PROYECTO)}:{frame.lineno} {frame.name}"
+    return f"{pila[-1].filename}:{pila[-1].lineno} {pila[-1].name}" if pila else "desconocido"
+
+
+class MonitorLoop:
+    """
+    Mide el lag del event loop y, opcionalmente, detecta callbacks bloqueantes
+    """
+
+    def __init__(self, intervalo: float = None, ventana: int = None, degradado_ms: float = None,
+                 detector: bool = None, bloqueo_ms: float = None):
+        self.intervalo = intervalo or settings.loop_intervalo
+        self.degradado_ms = settings.loop_lag_degradado_ms if degradado_ms is None else degradado_ms
+        self.detector = (settings.loop_detector_habilitado or settings.debug) if detector is None else detector
+        self.bloqueo_ms = bloqueo_ms or settings.loop_bloqueo_ms
+        self.lags: Deque[float] = deque(maxlen=ventana or settings.loop_ventana)
+        self.bloqueos: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self.origenes: Contador = Contador()
+
+        self._tarea: Optional[asyncio.Task] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._activo = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo_loop: Optional[int] = None
+        self.lag_max = 0.0
+
+    async def iniciar(self):
+        """Arranca la medición de lag y el vigía de bloqueos"""
+        self._activo = True
+        self._loop = asyncio.get_running_loop()
+        self._hilo_loop = threading.get_ident()
+        self._tarea = asyncio.create_task(self._medir_lag())
+        if self.detector:
+            self._hilo = threading.Thread(target=self._vigilar, name="vigia-event-loop", daemon=True)
+            self._hilo.start()
+
+    async def detener(self):
+        self._activo = False
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        if self._hilo:
+            self._hilo.join(timeout=2)
+            self._hilo = None
+
+    async def _medir_lag(self):
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(self.intervalo)
+            lag = max(0.0, time.perf_counter() - inicio - self.intervalo)
+            self.lags.append(lag)
+            self.lag_max = max(self.lag_max, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_SALUDABLE.set(0 if self.degradado() else 1)
+
+    def _vigilar(self):
+        """Hilo vigía: ping al loop y captura de pila si no responde a tiempo"""
+        atendido = threading.Event()
+        umbral = self.bloqueo_ms / 1000
+        while self._activo and not self._loop.is_closed():
+            atendido.clear()
+            enviado = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(atendido.set)
+            except RuntimeError:
+                return
+            if atendido.wait(umbral):
+                time.sleep(umbral / 2)
+                continue
+
+            frame = sys._current_frames().get(self._hilo_loop)
+            pila = traceback.extract_stack(frame) if frame is not None else traceback.StackSummary()
+            while self._activo and not atendido.wait(0.1):
+                pass
+            self._registrar_bloqueo(time.perf_counter() - enviado, pila)
+
+    def _registrar_bloqueo(self, duracion: float, pila: traceback.StackSummary):
+        origen = origen_pila(pila)
+        self.origenes[origen] += 1
+        self.bloqueos.append({
+            "duracion_ms": round(duracion * 1000, 1),
+            "origen": origen,
+            "pila": [f"{f.filename}:{f.lineno} {f.name}" for f in pila[-15:]],
+            "timestamp": time.time()
+        })
+        EVENT_LOOP_BLOQUEOS.inc()
+        logger.warning("Event loop bloqueado", extra={"duracion_ms": round(duracion * 1000, 1), "origen": origen})
+
+    def percentil(self, p: float) -> float:
+        """Percentil del lag (segundos) en la ventana reciente"""
+        if not self.lags:
+            return 0.0
+        ordenados = sorted(self.lags)
+        return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+    def degradado(self) -> bool:
+        """True si el p95 del lag reciente supera el umbral de degradación"""
+        return self.percentil(0.95) * 1000 > self.degradado_ms
+
+    def obtener_estado(self) -> Dict[str, Any]:
+        """Resumen para /health"""
+        return {
+            "estado": "degradado" if self.degradado() else "ok",
+            "lag_p95_ms": round(self.percentil(0.95) * 1000, 2),
+            "umbral_ms": self.degradado_ms
+        }
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        return {
+            **self.obtener_estado(),
+            "lag_p50_ms": round(self.percentil(0.5) * 1000, 2),
+            "lag_p99_ms": round(self.percentil(0.99) * 1000, 2),
+            "lag_max_ms": round(self.lag_max * 1000, 2),
+            "muestras": len(self.lags),
+            "detector": {
+                "habilitado": self.detector,
+                "umbral_ms": self.bloqueo_ms,
+                "total": sum(self.origenes.values()),
+                "origenes": [{"origen": o, "bloqueos": n} for o, n in self.origenes.most_common(20)],
+                "recientes": list(self.bloqueos)[-10:]
+            }
+        }
+
+
+# Instancia global (se inicia en el lifespan)
+monitor_loop = MonitorLoop()
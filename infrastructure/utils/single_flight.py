@@ -0,0 +1,94 @@
+"""
+Coalescencia de lecturas concurrentes (single-flight)
+
+Cuando varias corrutinas piden la misma clave al mismo tiempo solo la
+primera ejecuta la carga; el resto espera el mismo futuro en vuelo.
+"""
+
+import asyncio
+import copy
+import functools
+from typing import Dict, Any, Callable, Awaitable, Hashable, List, Tuple
+
+
+class SingleFlight:
+    """Agrupa cargas async idénticas en un único futuro por clave"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._en_vuelo: Dict[Hashable, Tuple[asyncio.Future, List[int]]] = {}
+        self.llamadas = 0
+        self.ejecuciones = 0
+        self.coalescidas = 0
+
+    async def hacer(self, key: Hashable, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta ``cargar`` salvo que ya haya una carga en vuelo para la clave
+
+        Si hubo llamadas coalescidas cada llamador recibe una copia del
+        resultado para que pueda mutarlo sin afectar a los demás.
+        """
+        self.llamadas += 1
+
+        en_vuelo = self._en_vuelo.get(key)
+        if en_vuelo is not None:
+            tarea, seguidores = en_vuelo
+            seguidores[0] += 1
+            self.coalescidas += 1
+            return copy.deepcopy(await asyncio.shield(tarea))
+
+        self.ejecuciones += 1
+        tarea = asyncio.ensure_future(cargar())
+        seguidores = [0]
+        self._en_vuelo[key] = (tarea, seguidores)
+        tarea.add_done_callback(lambda _: self._en_vuelo.pop(key, None))
+        # shield: cancelar al primer llamador no cancela a los que esperan
+        resultado = await asyncio.shield(tarea)
+        return copy.deepcopy(resultado) if seguidores[0] else resultado
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Contadores de llamadas, ejecuciones reales y llamadas coalescidas"""
+        return {
+            "llamadas": self.llamadas,
+            "ejecuciones": self.ejecuciones,
+            "coalescidas": self.coalescidas,
+            "en_vuelo": len(self._en_vuelo),
+            "ratio_coalescencia": round(self.coalescidas / self.llamadas, 4) if self.llamadas else 0.0
+        }
+
+
+# Registro global de grupos para exponer métricas
+_grupos: Dict[str, SingleFlight] = {}
+
+
+def single_flight(nombre: str = None):
+    """
+    Decorador para métodos async de servicios
+
+    La clave es la instancia más los argumentos de la llamada.
+
+    Args:
+        nombre: Nombre del grupo en las métricas (por defecto el qualname)
+    """
+    def decorador(fn):
+        grupo = SingleFlight(nombre or fn.__qualname__)
+        _grupos[grupo.nombre] = grupo
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            key = (id(self), args, tuple(sorted(kwargs.items())))
+            return await grupo.hacer(key, lambda: fn(self, *args, **kwargs))
+
+        wrapper.single_flight = grupo
+        return wrapper
+
+    return decorador
+
+
+def obtener_estadisticas_single_flight() -> Dict[str, Any]:
+    """Métricas de coalescencia de todos los grupos registrados"""
+    grupos = {nombre: grupo.obtener_estadisticas() for nombre, grupo in _grupos.items()}
+    return {
+        "grupos": grupos,
+        "total_coalescidas": sum(g["coalescidas"] for g in grupos.values())
+    }
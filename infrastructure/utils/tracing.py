@@ -0,0 +1,393 @@
+"""
+Trazas ligeras basadas en contextvars
+
+Cada petición muestreada abre una traza; dentro de ella ``span()`` y los
+decoradores ``trazar``/``trazar_metodos`` cuelgan spans del span actual
+(guardado en un ``ContextVar``, así las tareas de ``asyncio.gather``
+heredan su padre). Sin traza activa todo es un no-op de una lectura de
+contextvar.
+
+Las trazas terminadas quedan en memoria (``/debug/traces/slowest``). La
+exportación en segundo plano es opcional: un archivo JSON lines con
+rotación por tamaño o un colector OTLP/HTTP.
+"""
+
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Deque
+
+from config.settings import settings
+
+# Nombre de los pasos abiertos por el cronómetro hasta que se marcan
+PASO_SIN_NOMBRE = "paso"
+
+_span_actual: ContextVar[Optional["Span"]] = ContextVar("span_actual", default=None)
+
+
+class Span:
+    """Operación con inicio, fin, atributos y spans hijos"""
+
+    __slots__ = ("nombre", "traza", "padre", "inicio", "fin", "atributos", "hijos", "error")
+
+    def __init__(self, nombre: str, traza: "Traza", padre: Optional["Span"] = None, atributos: Dict[str, Any] = None):
+        self.nombre = nombre
+        self.traza = traza
+        self.padre = padre
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        self.atributos = atributos or {}
+        self.hijos: List["Span"] = []
+        self.error: Optional[str] = None
+        if padre is not None:
+            padre.hijos.append(self)
+
+    def terminar(self):
+        """Cierra el span y los hijos que quedaron abiertos"""
+        if self.fin is not None:
+            return
+        self.fin = time.perf_counter()
+        for hijo in self.hijos:
+            if hijo.fin is None:
+                if hijo.nombre == PASO_SIN_NOMBRE:
+                    hijo.nombre = "resto"
+                hijo.terminar()
+
+    @property
+    def duracion_ms(self) -> float:
+        return round(((self.fin or time.perf_counter()) - self.inicio) * 1000, 3)
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Árbol del span con tiempos relativos al inicio de la traza (ms)"""
+        return {
+            "nombre": self.nombre,
+            "inicio_ms": round((self.inicio - self.traza.raiz.inicio) * 1000, 3),
+            "duracion_ms": self.duracion_ms,
+            **({"atributos": self.atributos} if self.atributos else {}),
+            **({"error": self.error} if self.error else {}),
+            **({"hijos": [hijo.a_dict() for hijo in self.hijos]} if self.hijos else {})
+        }
+
+
+class Traza:
+    """Árbol de spans de una petición"""
+
+    def __init__(self, nombre: str, atributos: Dict[str, Any] = None):
+        self.id = uuid.uuid4().hex
+        self.epoch = time.time()
+        self.raiz = Span(nombre, self, atributos=atributos)
+
+    @property
+    def duracion_ms(self) -> float:
+        return self.raiz.duracion_ms
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "traza_id": self.id,
+            "inicio": self.epoch,
+            "duracion_ms": self.duracion_ms,
+            "raiz": self.raiz.a_dict()
+        }
+
+
+def trazando() -> bool:
+    """Indica si hay una traza activa en el contexto actual"""
+    return _span_actual.get() is not None
+
+
+def anotar(**atributos: Any):
+    """Agrega atributos al span actual (no-op sin traza)"""
+    actual = _span_actual.get()
+    if actual is not None:
+        actual.atributos.update(atributos)
+
+
+@contextmanager
+def span(nombre: str, **atributos: Any):
+    """Span hijo del span actual mientras dura el bloque"""
+    padre = _span_actual.get()
+    if padre is None:
+        yield None
+        return
+
+    actual = Span(nombre, padre.traza, padre, atributos)
+    token = _span_actual.set(actual)
+    try:
+        yield actual
+    except BaseException as e:
+        actual.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        actual.terminar()
+        _span_actual.reset(token)
+
+
+def abrir_paso() -> Optional[Span]:
+    """
+    Abre un span de paso y lo deja como actual hasta ``siguiente_paso``
+
+    Lo usa ``Cronometro``: los pasos se nombran al marcarse, y así las
+    operaciones de cada paso quedan como hijas del paso.
+    """
+    padre = _span_actual.get()
+    if padre is None:
+        return None
+    paso = Span(PASO_SIN_NOMBRE, padre.traza, padre)
+    _span_actual.set(paso)
+    return paso
+
+
+def siguiente_paso(paso: Span, nombre: str) -> Span:
+    """Cierra ``paso`` con su nombre definitivo y abre el siguiente"""
+    paso.nombre = nombre
+    paso.terminar()
+    siguiente = Span(PASO_SIN_NOMBRE, paso.traza, paso.padre)
+    _span_actual.set(siguiente)
+    return siguiente
+
+
+def trazar(nombre: str = None):
+    """Decorador: ejecuta una corrutina dentro de un span"""
+    def decorador(fn):
+        nombre_span = nombre or fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _span_actual.get() is None:
+                return await fn(*args, **kwargs)
+            with span(nombre_span):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorador
+
+
+def trazar_metodos(prefijo: str):
+    """Decorador de clase: un span por cada método async público"""
+    def decorador(cls):
+        for nombre, metodo in list(vars(cls).items()):
+            if nombre.startswith("_") or not inspect.iscoroutinefunction(metodo):
+                continue
+            setattr(cls, nombre, trazar(f"{prefijo}.{nombre}")(metodo))
+        return cls
+
+    return decorador
+
+
+class RegistroTrazas:
+    """Últimas trazas terminadas (ventana acotada)"""
+
+    def __init__(self, capacidad: int):
+        self.trazas: Deque[Traza] = deque(maxlen=capacidad)
+        self.iniciadas = 0
+        self.muestreadas = 0
+
+    def agregar(self, traza: Traza):
+        self.trazas.append(traza)
+
+    def mas_lentas(self, limite: int = 10) -> List[Dict[str, Any]]:
+        """Trazas recientes más lentas con su árbol de spans"""
+        return [t.a_dict() for t in sorted(self.trazas, key=lambda t: t.duracion_ms, reverse=True)[:limite]]
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        return {
+            "iniciadas": self.iniciadas,
+            "muestreadas": self.muestreadas,
+            "en_memoria": len(self.trazas),
+            "muestreo": settings.tracing_muestreo
+        }
+
+
+def _spans_otlp(traza: Traza) -> List[Dict[str, Any]]:
+    """Aplana el árbol de spans al formato OTLP/JSON"""
+    spans = []
+
+    def nanos(instante: float) -> str:
+        return str(int((traza.epoch + instante - traza.raiz.inicio) * 1e9))
+
+    def visitar(actual: Span, padre_id: str):
+        span_id = os.urandom(8).hex()
+        spans.append({
+            "traceId": traza.id,
+            "spanId": span_id,
+            **({"parentSpanId": padre_id} if padre_id else {}),
+            "name": actual.nombre,
+            "kind": 2 if actual is traza.raiz else 1,
+            "startTimeUnixNano": nanos(actual.inicio),
+            "endTimeUnixNano": nanos(actual.fin or actual.inicio),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in actual.atributos.items()],
+            "status": {"code": 2, "message": actual.error} if actual.error else {"code": 1}
+        })
+        for hijo in actual.hijos:
+            visitar(hijo, span_id)
+
+    visitar(traza.raiz, "")
+    return spans
+
+
+class ExportadorTrazas:
+    """
+    Exporta trazas en un hilo aparte (nunca bloquea el event loop)
+
+    ``json``: una traza por línea en ``settings.tracing_archivo`` (rota al
+    superar ``tracing_archivo_max_bytes``, conserva ``tracing_archivo_respaldos``).
+    ``otlp``: POST OTLP/HTTP JSON a ``settings.tracing_otlp_endpoint``.
+    """
+
+    def __init__(self, formato: str, lote: int = 100):
+        self.formato = formato
+        self.lote = lote
+        self._cola: "queue.Queue[Optional[Traza]]" = queue.Queue(maxsize=10000)
+        self._hilo: Optional[threading.Thread] = None
+        self.exportadas = 0
+        self.descartadas = 0
+        self.errores = 0
+
+    def exportar(self, traza: Traza):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ejecutar, name="exportador-trazas", daemon=True)
+            self._hilo.start()
+        try:
+            self._cola.put_nowait(traza)
+        except queue.Full:
+            self.descartadas += 1
+
+    def cerrar(self, timeout: float = 5.0):
+        """Vacía la cola pendiente y detiene el hilo"""
+        if self._hilo is not None:
+            self._cola.put(None)
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    def _ejecutar(self):
+        while True:
+            trazas = [self._cola.get()]
+            while len(trazas) < self.lote:
+                try:
+                    trazas.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            fin = None in trazas
+            trazas = [t for t in trazas if t is not None]
+            if trazas:
+                try:
+                    self._escribir(trazas)
+                    self.exportadas += len(trazas)
+                except Exception as e:
+                    self.errores += 1
+                    # Import diferido: logs importa este módulo
+                    from infrastructure.utils.logs import obtener_logger
+                    obtener_logger(__name__).warning("Error exportando trazas", extra={"error": str(e)})
+            if fin:
+                return
+
+    def _escribir(self, trazas: List[Traza]):
+        if self.formato == "otlp":
+            import httpx
+            cuerpo = {"resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.tracing_servicio}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "cinemax.tracing"},
+                    "spans": [s for t in trazas for s in _spans_otlp(t)]
+                }]
+            }]}
+            httpx.post(settings.tracing_otlp_endpoint, json=cuerpo, timeout=5.0).raise_for_status()
+            return
+
+        directorio = os.path.dirname(settings.tracing_archivo)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._rotar(settings.tracing_archivo)
+        with open(settings.tracing_archivo, "a", encoding="utf-8") as archivo:
+            for traza in trazas:
+                archivo.write(json.dumps(traza.a_dict(), ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _rotar(ruta: str):
+        """Rota el archivo si superó el tamaño máximo (ruta.1, ruta.2, ...)"""
+        if not os.path.exists(ruta) or os.path.getsize(ruta) < settings.tracing_archivo_max_bytes:
+            return
+        respaldos = settings.tracing_archivo_respaldos
+        if respaldos <= 0:
+            os.remove(ruta)
+            return
+        for n in range(respaldos - 1, 0, -1):
+            if os.path.exists(f"{ruta}.{n}"):
+                os.replace(f"{ruta}.{n}", f"{ruta}.{n + 1}")
+        os.replace(ruta, f"{ruta}.1")
+
+
+registro_trazas = RegistroTrazas(settings.tracing_max_trazas)
+exportador_trazas = ExportadorTrazas(settings.tracing_exportador) if settings.tracing_exportador in ("json", "otlp") else None
+
+
+@contextmanager
+def iniciar_traza(nombre: str, **atributos: Any):
+    """
+    Abre una traza si la petición sale muestreada
+
+    Yields:
+        Traza o None si no se muestreó (o ya hay una traza activa)
+    """
+    registro_trazas.iniciadas += 1
+    if (not settings.tracing_habilitado or _span_actual.get() is not None
+            or random.random() >= settings.tracing_muestreo):
+        yield None
+        return
+
+    registro_trazas.muestreadas += 1
+    traza = Traza(nombre, atributos)
+    token = _span_actual.set(traza.raiz)
+    try:
+        yield traza
+    except BaseException as e:
+        traza.raiz.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_actual.reset(token)
+        traza.raiz.terminar()
+        registro_trazas.agregar(traza)
+        if exportador_trazas:
+            exportador_trazas.exportar(traza)
+
+
+class TrazasHTTPMiddleware:
+    """Middleware ASGI que abre una traza por petición HTTP muestreada"""
+
+    def __init__(self, app, excluir=("/metrics",)):
+        self.app = app
+        self.excluir = set(excluir)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluir or scope["path"].startswith("/debug"):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_con_status(mensaje):
+            nonlocal status_code
+            if mensaje["type"] == "http.response.start":
+                status_code = mensaje["status"]
+            await send(mensaje)
+
+        with iniciar_traza(f"{scope['method']} {scope['path']}", path=scope["path"]) as traza:
+            try:
+                await self.app(scope, receive, send_con_status)
+            finally:
+                if traza is not None:
+                    ruta = scope.get("route")
+                    if ruta is not None:
+                        traza.raiz.nombre = f"{scope['method']} {ruta.path}"
+                    traza.raiz.atributos["status"] = status_code
@@ -1,11 +1,12 @@
 from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import List, Dict, Any
 import uvicorn
 
 from config.settings import settings
-from services.global_services import set_redis_service, set_mongodb_service, set_algorithms_service, get_redis_service, get_mongodb_service, get_algorithms_service
+from services.global_services import set_redis_service, set_mongodb_service, set_algorithms_service, set_rollup_service, set_dashboard_service, set_payment_worker_service, set_outbox_relay_service, set_email_worker_service, set_email_retention_service, get_redis_service, get_mongodb_service, get_algorithms_service
 
 # Importar controladores
 from controllers.peliculas_controller import router as peliculas_router
@@ -16,11 +17,28 @@ from controllers.websocket_controller import router as websocket_router
 from controllers.usuarios_controller import router as usuarios_router
 from controllers.selecciones_controller import router as selecciones_router
 from controllers.algoritmos_controller import router as algoritmos_router
+from controllers.prometheus_controller import router as prometheus_router
+from controllers.debug_controller import router as debug_router
+from controllers.admin_controller import router as admin_router
+from infrastructure.metrics.prometheus_metrics import MetricasHTTPMiddleware
+from infrastructure.utils.tracing import TrazasHTTPMiddleware, exportador_trazas
+from infrastructure.utils.logs import configurar_logging, detener_logging
+from infrastructure.utils.salud_loop import monitor_loop
 
 
 # Servicios globales - Inicializar como None por ahora
 redis_service = None
 mongodb_service = None
+rollup_service = None
+dashboard_service = None
+payment_worker_service = None
+outbox_relay_service = None
+email_worker_service = None
+email_retention_service = None
+metricas_task = None
+
+# Puerto de la API (scripts/start_services.sh y uvicorn.run)
+PUERTO_API = 8000
 
 
 @asynccontextmanager
@@ -28,8 +46,14 @@ async def lifespan(app: FastAPI):
     """Gestión del ciclo de vida de la aplicación"""
     # Startup
     print("🚀 Iniciando Sistema de Cine...")
+    configurar_logging()
     
     try:
+        # Lag del event loop (alimenta /health y métricas)
+        if settings.loop_monitor_habilitado:
+            await monitor_loop.iniciar()
+            print(f"✅ Monitor del event loop iniciado (detector de bloqueos: {'sí' if monitor_loop.detector else 'no'})")
+        
         # Intentar conectar a Redis
         try:
             from infrastructure.cache.redis_service import RedisService
@@ -38,6 +62,11 @@ async def lifespan(app: FastAPI):
             await redis_service.connect()
             set_redis_service(redis_service)
             print("✅ Conectado a Redis")
+            
+            # Muestreo del keyspace: solo desde la API y un proceso a la vez
+            if settings.redis_monitor_habilitado:
+                from infrastructure.cache.monitor_redis import monitor_redis
+                await monitor_redis.iniciar(redis_service.redis_client)
         except Exception as e:
             print(f"⚠️  No se pudo conectar a Redis: {e}")
             print("📝 Continuando sin Redis...")
@@ -50,6 +79,11 @@ async def lifespan(app: FastAPI):
             await mongodb_service.connect()
             set_mongodb_service(mongodb_service)
             print("✅ Conectado a MongoDB")
+            
+            # Cache read-through de películas y funciones (L1 memoria + L2 Redis)
+            if settings.cache_entidades_habilitada:
+                mongodb_service.habilitar_cache(get_redis_service())
+                print("✅ Cache de películas y funciones activada")
         except Exception as e:
             print(f"⚠️  No se pudo conectar a MongoDB: {e}")
             print("📝 Continuando sin MongoDB...")
@@ -63,6 +97,99 @@ async def lifespan(app: FastAPI):
             print(f"⚠️  No se pudo inicializar algoritmos: {e}")
             print("📝 Continuando sin algoritmos...")
         
+        # Inicializar servicio de QR (pool de procesos + cache en Redis)
+        try:
+            from services.qr_service import qr_service
+            await qr_service.iniciar(get_redis_service())
+            print(f"✅ Servicio de QR iniciado ({qr_service.procesos} procesos)")
+        except Exception as e:
+            print(f"⚠️  No se pudo iniciar el servicio de QR: {e}")
+            print("📝 Los QR se generarán bajo demanda...")
+        
+        # Inicializar rollups de ventas (requiere Redis y MongoDB)
+        if settings.rollups_habilitados and get_redis_service() and get_mongodb_service():
+            try:
+                from services.rollup_service import RollupService
+                global rollup_service
+                rollup_service = RollupService(get_mongodb_service(), get_redis_service())
+                await rollup_service.iniciar()
+                set_rollup_service(rollup_service)
+                print("✅ Consumidor de rollups de ventas iniciado")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar rollups de ventas: {e}")
+                print("📝 Las métricas se calcularán desde transacciones...")
+        
+        # Inicializar resumen del dashboard (cache + refrescador compartido)
+        if get_mongodb_service():
+            try:
+                from services.dashboard_service import DashboardService
+                global dashboard_service
+                dashboard_service = DashboardService(get_mongodb_service(), get_redis_service())
+                await dashboard_service.iniciar()
+                set_dashboard_service(dashboard_service)
+                print("✅ Servicio de dashboard iniciado")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar el servicio de dashboard: {e}")
+        
+        # Inicializar workers de pago asíncrono (requiere Redis y MongoDB)
+        if settings.pagos_async_habilitado and get_redis_service() and get_mongodb_service():
+            try:
+                from services.payment_worker_service import PaymentWorkerService
+                global payment_worker_service
+                payment_worker_service = PaymentWorkerService(get_redis_service())
+                await payment_worker_service.iniciar()
+                set_payment_worker_service(payment_worker_service)
+                print(f"✅ Workers de pago iniciados ({payment_worker_service.concurrencia})")
+            except Exception as e:
+                print(f"⚠️  No se pudieron iniciar los workers de pago: {e}")
+        
+        # Inicializar relay del outbox transaccional (requiere Redis y MongoDB)
+        if settings.outbox_habilitado and get_redis_service() and get_mongodb_service():
+            try:
+                from services.outbox_relay_service import OutboxRelayService
+                global outbox_relay_service
+                outbox_relay_service = OutboxRelayService(get_mongodb_service(), get_redis_service())
+                await outbox_relay_service.iniciar()
+                set_outbox_relay_service(outbox_relay_service)
+                print("✅ Relay del outbox iniciado")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar el relay del outbox: {e}")
+        
+        # Inicializar worker de correos en este proceso (o usar process_email_queue.py)
+        if settings.email_worker_habilitado and get_redis_service():
+            try:
+                from services.email_worker_service import EmailWorkerService
+                global email_worker_service
+                email_worker_service = EmailWorkerService(get_redis_service())
+                await email_worker_service.iniciar()
+                set_email_worker_service(email_worker_service)
+                print(f"✅ Worker de correos iniciado ({email_worker_service.concurrencia})")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar el worker de correos: {e}")
+        
+        # Inicializar retención de correos (requiere Redis y MongoDB)
+        if settings.email_retencion_habilitada and get_redis_service() and get_mongodb_service():
+            try:
+                from services.email_retention_service import EmailRetentionService
+                global email_retention_service
+                email_retention_service = EmailRetentionService(get_redis_service(), get_mongodb_service())
+                await email_retention_service.iniciar()
+                set_email_retention_service(email_retention_service)
+                print("✅ Retención de correos iniciada")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar la retención de correos: {e}")
+        
+        # Servidor de métricas en su propio puerto si METRICS_PORT no es el de la API
+        if settings.enable_metrics and settings.metrics_port != PUERTO_API:
+            try:
+                from infrastructure.metrics.prometheus_metrics import iniciar_servidor_metricas
+                from services.websocket_service import websocket_service
+                global metricas_task
+                metricas_task = iniciar_servidor_metricas(settings.metrics_port, get_redis_service, websocket_service)
+                print(f"✅ Métricas Prometheus en el puerto {settings.metrics_port}")
+            except Exception as e:
+                print(f"⚠️  No se pudo iniciar el servidor de métricas: {e}")
+        
         print("🎬 Sistema de Cine listo!")
         
     except Exception as e:
@@ -73,10 +200,30 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("🛑 Cerrando conexiones...")
+    if metricas_task:
+        metricas_task.cancel()
+    await monitor_loop.detener()
+    if payment_worker_service:
+        await payment_worker_service.detener()
+    if outbox_relay_service:
+        await outbox_relay_service.detener()
+    if email_worker_service:
+        await email_worker_service.detener()
+    if email_retention_service:
+        await email_retention_service.detener()
+    if dashboard_service:
+        await dashboard_service.detener()
+    if rollup_service:
+        await rollup_service.detener()
+    from services.qr_service import qr_service
+    await qr_service.cerrar()
+    if exportador_trazas:
+        exportador_trazas.cerrar()
     if redis_service:
         await redis_service.disconnect()
     if mongodb_service:
         await mongodb_service.disconnect()
+    detener_logging()
     print("👋 ¡Hasta luego!")
 
 
@@ -106,6 +253,20 @@ app.include_router(websocket_router)
 app.include_router(usuarios_router)
 app.include_router(selecciones_router)
 app.include_router(algoritmos_router)
+app.include_router(admin_router)
+
+# Métricas Prometheus: latencia por ruta y /metrics (scrape de monitoring/prometheus.yml)
+if settings.enable_metrics:
+    app.add_middleware(MetricasHTTPMiddleware)
+    app.include_router(prometheus_router)
+
+# Trazas muestreadas por petición (spans de la compra, repositorios y Redis)
+if settings.tracing_habilitado:
+    app.add_middleware(TrazasHTTPMiddleware)
+
+# Vistas de depuración (trazas más lentas)
+if settings.debug:
+    app.include_router(debug_router)
 
 # Ruta de test para CORS
 @app.get("/test-cors")
@@ -148,13 +309,21 @@ async def health_check():
         # Verificar MongoDB  
         mongo_ok = get_mongodb_service() is not None
         
-        return {
+        # Un event loop degradado responde 503 para que el balanceador drene el worker
+        event_loop = monitor_loop.obtener_estado()
+        
+        respuesta = {
             "estado": "saludable" if redis_ok or mongo_ok else "con_problemas",
             "servicios": {
                 "redis": "conectado" if redis_ok else "desconectado",
                 "mongodb": "conectado" if mongo_ok else "desconectado"
-            }
+            },
+            "event_loop": event_loop
         }
+        if event_loop["estado"] == "degradado":
+            respuesta["estado"] = "degradado"
+            return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=respuesta)
+        return respuesta
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -166,7 +335,7 @@ if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
+        port=PUERTO_API,
         reload=settings.debug,
         log_level="info"
     ) 
\ No newline at end of file
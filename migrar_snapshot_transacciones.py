@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Script de migración: agrega géneros y horario de función a transacciones antiguas
+"""
+
+import argparse
+import asyncio
+
+from infrastructure.database.mongodb_service import MongoDBService
+
+
+async def migrar_snapshot(batch_size: int):
+    """Rellena el snapshot desnormalizado en transacciones existentes"""
+
+    print("🔄 Migrando snapshot de géneros y horarios en transacciones...")
+
+    mongodb_service = MongoDBService()
+
+    try:
+        # connect() también crea los índices que usan los nuevos pipelines
+        await mongodb_service.connect()
+
+        actualizadas = await mongodb_service.migrar_snapshot_transacciones(batch_size)
+
+        print(f"✅ Transacciones actualizadas: {actualizadas}")
+
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+    finally:
+        await mongodb_service.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra el snapshot desnormalizado de transacciones")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Transacciones por lote")
+    args = parser.parse_args()
+
+    asyncio.run(migrar_snapshot(args.batch_size))
@@ -1,51 +1,73 @@
 #!/usr/bin/env python3
 """
-Script para procesar la cola de correos desde Redis
+Worker de correos: procesa la cola de correos desde Redis de forma continua
+
+Usa el grupo de consumidores de ``email:notifications`` (reintentos con
+backoff y cola de muertos). Se detiene de forma ordenada con Ctrl+C o
+SIGTERM. Con ``--una-vez`` procesa un solo lote y termina.
 """
 
+import argparse
 import asyncio
-import os
-from services.email_service import EmailService
+import signal
+
+from infrastructure.cache.redis_service import RedisService
+from services.email_service import email_service
+from services.email_worker_service import EmailWorkerService
 
-async def process_email_queue():
+
+async def process_email_queue(una_vez: bool = False):
     """Procesa la cola de correos desde Redis"""
-    
+
     print("📧 Procesando cola de correos...")
-    
-    # Configurar variables de entorno directamente
-    os.environ['SMTP_HOST'] = 'smtp.gmail.com'
-    os.environ['SMTP_PORT'] = '587'
-    os.environ['SMTP_USER'] = 'harukakasugano31@gmail.com'
-    os.environ['SMTP_PASSWORD'] = 'ebbimqokubqqnvqe'
-    os.environ['SMTP_USE_TLS'] = 'true'
-    os.environ['SMTP_VERIFY_SSL'] = 'true'
-    os.environ['SMTP_TIMEOUT'] = '30'
-    os.environ['SMTP_MAX_RETRIES'] = '3'
-    os.environ['ENVIRONMENT'] = 'production'  # Cambiar a production para enviar correos reales
-    
+
+    redis_service = RedisService()
     try:
-        email_service = EmailService()
         await email_service.connect()
-        
+        await redis_service.connect()
         print("✅ Conectado al servicio de correo")
-        
-        # Procesar correos en lotes
-        processed_count = await email_service.procesar_cola_correos(batch_size=5)
-        
-        print(f"✅ Procesados {processed_count} correos")
-        
-        # Obtener estadísticas
-        stats = await email_service.obtener_estadisticas_correos()
+
+        if una_vez:
+            processed_count = await email_service.procesar_cola_correos(batch_size=5)
+            print(f"✅ Procesados {processed_count} correos")
+            return
+
+        worker = EmailWorkerService(redis_service, email_service)
+        await worker.iniciar()
+        print(f"✅ Worker de correos iniciado ({worker.concurrencia} consumidores)")
+
+        # Esperar Ctrl+C / SIGTERM
+        detener = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, detener.set)
+            except NotImplementedError:
+                # Windows: Ctrl+C llega como KeyboardInterrupt
+                pass
+        await detener.wait()
+
+        print("🛑 Deteniendo worker de correos...")
+        await worker.detener()
+
+        stats = worker.obtener_estadisticas()
         print("\n📊 Estadísticas de correos:")
-        print(f"   Total enviados: {stats.get('total_enviados', 0)}")
-        print(f"   Enviados hoy: {stats.get('enviados_hoy', 0)}")
-        print(f"   Pendientes: {stats.get('pendientes', 0)}")
-        print(f"   Errores: {stats.get('errores', 0)}")
-        
-        await email_service.disconnect()
-        
+        print(f"   Enviados: {stats['enviados']}")
+        print(f"   Reintentos: {stats['reintentos']}")
+        print(f"   Cola de muertos: {stats['muertos']}")
+        print(f"   Errores: {stats['errores']}")
+
     except Exception as e:
         print(f"❌ Error procesando cola de correos: {e}")
+    finally:
+        await redis_service.disconnect()
+        await email_service.disconnect()
 
 if __name__ == "__main__":
-    asyncio.run(process_email_queue()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Worker de correos")
+    parser.add_argument("--una-vez", action="store_true", help="Procesar un solo lote y terminar")
+    args = parser.parse_args()
+    try:
+        asyncio.run(process_email_queue(args.una_vez))
+    except KeyboardInterrupt:
+        pass
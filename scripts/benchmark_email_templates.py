@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark del render de correos: correos por segundo por núcleo
+
+Renderiza N correos por template y locale con los templates precompilados
+(sin QR, que se mide aparte) y con el QR incluido.
+
+Uso:
+    python scripts/benchmark_email_templates.py --n 20000 --procesos 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from services.email_templates import EmailTemplateRenderer, TEXTOS  # noqa: E402
+
+MENSAJES = {
+    "confirmacion_compra": {
+        "template": "confirmacion_compra",
+        "subject": "Confirmación de Compra - FAC-000123",
+        "data": {
+            "numero_factura": "FAC-000123",
+            "asientos": ["F7", "F8", "F9"],
+            "metodo_pago": "tarjeta_credito",
+            "total": 45000,
+            "codigo_qr": "5f0c2a9e-3b1d-4c7a-9e55-0d6c2b1f4a10"
+        }
+    },
+    "cancelacion_compra": {
+        "template": "cancelacion_compra",
+        "subject": "Cancelación de Compra - FAC-000123",
+        "data": {"numero_factura": "FAC-000123", "motivo": "Cambio de planes", "reembolso": True}
+    }
+}
+
+QR_FIJO = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+
+def medir(n: int, con_qr: bool = False) -> float:
+    """Correos renderizados por segundo en un núcleo"""
+    renderer = EmailTemplateRenderer()
+    mensajes = [(m, locale) for m in MENSAJES.values() for locale in TEXTOS]
+
+    if con_qr:
+        from services.email_service import EmailService
+        servicio = EmailService()
+        generar = servicio._generar_template_html
+    else:
+        generar = None
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        mensaje, locale = mensajes[i % len(mensajes)]
+        if generar:
+            generar(mensaje)
+        else:
+            renderer.renderizar(mensaje, locale=locale, qr_base64=QR_FIJO)
+    return n / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de templates de correo")
+    parser.add_argument("--n", type=int, default=20000, help="Correos por proceso")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos en paralelo (uno por núcleo)")
+    parser.add_argument("--con-qr", action="store_true", help="Incluir la generación del QR en cada correo")
+    args = parser.parse_args()
+
+    print(f"📧 Renderizando {args.n} correos x {args.procesos} proceso(s){' con QR' if args.con_qr else ''}...")
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.procesos) as executor:
+        tasas = list(executor.map(medir, [args.n] * args.procesos, [args.con_qr] * args.procesos))
+    duracion = time.perf_counter() - inicio
+
+    renderer = EmailTemplateRenderer()
+    for mensaje in MENSAJES.values():
+        renderer.renderizar(mensaje, qr_base64=QR_FIJO)
+
+    print(f"   Por núcleo: {sum(tasas) / len(tasas):,.0f} correos/s")
+    print(f"   Total:      {args.n * args.procesos / duracion:,.0f} correos/s ({duracion:.2f}s)")
+    for nombre, metrica in renderer.obtener_estadisticas().items():
+        print(f"   {nombre}: {metrica['bytes_promedio']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark del logging del camino caliente a 5k peticiones/s
+
+Cada petición simulada emite lo que emite una compra: un evento INFO con
+campos y tres DEBUG (muestreados). Se compara:
+
+- print: los ``print()`` anteriores, escritos desde el event loop
+- sincrono: logging estándar con el handler JSON escribiendo en el loop
+- cola: ``configurar_logging()`` (QueueHandler + listener en otro hilo)
+
+Se mide el costo por petición (µs) dentro del loop y el retraso del
+event loop (lag) mientras se sostiene la carga. ``--escritura-lenta-us``
+simula un stdout que bloquea en cada escritura (pipe lleno, terminal,
+driver de logs del contenedor).
+
+Uso:
+    python scripts/benchmark_logging.py --rps 5000 --segundos 5 --destino /tmp/bench.log
+    python scripts/benchmark_logging.py --escritura-lenta-us 50 --nivel INFO
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config.settings import settings  # noqa: E402
+from infrastructure.utils import logs  # noqa: E402
+
+# Se crea con ``logs.obtener_logger`` después de ``preparar()`` para que
+# muestree los DEBUG como los loggers del proyecto
+logger: logging.Logger = None
+
+
+def peticion_print(i: int, destino: io.TextIOBase):
+    print(f"🔍 Búsqueda iniciada - Texto: 'matrix', Género: 'accion', Límite: 20", file=destino)
+    print(f"✅ Selecciones confirmadas para usuario u{i}, asientos: ['F7', 'F8']", file=destino)
+    print(f"✅ Asientos ['F7', 'F8'] marcados como ocupados en función f1", file=destino)
+    print(f"⏱️  Compra t{i} en 12.5ms: {{'reserva': 4.1, 'pago': 6.2, 'finalizar': 2.2}}", file=destino)
+
+
+def peticion_logging(i: int, destino: io.TextIOBase = None):
+    logger.debug("Búsqueda iniciada", extra={"texto": "matrix", "genero": "accion", "limite": 20})
+    logger.debug("Selecciones confirmadas", extra={"usuario_id": f"u{i}", "asientos": ["F7", "F8"]})
+    logger.debug("Asientos marcados como ocupados", extra={"funcion_id": "f1", "asientos": ["F7", "F8"]})
+    logger.info("Compra completada", extra={
+        "transaccion_id": f"t{i}",
+        "duracion_ms": 12.5,
+        "pasos_ms": {"reserva": 4.1, "pago": 6.2, "finalizar": 2.2}
+    })
+
+
+class DestinoLento(io.TextIOBase):
+    """Archivo cuyas escrituras bloquean ``espera`` segundos (sin buffer)"""
+
+    def __init__(self, archivo: io.TextIOBase, espera: float):
+        self.archivo = archivo
+        self.espera = espera
+
+    def write(self, texto: str) -> int:
+        time.sleep(self.espera)
+        return self.archivo.write(texto)
+
+    def flush(self):
+        self.archivo.flush()
+
+
+async def sostener_carga(rps: int, segundos: float, peticion, destino) -> dict:
+    """Emite ``rps`` peticiones/s en ráfagas de ~1ms y mide el lag del loop"""
+    lags = []
+    costos = []
+    activo = True
+
+    async def monitor():
+        while activo:
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - inicio - 0.01) * 1000)
+
+    tarea_monitor = asyncio.create_task(monitor())
+    inicio = time.perf_counter()
+    emitidas = 0
+    while (transcurrido := time.perf_counter() - inicio) < segundos:
+        objetivo = int(rps * transcurrido)
+        while emitidas < objetivo:
+            t0 = time.perf_counter()
+            peticion(emitidas, destino)
+            costos.append(time.perf_counter() - t0)
+            emitidas += 1
+        await asyncio.sleep(0.001)
+    activo = False
+    await tarea_monitor
+
+    lags.sort()
+    return {
+        "peticiones_s": emitidas / (time.perf_counter() - inicio),
+        "us_por_peticion": statistics.mean(costos) * 1e6,
+        "us_p99": sorted(costos)[int(len(costos) * 0.99)] * 1e6,
+        "cpu_loop_pct": sum(costos) / segundos * 100,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)],
+        "lag_max_ms": lags[-1]
+    }
+
+
+def preparar(modo: str, destino: io.TextIOBase, nivel: str):
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    settings.log_nivel = nivel
+
+    if modo == "sincrono":
+        handler = logging.StreamHandler(destino)
+        handler.setFormatter(logs.FormatoJSON())
+        raiz.addHandler(handler)
+        raiz.setLevel(nivel)
+    elif modo == "cola":
+        stdout, sys.stdout = sys.stdout, destino
+        try:
+            logs.configurar_logging()
+        finally:
+            sys.stdout = stdout
+
+
+def main():
+    global logger
+    parser = argparse.ArgumentParser(description="Benchmark de logging a carga sostenida")
+    parser.add_argument("--rps", type=int, default=5000, help="Peticiones por segundo")
+    parser.add_argument("--segundos", type=float, default=5.0, help="Duración de cada modo")
+    parser.add_argument("--destino", default=os.devnull, help="Archivo que recibe los logs (p. ej. un pipe o /tmp/x.log)")
+    parser.add_argument("--modos", default="print,sincrono,cola")
+    parser.add_argument("--nivel", default="DEBUG", help="LOG_NIVEL (DEBUG ejercita el muestreo)")
+    parser.add_argument("--muestreo-debug", type=float, default=settings.log_muestreo_debug)
+    parser.add_argument("--escritura-lenta-us", type=float, default=0, help="Bloqueo por escritura en el destino")
+    args = parser.parse_args()
+
+    settings.log_muestreo_debug = args.muestreo_debug
+    print(f"📝 Logging a {args.rps} peticiones/s durante {args.segundos}s por modo "
+          f"(nivel {args.nivel}, muestreo DEBUG {args.muestreo_debug}, escritura {args.escritura_lenta_us}µs)")
+    for modo in args.modos.split(","):
+        with open(args.destino, "w", encoding="utf-8") as archivo:
+            destino = DestinoLento(archivo, args.escritura_lenta_us / 1e6) if args.escritura_lenta_us else archivo
+            preparar(modo, destino, args.nivel)
+            logger = logs.obtener_logger("benchmark.compra")
+            peticion = peticion_print if modo == "print" else peticion_logging
+            resultado = asyncio.run(sostener_carga(args.rps, args.segundos, peticion, destino))
+            logs.detener_logging()
+            estadisticas = logs.estadisticas_logging() if modo == "cola" else {}
+
+        print(f"   {modo:9} {resultado['peticiones_s']:,.0f} pet/s | "
+              f"{resultado['us_por_peticion']:.1f} µs/pet (p99 {resultado['us_p99']:.1f}) | "
+              f"loop {resultado['cpu_loop_pct']:.1f}% | "
+              f"lag p99 {resultado['lag_p99_ms']:.2f}ms máx {resultado['lag_max_ms']:.2f}ms"
+              + (f" | descartados {estadisticas['descartados']}" if estadisticas else ""))
+
+
+if __name__ == "__main__":
+    main()
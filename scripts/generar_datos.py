@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Generación determinista de datos con carga masiva en MongoDB (y Redis)
+
+Misma semilla + perfil + fecha base = mismos documentos, así los
+benchmarks y las pruebas de carga trabajan sobre datos idénticos.
+
+Uso:
+    python scripts/generar_datos.py --perfil pequeno
+    python scripts/generar_datos.py --perfil grande --limpiar --bitmaps --concurrencia 8
+    python scripts/generar_datos.py --perfil grande --colecciones funciones transacciones --fecha-base 2025-01-06
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import motor.motor_asyncio  # noqa: E402
+
+from config.settings import settings  # noqa: E402
+from infrastructure.database.datos_sinteticos import (  # noqa: E402
+    GeneradorDatos, PERFILES, COLECCIONES, CONTRASENA, cargar_datos
+)
+
+
+def mostrar_progreso(coleccion: str, hechos: int, total: int):
+    porcentaje = hechos / total * 100 if total else 100
+    print(f"\r   {coleccion:<14}{hechos:>10,}/{total:,} ({porcentaje:5.1f}%)", end="", flush=True)
+    if hechos >= total:
+        print()
+
+
+async def ejecutar(args: argparse.Namespace):
+    generador = GeneradorDatos(args.perfil, args.semilla, args.fecha_base)
+    colecciones = args.colecciones or COLECCIONES
+
+    cliente = motor.motor_asyncio.AsyncIOMotorClient(args.mongodb_url or settings.mongodb_url)
+    database = cliente[args.database or settings.mongodb_database]
+    redis_service = None
+    try:
+        await cliente.admin.command("ping")
+        if args.limpiar:
+            for coleccion in colecciones:
+                await database[coleccion].drop()
+            print(f"🧹 Colecciones eliminadas: {', '.join(colecciones)}")
+
+        if args.bitmaps:
+            from infrastructure.cache.redis_service import RedisService
+            redis_service = RedisService()
+            await redis_service.connect()
+
+        print(f"🎬 Perfil {args.perfil} (semilla {args.semilla}, fecha base {generador.fecha_base:%Y-%m-%d}) "
+              f"en {database.name}: lotes de {args.lote}, {args.concurrencia} en vuelo")
+        inicio = time.perf_counter()
+        resultado = await cargar_datos(
+            database, generador,
+            redis_client=redis_service.redis_client if redis_service else None,
+            colecciones=colecciones,
+            lote=args.lote,
+            concurrencia=args.concurrencia,
+            progreso=mostrar_progreso
+        )
+    finally:
+        cliente.close()
+        if redis_service:
+            await redis_service.disconnect()
+
+    print(f"\n✅ Carga completada en {time.perf_counter() - inicio:.1f}s")
+    for nombre, datos in resultado.items():
+        if nombre == "bitmaps":
+            print(f"   bitmaps: {datos['funciones']:,} funciones programadas ({datos['segundos']}s)")
+        else:
+            print(f"   {nombre}: {datos['insertados']:,} docs ({datos['segundos']}s, {datos['docs_por_segundo']:,} docs/s)")
+    if "usuarios" in colecciones:
+        print(f"   Usuarios: usuario<N>@datos.cinemax.com / {CONTRASENA}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador determinista de datos del sistema de cine")
+    parser.add_argument("--perfil", choices=list(PERFILES), default="pequeno")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--fecha-base", type=datetime.fromisoformat,
+                        help="Fecha de referencia de funciones y transacciones (por defecto hoy)")
+    parser.add_argument("--colecciones", nargs="+", choices=COLECCIONES, help="Solo estas colecciones")
+    parser.add_argument("--lote", type=int, default=5000, help="Documentos por insert_many")
+    parser.add_argument("--concurrencia", type=int, default=4, help="insert_many simultáneos")
+    parser.add_argument("--limpiar", action="store_true", help="Eliminar las colecciones antes de cargar")
+    parser.add_argument("--bitmaps", action="store_true",
+                        help="Poblar en Redis los bitmaps sala:asientos:* de las funciones programadas")
+    parser.add_argument("--mongodb-url", help="Por defecto MONGODB_URL")
+    parser.add_argument("--database", help="Por defecto MONGODB_DATABASE")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(ejecutar(args))
+    except Exception as e:
+        print(f"\n❌ Error en la carga: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -267,6 +267,8 @@ print("✅ Total de funciones generadas: " + CONFIG.FUNCIONES_TOTAL);
 print("💳 Generando " + CONFIG.TRANSACCIONES_TOTAL + " transacciones...");
 
 const transacciones = [];
+const generosPorPelicula = {};
+peliculas.forEach(p => { generosPorPelicula[p._id] = p.generos; });
 const metodosPago = ["tarjeta", "efectivo", "transferencia", "paypal", "criptomonedas"];
 
 for (let i = 0; i < CONFIG.TRANSACCIONES_TOTAL; i++) {
@@ -296,6 +298,11 @@ for (let i = 0; i < CONFIG.TRANSACCIONES_TOTAL; i++) {
         numero_factura: `CIN-${String(i + 1).padStart(8, '0')}`,
         fecha_creacion: generateRandomDate(new Date(2023, 0, 1), new Date()),
         fecha_actualizacion: new Date(),
+        // Snapshot desnormalizado para analítica sin $lookup
+        generos: generosPorPelicula[funcion.pelicula_id] || [],
+        funcion_inicio: funcion.fecha_hora_inicio,
+        funcion_hora: funcion.fecha_hora_inicio.getUTCHours(),
+        funcion_dia_semana: funcion.fecha_hora_inicio.getUTCDay() + 1,
         qr_code: `data:image/png;base64,QR_${i + 1}`,
         detalles_pago: {
             subtotal: funcion.precio_base * numAsientos,
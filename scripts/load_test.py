@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Pruebas de carga por escenarios (asyncio)
+
+Escenarios (se ejecutan en paralelo durante ``--duracion`` segundos):
+    recorrido   catálogo -> funciones -> mapa de asientos -> selección por WebSocket -> compra
+    estreno     miles de selecciones simultáneas por WebSocket sobre una misma función
+    busqueda    tormenta de búsquedas de películas (texto y género)
+    dashboard   pollers del dashboard de analítica
+
+Reporta por operación: throughput, latencia p50/p95/p99 y tasa de error.
+``escenario=N`` fija los usuarios virtuales de ese escenario (por defecto ``--usuarios``).
+
+Uso:
+    # Contra la API levantada con docker compose (Mongo/Redis en contenedores)
+    python scripts/load_test.py recorrido=50 busqueda=200 dashboard=5 --duracion 60
+
+    # API en este proceso con Redis/Mongo en memoria (fakeredis + mongomock-motor)
+    # y los datos de scripts/generar_datos.py
+    python scripts/load_test.py estreno=2000 --en-proceso --backends memoria --perfil-datos pequeno
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import time
+import uuid
+from collections import defaultdict, Counter as Contador
+from typing import Optional, Dict, Any, List
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+FILAS = "ABCDEFGH"
+ASIENTOS_POR_FILA = 15
+TODOS_LOS_ASIENTOS = [f"{fila}{numero}" for fila in FILAS for numero in range(1, ASIENTOS_POR_FILA + 1)]
+GENEROS = ["accion", "aventura", "comedia", "drama", "terror", "ciencia_ficcion", "romance", "thriller", "animacion", "documental"]
+TEXTOS_SIN_RESULTADO = ["zzzz", "pelicula inexistente", "qwerty"]
+PASSWORD = "CargaCinemax2024!"
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Estadisticas:
+    """Latencias y errores por operación"""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, Contador] = defaultdict(Contador)
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+
+    def registrar(self, operacion: str, segundos: float, error: Optional[str] = None):
+        self.latencias[operacion].append(segundos)
+        if error:
+            self.errores[operacion][error] += 1
+
+    def cerrar(self):
+        self.fin = time.perf_counter()
+
+    def resumen(self) -> List[Dict[str, Any]]:
+        duracion = (self.fin or time.perf_counter()) - self.inicio
+        filas = []
+        for operacion, latencias in sorted(self.latencias.items()):
+            ordenadas = sorted(latencias)
+            errores = sum(self.errores[operacion].values())
+            filas.append({
+                "operacion": operacion,
+                "total": len(ordenadas),
+                "rps": round(len(ordenadas) / duracion, 2) if duracion else 0,
+                "errores": errores,
+                "error_pct": round(errores / len(ordenadas) * 100, 2),
+                "p50_ms": round(percentil(ordenadas, 0.50) * 1000, 1),
+                "p95_ms": round(percentil(ordenadas, 0.95) * 1000, 1),
+                "p99_ms": round(percentil(ordenadas, 0.99) * 1000, 1),
+                "max_ms": round(ordenadas[-1] * 1000, 1),
+                "detalle_errores": dict(self.errores[operacion].most_common(5))
+            })
+        return filas
+
+    def imprimir(self, titulo: str):
+        filas = self.resumen()
+        duracion = (self.fin or time.perf_counter()) - self.inicio
+        print(f"\n📊 {titulo} ({duracion:.1f}s)")
+        if not filas:
+            print("   (sin operaciones)")
+            return
+        print(f"   {'operación':<22}{'total':>8}{'req/s':>9}{'error %':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for f in filas:
+            print(f"   {f['operacion']:<22}{f['total']:>8}{f['rps']:>9}{f['error_pct']:>9}"
+                  f"{f['p50_ms']:>9}{f['p95_ms']:>9}{f['p99_ms']:>9}{f['max_ms']:>9}")
+        for f in filas:
+            for error, conteo in f["detalle_errores"].items():
+                print(f"   ⚠️  {f['operacion']}: {error} x{conteo}")
+
+
+class GeneradorCarga:
+    """Usuarios virtuales de cada escenario contra una instancia de la API"""
+
+    def __init__(self, url: str, args: argparse.Namespace):
+        self.url = url.rstrip("/")
+        self.url_ws = "ws" + self.url[4:] if self.url.startswith("http") else self.url
+        self.args = args
+        self.ejecucion = uuid.uuid4().hex[:8]
+        self.estadisticas = Estadisticas()
+        self.preparacion = Estadisticas()
+        self.cliente: Optional[httpx.AsyncClient] = None
+        self.peliculas: List[Dict[str, Any]] = []
+        self.funciones: List[str] = []
+        self.espectadores_listos = 0
+        self.fin = 0.0
+
+    def activo(self) -> bool:
+        return time.perf_counter() < self.fin
+
+    async def http(self, operacion: str, metodo: str, ruta: str, esperado=(200,), token: str = None,
+                   estadisticas: Estadisticas = None, **kwargs) -> Optional[httpx.Response]:
+        """Petición medida; devuelve la respuesta si el código es el esperado"""
+        estadisticas = estadisticas or self.estadisticas
+        if token:
+            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {token}"
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.cliente.request(metodo, ruta, **kwargs)
+        except httpx.HTTPError as e:
+            estadisticas.registrar(operacion, time.perf_counter() - inicio, type(e).__name__)
+            return None
+        error = None if respuesta.status_code in esperado else f"HTTP {respuesta.status_code}"
+        estadisticas.registrar(operacion, time.perf_counter() - inicio, error)
+        return None if error else respuesta
+
+    # Preparación
+
+    async def descubrir(self):
+        """Películas y funciones existentes para repartir la carga"""
+        respuesta = await self.http("catalogo", "GET", "/api/v1/peliculas/", params={"limite": 50},
+                                    estadisticas=self.preparacion)
+        self.peliculas = respuesta.json().get("peliculas", []) if respuesta else []
+        for pelicula in self.peliculas[:10]:
+            respuesta = await self.http("funciones_pelicula", "GET", f"/api/v1/peliculas/{pelicula['_id']}/funciones",
+                                        estadisticas=self.preparacion)
+            if respuesta:
+                self.funciones.extend(f["_id"] for f in respuesta.json().get("funciones", []))
+
+    async def registrar_usuarios(self, n: int, prefijo: str) -> List[str]:
+        """Registra ``n`` usuarios por la API y devuelve sus tokens"""
+        limite = asyncio.Semaphore(self.args.concurrencia_registro)
+
+        async def registrar(i: int) -> Optional[str]:
+            async with limite:
+                respuesta = await self.http("registro", "POST", "/api/v1/usuarios/registro", estadisticas=self.preparacion, json={
+                    "email": f"{prefijo}.{self.ejecucion}.{i}@carga.cinemax.com",
+                    "nombre": "Carga",
+                    "apellido": f"Usuario {i}",
+                    "password": PASSWORD
+                })
+            return respuesta.json()["token"]["access_token"] if respuesta else None
+
+        tokens = await asyncio.gather(*(registrar(i) for i in range(n)))
+        return [t for t in tokens if t]
+
+    def firmar_tokens(self, n: int, prefijo: str) -> List[str]:
+        """Tokens firmados localmente (misma JWT_SECRET_KEY que la API); sin usuario en la base"""
+        from services.auth_service import auth_service
+        return [auth_service.create_access_token({
+            "sub": f"{prefijo}-{self.ejecucion}-{i}",
+            "email": f"{prefijo}.{self.ejecucion}.{i}@carga.cinemax.com"
+        }) for i in range(n)]
+
+    # WebSocket
+
+    async def conectar_ws(self, funcion_id: str, token: str, operacion: str = "ws_conexion",
+                          estadisticas: Estadisticas = None):
+        """Abre la sala de la función y espera ``connection_established``"""
+        estadisticas = estadisticas or self.estadisticas
+        inicio = time.perf_counter()
+        try:
+            ws = await websockets.connect(f"{self.url_ws}/ws/funciones/{funcion_id}/asientos?token={token}",
+                                          open_timeout=self.args.timeout, max_queue=None)
+            await self.esperar_mensaje(ws, "connection_established")
+        except Exception as e:
+            estadisticas.registrar(operacion, time.perf_counter() - inicio, type(e).__name__)
+            return None
+        estadisticas.registrar(operacion, time.perf_counter() - inicio)
+        return ws
+
+    async def esperar_mensaje(self, ws, tipo: str) -> Dict[str, Any]:
+        """Descarta los broadcast de otros usuarios hasta recibir ``tipo`` o un error"""
+        async with asyncio.timeout(self.args.timeout):
+            while True:
+                mensaje = json.loads(await ws.recv())
+                if mensaje.get("type") == tipo:
+                    return mensaje
+                if mensaje.get("type") == "error":
+                    raise RuntimeError(mensaje.get("message", "error"))
+
+    async def seleccionar(self, ws, operacion: str, asientos: List[str], accion: str = "select") -> bool:
+        inicio = time.perf_counter()
+        try:
+            await ws.send(json.dumps({"action": accion, "asientos": asientos}))
+            await self.esperar_mensaje(ws, "selection_confirmed")
+        except Exception as e:
+            self.estadisticas.registrar(operacion, time.perf_counter() - inicio, type(e).__name__)
+            return False
+        self.estadisticas.registrar(operacion, time.perf_counter() - inicio)
+        return True
+
+    # Escenarios
+
+    async def recorrido(self, token: str):
+        """Catálogo -> funciones -> mapa de asientos -> selección -> compra"""
+        while self.activo():
+            respuesta = await self.http("catalogo", "GET", "/api/v1/peliculas/",
+                                        params={"limite": 20, "offset": random.randint(0, 2) * 20})
+            peliculas = (respuesta.json().get("peliculas") if respuesta else None) or self.peliculas
+            if not peliculas:
+                await asyncio.sleep(self.args.pausa)
+                continue
+            pelicula = random.choice(peliculas)
+
+            respuesta = await self.http("funciones_pelicula", "GET", f"/api/v1/peliculas/{pelicula['_id']}/funciones")
+            funciones = respuesta.json().get("funciones", []) if respuesta else []
+            if not funciones:
+                await asyncio.sleep(self.args.pausa)
+                continue
+            funcion_id = random.choice(funciones)["_id"]
+
+            respuesta = await self.http("mapa_asientos", "GET", f"/api/v1/funciones/{funcion_id}/asientos")
+            if not respuesta:
+                continue
+            libres = [a["codigo"] for fila in respuesta.json()["mapa_asientos"].values() for a in fila if a["disponible"]]
+            if not libres:
+                continue
+            asientos = random.sample(libres, min(self.args.asientos, len(libres)))
+
+            ws = await self.conectar_ws(funcion_id, token)
+            if ws is None:
+                continue
+            try:
+                if await self.seleccionar(ws, "ws_seleccion", asientos):
+                    await self.http("compra", "POST", "/api/v1/transacciones/comprar-entrada", token=token,
+                                    headers={"Idempotency-Key": str(uuid.uuid4())},
+                                    json={
+                                        "funcion_id": funcion_id,
+                                        "asientos": asientos,
+                                        "metodo_pago": "tarjeta_credito",
+                                        "datos_pago": {"ultimos_4_digitos": "4242", "canal_venta": "carga"}
+                                    })
+            finally:
+                await ws.close()
+            await asyncio.sleep(self.args.pausa)
+
+    async def estreno(self, token: str, funcion_id: str, salida: asyncio.Event):
+        """Conecta, espera la salida común y selecciona/libera asientos sin pausa"""
+        ws = await self.conectar_ws(funcion_id, token, "ws_conexion_estreno", self.preparacion)
+        self.espectadores_listos += 1
+        if ws is None:
+            return
+        try:
+            await salida.wait()
+            while self.activo():
+                asiento = [random.choice(TODOS_LOS_ASIENTOS)]
+                if await self.seleccionar(ws, "ws_seleccion_estreno", asiento):
+                    await self.seleccionar(ws, "ws_liberacion_estreno", asiento, accion="deselect")
+        finally:
+            await ws.close()
+
+    async def busqueda(self):
+        """Búsquedas por palabras de títulos reales, por género y sin resultado"""
+        palabras = [p for pelicula in self.peliculas for p in pelicula.get("titulo", "").split() if len(p) > 3]
+        while self.activo():
+            consulta = random.random()
+            if consulta < 0.6 and palabras:
+                cuerpo = {"texto": random.choice(palabras), "limite": 20}
+            elif consulta < 0.9:
+                cuerpo = {"genero": random.choice(GENEROS), "limite": 20}
+            else:
+                cuerpo = {"texto": random.choice(TEXTOS_SIN_RESULTADO), "limite": 20}
+            await self.http("busqueda", "POST", "/api/v1/peliculas/buscar", json=cuerpo)
+
+    async def dashboard(self):
+        """Poller del dashboard de analítica"""
+        while self.activo():
+            await self.http("dashboard", "GET", "/api/v1/metricas/dashboard/resumen")
+            await asyncio.sleep(self.args.intervalo_dashboard)
+
+    async def ejecutar(self, escenarios: Dict[str, int]) -> Estadisticas:
+        limites = httpx.Limits(max_connections=self.args.max_conexiones, max_keepalive_connections=self.args.max_conexiones)
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.args.timeout, limits=limites) as cliente:
+            self.cliente = cliente
+            await self.descubrir()
+            if not self.funciones and ("recorrido" in escenarios or ("estreno" in escenarios and not self.args.funcion)):
+                raise RuntimeError("No hay funciones en la base; cargue datos o use --backends memoria")
+
+            # Los espectadores del estreno se conectan antes de que empiece el reloj
+            salida = asyncio.Event()
+            tareas = []
+            if "estreno" in escenarios:
+                n = escenarios["estreno"]
+                tokens = self.firmar_tokens(n, "estreno") if self.args.tokens == "locales" \
+                    else await self.registrar_usuarios(n, "estreno")
+                funcion_id = self.args.funcion or self.funciones[0]
+                print(f"🎬 Estreno: conectando {len(tokens)} espectadores a la función {funcion_id}...")
+                tareas += [asyncio.create_task(self.estreno(token, funcion_id, salida)) for token in tokens]
+                while self.espectadores_listos < len(tokens):
+                    await asyncio.sleep(0.05)
+
+            corrutinas = []
+            if "recorrido" in escenarios:
+                tokens = await self.registrar_usuarios(escenarios["recorrido"], "recorrido")
+                corrutinas += [self.recorrido(token) for token in tokens]
+            corrutinas += [self.busqueda() for _ in range(escenarios.get("busqueda", 0))]
+            corrutinas += [self.dashboard() for _ in range(escenarios.get("dashboard", 0))]
+            self.preparacion.cerrar()
+
+            self.estadisticas = Estadisticas()
+            self.fin = time.perf_counter() + self.args.duracion
+            salida.set()
+            tareas += [asyncio.create_task(c) for c in corrutinas]
+            await asyncio.gather(*tareas)
+            self.estadisticas.cerrar()
+        return self.estadisticas
+
+
+# API en este proceso
+
+def usar_backends_en_memoria():
+    """Sustituye Redis y Mongo por fakeredis y mongomock-motor antes de arrancar la API"""
+    try:
+        import fakeredis.aioredis
+        import mongomock_motor
+    except ImportError:
+        print("❌ --backends memoria requiere: pip install fakeredis mongomock-motor")
+        sys.exit(1)
+    import redis.asyncio
+    import motor.motor_asyncio
+
+    servidor = fakeredis.FakeServer()
+    redis.asyncio.Redis = lambda *args, **kwargs: fakeredis.aioredis.FakeRedis(
+        server=servidor, decode_responses=kwargs.get("decode_responses", False))
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient()
+
+
+async def sembrar_datos(perfil: str, semilla: int):
+    """Carga en la base en memoria (vacía al arrancar) los mismos datos que scripts/generar_datos.py"""
+    from infrastructure.database.datos_sinteticos import GeneradorDatos, cargar_datos
+    from services.global_services import get_mongodb_service, get_redis_service
+
+    redis_service = get_redis_service()
+    inicio = time.perf_counter()
+    await cargar_datos(
+        get_mongodb_service().database,
+        GeneradorDatos(perfil, semilla),
+        redis_client=redis_service.redis_client if redis_service else None
+    )
+    print(f"🎬 Datos {perfil} (semilla {semilla}) cargados en {time.perf_counter() - inicio:.1f}s")
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def ejecutar_en_proceso(args: argparse.Namespace, escenarios: Dict[str, int]) -> GeneradorCarga:
+    """
+    Arranca la API con uvicorn en este mismo loop
+
+    Las latencias incluyen el costo del generador (mismo proceso y GIL):
+    sirve para comparar cambios, no para dimensionar producción.
+    """
+    import uvicorn
+    from main import app
+
+    puerto = puerto_libre()
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning",
+                                             ws_max_queue=1024))
+    tarea = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        if tarea.done():
+            tarea.result()
+        await asyncio.sleep(0.05)
+
+    try:
+        if args.backends == "memoria":
+            await sembrar_datos(args.perfil_datos, 42 if args.semilla is None else args.semilla)
+        generador = GeneradorCarga(f"http://127.0.0.1:{puerto}", args)
+        await generador.ejecutar(escenarios)
+        return generador
+    finally:
+        servidor.should_exit = True
+        await tarea
+
+
+def interpretar_escenarios(valores: List[str], usuarios: int) -> Dict[str, int]:
+    escenarios = {}
+    for valor in valores:
+        nombre, _, n = valor.partition("=")
+        if nombre not in ("recorrido", "estreno", "busqueda", "dashboard"):
+            raise argparse.ArgumentTypeError(f"Escenario desconocido: {nombre}")
+        escenarios[nombre] = int(n) if n else usuarios
+    return escenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga por escenarios")
+    parser.add_argument("escenarios", nargs="*", default=["recorrido", "busqueda", "dashboard"],
+                        help="recorrido, estreno, busqueda, dashboard (opcional =usuarios)")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base de la API")
+    parser.add_argument("--usuarios", type=int, default=20, help="Usuarios virtuales por escenario")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--pausa", type=float, default=0.5, help="Pausa entre recorridos de un usuario (s)")
+    parser.add_argument("--asientos", type=int, default=2, help="Asientos por compra en el recorrido")
+    parser.add_argument("--funcion", help="Función del estreno (por defecto la primera encontrada)")
+    parser.add_argument("--intervalo-dashboard", type=float, default=5, help="Segundos entre consultas del dashboard")
+    parser.add_argument("--tokens", choices=["registro", "locales"],
+                        help="Tokens del estreno: registrando usuarios o firmados con la JWT_SECRET_KEY local")
+    parser.add_argument("--concurrencia-registro", type=int, default=20, help="Registros simultáneos")
+    parser.add_argument("--max-conexiones", type=int, default=500, help="Conexiones HTTP del pool del cliente")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout por operación (s)")
+    parser.add_argument("--en-proceso", action="store_true", help="Levantar la API en este proceso")
+    parser.add_argument("--backends", choices=["reales", "memoria"], default="reales",
+                        help="Con --en-proceso: Mongo/Redis configurados o en memoria")
+    parser.add_argument("--perfil-datos", default="pequeno", help="Perfil de datos a cargar con --backends memoria")
+    parser.add_argument("--json", help="Guardar el resumen en este archivo")
+    parser.add_argument("--max-error-pct", type=float, help="Salir con código 1 si alguna operación lo supera")
+    parser.add_argument("--semilla", type=int, help="Semilla de la secuencia de operaciones (y de los datos en memoria)")
+    args = parser.parse_args()
+
+    escenarios = interpretar_escenarios(args.escenarios, args.usuarios)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args.tokens = args.tokens or ("locales" if args.en_proceso else "registro")
+    if args.semilla is not None:
+        random.seed(args.semilla)
+    if args.backends == "memoria":
+        if not args.en_proceso:
+            parser.error("--backends memoria requiere --en-proceso")
+        usar_backends_en_memoria()
+
+    destino = "API en proceso" if args.en_proceso else args.url
+    print(f"🔥 Carga contra {destino}: {', '.join(f'{e}={n}' for e, n in escenarios.items())} durante {args.duracion:.0f}s")
+    try:
+        if args.en_proceso:
+            generador = asyncio.run(ejecutar_en_proceso(args, escenarios))
+        else:
+            generador = GeneradorCarga(args.url, args)
+            asyncio.run(generador.ejecutar(escenarios))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    generador.preparacion.imprimir("Preparación")
+    generador.estadisticas.imprimir("Carga")
+
+    resumen = generador.estadisticas.resumen()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump({"escenarios": escenarios, "duracion": args.duracion, "operaciones": resumen}, archivo, indent=2)
+        print(f"\n💾 Resumen guardado en {args.json}")
+
+    if args.max_error_pct is not None:
+        excedidas = [f["operacion"] for f in resumen if f["error_pct"] > args.max_error_pct]
+        if excedidas:
+            print(f"❌ Tasa de error por encima de {args.max_error_pct}% en: {', '.join(excedidas)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/bin/bash
+
+# Micro-benchmarks de rutas calientes con línea base y gating de regresiones
+#
+# Uso:
+#   ./scripts/run_benchmarks.sh guardar            # guarda la línea base (.benchmarks/)
+#   ./scripts/run_benchmarks.sh comparar           # falla si alguna mediana empeora > UMBRAL%
+#   UMBRAL=10 ./scripts/run_benchmarks.sh comparar
+#
+# La línea base depende de la máquina: guárdala y compárala en el mismo host
+# (p. ej. antes y después de un cambio, o en el mismo runner de CI). En hosts
+# compartidos o de una sola vCPU el ruido supera el 15%: sube UMBRAL.
+
+set -e
+
+cd "$(dirname "$0")/.."
+
+MODO="${1:-comparar}"
+UMBRAL="${UMBRAL:-15}"
+NOMBRE_BASE="${NOMBRE_BASE:-base}"
+OPCIONES="tests/benchmarks --benchmark-only --benchmark-warmup=on --benchmark-disable-gc --benchmark-sort=name --benchmark-columns=min,median,iqr,ops,rounds"
+
+case "$MODO" in
+    guardar)
+        echo "📏 Guardando línea base '$NOMBRE_BASE'..."
+        python -m pytest $OPCIONES --benchmark-save="$NOMBRE_BASE"
+        ;;
+    comparar)
+        if ! ls .benchmarks/*/*_"$NOMBRE_BASE".json > /dev/null 2>&1; then
+            echo "❌ No hay línea base '$NOMBRE_BASE'. Ejecuta primero: $0 guardar"
+            exit 1
+        fi
+        BASE=$(ls -t .benchmarks/*/*_"$NOMBRE_BASE".json | head -1 | xargs basename | cut -d_ -f1)
+        echo "🔍 Comparando con la línea base $BASE (umbral ${UMBRAL}% en la mediana)..."
+        if python -m pytest $OPCIONES --benchmark-compare="$BASE" --benchmark-compare-fail="median:${UMBRAL}%"; then
+            echo "✅ Sin regresiones por encima del ${UMBRAL}%"
+        else
+            echo "❌ Regresión de rendimiento (o test fallido) respecto a la línea base"
+            exit 1
+        fi
+        ;;
+    *)
+        echo "Uso: $0 [guardar|comparar]"
+        exit 1
+        ;;
+esac
@@ -2,6 +2,8 @@
 
 # Script de pruebas de estrés para el Sistema de Cine
 # Evalúa el comportamiento del sistema bajo condiciones extremas
+# Para carga por escenarios (recorrido de compra, estreno, búsquedas, dashboard)
+# con p50/p95/p99 y tasa de error por operación: python scripts/load_test.py --help
 
 echo "🔥 Iniciando pruebas de estrés del Sistema de Cine..."
 echo "================================================================"
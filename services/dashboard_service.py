@@ -0,0 +1,120 @@
+"""
+Servicio de resumen del dashboard con cache y refresco en segundo plano
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from config.settings import settings
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+class DashboardService:
+    """
+    Calcula el resumen del dashboard y lo mantiene en cache
+
+    - Los contadores se calculan concurrentemente (asyncio.gather).
+    - La ocupación promedio se deriva de los bitmaps de cada función en Redis.
+    - Cache con TTL corto y stale-while-revalidate: dentro del TTL se
+      responde desde cache; dentro de la ventana stale se responde el valor
+      anterior y se dispara un único refresco en segundo plano.
+    - Un solo refrescador periódico compartido por todos los clientes.
+    """
+
+    def __init__(self, mongodb_service, redis_service=None):
+        self.mongodb_service = mongodb_service
+        self.redis_service = redis_service
+        self.ttl = settings.dashboard_cache_ttl
+        self.stale_ttl = settings.dashboard_stale_ttl
+
+        self._resumen: Optional[Dict[str, Any]] = None
+        self._calculado_en: float = 0.0
+        self._refresco: Optional[asyncio.Task] = None
+        self._refrescador: Optional[asyncio.Task] = None
+
+    async def iniciar(self):
+        """Calcula el primer resumen y lanza el refrescador periódico"""
+        await self._refrescar()
+        self._refrescador = asyncio.create_task(self._refrescar_periodicamente())
+
+    async def detener(self):
+        """Detiene el refrescador periódico"""
+        for tarea in (self._refrescador, self._refresco):
+            if tarea and not tarea.done():
+                tarea.cancel()
+                try:
+                    await tarea
+                except asyncio.CancelledError:
+                    pass
+        self._refrescador = None
+        self._refresco = None
+
+    async def obtener_resumen(self) -> Dict[str, Any]:
+        """Obtiene el resumen aplicando stale-while-revalidate"""
+        edad = time.monotonic() - self._calculado_en
+
+        if self._resumen is not None and edad < self.ttl:
+            return self._resumen
+
+        if self._resumen is not None and edad < self.ttl + self.stale_ttl:
+            self._disparar_refresco()
+            return self._resumen
+
+        # Sin valor utilizable: esperar el refresco (compartido entre requests)
+        return await asyncio.shield(self._disparar_refresco())
+
+    def _disparar_refresco(self) -> asyncio.Task:
+        """Lanza un refresco si no hay uno en curso y devuelve la tarea"""
+        if self._refresco is None or self._refresco.done():
+            self._refresco = asyncio.create_task(self._refrescar())
+        return self._refresco
+
+    async def _refrescar_periodicamente(self):
+        """Refrescador compartido por todos los clientes del dashboard"""
+        while True:
+            await asyncio.sleep(settings.dashboard_refresh_interval)
+            try:
+                await self._disparar_refresco()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Error refrescando resumen del dashboard", extra={"error": str(e)})
+
+    async def _refrescar(self) -> Dict[str, Any]:
+        """Recalcula el resumen y actualiza la cache"""
+        self._resumen = await self.calcular_resumen()
+        self._calculado_en = time.monotonic()
+        return self._resumen
+
+    async def calcular_resumen(self) -> Dict[str, Any]:
+        """Calcula el resumen con todas las consultas en paralelo"""
+        total_peliculas, total_funciones_hoy, total_transacciones_hoy, ocupacion_promedio = await asyncio.gather(
+            self.mongodb_service.contar_peliculas_activas(),
+            self.mongodb_service.contar_funciones_hoy(),
+            self.mongodb_service.contar_transacciones_hoy(),
+            self._ocupacion_promedio()
+        )
+
+        return {
+            "resumen": {
+                "peliculas_activas": total_peliculas,
+                "funciones_hoy": total_funciones_hoy,
+                "transacciones_hoy": total_transacciones_hoy,
+                "ocupacion_promedio": ocupacion_promedio
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def _ocupacion_promedio(self) -> float:
+        """Ocupación promedio desde los bitmaps de Redis (0.0 si no hay Redis)"""
+        if not self.redis_service:
+            return 0.0
+        try:
+            return await self.redis_service.get_ocupacion_promedio()
+        except Exception as e:
+            logger.warning("Error obteniendo ocupación promedio desde Redis", extra={"error": str(e)})
+            return 0.0
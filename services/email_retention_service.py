@@ -0,0 +1,196 @@
+"""
+Retención de las estructuras de correo en Redis
+
+``email:notifications`` y ``email:queue`` crecían sin límite. El stream
+vivo no usa MAXLEN al escribir (recortaría correos aún sin entregar ni
+confirmar); este servicio es el único que lo recorta y periódicamente:
+
+- Archiva en MongoDB (en lote) los metadatos de correos entregados.
+- Compacta el stream con XTRIM MINID, eliminando solo entradas ya
+  confirmadas por todos los grupos y más antiguas que la retención.
+- Quita de ``email:queue`` los IDs cuya entrada ya no está en el stream.
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+
+from config.settings import settings
+from services.email_service import email_service as email_service_global
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+def clave_id(stream_id: str) -> Tuple[int, int]:
+    """Convierte un ID de stream ``ms-seq`` en tupla comparable"""
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def siguiente_id(stream_id: str) -> str:
+    """ID inmediatamente posterior (para recortar incluyendo ``stream_id``)"""
+    ms, seq = clave_id(stream_id)
+    return f"{ms}-{seq + 1}"
+
+
+class EmailRetentionService:
+    """
+    Compactación y archivo periódicos de los correos
+    """
+
+    def __init__(self, redis_service, mongodb_service, email_service=None):
+        self.redis_service = redis_service
+        self.email_service = email_service or email_service_global
+        self.collection = mongodb_service.database.correos_enviados
+        self._tarea: Optional[asyncio.Task] = None
+        self._activo = False
+
+        self.archivados = 0
+        self.recortados = 0
+        self.cola_limpiados = 0
+        self.ultimo_ciclo: Optional[Dict[str, Any]] = None
+
+    async def iniciar(self):
+        """Crea índices del archivo y lanza el ciclo periódico"""
+        await self.collection.create_indexes([
+            IndexModel([("transaccion_id", 1)]),
+            IndexModel([("para", 1), ("entregado", -1)])
+        ])
+        self._activo = True
+        self._tarea = asyncio.create_task(self._ejecutar())
+
+    async def detener(self):
+        """Detiene el ciclo periódico"""
+        self._activo = False
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _ejecutar(self):
+        while self._activo:
+            try:
+                await self.ejecutar_ciclo()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error en retención de correos", extra={"error": str(e)})
+            await asyncio.sleep(settings.email_compactacion_intervalo)
+
+    async def ejecutar_ciclo(self) -> Dict[str, Any]:
+        """Archiva, compacta el stream y limpia la cola de prioridad"""
+        inicio = time.perf_counter()
+        archivados = await self.archivar()
+        recortados = await self.compactar_stream()
+        limpiados = await self.limpiar_cola()
+
+        self.archivados += archivados
+        self.recortados += recortados
+        self.cola_limpiados += limpiados
+        self.ultimo_ciclo = {
+            "archivados": archivados,
+            "recortados": recortados,
+            "cola_limpiados": limpiados,
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "fecha": datetime.now().isoformat()
+        }
+        return self.ultimo_ciclo
+
+    async def archivar(self) -> int:
+        """Mueve a MongoDB los metadatos de correos entregados, en lotes"""
+        clave = self.email_service.email_entregados
+        lote = settings.email_archivo_lote
+        total = 0
+
+        while True:
+            items = await self.redis_service.lrange(clave, 0, lote - 1)
+            if not items:
+                break
+
+            documentos = []
+            for item in items:
+                metadatos = json.loads(item)
+                metadatos["_id"] = metadatos.pop("mensaje_id")
+                metadatos["entregado"] = datetime.fromisoformat(metadatos["entregado"])
+                documentos.append(metadatos)
+
+            try:
+                await self.collection.insert_many(documentos, ordered=False)
+            except BulkWriteError as e:
+                # Reintentos de un ciclo interrumpido: ignorar duplicados
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+
+            await self.redis_service.ltrim(clave, len(items), -1)
+            total += len(items)
+            if len(items) < lote:
+                break
+
+        return total
+
+    async def _id_minimo_seguro(self) -> Optional[str]:
+        """
+        Primer ID que debe conservarse
+
+        Es el menor entre el corte por retención y, por cada grupo, el
+        mensaje pendiente más antiguo (o el siguiente al último entregado).
+        Sin grupos no se sabe qué se entregó y no se compacta.
+        """
+        stream = self.email_service.email_stream
+        grupos = await self.redis_service.xinfo_groups(stream)
+        if not grupos:
+            return None
+
+        corte = f"{int((time.time() - settings.email_retencion_segundos) * 1000)}-0"
+        for grupo in grupos:
+            if grupo.get("pending"):
+                resumen = await self.redis_service.xpending(stream, grupo["name"])
+                candidato = resumen["min"]
+            else:
+                candidato = siguiente_id(grupo["last-delivered-id"])
+            corte = min(corte, candidato, key=clave_id)
+        return corte
+
+    async def compactar_stream(self) -> int:
+        """Elimina entradas confirmadas y vencidas con XTRIM MINID ~"""
+        minid = await self._id_minimo_seguro()
+        if minid is None:
+            return 0
+        return await self.redis_service.xtrim(self.email_service.email_stream, minid=minid, approximate=True)
+
+    async def limpiar_cola(self, lote: int = 500) -> int:
+        """Quita de la cola de prioridad los IDs anteriores a la primera entrada del stream"""
+        primera = await self.redis_service.xrange(self.email_service.email_stream, count=1)
+        primer_id = clave_id(primera[0][0]) if primera else None
+        total = 0
+
+        while True:
+            # El score es el momento de encolado, así que el orden sigue al de los IDs
+            miembros = await self.redis_service.zrangebyscore(
+                self.email_service.email_queue, "-inf", "+inf", start=0, num=lote
+            )
+            viejos = [m for m in miembros if primer_id is None or clave_id(m) < primer_id]
+            if viejos:
+                total += await self.redis_service.zrem(self.email_service.email_queue, *viejos)
+            if len(viejos) < lote:
+                break
+
+        return total
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas acumuladas de la retención"""
+        return {
+            "archivados": self.archivados,
+            "recortados": self.recortados,
+            "cola_limpiados": self.cola_limpiados,
+            "ultimo_ciclo": self.ultimo_ciclo
+        }
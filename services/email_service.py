@@ -5,10 +5,19 @@ Servicio de correo electrónico usando Redis
 import asyncio
 import json
 from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any, Optional
 from infrastructure.cache.redis_service import RedisService
+from infrastructure.mail.smtp_pool import SMTPPool
 from config.settings import settings
-from services.global_services import get_algorithms_service
+from services.global_services import get_redis_service
+from services.email_templates import email_templates
+from services.qr_service import qr_service
+from infrastructure.utils.qr_generator import QR_PLACEHOLDER
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
 
 
 class EmailService:
@@ -18,6 +27,8 @@ class EmailService:
         self.redis_service = RedisService()
         self.email_stream = "email:notifications"
         self.email_queue = "email:queue"
+        self.email_entregados = "email:entregados"
+        self.smtp_pool: Optional[SMTPPool] = None
     
     async def connect(self):
         """Conectar al servicio de Redis"""
@@ -29,6 +40,45 @@ class EmailService:
             # Crear un cliente de Redis básico si falla
             self.redis_service.redis_client = None
     
+    def construir_correo_confirmacion(self, email: str, transaccion_data: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Construye el mensaje de confirmación de compra listo para el stream
+        
+        Args:
+            email: Email del usuario
+            transaccion_data: Datos de la transacción completada
+            
+        Returns:
+            Dict[str, str]: Campos del mensaje convertidos a string para Redis
+        """
+        email_data = {
+            "to": email,
+            "subject": f"Confirmación de Compra - {transaccion_data.get('numero_factura', 'N/A')}",
+            "template": "confirmacion_compra",
+            "data": {
+                "transaccion_id": transaccion_data.get("transaccion_id"),
+                "numero_factura": transaccion_data.get("numero_factura"),
+                "fecha_compra": datetime.now().isoformat(),
+                "asientos": transaccion_data.get("asientos", []),
+                "total": transaccion_data.get("total", 0),
+                "metodo_pago": transaccion_data.get("resumen", {}).get("metodo_pago", "N/A"),
+                "estado": transaccion_data.get("estado", "confirmado"),
+                "fecha_vencimiento": transaccion_data.get("fecha_vencimiento"),
+                "codigo_qr": transaccion_data.get("codigo_qr", "QR-CODE")
+            },
+            "priority": "high",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # Convertir datos a strings para Redis
+        email_data_str = {}
+        for key, value in email_data.items():
+            if isinstance(value, dict):
+                email_data_str[key] = json.dumps(value, default=str)
+            else:
+                email_data_str[key] = str(value)
+        return email_data_str
+    
     async def enviar_correo_confirmacion_compra(
         self, 
         email: str, 
@@ -47,7 +97,7 @@ class EmailService:
         try:
             # Verificar conexión a Redis
             if not self.redis_service.redis_client:
-                print("⚠️  Redis no disponible, enviando correo directamente")
+                logger.warning("Redis no disponible, enviando correo directamente", extra={"to": email})
                 # Enviar correo real directamente
                 return await self._enviar_correo_real({
                     "to": email,
@@ -56,35 +106,10 @@ class EmailService:
                     "data": transaccion_data
                 })
             
-            # Crear mensaje de correo
-            email_data = {
-                "to": email,
-                "subject": f"Confirmación de Compra - {transaccion_data.get('numero_factura', 'N/A')}",
-                "template": "confirmacion_compra",
-                "data": {
-                    "transaccion_id": transaccion_data.get("transaccion_id"),
-                    "numero_factura": transaccion_data.get("numero_factura"),
-                    "fecha_compra": datetime.now().isoformat(),
-                    "asientos": transaccion_data.get("asientos", []),
-                    "total": transaccion_data.get("total", 0),
-                    "metodo_pago": transaccion_data.get("resumen", {}).get("metodo_pago", "N/A"),
-                    "estado": transaccion_data.get("estado", "confirmado"),
-                    "fecha_vencimiento": transaccion_data.get("fecha_vencimiento"),
-                    "codigo_qr": transaccion_data.get("codigo_qr", "QR-CODE")
-                },
-                "priority": "high",
-                "timestamp": datetime.now().isoformat()
-            }
+            # Crear mensaje de correo (campos en string para Redis Stream)
+            email_data_str = self.construir_correo_confirmacion(email, transaccion_data)
             
             # Enviar a Redis Stream para procesamiento asíncrono
-            # Convertir datos a strings para Redis
-            email_data_str = {}
-            for key, value in email_data.items():
-                if isinstance(value, dict):
-                    email_data_str[key] = json.dumps(value)
-                else:
-                    email_data_str[key] = str(value)
-            
             message_id = await self.redis_service.xadd(
                 self.email_stream,
                 email_data_str
@@ -96,14 +121,16 @@ class EmailService:
                 {message_id: datetime.now().timestamp()}
             )
             
-            print(f"✅ Correo de confirmación enviado a Redis para {email}")
-            print(f"   ID Mensaje: {message_id}")
-            print(f"   Factura: {transaccion_data.get('numero_factura')}")
+            logger.debug("Correo de confirmación encolado", extra={
+                "to": email,
+                "message_id": message_id,
+                "factura": transaccion_data.get("numero_factura")
+            })
             
             return True
             
         except Exception as e:
-            print(f"❌ Error enviando correo de confirmación: {e}")
+            logger.error("Error encolando correo de confirmación", extra={"to": email, "error": str(e)})
             return False
     
     async def enviar_correo_cancelacion(
@@ -150,11 +177,11 @@ class EmailService:
                 email_data_str
             )
             
-            print(f"✅ Correo de cancelación enviado a Redis para {email}")
+            logger.debug("Correo de cancelación encolado", extra={"to": email, "message_id": message_id})
             return True
             
         except Exception as e:
-            print(f"❌ Error enviando correo de cancelación: {e}")
+            logger.error("Error encolando correo de cancelación", extra={"to": email, "error": str(e)})
             return False
     
     async def enviar_correo_recordatorio(
@@ -202,16 +229,17 @@ class EmailService:
                 email_data_str
             )
             
-            print(f"✅ Correo de recordatorio enviado a Redis para {email}")
+            logger.debug("Correo de recordatorio encolado", extra={"to": email})
             return True
             
         except Exception as e:
-            print(f"❌ Error enviando correo de recordatorio: {e}")
+            logger.error("Error encolando correo de recordatorio", extra={"to": email, "error": str(e)})
             return False
     
     async def procesar_cola_correos(self, batch_size: int = 10) -> int:
         """
-        Procesa la cola de correos pendientes
+        Procesa un lote de correos pendientes en una sola pasada
+        (el procesamiento continuo lo hace EmailWorkerService)
         
         Args:
             batch_size: Número de correos a procesar por lote
@@ -220,9 +248,12 @@ class EmailService:
             int: Número de correos procesados
         """
         try:
-            # Obtener mensajes de la cola
-            messages = await self.redis_service.xread(
-                {self.email_stream: "0"},
+            # Obtener mensajes nuevos para el grupo de consumidores de correo
+            await self.redis_service.xgroup_create(self.email_stream, settings.email_consumer_group, id="0", mkstream=True)
+            messages = await self.redis_service.xreadgroup(
+                settings.email_consumer_group,
+                "procesar_cola",
+                {self.email_stream: ">"},
                 count=batch_size,
                 block=1000  # 1 segundo de timeout
             )
@@ -230,57 +261,67 @@ class EmailService:
             if not messages:
                 return 0
             
-            procesados = 0
-            for stream, stream_messages in messages:
-                for message_id, fields in stream_messages:
-                    try:
-                        # Convertir campos de vuelta a formato original
-                        processed_fields = {}
-                        for key, value in fields.items():
-                            try:
-                                # Intentar parsear como JSON si es un dict
-                                if value.startswith('{') and value.endswith('}'):
-                                    processed_fields[key] = json.loads(value)
-                                else:
-                                    processed_fields[key] = value
-                            except:
-                                processed_fields[key] = value
-                        
-                        # Verificar si usar envío real o simulado
-                        # Usar envío real si las credenciales están configuradas correctamente
-                        print(f"🔧 Verificando credenciales SMTP:")
-                        print(f"   SMTP_USER: {settings.smtp_user}")
-                        print(f"   SMTP_PASSWORD: {'***' if settings.smtp_password else 'None'}")
-                        print(f"   ENVIRONMENT: {settings.environment}")
-                        
-                        if (settings.smtp_user and 
-                            settings.smtp_user != "tu-email@gmail.com" and 
-                            settings.smtp_password and 
-                            settings.smtp_password != "tu-app-password-gmail"):
-                            print("✅ Usando envío real de correo")
-                            # Envío real
-                            exito = await self._enviar_correo_real(processed_fields)
-                        else:
-                            print("⚠️  Usando simulación de correo")
-                            # Simulación en desarrollo
-                            exito = await self._simular_envio_correo(processed_fields)
-                        
-                        if exito:
-                            # Marcar como procesado
-                            await self.redis_service.xack(self.email_stream, "email_processor", message_id)
-                            procesados += 1
-                        else:
-                            print(f"⚠️  Correo {message_id} no se pudo enviar, se reintentará")
-                        
-                    except Exception as e:
-                        print(f"❌ Error procesando correo {message_id}: {e}")
+            # Los envíos del lote van en paralelo; el pool SMTP limita la concurrencia
+            resultados = await asyncio.gather(*[
+                self._procesar_mensaje(message_id, fields)
+                for stream, stream_messages in messages
+                for message_id, fields in stream_messages
+            ])
+            procesados = sum(1 for exito in resultados if exito)
             
             return procesados
             
         except Exception as e:
-            print(f"❌ Error procesando cola de correos: {e}")
+            logger.error("Error procesando cola de correos", extra={"error": str(e)})
             return 0
     
+    async def _procesar_mensaje(self, message_id: str, fields: Dict[str, str]) -> bool:
+        """Envía un mensaje del stream y lo confirma si tuvo éxito"""
+        try:
+            if await self.entregar(fields):
+                # Marcar como procesado
+                await self.redis_service.xack(self.email_stream, settings.email_consumer_group, message_id)
+                return True
+            
+            logger.warning("Correo no enviado, se reintentará", extra={"message_id": message_id})
+            return False
+            
+        except Exception as e:
+            logger.error("Error procesando correo", extra={"message_id": message_id, "error": str(e)})
+            return False
+    
+    async def entregar(self, fields: Dict[str, str]) -> bool:
+        """
+        Envía un mensaje tal como está en el stream (real o simulado)
+        
+        Args:
+            fields: Campos del mensaje en formato string
+            
+        Returns:
+            bool: True si se envió correctamente
+        """
+        # Convertir campos de vuelta a formato original
+        processed_fields = {}
+        for key, value in fields.items():
+            try:
+                # Intentar parsear como JSON si es un dict
+                if value.startswith('{') and value.endswith('}'):
+                    processed_fields[key] = json.loads(value)
+                else:
+                    processed_fields[key] = value
+            except:
+                processed_fields[key] = value
+        
+        # Usar envío real si las credenciales están configuradas correctamente
+        if (settings.smtp_user and 
+            settings.smtp_user != "tu-email@gmail.com" and 
+            settings.smtp_password and 
+            settings.smtp_password != "tu-app-password-gmail"):
+            return await self._enviar_correo_real(processed_fields)
+        
+        # Simulación en desarrollo
+        return await self._simular_envio_correo(processed_fields)
+    
     async def _simular_envio_correo(self, email_data: Dict[str, Any]) -> bool:
         """
         Simula el envío de un correo electrónico usando configuración de Docker
@@ -294,7 +335,7 @@ class EmailService:
         try:
             # Verificar si las notificaciones de correo están habilitadas
             if not settings.enable_email_notifications:
-                print(f"⚠️  Notificaciones de correo deshabilitadas para {email_data.get('to')}")
+                logger.debug("Notificaciones de correo deshabilitadas", extra={"to": email_data.get("to")})
                 return True
             
             # Simular delay de envío basado en configuración
@@ -305,29 +346,19 @@ class EmailService:
             exito = random.random() < 0.95
             
             if exito:
-                print(f"📧 Correo enviado exitosamente a {email_data.get('to')}")
-                print(f"   Servidor SMTP: {settings.smtp_host}:{settings.smtp_port}")
-                print(f"   Remitente: {settings.email_from_name} <{settings.email_from_address}>")
-                print(f"   Asunto: {email_data.get('subject')}")
-                print(f"   Template: {email_data.get('template')}")
-                
-                # Log de datos del correo
-                if email_data.get("template") == "confirmacion_compra":
-                    data = email_data.get("data", {})
-                    print(f"   Factura: {data.get('numero_factura')}")
-                    print(f"   Asientos: {data.get('asientos')}")
-                    print(f"   Total: ${data.get('total', 0):,}")
-                    print(f"   Método de pago: {data.get('metodo_pago', 'N/A')}")
-                
+                # La configuración SMTP es la misma para todos los mensajes: no se repite por envío
+                logger.debug("Correo simulado enviado", extra={
+                    "to": email_data.get("to"),
+                    "template": email_data.get("template"),
+                    "factura": email_data.get("data", {}).get("numero_factura")
+                })
                 return True
             else:
-                print(f"❌ Error simulado enviando correo a {email_data.get('to')}")
-                print(f"   Servidor: {settings.smtp_host}")
-                print(f"   Error: Timeout de conexión")
+                logger.warning("Error simulado enviando correo (timeout de conexión)", extra={"to": email_data.get("to")})
                 return False
                 
         except Exception as e:
-            print(f"❌ Error en simulación de correo: {e}")
+            logger.error("Error en simulación de correo", extra={"error": str(e)})
             return False
     
     async def obtener_estadisticas_correos(self) -> Dict[str, Any]:
@@ -338,33 +369,85 @@ class EmailService:
             Dict con estadísticas
         """
         try:
+            # En la API este servicio no abre su propia conexión: usar la global
+            redis_service = self.redis_service if self.redis_service.redis_client else get_redis_service()
+            
             # Contar mensajes en el stream
-            total_messages = await self.redis_service.xlen(self.email_stream)
+            total_messages = await redis_service.xlen(self.email_stream)
             
             # Contar correos por prioridad
-            high_priority = await self.redis_service.zcount(
+            high_priority = await redis_service.zcount(
                 self.email_queue, 
                 datetime.now().timestamp() - 86400,  # Últimas 24 horas
                 "+inf"
             )
             
+            # Memoria usada por las estructuras de correo
+            claves = {
+                "stream": self.email_stream,
+                "cola_prioridad": self.email_queue,
+                "reintentos": "email:reintentos",
+                "cola_muertos": f"{self.email_stream}:dlq",
+                "por_archivar": self.email_entregados
+            }
+            memoria = {
+                nombre: await redis_service.memory_usage(clave)
+                for nombre, clave in claves.items()
+            }
+            
+            pendientes = 0
+            for grupo in await redis_service.xinfo_groups(self.email_stream):
+                pendientes += grupo.get("pending", 0)
+            
             return {
                 "total_correos_enviados": total_messages,
                 "correos_prioridad_alta": high_priority,
+                "pendientes_sin_ack": pendientes,
+                "por_archivar": await redis_service.llen(self.email_entregados),
+                "memoria_bytes": {**memoria, "total": sum(memoria.values())},
+                "templates": email_templates.obtener_estadisticas(),
                 "fecha_ultima_actualizacion": datetime.now().isoformat()
             }
             
         except Exception as e:
-            print(f"❌ Error obteniendo estadísticas de correos: {e}")
+            logger.error("Error obteniendo estadísticas de correos", extra={"error": str(e)})
             return {
                 "total_correos_enviados": 0,
                 "correos_prioridad_alta": 0,
                 "error": str(e)
             }
     
+    def _obtener_smtp_pool(self) -> SMTPPool:
+        """Pool de sesiones SMTP persistentes (se crea al primer envío)"""
+        if self.smtp_pool is None:
+            self.smtp_pool = SMTPPool(
+                host=settings.smtp_host,
+                port=settings.smtp_port,
+                usuario=settings.smtp_user,
+                password=settings.smtp_password,
+                use_tls=settings.smtp_use_tls,
+                verify_ssl=settings.smtp_verify_ssl,
+                tamano=settings.smtp_pool_size,
+                timeout=settings.smtp_timeout,
+                max_inactividad=settings.smtp_pool_max_inactividad
+            )
+        return self.smtp_pool
+    
+    def _construir_mensaje(self, email_data: Dict[str, Any], qr_base64: Optional[str] = None) -> MIMEMultipart:
+        """Construye el mensaje MIME con el contenido HTML del template"""
+        msg = MIMEMultipart()
+        msg['From'] = settings.smtp_user  # Usar exactamente el mismo formato que funcionó
+        msg['To'] = email_data['to']
+        msg['Subject'] = email_data['subject']
+        msg['Reply-To'] = settings.email_reply_to
+        
+        html_content = self._generar_template_html(email_data, qr_base64)
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
+    
     async def _enviar_correo_real(self, email_data: Dict[str, Any]) -> bool:
         """
-        Envía un correo real usando SMTP con configuración de Docker
+        Envía un correo real por SMTP reutilizando sesiones del pool
         
         Args:
             email_data: Datos del correo a enviar
@@ -373,211 +456,64 @@ class EmailService:
             bool: True si se envió correctamente
         """
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            
-            print(f"📧 Iniciando envío real de correo a {email_data.get('to')}")
-            print(f"   Servidor: {settings.smtp_host}:{settings.smtp_port}")
-            print(f"   Usuario: {settings.smtp_user}")
-            print(f"   TLS: {settings.smtp_use_tls}")
-            
-            # Crear mensaje
-            msg = MIMEMultipart()
-            msg['From'] = settings.smtp_user  # Usar exactamente el mismo formato que funcionó
-            msg['To'] = email_data['to']
-            msg['Subject'] = email_data['subject']
-            msg['Reply-To'] = settings.email_reply_to
-            
-            # Crear contenido HTML del correo
-            html_content = self._generar_template_html(email_data)
-            msg.attach(MIMEText(html_content, 'html'))
-            
-            print(f"   Conectando a SMTP...")
-            
-            # Configurar conexión SMTP
-            if settings.smtp_use_tls:
-                server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-                print(f"   Iniciando TLS...")
-                server.starttls()
-            else:
-                server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-            
-            print(f"   Autenticando...")
-            # Autenticación
-            server.login(settings.smtp_user, settings.smtp_password)
-            
-            print(f"   Enviando correo...")
-            # Enviar correo
-            server.send_message(msg)
-            server.quit()
-            
-            print(f"📧 Correo real enviado exitosamente a {email_data.get('to')}")
+            qr_base64 = None
+            if email_data.get("template") == "confirmacion_compra":
+                # El QR se renderiza fuera del event loop (o sale de cache)
+                qr_base64 = await self._generar_qr_base64_async(email_data.get("data", {}).get("codigo_qr", "QR-CODE"))
+            msg = self._construir_mensaje(email_data, qr_base64)
+            await self._obtener_smtp_pool().enviar(msg)
+            
+            logger.debug("Correo enviado", extra={"to": email_data.get("to"), "template": email_data.get("template")})
             return True
             
         except Exception as e:
-            print(f"❌ Error enviando correo real: {e}")
-            print(f"   Tipo de error: {type(e).__name__}")
+            logger.error("Error enviando correo", extra={
+                "to": email_data.get("to"),
+                "smtp": f"{settings.smtp_host}:{settings.smtp_port}",
+                "tipo_error": type(e).__name__,
+                "error": str(e)
+            })
             return False
     
-    def _generar_template_html(self, email_data: Dict[str, Any]) -> str:
+    def _generar_template_html(self, email_data: Dict[str, Any], qr_base64: Optional[str] = None) -> str:
         """
-        Genera contenido HTML para el correo basado en el template
+        Genera contenido HTML para el correo con los templates precompilados
         
         Args:
             email_data: Datos del correo
+            qr_base64: QR ya generado (si no, se genera aquí de forma síncrona)
             
         Returns:
             str: Contenido HTML del correo
         """
-        template = email_data.get("template", "default")
-        data = email_data.get("data", {})
+        if email_data.get("template") == "confirmacion_compra":
+            if qr_base64 is None:
+                codigo_qr = email_data.get("data", {}).get("codigo_qr", "QR-CODE")
+                qr_base64 = self._generar_qr_base64(codigo_qr)
+            return email_templates.renderizar(email_data, qr_base64=qr_base64)
         
-        if template == "confirmacion_compra":
-            # Generar QR real
-            codigo_qr = data.get('codigo_qr', 'QR-CODE')
-            print(f"🔍 Debug QR - codigo_qr recibido: {codigo_qr}")
-            qr_code_base64 = self._generar_qr_base64(codigo_qr)
-            print(f"🔍 Debug QR - qr_code_base64 generado: {qr_code_base64[:50]}... (longitud: {len(qr_code_base64)})")
-            
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Confirmación de Compra - Cinemax</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f4; }}
-                    .container {{ max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                    .header {{ text-align: center; margin-bottom: 30px; }}
-                    .header h1 {{ color: #e74c3c; margin: 0; }}
-                    .details {{ margin: 20px 0; }}
-                    .detail-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 10px; background: #f8f9fa; border-radius: 5px; }}
-                    .total {{ font-size: 18px; font-weight: bold; color: #e74c3c; }}
-                    .qr-code {{ text-align: center; margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 5px; }}
-                    .qr-image {{ margin: 20px auto; display: block; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 12px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🎬 Cinemax</h1>
-                        <h2>¡Compra Confirmada!</h2>
-                    </div>
-                    
-                    <div class="details">
-                        <div class="detail-row">
-                            <strong>Número de Factura:</strong>
-                            <span>{data.get('numero_factura', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <strong>Asientos:</strong>
-                            <span>{', '.join(data.get('asientos', []))}</span>
-                        </div>
-                        <div class="detail-row">
-                            <strong>Método de Pago:</strong>
-                            <span>{data.get('metodo_pago', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row total">
-                            <strong>Total:</strong>
-                            <span>${data.get('total', 0):,}</span>
-                        </div>
-                    </div>
-                    
-                    <div class="qr-code">
-                        <h3>🎫 Código QR para Entrada</h3>
-                        <img src="data:image/png;base64,{qr_code_base64}" alt="QR Code" class="qr-image" width="200" height="200">
-                        <p><strong>{data.get('codigo_qr', 'QR-CODE')}</strong></p>
-                        <p><small>Presenta este código en la entrada del cine</small></p>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>Gracias por elegir Cinemax</p>
-                        <p>Para soporte: {settings.email_reply_to}</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-        
-        elif template == "cancelacion_compra":
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Cancelación de Compra - Cinemax</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f4; }}
-                    .container {{ max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                    .header {{ text-align: center; margin-bottom: 30px; }}
-                    .header h1 {{ color: #e74c3c; margin: 0; }}
-                    .details {{ margin: 20px 0; }}
-                    .detail-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 10px; background: #f8f9fa; border-radius: 5px; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 12px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🎬 Cinemax</h1>
-                        <h2>Cancelación de Compra</h2>
-                    </div>
-                    
-                    <div class="details">
-                        <div class="detail-row">
-                            <strong>Número de Factura:</strong>
-                            <span>{data.get('numero_factura', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <strong>Motivo:</strong>
-                            <span>{data.get('motivo', 'Cancelación solicitada')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <strong>Reembolso:</strong>
-                            <span>{'Sí' if data.get('reembolso') else 'No'}</span>
-                        </div>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>Para soporte: {settings.email_reply_to}</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+        return email_templates.renderizar(email_data)
+    
+    async def _generar_qr_base64_async(self, codigo: str) -> str:
+        """
+        Obtiene el QR en base64 del servicio de QR (pool de procesos + cache)
         
-        else:
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>{email_data.get('subject', 'Notificación')}</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f4; }}
-                    .container {{ max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                    .header {{ text-align: center; margin-bottom: 30px; }}
-                    .header h1 {{ color: #e74c3c; margin: 0; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 12px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🎬 Cinemax</h1>
-                        <h2>{email_data.get('subject', 'Notificación')}</h2>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>Para soporte: {settings.email_reply_to}</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+        Args:
+            codigo: Código a codificar en el QR
+            
+        Returns:
+            str: Imagen QR en formato base64
+        """
+        try:
+            return await qr_service.generar(codigo)
+        except Exception as e:
+            logger.error("Error generando QR", extra={"codigo": codigo, "error": str(e)})
+            # Retornar una imagen placeholder en base64 si falla
+            return QR_PLACEHOLDER
     
     def _generar_qr_base64(self, codigo: str) -> str:
         """
-        Genera un código QR usando algoritmo recursivo y lo convierte a base64
+        Variante síncrona: usa la cache del servicio de QR o renderiza en línea
         
         Args:
             codigo: Código a codificar en el QR
@@ -586,42 +522,16 @@ class EmailService:
             str: Imagen QR en formato base64
         """
         try:
-            import base64
-            from io import BytesIO
-            
-            # Usar algoritmo recursivo si está disponible
-            algorithms_service = get_algorithms_service()
-            if algorithms_service:
-                print("🔄 Generando QR usando algoritmo recursivo...")
-                qr_image = algorithms_service.generar_qr_recursivo(codigo)
-                print("✅ QR generado exitosamente con algoritmo recursivo")
-            else:
-                # Fallback a generación normal
-                import qrcode
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.ERROR_CORRECT_L,
-                    box_size=10,
-                    border=4,
-                )
-                qr.add_data(codigo)
-                qr.make(fit=True)
-                qr_image = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convertir a base64
-            buffer = BytesIO()
-            qr_image.save(buffer, 'PNG')
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_str
-            
+            return qr_service.generar_sync(codigo)
         except Exception as e:
-            print(f"❌ Error generando QR: {e}")
-            # Retornar una imagen placeholder en base64 si falla
-            return "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+            logger.error("Error generando QR", extra={"codigo": codigo, "error": str(e)})
+            return QR_PLACEHOLDER
     
     async def disconnect(self):
-        """Desconectar del servicio de Redis"""
+        """Desconectar del servicio de Redis y cerrar las sesiones SMTP"""
+        if self.smtp_pool:
+            await self.smtp_pool.cerrar()
+            self.smtp_pool = None
         await self.redis_service.disconnect()
 
 
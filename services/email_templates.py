@@ -0,0 +1,258 @@
+"""
+Templates HTML de correo precompilados
+
+Cada template se compila una vez por locale al importar el módulo: los
+fragmentos estáticos (CSS, encabezado, pie y etiquetas traducidas) quedan
+ya renderizados y solo se intercalan los valores del mensaje. Jinja2 no
+es dependencia del proyecto; el compilador es un split por
+``{{campo}}`` suficiente para estos templates sin lógica.
+"""
+
+import html
+import re
+import time
+from typing import Dict, Any, List, Callable, Tuple
+
+from config.settings import settings
+
+LOCALE_POR_DEFECTO = "es"
+
+_CAMPO = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Fragmentos estáticos compartidos
+_CSS_BASE = (
+    "body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f4; }"
+    ".container { max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }"
+    ".header { text-align: center; margin-bottom: 30px; }"
+    ".header h1 { color: #e74c3c; margin: 0; }"
+    ".footer { text-align: center; margin-top: 30px; color: #666; font-size: 12px; }"
+)
+_CSS_DETALLES = (
+    ".details { margin: 20px 0; }"
+    ".detail-row { display: flex; justify-content: space-between; margin: 10px 0; padding: 10px; background: #f8f9fa; border-radius: 5px; }"
+    ".total { font-size: 18px; font-weight: bold; color: #e74c3c; }"
+)
+_CSS_QR = (
+    ".qr-code { text-align: center; margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 5px; }"
+    ".qr-image { margin: 20px auto; display: block; }"
+)
+
+TEXTOS: Dict[str, Dict[str, str]] = {
+    "es": {
+        "confirmacion_titulo": "Confirmación de Compra - Cinemax",
+        "confirmacion_encabezado": "¡Compra Confirmada!",
+        "cancelacion_titulo": "Cancelación de Compra - Cinemax",
+        "cancelacion_encabezado": "Cancelación de Compra",
+        "factura": "Número de Factura",
+        "asientos": "Asientos",
+        "metodo_pago": "Método de Pago",
+        "total": "Total",
+        "motivo": "Motivo",
+        "motivo_defecto": "Cancelación solicitada",
+        "reembolso": "Reembolso",
+        "si": "Sí",
+        "no": "No",
+        "qr_titulo": "🎫 Código QR para Entrada",
+        "qr_instrucciones": "Presenta este código en la entrada del cine",
+        "gracias": "Gracias por elegir Cinemax",
+        "soporte": "Para soporte",
+        "notificacion": "Notificación"
+    },
+    "en": {
+        "confirmacion_titulo": "Purchase Confirmation - Cinemax",
+        "confirmacion_encabezado": "Purchase Confirmed!",
+        "cancelacion_titulo": "Purchase Cancellation - Cinemax",
+        "cancelacion_encabezado": "Purchase Cancelled",
+        "factura": "Invoice Number",
+        "asientos": "Seats",
+        "metodo_pago": "Payment Method",
+        "total": "Total",
+        "motivo": "Reason",
+        "motivo_defecto": "Cancellation requested",
+        "reembolso": "Refund",
+        "si": "Yes",
+        "no": "No",
+        "qr_titulo": "🎫 Ticket QR Code",
+        "qr_instrucciones": "Show this code at the cinema entrance",
+        "gracias": "Thank you for choosing Cinemax",
+        "soporte": "Support",
+        "notificacion": "Notification"
+    }
+}
+
+
+def _documento(titulo: str, css: str, encabezado: str, cuerpo: str, pie: str) -> str:
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{titulo}</title><style>{css}</style>"
+        "</head><body><div class=\"container\">"
+        f"<div class=\"header\"><h1>🎬 Cinemax</h1><h2>{encabezado}</h2></div>"
+        f"{cuerpo}"
+        f"<div class=\"footer\">{pie}</div>"
+        "</div></body></html>"
+    )
+
+
+def _fila(etiqueta: str, campo: str, clase: str = "detail-row") -> str:
+    return f"<div class=\"{clase}\"><strong>{etiqueta}:</strong><span>{{{{{campo}}}}}</span></div>"
+
+
+def _pie(t: Dict[str, str], gracias: bool = False) -> str:
+    soporte = f"<p>{t['soporte']}: {html.escape(settings.email_reply_to)}</p>"
+    return (f"<p>{t['gracias']}</p>" if gracias else "") + soporte
+
+
+def _fuente_confirmacion(t: Dict[str, str]) -> str:
+    cuerpo = (
+        "<div class=\"details\">"
+        + _fila(t["factura"], "numero_factura")
+        + _fila(t["asientos"], "asientos")
+        + _fila(t["metodo_pago"], "metodo_pago")
+        + _fila(t["total"], "total", "detail-row total")
+        + "</div>"
+        "<div class=\"qr-code\">"
+        f"<h3>{t['qr_titulo']}</h3>"
+        "<img src=\"data:image/png;base64,{{qr_base64}}\" alt=\"QR Code\" class=\"qr-image\" width=\"200\" height=\"200\">"
+        "<p><strong>{{codigo_qr}}</strong></p>"
+        f"<p><small>{t['qr_instrucciones']}</small></p>"
+        "</div>"
+    )
+    return _documento(t["confirmacion_titulo"], _CSS_BASE + _CSS_DETALLES + _CSS_QR,
+                      t["confirmacion_encabezado"], cuerpo, _pie(t, gracias=True))
+
+
+def _fuente_cancelacion(t: Dict[str, str]) -> str:
+    cuerpo = (
+        "<div class=\"details\">"
+        + _fila(t["factura"], "numero_factura")
+        + _fila(t["motivo"], "motivo")
+        + _fila(t["reembolso"], "reembolso")
+        + "</div>"
+    )
+    return _documento(t["cancelacion_titulo"], _CSS_BASE + _CSS_DETALLES,
+                      t["cancelacion_encabezado"], cuerpo, _pie(t))
+
+
+def _fuente_default(t: Dict[str, str]) -> str:
+    return _documento("{{asunto}}", _CSS_BASE, "{{asunto}}", "", _pie(t))
+
+
+def _total(valor: Any) -> str:
+    try:
+        return f"${float(valor):,}" if isinstance(valor, str) else f"${valor:,}"
+    except (TypeError, ValueError):
+        return f"${valor}"
+
+
+def _valores_confirmacion(email_data: Dict[str, Any], t: Dict[str, str]) -> Dict[str, Any]:
+    data = email_data.get("data", {})
+    return {
+        "numero_factura": data.get("numero_factura", "N/A"),
+        "asientos": ", ".join(data.get("asientos", [])),
+        "metodo_pago": data.get("metodo_pago", "N/A"),
+        "total": _total(data.get("total", 0)),
+        "codigo_qr": data.get("codigo_qr", "QR-CODE")
+    }
+
+
+def _valores_cancelacion(email_data: Dict[str, Any], t: Dict[str, str]) -> Dict[str, Any]:
+    data = email_data.get("data", {})
+    return {
+        "numero_factura": data.get("numero_factura", "N/A"),
+        "motivo": data.get("motivo") or t["motivo_defecto"],
+        "reembolso": t["si"] if data.get("reembolso") else t["no"]
+    }
+
+
+def _valores_default(email_data: Dict[str, Any], t: Dict[str, str]) -> Dict[str, Any]:
+    return {"asunto": email_data.get("subject") or t["notificacion"]}
+
+
+# template -> (fuente por locale, valores del mensaje)
+TEMPLATES: Dict[str, Tuple[Callable[[Dict[str, str]], str], Callable[..., Dict[str, Any]]]] = {
+    "confirmacion_compra": (_fuente_confirmacion, _valores_confirmacion),
+    "cancelacion_compra": (_fuente_cancelacion, _valores_cancelacion),
+    "default": (_fuente_default, _valores_default)
+}
+
+# Campos que ya vienen codificados y no se escapan
+_SIN_ESCAPE = {"qr_base64"}
+
+
+class PlantillaCompilada:
+    """Template partido en fragmentos estáticos y campos"""
+
+    def __init__(self, fuente: str):
+        partes = _CAMPO.split(fuente)
+        self.estaticos: List[str] = partes[0::2]
+        self.campos: List[str] = partes[1::2]
+
+    def renderizar(self, valores: Dict[str, Any]) -> str:
+        salida = [self.estaticos[0]]
+        for campo, estatico in zip(self.campos, self.estaticos[1:]):
+            valor = str(valores.get(campo, ""))
+            salida.append(valor if campo in _SIN_ESCAPE else html.escape(valor))
+            salida.append(estatico)
+        return "".join(salida)
+
+
+class EmailTemplateRenderer:
+    """
+    Renderiza correos con templates compilados por (template, locale)
+    """
+
+    def __init__(self):
+        self._compiladas: Dict[Tuple[str, str], PlantillaCompilada] = {
+            (nombre, locale): PlantillaCompilada(fuente(textos))
+            for nombre, (fuente, _) in TEMPLATES.items()
+            for locale, textos in TEXTOS.items()
+        }
+        self._metricas: Dict[str, Dict[str, float]] = {}
+
+    def renderizar(self, email_data: Dict[str, Any], locale: str = None, **extras: Any) -> str:
+        """
+        Renderiza el HTML de un correo
+
+        Args:
+            email_data: Mensaje con ``template``, ``subject`` y ``data``
+            locale: Idioma (por defecto el del mensaje o ``es``)
+            extras: Valores adicionales ya calculados (p. ej. ``qr_base64``)
+        """
+        inicio = time.perf_counter()
+        nombre = email_data.get("template")
+        if nombre not in TEMPLATES:
+            nombre = "default"
+        locale = locale or email_data.get("locale") or LOCALE_POR_DEFECTO
+        if locale not in TEXTOS:
+            locale = LOCALE_POR_DEFECTO
+
+        _, valores = TEMPLATES[nombre]
+        contenido = self._compiladas[(nombre, locale)].renderizar(
+            {**valores(email_data, TEXTOS[locale]), **extras}
+        )
+
+        self._registrar(nombre, len(contenido.encode()), time.perf_counter() - inicio)
+        return contenido
+
+    def _registrar(self, nombre: str, bytes_html: int, segundos: float):
+        metrica = self._metricas.setdefault(nombre, {"renders": 0, "bytes_total": 0, "bytes_max": 0, "tiempo_total": 0.0})
+        metrica["renders"] += 1
+        metrica["bytes_total"] += bytes_html
+        metrica["bytes_max"] = max(metrica["bytes_max"], bytes_html)
+        metrica["tiempo_total"] += segundos
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Tamaño y tiempo de render promedio por template"""
+        return {
+            nombre: {
+                "renders": m["renders"],
+                "bytes_promedio": round(m["bytes_total"] / m["renders"]),
+                "bytes_max": m["bytes_max"],
+                "tiempo_promedio_us": round(m["tiempo_total"] / m["renders"] * 1_000_000, 2)
+            }
+            for nombre, m in self._metricas.items()
+        }
+
+
+# Templates compilados al importar (arranque)
+email_templates = EmailTemplateRenderer()
@@ -0,0 +1,257 @@
+"""
+Worker de correos con grupo de consumidores
+
+Consume ``email:notifications`` con XREADGROUP y N consumidores. Entrega
+al menos una vez:
+
+- Un mensaje se confirma (XACK) solo después de enviarse.
+- Los mensajes de un consumidor caído se reclaman con XAUTOCLAIM.
+- Los envíos fallidos se reprograman con backoff exponencial en un sorted
+  set y, al agotar los intentos, pasan al stream de mensajes muertos.
+"""
+
+import asyncio
+import json
+import random
+import socket
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from config.settings import settings
+from services.email_service import email_service as email_service_global
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+CLAVE_REINTENTOS = "email:reintentos"
+CLAVE_PROGRAMADOR = "email:reintentos:programador"
+
+
+def metadatos_entrega(message_id: str, campos: Dict[str, str], intentos: int) -> Dict[str, Any]:
+    """Metadatos de un correo entregado (sin el contenido) para el archivo"""
+    try:
+        data = json.loads(campos.get("data") or "{}")
+    except ValueError:
+        data = {}
+    return {
+        "mensaje_id": message_id,
+        "para": campos.get("to"),
+        "asunto": campos.get("subject"),
+        "template": campos.get("template"),
+        "transaccion_id": data.get("transaccion_id"),
+        "numero_factura": data.get("numero_factura"),
+        "intentos": intentos,
+        "entregado": datetime.now().isoformat()
+    }
+
+
+class EmailWorkerService:
+    """
+    Pool de N consumidores del stream de correos
+
+    La lectura está limitada por ``SMTP_POOL_SIZE``: un consumidor solo
+    toma un mensaje nuevo si hay una sesión SMTP libre para enviarlo, así
+    el resto queda en el stream para otros procesos.
+    """
+
+    def __init__(self, redis_service, email_service=None, concurrencia: int = None):
+        self.redis_service = redis_service
+        self.email_service = email_service or email_service_global
+        self.stream = self.email_service.email_stream
+        self.stream_muertos = f"{self.stream}:dlq"
+        self.grupo = settings.email_consumer_group
+        self.concurrencia = concurrencia or settings.email_workers
+        self.prefijo_consumidor = f"{socket.gethostname()}-{id(self)}"
+        self._tareas: List[Tuple[str, asyncio.Task]] = []
+        self._programador: Optional[asyncio.Task] = None
+        self._ocupados = set()
+        self._cupos: Optional[asyncio.Semaphore] = None
+        self._activo = False
+
+        self.enviados = 0
+        self.reintentos = 0
+        self.muertos = 0
+        self.reclamados = 0
+        self.errores = 0
+
+    async def iniciar(self):
+        """Crea el grupo de consumidores y lanza los consumidores y el programador de reintentos"""
+        await self.redis_service.xgroup_create(self.stream, self.grupo, id="0", mkstream=True)
+        self._activo = True
+        self._cupos = asyncio.Semaphore(settings.smtp_pool_size)
+        self._tareas = []
+        for i in range(self.concurrencia):
+            consumidor = f"{self.prefijo_consumidor}-{i}"
+            self._tareas.append((consumidor, asyncio.create_task(self._trabajador(consumidor))))
+        self._programador = asyncio.create_task(self._programar_reintentos())
+
+    async def detener(self, timeout: float = None):
+        """
+        Apagado ordenado
+
+        Los consumidores esperando mensajes se cancelan de inmediato; los que
+        están enviando terminan su mensaje (hasta ``timeout`` segundos). Lo
+        que quede sin ACK se reclamará al reiniciar.
+        """
+        self._activo = False
+        timeout = settings.email_shutdown_timeout if timeout is None else timeout
+
+        if self._programador:
+            self._programador.cancel()
+        for consumidor, tarea in self._tareas:
+            if consumidor not in self._ocupados:
+                tarea.cancel()
+
+        tareas = [tarea for _, tarea in self._tareas] + ([self._programador] if self._programador else [])
+        if tareas:
+            _, pendientes = await asyncio.wait(tareas, timeout=timeout)
+            for tarea in pendientes:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+        self._tareas = []
+        self._programador = None
+
+    async def _trabajador(self, consumidor: str):
+        """Loop de un consumidor: reclama pendientes abandonados y lee nuevos"""
+        ultimo_reclamo = 0.0
+        while self._activo:
+            try:
+                async with self._cupos:
+                    mensajes = []
+
+                    if time.monotonic() - ultimo_reclamo > settings.email_reclamo_segundos:
+                        ultimo_reclamo = time.monotonic()
+                        reclamados = await self.redis_service.xautoclaim(
+                            self.stream, self.grupo, consumidor,
+                            min_idle_time=settings.email_reclamo_segundos * 1000,
+                            count=10
+                        )
+                        mensajes = reclamados[1] if reclamados else []
+                        self.reclamados += len(mensajes)
+
+                    if not mensajes:
+                        leidos = await self.redis_service.xreadgroup(
+                            self.grupo, consumidor, {self.stream: ">"}, count=1, block=2000
+                        )
+                        mensajes = [m for _, eventos in leidos or [] for m in eventos]
+
+                    if mensajes:
+                        self._ocupados.add(consumidor)
+                        try:
+                            for message_id, campos in mensajes:
+                                await self.procesar(message_id, campos)
+                        finally:
+                            self._ocupados.discard(consumidor)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errores += 1
+                logger.error("Error en worker de correos", extra={"consumidor": consumidor, "error": str(e)})
+                await asyncio.sleep(1)
+
+    async def procesar(self, message_id: str, campos: Dict[str, str]) -> bool:
+        """
+        Envía un mensaje y lo confirma, o lo reprograma si falla
+
+        Returns:
+            bool: True si el correo se envió
+        """
+        intentos = int(campos.get("intentos", 0)) + 1
+        try:
+            exito = await self.email_service.entregar(campos)
+            error = None if exito else "Envío rechazado"
+        except Exception as e:
+            exito = False
+            error = f"{type(e).__name__}: {e}"
+
+        if exito:
+            # ACK + metadatos para el archivo en MongoDB (lista acotada)
+            await self.redis_service.pipeline_execute([
+                ("xack", (self.stream, self.grupo, message_id), {}),
+                ("rpush", (self.email_service.email_entregados, json.dumps(metadatos_entrega(message_id, campos, intentos))), {}),
+                ("ltrim", (self.email_service.email_entregados, -settings.email_archivo_max_pendientes, -1), {})
+            ])
+            self.enviados += 1
+            return True
+
+        await self._reprogramar(message_id, campos, intentos, error)
+        return False
+
+    async def _reprogramar(self, message_id: str, campos: Dict[str, str], intentos: int, error: str):
+        """Programa un reintento con backoff o mueve el mensaje a la cola de muertos"""
+        campos = {**campos, "intentos": str(intentos)}
+
+        if intentos >= settings.email_max_intentos:
+            destino = ("xadd", (self.stream_muertos, {**campos, "error": error, "mensaje_original": message_id}),
+                       {"maxlen": settings.email_dlq_maxlen, "approximate": True})
+            self.muertos += 1
+            logger.error("Correo enviado a la DLQ", extra={"message_id": message_id, "dlq": self.stream_muertos, "intentos": intentos, "error": error})
+        else:
+            espera = min(settings.email_backoff_base * 2 ** (intentos - 1), settings.email_backoff_max)
+            espera *= random.uniform(0.8, 1.2)
+            miembro = json.dumps({"id": message_id, "campos": campos}, sort_keys=True)
+            destino = ("zadd", (CLAVE_REINTENTOS, {miembro: time.time() + espera}), {})
+            logger.warning("Correo fallido, reintento programado", extra={"message_id": message_id, "intentos": intentos, "espera_s": round(espera, 1), "error": error})
+
+        # Reprogramar y confirmar el original en un mismo MULTI/EXEC
+        await self.redis_service.pipeline_execute([
+            destino,
+            ("xack", (self.stream, self.grupo, message_id), {})
+        ])
+
+    async def _programar_reintentos(self):
+        """Devuelve al stream los reintentos cuyo backoff venció"""
+        while self._activo:
+            try:
+                movidos = 0
+                if await self._es_programador():
+                    movidos = await self.mover_reintentos_vencidos()
+                if movidos < 100:
+                    await asyncio.sleep(1)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errores += 1
+                logger.error("Error programando reintentos de correo", extra={"error": str(e)})
+                await asyncio.sleep(1)
+
+    async def _es_programador(self) -> bool:
+        """Un solo proceso mueve reintentos a la vez (lock con TTL en Redis)"""
+        if await self.redis_service.set_with_expiry(
+            CLAVE_PROGRAMADOR, self.prefijo_consumidor, expire_seconds=10, only_if_not_exists=True
+        ):
+            return True
+        if await self.redis_service.get(CLAVE_PROGRAMADOR) == self.prefijo_consumidor:
+            await self.redis_service.expire(CLAVE_PROGRAMADOR, 10)
+            return True
+        return False
+
+    async def mover_reintentos_vencidos(self, limite: int = 100) -> int:
+        """
+        Reencola en el stream los reintentos vencidos
+
+        Primero XADD y después ZREM: una caída entre ambos duplica el
+        reintento en lugar de perderlo.
+        """
+        vencidos = await self.redis_service.zrangebyscore(CLAVE_REINTENTOS, "-inf", time.time(), start=0, num=limite)
+        for miembro in vencidos:
+            await self.redis_service.xadd(self.stream, json.loads(miembro)["campos"])
+            await self.redis_service.zrem(CLAVE_REINTENTOS, miembro)
+            self.reintentos += 1
+        return len(vencidos)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas del worker"""
+        return {
+            "consumidores": len(self._tareas),
+            "enviando": len(self._ocupados),
+            "enviados": self.enviados,
+            "reintentos": self.reintentos,
+            "muertos": self.muertos,
+            "reclamados": self.reclamados,
+            "errores": self.errores
+        }
@@ -6,6 +6,12 @@ Servicios globales para evitar import circular
 redis_service = None
 mongodb_service = None
 algorithms_service = None
+rollup_service = None
+dashboard_service = None
+payment_worker_service = None
+outbox_relay_service = None
+email_worker_service = None
+email_retention_service = None
 
 def set_redis_service(service):
     """Establece el servicio de Redis"""
@@ -22,6 +28,36 @@ def set_algorithms_service(service):
     global algorithms_service
     algorithms_service = service
 
+def set_rollup_service(service):
+    """Establece el servicio de rollups de ventas"""
+    global rollup_service
+    rollup_service = service
+
+def set_dashboard_service(service):
+    """Establece el servicio de resumen del dashboard"""
+    global dashboard_service
+    dashboard_service = service
+
+def set_payment_worker_service(service):
+    """Establece el servicio de workers de pago asíncrono"""
+    global payment_worker_service
+    payment_worker_service = service
+
+def set_outbox_relay_service(service):
+    """Establece el servicio de relay del outbox"""
+    global outbox_relay_service
+    outbox_relay_service = service
+
+def set_email_worker_service(service):
+    """Establece el servicio de worker de correos"""
+    global email_worker_service
+    email_worker_service = service
+
+def set_email_retention_service(service):
+    """Establece el servicio de retención de correos"""
+    global email_retention_service
+    email_retention_service = service
+
 def get_redis_service():
     """Obtiene el servicio de Redis"""
     return redis_service
@@ -32,4 +68,28 @@ def get_mongodb_service():
 
 def get_algorithms_service():
     """Obtiene el servicio de algoritmos"""
-    return algorithms_service 
\ No newline at end of file
+    return algorithms_service 
+
+def get_rollup_service():
+    """Obtiene el servicio de rollups de ventas"""
+    return rollup_service
+
+def get_dashboard_service():
+    """Obtiene el servicio de resumen del dashboard"""
+    return dashboard_service
+
+def get_payment_worker_service():
+    """Obtiene el servicio de workers de pago asíncrono"""
+    return payment_worker_service
+
+def get_outbox_relay_service():
+    """Obtiene el servicio de relay del outbox"""
+    return outbox_relay_service
+
+def get_email_worker_service():
+    """Obtiene el servicio de worker de correos"""
+    return email_worker_service
+
+def get_email_retention_service():
+    """Obtiene el servicio de retención de correos"""
+    return email_retention_service
\ No newline at end of file
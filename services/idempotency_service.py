@@ -0,0 +1,156 @@
+"""
+Claves de idempotencia para operaciones de compra
+
+Un cliente que reintenta una compra con el mismo ``Idempotency-Key``
+recibe la respuesta original en lugar de volver a ejecutar el pipeline.
+El estado de cada clave se guarda en Redis:
+
+- ``en_proceso``: la primera petición aún se está ejecutando; los
+  duplicados concurrentes esperan a que termine o reciben 409.
+- ``completada``: respuesta guardada (status, cabeceras y cuerpo) que se
+  devuelve byte a byte durante la ventana configurada.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+
+from config.settings import settings
+
+# Cabeceras de la respuesta original que se conservan al repetirla
+CABECERAS_REPETIBLES = ("location",)
+
+# Contadores del proceso (expuestos en /api/v1/metricas/idempotencia)
+estadisticas_idempotencia: Dict[str, int] = {
+    "ejecutadas": 0,
+    "repetidas": 0,
+    "esperas": 0,
+    "conflictos": 0
+}
+
+
+def huella_peticion(datos: Dict[str, Any]) -> str:
+    """Hash estable del cuerpo de la petición"""
+    serializado = json.dumps(datos, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode()).hexdigest()
+
+
+class IdempotencyService:
+    """
+    Ejecuta una operación como máximo una vez por clave de idempotencia
+    """
+
+    def __init__(self, redis_service):
+        self.redis_service = redis_service
+
+    @staticmethod
+    def _clave_redis(alcance: str, clave: str) -> str:
+        return f"idempotencia:{alcance}:{clave}"
+
+    async def ejecutar(
+        self,
+        clave: str,
+        alcance: str,
+        datos: Dict[str, Any],
+        operacion: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        """
+        Ejecuta ``operacion`` o repite la respuesta ya guardada para la clave
+
+        Args:
+            clave: Valor de la cabecera ``Idempotency-Key``
+            alcance: Espacio de la clave (usuario y operación)
+            datos: Cuerpo de la petición; reutilizar la clave con otro cuerpo es un error
+            operacion: Corrutina que produce la respuesta ya renderizada
+
+        Returns:
+            Response: Respuesta original o su repetición
+        """
+        if not clave or len(clave) > 255:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Idempotency-Key inválida (1 a 255 caracteres)"
+            )
+
+        clave_redis = self._clave_redis(alcance, clave)
+        huella = huella_peticion(datos)
+        marcador = json.dumps({"estado": "en_proceso", "huella": huella})
+
+        adquirida = await self.redis_service.set_with_expiry(
+            clave_redis, marcador,
+            expire_seconds=settings.idempotencia_bloqueo_ttl,
+            only_if_not_exists=True
+        )
+        if not adquirida:
+            return await self._repetir(clave_redis, huella)
+
+        try:
+            respuesta = await operacion()
+        except Exception:
+            # Sin respuesta que guardar: el cliente puede reintentar
+            await self.redis_service.delete(clave_redis)
+            raise
+
+        await self.redis_service.set(clave_redis, json.dumps({
+            "estado": "completada",
+            "huella": huella,
+            "status_code": respuesta.status_code,
+            "cabeceras": {
+                nombre: valor for nombre, valor in respuesta.headers.items()
+                if nombre in CABECERAS_REPETIBLES
+            },
+            "cuerpo": respuesta.body.decode()
+        }), expire=settings.idempotencia_ttl)
+        estadisticas_idempotencia["ejecutadas"] += 1
+        return respuesta
+
+    async def _repetir(self, clave_redis: str, huella: str) -> Response:
+        """Espera a que la petición original termine y repite su respuesta"""
+        limite = time.monotonic() + settings.idempotencia_espera_segundos
+        espero = False
+
+        while True:
+            registro = await self._obtener(clave_redis)
+            if registro is None:
+                # La petición original falló y liberó la clave
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="La petición original con esta Idempotency-Key falló; reintente"
+                )
+
+            if registro["huella"] != huella:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key ya usada con una petición distinta"
+                )
+
+            if registro["estado"] == "completada":
+                estadisticas_idempotencia["repetidas"] += 1
+                if espero:
+                    estadisticas_idempotencia["esperas"] += 1
+                return Response(
+                    content=registro["cuerpo"],
+                    status_code=registro["status_code"],
+                    headers={**registro["cabeceras"], "Idempotent-Replayed": "true"},
+                    media_type="application/json"
+                )
+
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                estadisticas_idempotencia["conflictos"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Hay una petición en curso con esta Idempotency-Key"
+                )
+
+            espero = True
+            await asyncio.sleep(min(settings.idempotencia_intervalo, restante))
+
+    async def _obtener(self, clave_redis: str) -> Optional[Dict[str, Any]]:
+        valor = await self.redis_service.get(clave_redis)
+        return json.loads(valor) if valor else None
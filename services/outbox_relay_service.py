@@ -0,0 +1,233 @@
+"""
+Relay del outbox transaccional
+
+Lee los eventos pendientes de la colección ``outbox`` y los publica en
+Redis en lotes: evento de venta en ``stream:ventas``, correo en el stream
+de notificaciones, contadores de ranking/métricas por película y el QR
+pregenerado de cada entrada. La
+entrega del outbox es al menos una vez: los efectos de cada evento se
+aplican en Redis con un script Lua junto con un marcador por
+``transaccion_id``, así que una reentrega no repite streams ni contadores.
+"""
+
+import asyncio
+import json
+import socket
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from config.settings import settings
+from domain.entities.transaccion import EstadoTransaccion
+from domain.repositories.outbox_repository import OutboxRepository
+from services.email_service import email_service
+from services.ticket_service import ticket_service
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+STREAM_VENTAS = "stream:ventas"
+
+# Marcador de evento ya publicado (cubre de sobra la expiración del outbox)
+PREFIJO_PUBLICADO = "outbox:publicado:"
+TTL_PUBLICADO = 7 * 86400
+
+# Efectos de un evento, atómicos y una sola vez por transacción.
+# KEYS: marcador, stream de ventas, stream de correo, cola de correo,
+#       ranking, métricas de la película, audiencia de la película
+# ARGV: ttl, ahora, n, campos de venta..., n, campos de
+#       correo..., pelicula_id, cantidad_asientos, cliente_id
+SCRIPT_PUBLICAR = """
+if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+local i = 3
+local n = tonumber(ARGV[i])
+redis.call('XADD', KEYS[2], '*', unpack(ARGV, i + 1, i + n))
+i = i + n + 1
+n = tonumber(ARGV[i])
+if n > 0 then
+    local id = redis.call('XADD', KEYS[3], '*', unpack(ARGV, i + 1, i + n))
+    redis.call('ZADD', KEYS[4], ARGV[2], id)
+end
+i = i + n + 1
+if ARGV[i] ~= '' then
+    redis.call('ZINCRBY', KEYS[5], ARGV[i + 1], ARGV[i])
+    redis.call('HINCRBY', KEYS[6], 'ventas_total', 1)
+    if ARGV[i + 2] ~= '' then
+        redis.call('PFADD', KEYS[7], ARGV[i + 2])
+    end
+end
+return 1
+"""
+
+
+class OutboxRelayService:
+    """
+    Publica en Redis los eventos registrados en el outbox
+    """
+
+    def __init__(self, mongodb_service, redis_service):
+        self.mongodb_service = mongodb_service
+        self.redis_service = redis_service
+        self.outbox_repo = OutboxRepository(mongodb_service.database, mongodb_service.client)
+        self.relay_id = f"{socket.gethostname()}-{id(self)}"
+        self._tarea: Optional[asyncio.Task] = None
+        self._despertar = asyncio.Event()
+        self._activo = False
+
+        self.publicados = 0
+        self.descartados = 0
+        self.errores = 0
+
+    async def iniciar(self):
+        """Crea índices y lanza el loop del relay"""
+        await self.outbox_repo.crear_indices()
+        self._activo = True
+        self._tarea = asyncio.create_task(self._ejecutar())
+
+    async def detener(self):
+        """Detiene el relay (los eventos reclamados vuelven a estar disponibles al vencer el lease)"""
+        self._activo = False
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def notificar(self):
+        """Despierta el relay tras registrar eventos nuevos"""
+        self._despertar.set()
+
+    async def _ejecutar(self):
+        """Loop principal: procesa lotes hasta vaciar el outbox y luego espera"""
+        while self._activo:
+            try:
+                procesados = await self.procesar_lote()
+                if procesados >= settings.outbox_batch_size:
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), timeout=settings.outbox_intervalo)
+                except asyncio.TimeoutError:
+                    pass
+                self._despertar.clear()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errores += 1
+                logger.error("Error en relay del outbox", extra={"error": str(e)})
+                await asyncio.sleep(1)
+
+    async def procesar_lote(self) -> int:
+        """
+        Reclama y publica un lote de eventos
+
+        Returns:
+            int: Número de eventos reclamados
+        """
+        eventos = await self.outbox_repo.reclamar_lote(
+            self.relay_id, settings.outbox_batch_size, settings.outbox_lease_segundos
+        )
+        if not eventos:
+            return 0
+
+        listos = await self._filtrar_confirmados(eventos)
+        if listos:
+            await self._publicar(listos)
+            await self.outbox_repo.marcar_publicados([evento["_id"] for evento in listos])
+            self.publicados += len(listos)
+        return len(eventos)
+
+    async def _filtrar_confirmados(self, eventos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Separa los eventos cuya transacción quedó confirmada
+
+        Con replica set el evento solo existe si la confirmación se aplicó.
+        En un servidor standalone se verifica el estado con una sola consulta:
+        los eventos aún sin confirmar se liberan y los que superan la
+        expiración se descartan.
+        """
+        if await self.outbox_repo.soporta_transacciones():
+            return eventos
+
+        ids = list({evento["transaccion_id"] for evento in eventos})
+        confirmadas = await self.mongodb_service.database.transacciones.distinct(
+            "_id", {"_id": {"$in": ids}, "estado": EstadoTransaccion.CONFIRMADO.value}
+        )
+        confirmadas = {str(transaccion_id) for transaccion_id in confirmadas}
+
+        limite = datetime.now() - timedelta(seconds=settings.outbox_expiracion_segundos)
+        listos, en_espera, vencidos = [], [], []
+        for evento in eventos:
+            if evento["transaccion_id"] in confirmadas:
+                listos.append(evento)
+            elif evento["creado"] < limite:
+                vencidos.append(evento["_id"])
+            else:
+                en_espera.append(evento["_id"])
+
+        await self.outbox_repo.liberar(en_espera)
+        self.descartados += await self.outbox_repo.descartar(vencidos, "transaccion no confirmada")
+        return listos
+
+    async def _publicar(self, eventos: List[Dict[str, Any]]):
+        """Publica un lote en Redis (un script por evento en un pipeline) y pregenera los QR"""
+        # 1-2. Streams de ventas y correos, cola de correos y contadores por película
+        ahora = datetime.now().timestamp()
+        llamadas = [self._llamada_script(evento, ahora) for evento in eventos]
+        resultados = await self.redis_service.script_lote(SCRIPT_PUBLICAR, llamadas)
+        repetidos = len(resultados) - sum(resultados)
+        if repetidos:
+            logger.info("Eventos del outbox ya publicados omitidos", extra={"repetidos": repetidos})
+
+        # 3. QR de las entradas en un solo lote de render (el endpoint
+        # de la entrada lo regenera si esto falla, no se reintenta el lote)
+        entradas = [evento["entrada"] for evento in eventos if evento.get("entrada")]
+        try:
+            await ticket_service.pregenerar_lote(entradas)
+        except Exception as e:
+            logger.warning("Error pregenerando QR de entradas", extra={"error": str(e)})
+
+    @classmethod
+    def _llamada_script(cls, evento: Dict[str, Any], ahora: float) -> tuple:
+        """KEYS y ARGV de SCRIPT_PUBLICAR para un evento"""
+        venta = evento["venta"]
+        pelicula_id = venta.get("pelicula_id") or ""
+        keys = [
+            f"{PREFIJO_PUBLICADO}{evento['transaccion_id']}",
+            STREAM_VENTAS,
+            email_service.email_stream,
+            email_service.email_queue,
+            "ranking:peliculas:ventas",
+            f"metricas:pelicula:{pelicula_id}",
+            f"audiencia:pelicula:{pelicula_id}"
+        ]
+        args = [TTL_PUBLICADO, ahora]
+        for campos in (venta, evento.get("correo") or {}):
+            campos = cls._campos_stream(campos)
+            args.append(len(campos) * 2)
+            for clave, valor in campos.items():
+                args.extend((clave, valor))
+        args.extend((pelicula_id, venta.get("cantidad_asientos") or 0, venta.get("cliente_id") or ""))
+        return keys, args
+
+    @staticmethod
+    def _campos_stream(campos: Dict[str, Any]) -> Dict[str, str]:
+        """Convierte los campos a string para Redis"""
+        return {
+            clave: valor if isinstance(valor, str) else json.dumps(valor, default=str)
+            for clave, valor in campos.items()
+            if valor is not None
+        }
+
+    async def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas del relay y del outbox"""
+        return {
+            "publicados": self.publicados,
+            "descartados": self.descartados,
+            "errores": self.errores,
+            "outbox": await self.outbox_repo.contar_por_estado()
+        }
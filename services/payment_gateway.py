@@ -0,0 +1,60 @@
+"""
+Pasarela de pagos local (stub) con latencia y tasa de éxito configurables
+
+Permite hacer pruebas de carga del flujo de compra sin depender de un
+proveedor externo.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+from config.settings import settings
+
+
+class StubPaymentGateway:
+    """Simula la autorización de un pago en un proveedor externo"""
+
+    def __init__(self, latencia_ms: int = None, tasa_exito: float = None):
+        self.latencia_ms = settings.pagos_latencia_ms if latencia_ms is None else latencia_ms
+        self.tasa_exito = settings.pagos_tasa_exito if tasa_exito is None else tasa_exito
+
+    async def autorizar(self, transaccion_id: str, monto: float) -> Dict[str, Any]:
+        """
+        Autoriza un pago
+
+        Returns:
+            Dict con ``exitoso``, ``mensaje``, ``fecha_procesamiento`` y,
+            si fue aprobado, ``codigo_autorizacion``
+        """
+        try:
+            # Simular el round trip con el proveedor
+            if self.latencia_ms > 0:
+                await asyncio.sleep(self.latencia_ms / 1000)
+
+            if random.random() < self.tasa_exito:
+                return {
+                    "exitoso": True,
+                    "codigo_autorizacion": f"AUTH{int(time.time())}{random.randint(1000, 9999)}",
+                    "mensaje": "Pago procesado exitosamente",
+                    "fecha_procesamiento": datetime.now().isoformat()
+                }
+
+            return {
+                "exitoso": False,
+                "mensaje": "Tarjeta rechazada - fondos insuficientes",
+                "fecha_procesamiento": datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            return {
+                "exitoso": False,
+                "mensaje": f"Error procesando pago: {str(e)}",
+                "fecha_procesamiento": datetime.now().isoformat()
+            }
+
+
+# Instancia global de la pasarela
+payment_gateway = StubPaymentGateway()
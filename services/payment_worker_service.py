@@ -0,0 +1,176 @@
+"""
+Pool de workers de pago asíncrono
+
+Consume las órdenes de pago de ``stream:pagos`` con un grupo de
+consumidores, procesa cada pago con la pasarela y notifica al cliente por
+WebSocket. Los clientes sin WebSocket consultan el estado por long-poll.
+"""
+
+import asyncio
+import json
+import socket
+import time
+from typing import Optional, Dict, Any, List
+
+from config.settings import settings
+from domain.entities.transaccion import EstadoTransaccion
+from use_cases.comprar_entrada_use_case import ComprarEntradaUseCase, PagoEnCurso, STREAM_PAGOS
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+class PaymentWorkerService:
+    """
+    Pool de N consumidores de ``stream:pagos``
+
+    Los mensajes que un worker no alcanza a confirmar (caída del proceso)
+    quedan pendientes en el grupo y se reclaman con XAUTOCLAIM.
+    """
+
+    def __init__(self, redis_service, concurrencia: int = None):
+        self.redis_service = redis_service
+        self.concurrencia = concurrencia or settings.pagos_workers
+        self.grupo = settings.pagos_consumer_group
+        self.prefijo_consumidor = f"{socket.gethostname()}-{id(self)}"
+        self._tareas: List[asyncio.Task] = []
+        self._esperas: Dict[str, asyncio.Event] = {}
+        self._activo = False
+
+        self.procesados = 0
+        self.errores = 0
+
+    async def iniciar(self):
+        """Crea el grupo de consumidores y lanza los workers"""
+        await self.redis_service.xgroup_create(STREAM_PAGOS, self.grupo, id="0", mkstream=True)
+        self._activo = True
+        self._tareas = [
+            asyncio.create_task(self._trabajador(f"{self.prefijo_consumidor}-{i}"))
+            for i in range(self.concurrencia)
+        ]
+
+    async def detener(self):
+        """Detiene los workers (los mensajes sin ACK se reprocesarán)"""
+        self._activo = False
+        for tarea in self._tareas:
+            tarea.cancel()
+        for tarea in self._tareas:
+            try:
+                await tarea
+            except asyncio.CancelledError:
+                pass
+        self._tareas = []
+
+    async def _trabajador(self, consumidor: str):
+        """Loop de un worker: reclama pendientes abandonados y lee nuevos"""
+        ultimo_reclamo = 0.0
+        while self._activo:
+            try:
+                mensajes = []
+
+                if time.monotonic() - ultimo_reclamo > settings.pagos_reclamo_segundos:
+                    ultimo_reclamo = time.monotonic()
+                    reclamados = await self.redis_service.xautoclaim(
+                        STREAM_PAGOS, self.grupo, consumidor,
+                        min_idle_time=settings.pagos_reclamo_segundos * 1000,
+                        count=10
+                    )
+                    mensajes = reclamados[1] if reclamados else []
+
+                if not mensajes:
+                    leidos = await self.redis_service.xreadgroup(
+                        self.grupo, consumidor, {STREAM_PAGOS: ">"}, count=1, block=5000
+                    )
+                    mensajes = [m for _, eventos in leidos or [] for m in eventos]
+
+                for message_id, campos in mensajes:
+                    try:
+                        await self.procesar(campos.get("transaccion_id"))
+                    except PagoEnCurso:
+                        # Otro worker la tiene reclamada: sin ACK, se reclama al vencer su reclamo
+                        continue
+                    await self.redis_service.xack(STREAM_PAGOS, self.grupo, message_id)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errores += 1
+                logger.error("Error en worker de pagos", extra={"consumidor": consumidor, "error": str(e)})
+                await asyncio.sleep(1)
+
+    async def procesar(self, transaccion_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Procesa el pago de una transacción pendiente y notifica al cliente"""
+        if not transaccion_id:
+            return None
+
+        respuesta = await ComprarEntradaUseCase().completar_pago(transaccion_id)
+        if respuesta is None:
+            # Reentrega de un pago ya procesado
+            return None
+
+        self.procesados += 1
+        await self._notificar(transaccion_id, respuesta)
+        return respuesta
+
+    async def _notificar(self, transaccion_id: str, respuesta: Dict[str, Any]):
+        """Despierta los long-polls locales y notifica por WebSocket"""
+        evento = self._esperas.pop(transaccion_id, None)
+        if evento:
+            evento.set()
+
+        try:
+            from services.websocket_service import manager
+            usuario_id = respuesta["resumen"]["cliente_id"]
+            await manager.send_personal_message(json.dumps({
+                "type": "pago_completado",
+                "transaccion_id": transaccion_id,
+                "estado": respuesta["estado"],
+                "resultado_pago": respuesta["resultado_pago"]
+            }, default=str), usuario_id)
+        except Exception as e:
+            logger.warning("Error notificando pago por WebSocket", extra={"error": str(e)})
+
+    def evento_espera(self, transaccion_id: str) -> asyncio.Event:
+        """Evento que se activa cuando este proceso completa el pago"""
+        return self._esperas.setdefault(transaccion_id, asyncio.Event())
+
+    def liberar_espera(self, transaccion_id: str):
+        """Descarta el evento de espera de una transacción"""
+        self._esperas.pop(transaccion_id, None)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Estadísticas del pool"""
+        return {
+            "workers": len(self._tareas),
+            "procesados": self.procesados,
+            "errores": self.errores,
+            "esperas_activas": len(self._esperas)
+        }
+
+
+async def esperar_estado_pago(redis_service, transaccion_id: str, timeout: float,
+                              pool: Optional[PaymentWorkerService] = None) -> Optional[Dict[str, Any]]:
+    """
+    Long-poll del estado de un pago
+
+    Devuelve en cuanto el pago deja de estar pendiente o al vencer el
+    timeout. Si el pago se procesa en este proceso responde de inmediato;
+    si no, consulta Redis periódicamente.
+    """
+    limite = time.monotonic() + timeout
+    while True:
+        estado = await redis_service.obtener_estado_pago(transaccion_id)
+        restante = limite - time.monotonic()
+        if not estado or estado.get("estado") != EstadoTransaccion.PENDIENTE.value or restante <= 0:
+            if pool:
+                pool.liberar_espera(transaccion_id)
+            return estado
+
+        espera = min(settings.pagos_long_poll_intervalo, restante)
+        if pool:
+            try:
+                await asyncio.wait_for(pool.evento_espera(transaccion_id).wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(espera)
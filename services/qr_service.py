@@ -0,0 +1,228 @@
+"""
+Generación de códigos QR fuera del event loop y con cache
+
+Codificar el PNG de un QR es CPU puro y antes se hacía en línea en tres
+sitios (compra, correo y endpoint de algoritmos). Aquí se centraliza:
+
+- El render corre en un ``ProcessPoolExecutor`` (no compite por el GIL).
+- El resultado se cachea por hash del contenido: LRU en memoria y,
+  opcionalmente, Redis para compartirlo entre workers y reinicios.
+- Peticiones idénticas concurrentes se agrupan (single-flight).
+- SVG como formato alternativo: es texto, no requiere compresión PNG.
+- Lotes (compras de grupo) en un único viaje al pool.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List
+
+from config.settings import settings
+from infrastructure.cache.entity_cache import LRUCache
+from infrastructure.utils.qr_generator import renderizar_qr, renderizar_lote
+from infrastructure.utils.single_flight import SingleFlight
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+FORMATOS = ("png", "svg")
+
+
+class QRService:
+    """
+    Servicio único de QR: pool de procesos + cache LRU/Redis
+    """
+
+    def __init__(self, redis_service=None, procesos: int = None):
+        self.redis_service = redis_service
+        self.procesos = settings.qr_procesos if procesos is None else procesos
+        self.box_size = settings.qr_box_size
+        self.border = settings.qr_border
+        self.l1 = LRUCache(settings.qr_cache_max_items)
+        self.single_flight = SingleFlight("qr.generar")
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.renders = 0
+        self.errores = 0
+        self.tiempo_render = 0.0
+
+    def habilitar_redis(self, redis_service):
+        """Activa la persistencia de QR generados en Redis"""
+        self.redis_service = redis_service if settings.qr_redis_habilitado else None
+
+    async def iniciar(self, redis_service=None):
+        """Crea el pool de procesos y lo calienta para no pagar el arranque en la primera compra"""
+        if redis_service is not None:
+            self.habilitar_redis(redis_service)
+        if self.procesos > 0:
+            await self.generar("warmup")
+
+    async def cerrar(self):
+        """Apaga el pool de procesos"""
+        if self._pool:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    def _obtener_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.procesos <= 0:
+            return None
+        if self._pool is None:
+            # spawn: no hereda el event loop ni los hilos del proceso padre
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.procesos,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def clave(self, datos: str, formato: str = "png") -> str:
+        """Clave de cache: hash del contenido y de los parámetros de render"""
+        huella = hashlib.sha256(f"{formato}:{self.box_size}:{self.border}:{datos}".encode()).hexdigest()
+        return f"qr:{formato}:{huella}"
+
+    async def _ejecutar(self, funcion, *args) -> Any:
+        """Ejecuta el render en el pool (o en un hilo si no hay procesos)"""
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._obtener_pool(), funcion, *args)
+        except Exception:
+            self.errores += 1
+            raise
+        finally:
+            self.tiempo_render += time.perf_counter() - inicio
+
+    async def _leer_l2(self, claves: List[str]) -> List[Optional[str]]:
+        if not self.redis_service or not claves:
+            return [None] * len(claves)
+        try:
+            return await self.redis_service.pipeline_execute([("get", (c,), {}) for c in claves])
+        except Exception as e:
+            logger.warning("Error leyendo QR de Redis", extra={"error": str(e)})
+            return [None] * len(claves)
+
+    async def _guardar(self, valores: Dict[str, str]):
+        for clave, valor in valores.items():
+            self.l1.set(clave, valor, settings.qr_cache_ttl)
+        if not self.redis_service or not valores:
+            return
+        try:
+            await self.redis_service.pipeline_execute([
+                ("set", (clave, valor), {"ex": settings.qr_cache_ttl}) for clave, valor in valores.items()
+            ])
+        except Exception as e:
+            logger.warning("Error guardando QR en Redis", extra={"error": str(e)})
+
+    def _validar_formato(self, formato: str):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de QR no soportado: {formato}")
+
+    async def generar(self, datos: str, formato: str = "png") -> str:
+        """
+        Obtiene el QR de ``datos`` desde cache o lo renderiza en el pool
+
+        Returns:
+            str: PNG en base64 o documento SVG
+        """
+        self._validar_formato(formato)
+        clave = self.clave(datos, formato)
+        valor = self.l1.get(clave)
+        if valor is not None:
+            self.l1_hits += 1
+            return valor
+        return await self.single_flight.hacer(clave, lambda: self._cargar(clave, datos, formato))
+
+    async def _cargar(self, clave: str, datos: str, formato: str) -> str:
+        valor = (await self._leer_l2([clave]))[0]
+        if valor is not None:
+            self.l2_hits += 1
+            self.l1.set(clave, valor, settings.qr_cache_ttl)
+            return valor
+
+        valor = await self._ejecutar(renderizar_qr, datos, formato, self.box_size, self.border)
+        self.renders += 1
+        await self._guardar({clave: valor})
+        return valor
+
+    async def generar_lote(self, lista_datos: List[str], formato: str = "png") -> List[str]:
+        """
+        Genera los QR de un lote (p. ej. una entrada por asiento en compras de grupo)
+
+        Solo se renderizan los que no están en cache, repartidos en un
+        bloque por proceso del pool. Mantiene el orden de entrada.
+        """
+        self._validar_formato(formato)
+        claves = {datos: self.clave(datos, formato) for datos in lista_datos}
+        resultados: Dict[str, str] = {}
+
+        for datos, clave in claves.items():
+            valor = self.l1.get(clave)
+            if valor is not None:
+                self.l1_hits += 1
+                resultados[datos] = valor
+
+        faltantes = [d for d in claves if d not in resultados]
+        for datos, valor in zip(faltantes, await self._leer_l2([claves[d] for d in faltantes])):
+            if valor is not None:
+                self.l2_hits += 1
+                self.l1.set(claves[datos], valor, settings.qr_cache_ttl)
+                resultados[datos] = valor
+
+        faltantes = [d for d in faltantes if d not in resultados]
+        if faltantes:
+            tamano = -(-len(faltantes) // max(self.procesos, 1))
+            bloques = [faltantes[i:i + tamano] for i in range(0, len(faltantes), tamano)]
+            renderizados = await asyncio.gather(*[
+                self._ejecutar(renderizar_lote, bloque, formato, self.box_size, self.border) for bloque in bloques
+            ])
+            nuevos = {}
+            for bloque, valores in zip(bloques, renderizados):
+                for datos, valor in zip(bloque, valores):
+                    resultados[datos] = valor
+                    nuevos[claves[datos]] = valor
+            self.renders += len(nuevos)
+            await self._guardar(nuevos)
+
+        return [resultados[datos] for datos in lista_datos]
+
+    def generar_sync(self, datos: str, formato: str = "png") -> str:
+        """
+        Variante síncrona para código que no corre en el event loop
+
+        Consulta la cache en memoria y, si no está, renderiza en línea.
+        """
+        self._validar_formato(formato)
+        clave = self.clave(datos, formato)
+        valor = self.l1.get(clave)
+        if valor is not None:
+            self.l1_hits += 1
+            return valor
+
+        inicio = time.perf_counter()
+        valor = renderizar_qr(datos, formato, self.box_size, self.border)
+        self.tiempo_render += time.perf_counter() - inicio
+        self.renders += 1
+        self.l1.set(clave, valor, settings.qr_cache_ttl)
+        return valor
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Hits por nivel, renders y tiempo medio de render"""
+        consultas = self.l1_hits + self.l2_hits + self.renders
+        return {
+            "procesos": self.procesos,
+            "redis": self.redis_service is not None,
+            "l1_items": len(self.l1),
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "renders": self.renders,
+            "errores": self.errores,
+            "hit_ratio": round((self.l1_hits + self.l2_hits) / consultas, 4) if consultas else 0.0,
+            "render_promedio_ms": round(self.tiempo_render / self.renders * 1000, 2) if self.renders else 0.0,
+            "single_flight": self.single_flight.obtener_estadisticas()
+        }
+
+
+# Instancia global (el pool se crea en el primer uso)
+qr_service = QRService()
@@ -0,0 +1,472 @@
+"""
+Servicio de rollups de ventas pre-agregados
+
+Consume el stream ``stream:ventas`` y mantiene buckets por hora y por día
+agrupados por película, función y canal de venta en la colección
+``rollups_ventas``. Los endpoints de métricas responden desde estos buckets
+en lugar de agregar las transacciones crudas en cada request.
+
+Hasta la primera reconstrucción (``backfill_rollups.py``) los buckets solo
+tienen las ventas consumidas desde que arrancó el servicio; ``cubre()``
+indica si una consulta puede responderse desde ellos.
+
+Entrega al menos una vez: un lote se confirma (XACK) y se marca como
+procesado (``rollup:procesado:{transaccion_id}``) solo después de escribir
+sus incrementos; los lotes que fallan quedan pendientes en el grupo y se
+reclaman con XAUTOCLAIM.
+"""
+
+import asyncio
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Tuple, Union
+
+from pymongo import IndexModel, UpdateOne
+
+from config.settings import settings
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+STREAM_VENTAS = "stream:ventas"
+GRANULARIDADES = ("hora", "dia")
+
+# Marca de transacción ya sumada en los buckets (descarta reentregas)
+PREFIJO_PROCESADO = "rollup:procesado:"
+TTL_PROCESADO = 7 * 86400
+
+# Mientras exista, ningún consumidor (de ningún proceso) aplica eventos
+CLAVE_PAUSA = "rollup:pausa"
+
+# Documento de ``rollups_estado`` con el alcance de las reconstrucciones:
+# los buckets están completos desde ``desde`` (None = todo el histórico)
+ID_ESTADO = "ventas"
+
+
+def parsear_fecha(valor: Union[str, datetime, None]) -> Optional[datetime]:
+    """Convierte un valor de fecha (ISO string o datetime) a datetime naive"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        fecha = valor
+    else:
+        try:
+            fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return fecha.replace(tzinfo=None)
+
+
+def inicio_bucket(fecha: datetime, granularidad: str) -> datetime:
+    """Obtiene el inicio del bucket que contiene la fecha"""
+    if granularidad == "hora":
+        return fecha.replace(minute=0, second=0, microsecond=0)
+    if granularidad == "dia":
+        return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+
+def rango_consulta(fecha_inicio: Union[str, datetime], fecha_fin: Union[str, datetime]) -> Tuple[str, datetime, datetime]:
+    """
+    Normaliza un rango de fechas a (granularidad, inicio, fin_exclusivo)
+
+    Las fechas sin hora (YYYY-MM-DD) se interpretan como días completos.
+    Si ambos extremos caen en medianoche se usan buckets diarios, si no
+    buckets por hora.
+    """
+    inicio = parsear_fecha(fecha_inicio)
+    fin = parsear_fecha(fecha_fin)
+    if inicio is None or fin is None:
+        raise ValueError("Rango de fechas inválido")
+
+    if isinstance(fecha_fin, str) and len(fecha_fin) == 10:
+        fin = fin + timedelta(days=1)
+    elif fin != inicio_bucket(fin, "hora"):
+        # Incluir el bucket que contiene el extremo final
+        fin = inicio_bucket(fin, "hora") + timedelta(hours=1)
+    inicio = inicio_bucket(inicio, "hora")
+
+    alineado_dia = inicio == inicio_bucket(inicio, "dia") and fin == inicio_bucket(fin, "dia")
+    granularidad = "dia" if alineado_dia else "hora"
+    return granularidad, inicio, fin
+
+
+class RollupService:
+    """
+    Mantiene rollups incrementales de ventas a partir de ``stream:ventas``
+    """
+
+    def __init__(self, mongodb_service, redis_service):
+        self.mongodb_service = mongodb_service
+        self.redis_service = redis_service
+        self.collection = mongodb_service.database.rollups_ventas
+        self.estado = mongodb_service.database.rollups_estado
+        self._completo = False
+        self.grupo = settings.rollups_consumer_group
+        self.consumidor = f"{socket.gethostname()}-{id(self)}"
+        self._tarea: Optional[asyncio.Task] = None
+        self._activo = False
+        # Serializa los lotes del consumidor local con una reconstrucción
+        self._lock = asyncio.Lock()
+
+    async def iniciar(self):
+        """Crea índices, el grupo de consumidores y lanza el consumidor"""
+        await self.collection.create_indexes([
+            IndexModel(
+                [("granularidad", 1), ("periodo", 1), ("pelicula_id", 1), ("funcion_id", 1), ("canal_venta", 1)],
+                unique=True
+            ),
+            IndexModel([("granularidad", 1), ("pelicula_id", 1)])
+        ])
+        await self.redis_service.xgroup_create(STREAM_VENTAS, self.grupo, id="0", mkstream=True)
+        if not await self.cubre():
+            logger.warning("Rollups de ventas sin reconstruir: las métricas se calculan desde las transacciones")
+
+        self._activo = True
+        self._tarea = asyncio.create_task(self._consumir())
+
+    async def detener(self):
+        """Detiene el consumidor del stream"""
+        self._activo = False
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _consumir(self):
+        """Loop principal: reclama pendientes abandonados o fallidos y lee nuevos"""
+        ultimo_reclamo = 0.0
+        while self._activo:
+            try:
+                if await self.redis_service.exists(CLAVE_PAUSA):
+                    # Reconstrucción en curso: los eventos esperan en el stream
+                    await asyncio.sleep(1)
+                    continue
+
+                mensajes = []
+                if time.monotonic() - ultimo_reclamo > settings.rollups_reclamo_segundos:
+                    ultimo_reclamo = time.monotonic()
+                    reclamados = await self.redis_service.xautoclaim(
+                        STREAM_VENTAS, self.grupo, self.consumidor,
+                        min_idle_time=settings.rollups_reclamo_segundos * 1000,
+                        count=settings.rollups_batch_size
+                    )
+                    mensajes = reclamados[1] if reclamados else []
+
+                if not mensajes:
+                    leidos = await self.redis_service.xreadgroup(
+                        self.grupo,
+                        self.consumidor,
+                        {STREAM_VENTAS: ">"},
+                        count=settings.rollups_batch_size,
+                        block=5000
+                    )
+                    mensajes = [m for _, eventos in leidos or [] for m in eventos]
+
+                if mensajes:
+                    await self._procesar_lote(mensajes)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error consumiendo stream de ventas", extra={"error": str(e)})
+                await asyncio.sleep(1)
+
+    async def _procesar_lote(self, mensajes: List[Tuple[str, Optional[Dict[str, Any]]]]) -> bool:
+        """
+        Aplica y confirma un lote leído del stream
+
+        Si empezó una reconstrucción entre la lectura y la escritura el lote
+        no se aplica: queda pendiente y se reclama al terminar.
+        """
+        async with self._lock:
+            if await self.redis_service.exists(CLAVE_PAUSA):
+                return False
+            # Entradas reclamadas que ya se borraron del stream llegan sin campos
+            await self.procesar_eventos([campos for _, campos in mensajes if campos])
+        for message_id, _ in mensajes:
+            await self.redis_service.xack(STREAM_VENTAS, self.grupo, message_id)
+        return True
+
+    async def procesar_eventos(self, eventos: List[Dict[str, Any]]) -> int:
+        """
+        Aplica un lote de eventos de venta a los buckets
+
+        Los incrementos del lote se acumulan en memoria y se escriben con un
+        único bulk_write. Los eventos ya procesados (reentregas) se
+        descartan; las transacciones del lote se marcan como procesadas
+        solo después de escribir, así un bulk_write fallido se reintenta
+        completo en la reentrega.
+
+        Returns:
+            int: Número de eventos aplicados
+        """
+        ventas = [
+            evento for evento in eventos
+            if evento.get("tipo", "venta_confirmada") == "venta_confirmada"
+        ]
+        ids = list({evento["transaccion_id"] for evento in ventas if evento.get("transaccion_id")})
+        procesadas = await self._ya_procesadas(ids)
+
+        acumulado: Dict[tuple, Dict[str, float]] = {}
+        aplicadas = set()
+        aplicados = 0
+        for evento in ventas:
+            transaccion_id = evento.get("transaccion_id")
+            if transaccion_id and (transaccion_id in procesadas or transaccion_id in aplicadas):
+                continue
+
+            fecha = parsear_fecha(evento.get("fecha_creacion") or evento.get("timestamp"))
+            if fecha is None:
+                continue
+
+            self._acumular(
+                acumulado,
+                fecha,
+                evento.get("pelicula_id"),
+                evento.get("funcion_id"),
+                evento.get("canal_venta") or "web",
+                float(evento.get("monto") or 0),
+                int(float(evento.get("cantidad_asientos") or 0))
+            )
+            if transaccion_id:
+                aplicadas.add(transaccion_id)
+            aplicados += 1
+
+        await self._escribir(acumulado, operador="$inc")
+        await self._marcar_procesadas(aplicadas)
+        return aplicados
+
+    async def _ya_procesadas(self, ids: List[str]) -> set:
+        """Transacciones del lote que ya se sumaron en los buckets"""
+        if not ids:
+            return set()
+        marcas = await self.redis_service.mget([f"{PREFIJO_PROCESADO}{i}" for i in ids])
+        return {transaccion_id for transaccion_id, marca in zip(ids, marcas) if marca}
+
+    async def _marcar_procesadas(self, ids) -> None:
+        """Marca transacciones como sumadas (en lotes de 1000 por pipeline)"""
+        ids = list(ids)
+        for i in range(0, len(ids), 1000):
+            await self.redis_service.pipeline_execute([
+                ("set", (f"{PREFIJO_PROCESADO}{transaccion_id}", "1"), {"ex": TTL_PROCESADO})
+                for transaccion_id in ids[i:i + 1000]
+            ])
+
+    @staticmethod
+    def _acumular(acumulado: Dict[tuple, Dict[str, float]], fecha: datetime, pelicula_id: str,
+                  funcion_id: str, canal_venta: str, monto: float, asientos: int):
+        """Suma una venta en los buckets de todas las granularidades"""
+        for granularidad in GRANULARIDADES:
+            clave = (granularidad, inicio_bucket(fecha, granularidad), pelicula_id, funcion_id, canal_venta)
+            bucket = acumulado.setdefault(clave, {
+                "total_ventas": 0.0,
+                "total_transacciones": 0,
+                "total_asientos": 0
+            })
+            bucket["total_ventas"] += monto
+            bucket["total_transacciones"] += 1
+            bucket["total_asientos"] += asientos
+
+    async def _escribir(self, acumulado: Dict[tuple, Dict[str, float]], operador: str):
+        """Escribe los buckets acumulados con upserts en lote"""
+        if not acumulado:
+            return
+
+        ahora = datetime.now()
+        operaciones = []
+        for (granularidad, periodo, pelicula_id, funcion_id, canal_venta), totales in acumulado.items():
+            operaciones.append(UpdateOne(
+                {
+                    "granularidad": granularidad,
+                    "periodo": periodo,
+                    "pelicula_id": pelicula_id,
+                    "funcion_id": funcion_id,
+                    "canal_venta": canal_venta
+                },
+                {operador: totales, "$set": {"actualizado": ahora}} if operador == "$inc"
+                else {"$set": {**totales, "actualizado": ahora}},
+                upsert=True
+            ))
+
+        for i in range(0, len(operaciones), 1000):
+            await self.collection.bulk_write(operaciones[i:i + 1000], ordered=False)
+
+    async def reconstruir(self, desde: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Reconstruye los buckets a partir de las transacciones históricas
+
+        Los consumidores de todos los procesos se pausan (``rollup:pausa``)
+        mientras se borran y se sobrescriben ($set) los buckets, así ningún
+        $inc se pierde ni se duplica. Las transacciones recientes
+        reconstruidas se marcan como procesadas: sus eventos que sigan en
+        el stream se descartan al reanudar.
+
+        Args:
+            desde: Fecha desde la cual reconstruir (None = todo el histórico)
+        """
+        await self.redis_service.set_with_expiry(CLAVE_PAUSA, self.consumidor, settings.rollups_pausa_ttl)
+        try:
+            # Lotes que otro proceso leyó antes de ver la pausa y está escribiendo
+            await asyncio.sleep(settings.rollups_pausa_espera)
+            async with self._lock:
+                return await self._reconstruir(desde)
+        finally:
+            await self.redis_service.delete(CLAVE_PAUSA)
+
+    async def _reconstruir(self, desde: Optional[datetime]) -> Dict[str, int]:
+        filtro: Dict[str, Any] = {"estado": "confirmado"}
+        desde = inicio_bucket(desde, "dia") if desde else None
+        if desde:
+            filtro["fecha_creacion"] = {"$gte": desde}
+
+        proyeccion = {
+            "pelicula_id": 1, "funcion_id": 1, "canal_venta": 1,
+            "total": 1, "cantidad_asientos": 1, "fecha_creacion": 1
+        }
+        cursor = self.mongodb_service.database.transacciones.find(filtro, proyeccion).batch_size(5000)
+
+        # Solo las transacciones recientes pueden tener eventos aún en el stream
+        limite_marcas = datetime.now() - timedelta(seconds=TTL_PROCESADO)
+        acumulado: Dict[tuple, Dict[str, float]] = {}
+        recientes = []
+        transacciones = 0
+        async for doc in cursor:
+            fecha = parsear_fecha(doc.get("fecha_creacion"))
+            if fecha is None:
+                continue
+            self._acumular(
+                acumulado,
+                fecha,
+                doc.get("pelicula_id"),
+                doc.get("funcion_id"),
+                doc.get("canal_venta") or "web",
+                float(doc.get("total") or 0),
+                int(doc.get("cantidad_asientos") or 0)
+            )
+            if fecha >= limite_marcas:
+                recientes.append(str(doc["_id"]))
+            transacciones += 1
+
+        if desde:
+            await self.collection.delete_many({"periodo": {"$gte": desde}})
+        else:
+            await self.collection.delete_many({})
+        await self._escribir(acumulado, operador="$set")
+        await self._marcar_procesadas(recientes)
+        await self._registrar_reconstruccion(desde)
+
+        return {"transacciones": transacciones, "buckets": len(acumulado)}
+
+    async def _registrar_reconstruccion(self, desde: Optional[datetime]):
+        """Guarda desde cuándo están completos los buckets (conserva el alcance más amplio)"""
+        actual = await self.estado.find_one({"_id": ID_ESTADO})
+        if actual and (actual.get("desde") is None or (desde and actual["desde"] <= desde)):
+            desde = actual.get("desde")
+        await self.estado.update_one(
+            {"_id": ID_ESTADO},
+            {"$set": {"desde": desde, "reconstruido": datetime.now()}},
+            upsert=True
+        )
+
+    async def cubre(self, fecha_inicio: Union[str, datetime, None] = None) -> bool:
+        """
+        Indica si los buckets están completos desde ``fecha_inicio``
+
+        Sin fecha se pregunta por todo el histórico (ranking). Hasta que una
+        reconstrucción lo cubra, la consulta debe ir a las transacciones.
+        """
+        if self._completo:
+            return True
+        estado = await self.estado.find_one({"_id": ID_ESTADO})
+        if not estado:
+            return False
+        if estado.get("desde") is None:
+            self._completo = True
+            return True
+        inicio = parsear_fecha(fecha_inicio)
+        return inicio is not None and inicio >= estado["desde"]
+
+    # Consultas
+    async def _totales(self, fecha_inicio, fecha_fin) -> Dict[str, Any]:
+        granularidad, inicio, fin = rango_consulta(fecha_inicio, fecha_fin)
+        pipeline = [
+            {
+                "$match": {
+                    "granularidad": granularidad,
+                    "periodo": {"$gte": inicio, "$lt": fin}
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "total_ventas": {"$sum": "$total_ventas"},
+                    "total_transacciones": {"$sum": "$total_transacciones"},
+                    "total_asientos": {"$sum": "$total_asientos"}
+                }
+            }
+        ]
+        result = await self.collection.aggregate(pipeline).to_list(1)
+        return result[0] if result else {}
+
+    async def obtener_metricas_ventas(self, fecha_inicio: str, fecha_fin: str) -> Dict[str, Any]:
+        """Métricas de ventas en un período (mismo formato que MongoDBService)"""
+        totales = await self._totales(fecha_inicio, fecha_fin)
+        if not totales:
+            return {}
+
+        transacciones = totales["total_transacciones"]
+        totales["promedio_venta"] = totales["total_ventas"] / transacciones if transacciones else 0
+        return totales
+
+    async def obtener_estadisticas_ventas(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """Estadísticas de ventas (mismo formato que TransaccionRepository)"""
+        totales = await self._totales(fecha_inicio, fecha_fin)
+        transacciones = totales.get("total_transacciones", 0)
+
+        return {
+            "total_ventas": totales.get("total_ventas", 0),
+            "cantidad_transacciones": transacciones,
+            "cantidad_asientos": totales.get("total_asientos", 0),
+            "promedio_por_transaccion": totales.get("total_ventas", 0) / transacciones if transacciones else 0
+        }
+
+    async def obtener_peliculas_mas_vendidas(self, limite: int = 10) -> List[Dict[str, Any]]:
+        """Películas más vendidas a partir de los buckets diarios"""
+        pipeline = [
+            {
+                "$match": {"granularidad": "dia"}
+            },
+            {
+                "$group": {
+                    "_id": "$pelicula_id",
+                    "total_ventas": {"$sum": "$total_ventas"},
+                    "total_asientos": {"$sum": "$total_asientos"},
+                    "total_transacciones": {"$sum": "$total_transacciones"}
+                }
+            },
+            {
+                "$sort": {"total_asientos": -1}
+            },
+            {
+                "$limit": limite
+            },
+            {
+                "$lookup": {
+                    "from": "peliculas",
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "pelicula"
+                }
+            },
+            {
+                "$unwind": "$pelicula"
+            }
+        ]
+
+        return await self.collection.aggregate(pipeline).to_list(limite)
@@ -0,0 +1,161 @@
+"""
+Entradas con QR pregenerado
+
+El QR de la entrada se genera una vez al confirmar la compra (desde el
+relay del outbox, fuera de la petición) y se guarda en Redis hasta que
+termina la función. El endpoint de la entrada lo sirve con ETag fuerte,
+así los escaneos repetidos en taquilla y puerta nunca vuelven a
+renderizar la imagen.
+"""
+
+import asyncio
+import base64
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Set
+
+from config.settings import settings
+from domain.entities.transaccion import EstadoTransaccion
+from services.global_services import get_redis_service
+from services.qr_service import qr_service as qr_service_global
+from infrastructure.utils.logs import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+def clave_entrada(transaccion_id: str) -> str:
+    """Clave del hash con el QR de una entrada"""
+    return f"entrada:qr:{transaccion_id}"
+
+
+def expiracion_entrada(funcion_inicio: Optional[datetime]) -> datetime:
+    """Momento hasta el que se conserva el QR: fin estimado de la función"""
+    if funcion_inicio is None:
+        return datetime.now() + timedelta(seconds=settings.entrada_qr_ttl_defecto)
+    return funcion_inicio + timedelta(seconds=settings.entrada_qr_duracion_funcion)
+
+
+class TicketService:
+    """
+    Pregenera y sirve el QR de las entradas confirmadas
+    """
+
+    def __init__(self, redis_service=None, qr_service=None):
+        self._redis_service = redis_service
+        self.qr_service = qr_service or qr_service_global
+        self._tareas: Set[asyncio.Task] = set()
+
+        self.pregeneradas = 0
+        self.servidas = 0
+        self.no_modificadas = 0
+        self.regeneradas = 0
+
+    @property
+    def redis_service(self):
+        return self._redis_service or get_redis_service()
+
+    @staticmethod
+    def etag(png: bytes) -> str:
+        """ETag fuerte a partir del contenido de la imagen"""
+        return f"\"{hashlib.sha256(png).hexdigest()[:32]}\""
+
+    async def pregenerar_lote(self, entradas: List[Dict[str, Any]]) -> int:
+        """
+        Genera y guarda el QR de varias entradas con un solo lote de render
+
+        Args:
+            entradas: Dicts con ``transaccion_id``, ``cliente_id`` y ``expira`` (ISO)
+        """
+        if not entradas:
+            return 0
+
+        imagenes = await self.qr_service.generar_lote([e["transaccion_id"] for e in entradas])
+        ahora = datetime.now()
+        operaciones = []
+        for entrada, imagen in zip(entradas, imagenes):
+            expira = datetime.fromisoformat(entrada["expira"])
+            ttl = max(int((expira - ahora).total_seconds()), settings.entrada_qr_ttl_minimo)
+            clave = clave_entrada(entrada["transaccion_id"])
+            operaciones.append(("hset", (clave,), {"mapping": {
+                "png": imagen,
+                "etag": self.etag(base64.b64decode(imagen)),
+                "cliente_id": entrada["cliente_id"],
+                "expira": entrada["expira"]
+            }}))
+            operaciones.append(("expire", (clave, ttl), {}))
+
+        await self.redis_service.pipeline_execute(operaciones)
+        self.pregeneradas += len(entradas)
+        return len(entradas)
+
+    async def pregenerar(self, transaccion_id: str, cliente_id: str, funcion_inicio: Optional[datetime]) -> Dict[str, Any]:
+        """Genera y guarda el QR de una entrada"""
+        entrada = {
+            "transaccion_id": transaccion_id,
+            "cliente_id": cliente_id,
+            "expira": expiracion_entrada(funcion_inicio).isoformat()
+        }
+        await self.pregenerar_lote([entrada])
+        return entrada
+
+    def pregenerar_en_segundo_plano(self, transaccion_id: str, cliente_id: str, funcion_inicio: Optional[datetime]):
+        """Lanza la pregeneración sin esperar (compras sin outbox)"""
+        async def ejecutar():
+            try:
+                await self.pregenerar(transaccion_id, cliente_id, funcion_inicio)
+            except Exception as e:
+                logger.warning("Error pregenerando QR de la entrada", extra={"transaccion_id": transaccion_id, "error": str(e)})
+
+        tarea = asyncio.create_task(ejecutar())
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def obtener(self, transaccion_id: str) -> Optional[Dict[str, Any]]:
+        """
+        QR guardado de una entrada
+
+        Returns:
+            Dict con ``png`` (base64), ``etag``, ``cliente_id`` y ``expira``, o None
+        """
+        guardado = await self.redis_service.hgetall(clave_entrada(transaccion_id))
+        return guardado or None
+
+    async def obtener_o_regenerar(self, transaccion_id: str, cargar_transaccion) -> Optional[Dict[str, Any]]:
+        """
+        QR de una entrada; si no está guardado (expiró o falló la
+        pregeneración) se genera una vez para transacciones confirmadas
+
+        Args:
+            cargar_transaccion: Corrutina que devuelve la transacción por ID
+        """
+        entrada = await self.obtener(transaccion_id)
+        if entrada:
+            return entrada
+
+        transaccion = await cargar_transaccion(transaccion_id)
+        if not transaccion or transaccion.estado != EstadoTransaccion.CONFIRMADO:
+            return None
+
+        self.regeneradas += 1
+        await self.pregenerar(transaccion.id, transaccion.cliente_id, transaccion.funcion_inicio)
+        return await self.obtener(transaccion_id)
+
+    def registrar_servida(self, no_modificada: bool):
+        """Cuenta una respuesta del endpoint de la entrada"""
+        if no_modificada:
+            self.no_modificadas += 1
+        else:
+            self.servidas += 1
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Contadores de pregeneración y de entradas servidas"""
+        return {
+            "pregeneradas": self.pregeneradas,
+            "servidas": self.servidas,
+            "no_modificadas": self.no_modificadas,
+            "regeneradas": self.regeneradas
+        }
+
+
+# Instancia global (usa el Redis registrado en global_services)
+ticket_service = TicketService()
@@ -0,0 +1,33 @@
+"""
+Datos compartidos por los benchmarks (los mismos que scripts/generar_datos.py)
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from infrastructure.database.datos_sinteticos import GeneradorDatos
+
+
+@pytest.fixture(scope="session")
+def generador() -> GeneradorDatos:
+    return GeneradorDatos("pequeno", semilla=42, fecha_base=datetime(2025, 1, 6))
+
+
+@pytest.fixture(scope="session")
+def peliculas(generador):
+    """1000 películas en orden aleatorio (fijo)"""
+    documentos = list(GeneradorDatos("mediano", 42, generador.fecha_base).documentos("peliculas"))
+    random.Random(42).shuffle(documentos)
+    return documentos
+
+
+@pytest.fixture(scope="session")
+def funciones(generador):
+    return [{**f, "hora": f"{f['fecha_hora_inicio']:%H:%M}"} for f in generador.documentos("funciones")]
+
+
+@pytest.fixture(scope="session")
+def transacciones(generador):
+    return [{**t, "fecha_transaccion": t["fecha_creacion"].isoformat()} for t in generador.documentos("transacciones", 0, 1000)]
@@ -0,0 +1,174 @@
+"""
+Micro-benchmarks del código que corre en cada request
+
+Guardar la línea base y comparar: scripts/run_benchmarks.sh
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import controllers.funciones_controller as funciones_controller  # noqa: E402
+from domain.entities.transaccion import Transaccion, DetalleAsiento, DetallePago, MetodoPago  # noqa: E402
+from services.algorithms_service import AlgorithmsService  # noqa: E402
+from services.auth_service import auth_service  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def servicio():
+    return AlgorithmsService()
+
+
+def sala_tree(ocupados):
+    return {"filas": [
+        {"fila": fila, "asientos": [
+            {"numero": f"{fila}{n}", "estado": "ocupado" if f"{fila}{n}" in ocupados else "disponible"}
+            for n in range(1, 16)
+        ]}
+        for fila in "ABCDEFGH"
+    ]}
+
+
+@pytest.mark.benchmark(group="algoritmos")
+class TestAlgoritmos:
+    """AlgorithmsService: ordenamientos y búsquedas sobre 1000 elementos"""
+
+    def test_quicksort_peliculas_rating(self, benchmark, servicio, peliculas):
+        resultado = benchmark(lambda: servicio.quicksort_peliculas_rating(list(peliculas)))
+        assert resultado[0]["rating"] >= resultado[-1]["rating"]
+
+    def test_mergesort_funciones_hora(self, benchmark, servicio, funciones):
+        resultado = benchmark(servicio.mergesort_funciones_hora, funciones)
+        assert resultado[0]["hora"] <= resultado[-1]["hora"]
+
+    def test_heapsort_transacciones_fecha(self, benchmark, servicio, transacciones):
+        resultado = benchmark(lambda: servicio.heapsort_transacciones_fecha(list(transacciones)))
+        assert len(resultado) == len(transacciones)
+
+    def test_busqueda_binaria_peliculas(self, benchmark, servicio, peliculas):
+        ordenadas = sorted(peliculas, key=lambda p: p["titulo"])
+        titulos = [p["titulo"] for p in ordenadas[::50]]
+
+        def buscar_todos():
+            return [servicio.busqueda_binaria_peliculas(ordenadas, titulo) for titulo in titulos]
+
+        assert all(benchmark(buscar_todos))
+
+    def test_busqueda_lineal_filtros(self, benchmark, servicio, peliculas):
+        filtros = {"genero": "drama", "duracion_max": 150, "precio_max": 15000, "activa": True}
+        resultado = benchmark(servicio.busqueda_lineal_filtros, peliculas, filtros)
+        assert resultado
+
+    def test_contar_asientos_disponibles_recursivo(self, benchmark, servicio):
+        arbol = sala_tree({"A1", "A2", "B5", "C10"})
+        assert benchmark(servicio.contar_asientos_disponibles_recursivo, arbol) == 116
+
+
+class FakeMongo:
+    def __init__(self, funcion):
+        self.funcion = funcion
+
+    async def obtener_funcion(self, funcion_id):
+        return self.funcion
+
+
+class FakeRedis:
+    def __init__(self, ocupados):
+        self.ocupados = ocupados
+
+    async def get_asientos_ocupados(self, funcion_id):
+        return self.ocupados
+
+
+@pytest.mark.benchmark(group="mapa_asientos")
+def test_mapa_asientos(benchmark, monkeypatch, servicio, generador):
+    """obtener_asientos_funcion completo con Mongo/Redis en memoria"""
+    funcion = next(f for f in generador.documentos("funciones") if f["estado"] == "programada")
+    monkeypatch.setattr(funciones_controller, "get_mongodb_service", lambda: FakeMongo(funcion))
+    monkeypatch.setattr(funciones_controller, "get_redis_service", lambda: FakeRedis(funcion["asientos_ocupados"][:40]))
+    monkeypatch.setattr(funciones_controller, "get_algorithms_service", lambda: servicio)
+
+    loop = asyncio.new_event_loop()
+    try:
+        respuesta = benchmark(lambda: loop.run_until_complete(funciones_controller.obtener_asientos_funcion(funcion["_id"])))
+    finally:
+        loop.close()
+    assert respuesta.estadisticas["total"] == 120
+
+
+@pytest.mark.benchmark(group="transaccion")
+class TestTransaccion:
+    """Construcción de Transaccion como en ComprarEntradaUseCase y calcular_totales"""
+
+    def crear(self):
+        asientos = [
+            DetalleAsiento(codigo=c, fila=c[0], numero=int(c[1:]), tipo="estandar", precio_unitario=18000, precio_final=18000)
+            for c in ("F7", "F8", "F9")
+        ]
+        return Transaccion(
+            cliente_id="6570a1b2c3d4e5f607182930",
+            pelicula_id="pel_000001",
+            funcion_id="fun_000001",
+            asientos=asientos,
+            pago=DetallePago(metodo=MetodoPago.TARJETA_CREDITO, ultimos_4_digitos="4242"),
+            subtotal=54000,
+            cantidad_asientos=3,
+            total=64260,
+            impuestos=10260
+        )
+
+    def test_construccion(self, benchmark):
+        assert benchmark(self.crear).numero_factura.startswith("CIN-")
+
+    def test_calcular_totales(self, benchmark):
+        transaccion = self.crear()
+        benchmark(transaccion.calcular_totales)
+        assert transaccion.subtotal == 54000
+
+
+@pytest.mark.benchmark(group="serializacion")
+class TestSerializacion:
+    """Respuestas típicas como las serializa FastAPI (jsonable_encoder + JSONResponse)"""
+
+    def test_listado_peliculas(self, benchmark, peliculas):
+        contenido = {"peliculas": peliculas[:20], "total": 20, "limite": 20, "offset": 0, "paginas": 1}
+        cuerpo = benchmark(lambda: JSONResponse(jsonable_encoder(contenido)).body)
+        assert len(json.loads(cuerpo)["peliculas"]) == 20
+
+    def test_mapa_asientos(self, benchmark):
+        mapa = funciones_controller.MapaAsientosResponse(
+            funcion_id="fun_000001",
+            mapa_asientos={
+                fila: [funciones_controller.AsientoInfo(codigo=f"{fila}{n}", disponible=True, tipo="estandar", precio=18000)
+                       for n in range(1, 16)]
+                for fila in "ABCDEFGH"
+            },
+            estadisticas={"total": 120, "ocupados": 0, "disponibles": 120, "porcentaje_ocupacion": 0.0}
+        )
+        cuerpo = benchmark(lambda: JSONResponse(jsonable_encoder(mapa)).body)
+        assert b'"F7"' in cuerpo
+
+    def test_transaccion(self, benchmark, generador):
+        transaccion = Transaccion(**next(generador.documentos("transacciones")))
+        cuerpo = benchmark(lambda: JSONResponse(jsonable_encoder(transaccion.model_dump(by_alias=True))).body)
+        assert json.loads(cuerpo)["_id"] == transaccion.id
+
+
+@pytest.mark.benchmark(group="jwt")
+class TestJWT:
+    """Firma y verificación del token en cada request autenticado"""
+
+    datos = {"sub": "6570a1b2c3d4e5f607182930", "email": "usuario1@datos.cinemax.com", "nombre": "Ana", "apellido": "García"}
+
+    def test_firmar(self, benchmark):
+        assert benchmark(auth_service.create_access_token, self.datos).count(".") == 2
+
+    def test_verificar(self, benchmark):
+        token = auth_service.create_access_token(self.datos)
+        assert benchmark(auth_service.verify_token, token)["sub"] == self.datos["sub"]
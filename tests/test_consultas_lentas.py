@@ -0,0 +1,96 @@
+"""
+Test para la captura de consultas lentas de MongoDB
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from infrastructure.database.consultas_lentas import MonitorConsultasLentas, forma_comando, resumir_plan
+
+
+def comando_regex(texto):
+    return {
+        "find": "peliculas",
+        "filter": {"activa": True, "$or": [{"titulo": {"$regex": texto, "$options": "i"}}]},
+        "limit": 20,
+        "lsid": {"id": "sesion"},
+        "$db": "cinemax"
+    }
+
+
+PLAN_COLLSCAN = {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}}}
+
+
+class FakeDatabase:
+    def __init__(self, comandos):
+        self.comandos = comandos
+
+    async def command(self, comando):
+        self.comandos.append(comando)
+        return PLAN_COLLSCAN
+
+
+class FakeClient:
+    def __init__(self):
+        self.comandos = []
+
+    def __getitem__(self, nombre):
+        return FakeDatabase(self.comandos)
+
+
+def ejecutar(monitor, request_id, comando, duracion_ms, nombre="find"):
+    monitor.started(SimpleNamespace(command_name=nombre, connection_id=("mongo", 27017), request_id=request_id,
+                                    database_name="cinemax", command=comando))
+    monitor.succeeded(SimpleNamespace(command_name=nombre, connection_id=("mongo", 27017), request_id=request_id,
+                                      duration_micros=int(duracion_ms * 1000)))
+
+
+class TestConsultasLentas:
+    """Test para infrastructure.database.consultas_lentas"""
+
+    def test_forma_normalizada_ignora_literales(self):
+        forma = forma_comando("find", comando_regex("matrix"))
+
+        assert forma == {"filter": {"activa": "?", "$or": [{"titulo": {"$regex": "?", "$options": "?"}}]}}
+        assert forma_comando("find", comando_regex("batman")) == forma
+        assert forma_comando("aggregate", {"aggregate": "transacciones", "pipeline": [
+            {"$match": {"estado": "confirmado"}}, {"$group": {"_id": "$generos", "total": {"$sum": "$total"}}}
+        ]})["pipeline"] == [{"$match": {"estado": "?"}}, {"$group": {"_id": "$generos", "total": {"$sum": "$total"}}}]
+
+    def test_agrupa_por_forma_y_captura_explain(self):
+        async def escenario():
+            client = FakeClient()
+            monitor = MonitorConsultasLentas(umbral_ms=50, max_formas=10, explain=True)
+            monitor.iniciar(client)
+
+            ejecutar(monitor, 1, comando_regex("matrix"), 120)
+            ejecutar(monitor, 2, comando_regex("batman"), 80)
+            ejecutar(monitor, 3, comando_regex("alien"), 5)
+            for _ in range(3):
+                await asyncio.sleep(0)
+            return monitor, client
+
+        monitor, client = asyncio.run(escenario())
+        formas = monitor.top()
+
+        assert len(formas) == 1
+        assert formas[0]["namespace"] == "cinemax.peliculas"
+        assert formas[0]["conteo"] == 2
+        assert formas[0]["max_ms"] == 120
+        assert formas[0]["plan"]["coleccion_completa"] is True
+        assert formas[0]["plan"]["usa_indice"] is False
+        # Un solo explain por forma, sin los campos de sesión
+        assert len(client.comandos) == 1
+        assert "lsid" not in client.comandos[0]["explain"]
+        assert monitor.obtener_estadisticas()["formas_sin_indice"] == 1
+
+    def test_resumen_de_plan_de_agregacion(self):
+        explain = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {
+            "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "estado_1_generos_1"}
+        }}}}, {"$group": {}}]}
+
+        plan = resumir_plan(explain)
+
+        assert plan["usa_indice"] is True
+        assert plan["coleccion_completa"] is False
+        assert plan["indices"] == ["estado_1_generos_1"]
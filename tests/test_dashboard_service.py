@@ -0,0 +1,72 @@
+"""
+Test para la cache stale-while-revalidate del resumen del dashboard
+"""
+
+import asyncio
+
+from services.dashboard_service import DashboardService
+
+
+class MongoDBFalso:
+    """MongoDBService mínimo que cuenta las consultas recibidas"""
+
+    def __init__(self):
+        self.consultas = 0
+
+    async def contar_peliculas_activas(self):
+        self.consultas += 1
+        await asyncio.sleep(0.01)
+        return 10
+
+    async def contar_funciones_hoy(self):
+        return 4
+
+    async def contar_transacciones_hoy(self):
+        return 25
+
+
+class TestDashboardService:
+    """Test para el servicio de dashboard"""
+
+    def test_resumen_en_cache(self):
+        """Dentro del TTL no se vuelve a consultar MongoDB"""
+        async def escenario():
+            mongodb = MongoDBFalso()
+            servicio = DashboardService(mongodb)
+            servicio.ttl, servicio.stale_ttl = 60, 60
+
+            primero = await servicio.obtener_resumen()
+            segundo = await servicio.obtener_resumen()
+            return mongodb.consultas, primero, segundo
+
+        consultas, primero, segundo = asyncio.run(escenario())
+        assert consultas == 1
+        assert primero is segundo
+        assert primero["resumen"]["peliculas_activas"] == 10
+        assert primero["resumen"]["ocupacion_promedio"] == 0.0
+
+    def test_refresco_compartido(self):
+        """Requests concurrentes sin cache comparten un único cálculo"""
+        async def escenario():
+            mongodb = MongoDBFalso()
+            servicio = DashboardService(mongodb)
+            await asyncio.gather(*[servicio.obtener_resumen() for _ in range(20)])
+            return mongodb.consultas
+
+        assert asyncio.run(escenario()) == 1
+
+    def test_stale_while_revalidate(self):
+        """Fuera del TTL se responde el valor anterior y se refresca en segundo plano"""
+        async def escenario():
+            mongodb = MongoDBFalso()
+            servicio = DashboardService(mongodb)
+            servicio.ttl, servicio.stale_ttl = 0, 60
+
+            primero = await servicio.obtener_resumen()
+            stale = await servicio.obtener_resumen()
+            await servicio._refresco
+            return mongodb.consultas, primero, stale
+
+        consultas, primero, stale = asyncio.run(escenario())
+        assert stale is primero
+        assert consultas == 2
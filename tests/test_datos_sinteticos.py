@@ -0,0 +1,131 @@
+"""
+Test para el generador determinista de datos
+"""
+
+import asyncio
+from datetime import datetime
+
+from domain.entities.funcion import Funcion
+from domain.entities.pelicula import Pelicula
+from domain.entities.transaccion import Transaccion
+from domain.entities.cliente import Cliente
+from infrastructure.database.datos_sinteticos import GeneradorDatos, cargar_datos
+
+FECHA_BASE = datetime(2025, 1, 6)
+
+
+def generador(semilla: int = 7) -> GeneradorDatos:
+    return GeneradorDatos("pequeno", semilla, FECHA_BASE, peliculas=20, usuarios=30, funciones=60, transacciones=120)
+
+
+class FakeColeccion:
+    def __init__(self, base: "FakeDatabase", nombre: str):
+        self.base = base
+        self.nombre = nombre
+
+    async def insert_many(self, documentos, ordered=True):
+        self.base.en_vuelo += 1
+        self.base.max_en_vuelo = max(self.base.max_en_vuelo, self.base.en_vuelo)
+        await asyncio.sleep(0.001)
+        self.base.documentos.setdefault(self.nombre, []).extend(documentos)
+        self.base.en_vuelo -= 1
+        return type("Resultado", (), {"inserted_ids": [d["_id"] for d in documentos]})()
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.documentos = {}
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+
+    def __getitem__(self, nombre):
+        return FakeColeccion(self, nombre)
+
+
+class FakePipeline:
+    def __init__(self, comandos):
+        self.comandos = comandos
+
+    def delete(self, clave):
+        self.comandos.append(("delete", clave))
+
+    def setbit(self, clave, posicion, valor):
+        self.comandos.append(("setbit", clave, posicion, valor))
+
+    def hset(self, clave, mapping):
+        self.comandos.append(("hset", clave, mapping))
+
+    async def execute(self):
+        return []
+
+
+class FakeRedis:
+    def __init__(self):
+        self.comandos = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.comandos)
+
+
+class TestGeneradorDatos:
+    """Test para infrastructure.database.datos_sinteticos"""
+
+    def test_determinista_por_semilla_y_por_rango(self):
+        a, b = generador(), generador()
+        for coleccion in ["peliculas", "usuarios", "funciones", "transacciones"]:
+            completos = list(a.documentos(coleccion))
+            assert completos == list(b.documentos(coleccion))
+            # El documento i no depende del rango con el que se genera
+            assert list(generador().documentos(coleccion, 10, 15)) == completos[10:15]
+        assert list(generador(8).documentos("funciones")) != list(a.documentos("funciones"))
+
+    def test_documentos_validan_con_las_entidades_y_referencias(self):
+        g = generador()
+        peliculas = {p["_id"]: Pelicula(**p) for p in g.documentos("peliculas")}
+        funciones = {f["_id"]: f for f in g.documentos("funciones")}
+        for cliente in g.documentos("clientes"):
+            Cliente(**cliente)
+        for funcion in funciones.values():
+            Funcion(**funcion)
+            assert funcion["pelicula_id"] in peliculas
+            assert len(set(funcion["asientos_ocupados"])) == funcion["ventas_totales"]
+
+        usuarios = {str(u["_id"]) for u in g.documentos("usuarios")}
+        facturas = set()
+        vendidos = {}
+        for documento in g.documentos("transacciones"):
+            transaccion = Transaccion(**documento)
+            funcion = funciones[transaccion.funcion_id]
+            assert transaccion.cliente_id in usuarios
+            assert transaccion.pelicula_id == funcion["pelicula_id"]
+            codigos = {a.codigo for a in transaccion.asientos}
+            if not codigos <= set(funcion["asientos_ocupados"]):
+                # Sin asientos vendidos disponibles la transacción no queda vigente
+                assert codigos.isdisjoint(funcion["asientos_ocupados"])
+                assert transaccion.estado in ("cancelado", "reembolsado", "fallido")
+            if funcion["estado"] == "cancelada":
+                assert transaccion.estado in ("cancelado", "reembolsado", "fallido")
+            # Las transacciones de una función no comparten asientos
+            asignados = vendidos.setdefault(transaccion.funcion_id, set())
+            assert asignados.isdisjoint(codigos)
+            asignados |= codigos
+            assert transaccion.funcion_hora == funcion["fecha_hora_inicio"].hour
+            facturas.add(transaccion.numero_factura)
+        assert len(facturas) == 120
+
+    def test_carga_por_lotes_concurrentes_y_bitmaps(self):
+        g = generador()
+        database = FakeDatabase()
+        redis = FakeRedis()
+
+        resultado = asyncio.run(cargar_datos(database, g, redis_client=redis, lote=7, concurrencia=3))
+
+        assert database.max_en_vuelo == 3
+        assert resultado["transacciones"]["insertados"] == 120
+        ids = sorted(t["_id"] for t in database.documentos["transacciones"])
+        assert ids == sorted(t["_id"] for t in g.documentos("transacciones"))
+
+        programadas = [f for f in g.documentos("funciones") if f["estado"] == "programada"]
+        assert resultado["bitmaps"]["funciones"] == len(programadas)
+        bits = [c for c in redis.comandos if c[0] == "setbit" and c[1] == f"sala:asientos:{programadas[0]['_id']}"]
+        assert len(bits) == len(programadas[0]["asientos_ocupados"])
@@ -0,0 +1,113 @@
+"""
+Test para la retención de correos (compactación, limpieza de cola y archivo)
+"""
+
+import asyncio
+import json
+import time
+
+from services.email_retention_service import EmailRetentionService, clave_id
+
+
+class FakeRedis:
+    def __init__(self, ids, grupos, pendiente_min=None):
+        self.stream = [(i, {"to": "a@cine.com"}) for i in ids]
+        self.grupos = grupos
+        self.pendiente_min = pendiente_min
+        self.cola = {i: float(i.split("-")[0]) / 1000 for i in ids}
+        self.listas = {}
+
+    async def xinfo_groups(self, stream):
+        return self.grupos
+
+    async def xpending(self, stream, group):
+        return {"pending": 1, "min": self.pendiente_min}
+
+    async def xtrim(self, stream, maxlen=None, minid=None, approximate=True):
+        antes = len(self.stream)
+        self.stream = [(i, c) for i, c in self.stream if clave_id(i) >= clave_id(minid)]
+        return antes - len(self.stream)
+
+    async def xrange(self, stream, min="-", max="+", count=None):
+        return self.stream[:count]
+
+    async def zrangebyscore(self, key, min_score, max_score, start=None, num=None):
+        return sorted(self.cola, key=self.cola.get)[start:start + num]
+
+    async def zrem(self, key, *members):
+        return sum(1 for m in members if self.cola.pop(m, None) is not None)
+
+    async def lrange(self, key, start, end):
+        return self.listas.get(key, [])[start:end + 1]
+
+    async def ltrim(self, key, start, end):
+        self.listas[key] = self.listas.get(key, [])[start:]
+        return True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documentos = []
+
+    async def insert_many(self, documentos, ordered=True):
+        self.documentos.extend(documentos)
+
+
+class FakeMongo:
+    def __init__(self):
+        self.database = type("Database", (), {"correos_enviados": FakeCollection()})()
+
+
+def ids_antiguos(cantidad, hace_segundos=7200):
+    base = int((time.time() - hace_segundos) * 1000)
+    return [f"{base + i}-0" for i in range(cantidad)]
+
+
+class TestRetencionCorreos:
+    """Test para EmailRetentionService"""
+
+    def test_compacta_solo_confirmados(self):
+        """No se recortan entradas pendientes de ACK aunque sean antiguas"""
+        ids = ids_antiguos(5)
+        redis = FakeRedis(ids, [{"name": "email_processor", "pending": 1, "last-delivered-id": ids[-1]}],
+                          pendiente_min=ids[2])
+        servicio = EmailRetentionService(redis, FakeMongo())
+
+        async def escenario():
+            recortados = await servicio.compactar_stream()
+            limpiados = await servicio.limpiar_cola()
+            return recortados, limpiados
+
+        recortados, limpiados = asyncio.run(escenario())
+
+        assert recortados == 2
+        assert [i for i, _ in redis.stream] == ids[2:]
+        assert limpiados == 2
+        assert sorted(redis.cola) == sorted(ids[2:])
+
+    def test_respeta_ventana_de_retencion(self):
+        """Las entradas recientes se conservan aunque ya estén confirmadas"""
+        ids = ids_antiguos(3, hace_segundos=1)
+        redis = FakeRedis(ids, [{"name": "email_processor", "pending": 0, "last-delivered-id": ids[-1]}])
+        servicio = EmailRetentionService(redis, FakeMongo())
+
+        assert asyncio.run(servicio.compactar_stream()) == 0
+        assert len(redis.stream) == 3
+
+    def test_archiva_entregados_en_lote(self):
+        """Los metadatos de entregados pasan a MongoDB y salen de Redis"""
+        redis = FakeRedis([], [])
+        mongo = FakeMongo()
+        redis.listas["email:entregados"] = [
+            json.dumps({"mensaje_id": f"{i}-0", "para": "a@cine.com", "entregado": "2024-12-20T19:30:00"})
+            for i in range(3)
+        ]
+        servicio = EmailRetentionService(redis, mongo)
+
+        archivados = asyncio.run(servicio.archivar())
+
+        assert archivados == 3
+        assert redis.listas["email:entregados"] == []
+        documentos = mongo.database.correos_enviados.documentos
+        assert [d["_id"] for d in documentos] == ["0-0", "1-0", "2-0"]
+        assert documentos[0]["entregado"].year == 2024
@@ -0,0 +1,53 @@
+"""
+Test para los templates de correo precompilados
+"""
+
+from services.email_templates import EmailTemplateRenderer, PlantillaCompilada
+
+
+CONFIRMACION = {
+    "template": "confirmacion_compra",
+    "subject": "Confirmación",
+    "data": {
+        "numero_factura": "FAC-<001>",
+        "asientos": ["A1", "A2"],
+        "metodo_pago": "tarjeta_credito",
+        "total": 30000,
+        "codigo_qr": "tx-1"
+    }
+}
+
+
+class TestEmailTemplates:
+    """Test para EmailTemplateRenderer"""
+
+    def test_plantilla_compilada(self):
+        """Los fragmentos estáticos se separan de los campos una sola vez"""
+        plantilla = PlantillaCompilada("<p>{{a}}</p><b>{{ b }}</b>")
+        assert plantilla.campos == ["a", "b"]
+        assert plantilla.renderizar({"a": "x", "b": "<y>"}) == "<p>x</p><b>&lt;y&gt;</b>"
+
+    def test_confirmacion_por_locale(self):
+        """El mismo mensaje se renderiza con las etiquetas del locale"""
+        renderer = EmailTemplateRenderer()
+
+        es = renderer.renderizar(CONFIRMACION, qr_base64="QUJD")
+        en = renderer.renderizar(CONFIRMACION, locale="en", qr_base64="QUJD")
+
+        assert "¡Compra Confirmada!" in es
+        assert "Purchase Confirmed!" in en
+        assert "FAC-&lt;001&gt;" in es
+        assert "A1, A2" in es
+        assert "$30,000" in es
+        assert "base64,QUJD" in es
+
+    def test_template_desconocido_y_metricas(self):
+        """Un template desconocido usa el genérico y se mide tamaño y tiempo"""
+        renderer = EmailTemplateRenderer()
+
+        contenido = renderer.renderizar({"template": "recordatorio", "subject": "Tu función es hoy"}, locale="fr")
+
+        assert "<h2>Tu función es hoy</h2>" in contenido
+        estadisticas = renderer.obtener_estadisticas()["default"]
+        assert estadisticas["renders"] == 1
+        assert estadisticas["bytes_max"] == len(contenido.encode())
@@ -0,0 +1,148 @@
+"""
+Test para el worker de correos (reintentos, cola de muertos y apagado ordenado)
+"""
+
+import asyncio
+import json
+
+from config.settings import settings
+from services.email_worker_service import EmailWorkerService, CLAVE_REINTENTOS
+
+
+class FakeRedis:
+    def __init__(self, mensajes=None):
+        self.mensajes = list(mensajes or [])
+        self.acks = []
+        self.streams = {}
+        self.zsets = {}
+        self.claves = {}
+        self.listas = {}
+
+    async def xgroup_create(self, stream, group, id="0", mkstream=True):
+        return True
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, count=100):
+        return ["0-0", [], []]
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        if self.mensajes:
+            stream = next(iter(streams))
+            return [[stream, [self.mensajes.pop(0)]]]
+        await asyncio.sleep(block / 1000)
+        return []
+
+    async def xack(self, stream, group, message_id):
+        self.acks.append(message_id)
+        return 1
+
+    async def xadd(self, stream, campos, maxlen=None, approximate=True):
+        self.streams.setdefault(stream, []).append(campos)
+        return f"{len(self.streams[stream])}-0"
+
+    async def rpush(self, key, *valores):
+        self.listas.setdefault(key, []).extend(valores)
+        return len(self.listas[key])
+
+    async def ltrim(self, key, inicio, fin):
+        self.listas[key] = self.listas.get(key, [])[inicio:None if fin == -1 else fin + 1]
+        return True
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zrangebyscore(self, key, min_score, max_score, start=None, num=None):
+        return [m for m, score in self.zsets.get(key, {}).items() if score <= max_score]
+
+    async def zrem(self, key, *members):
+        return sum(1 for m in members if self.zsets.get(key, {}).pop(m, None) is not None)
+
+    async def pipeline_execute(self, operaciones):
+        return [await getattr(self, nombre)(*args, **kwargs) for nombre, args, kwargs in operaciones]
+
+    async def set_with_expiry(self, key, value, expire_seconds, only_if_not_exists=False):
+        if only_if_not_exists and key in self.claves:
+            return False
+        self.claves[key] = value
+        return True
+
+
+class FakeEmailService:
+    email_stream = "email:notifications"
+    email_entregados = "email:entregados"
+
+    def __init__(self, exito=True, demora=0.0):
+        self.exito = exito
+        self.demora = demora
+        self.entregados = []
+
+    async def entregar(self, campos):
+        await asyncio.sleep(self.demora)
+        if not self.exito:
+            raise ConnectionError("SMTP no disponible")
+        self.entregados.append(campos)
+        return True
+
+
+class TestEmailWorker:
+    """Test para EmailWorkerService"""
+
+    def test_envio_exitoso_confirma(self):
+        """Un envío exitoso se confirma en el grupo"""
+        redis = FakeRedis()
+        worker = EmailWorkerService(redis, FakeEmailService())
+
+        exito = asyncio.run(worker.procesar("1-0", {"to": "a@cine.com"}))
+
+        assert exito
+        assert redis.acks == ["1-0"]
+        assert worker.enviados == 1
+        entregado = json.loads(redis.listas["email:entregados"][0])
+        assert entregado["mensaje_id"] == "1-0"
+        assert entregado["intentos"] == 1
+
+    def test_fallo_reprograma_y_luego_cola_de_muertos(self):
+        """Los fallos se reprograman con backoff hasta agotar los intentos"""
+        redis = FakeRedis()
+        worker = EmailWorkerService(redis, FakeEmailService(exito=False))
+
+        async def escenario():
+            await worker.procesar("1-0", {"to": "a@cine.com"})
+            miembro = next(iter(redis.zsets[CLAVE_REINTENTOS]))
+            reprogramado = json.loads(miembro)["campos"]
+
+            # Vencer el backoff y devolver el mensaje al stream
+            redis.zsets[CLAVE_REINTENTOS][miembro] = 0
+            await worker.mover_reintentos_vencidos()
+
+            # Último intento fallido: cola de muertos
+            ultimo = {**reprogramado, "intentos": str(settings.email_max_intentos - 1)}
+            await worker.procesar("2-0", ultimo)
+            return reprogramado
+
+        reprogramado = asyncio.run(escenario())
+
+        assert reprogramado["intentos"] == "1"
+        assert redis.acks == ["1-0", "2-0"]
+        assert redis.streams["email:notifications"][0]["intentos"] == "1"
+        assert redis.zsets[CLAVE_REINTENTOS] == {}
+        muerto = redis.streams["email:notifications:dlq"][0]
+        assert muerto["mensaje_original"] == "2-0"
+        assert "SMTP no disponible" in muerto["error"]
+        assert worker.muertos == 1
+
+    def test_apagado_termina_envio_en_curso(self):
+        """Al detener, el envío en curso termina y se confirma"""
+        redis = FakeRedis(mensajes=[("1-0", {"to": "a@cine.com"})])
+        email = FakeEmailService(demora=0.3)
+        worker = EmailWorkerService(redis, email, concurrencia=2)
+
+        async def escenario():
+            await worker.iniciar()
+            await asyncio.sleep(0.1)
+            await worker.detener(timeout=5)
+
+        asyncio.run(escenario())
+
+        assert len(email.entregados) == 1
+        assert redis.acks == ["1-0"]
@@ -0,0 +1,115 @@
+"""
+Test para la cache read-through de películas y funciones
+"""
+
+import asyncio
+from datetime import datetime
+
+from infrastructure.cache.entity_cache import LRUCache, EntityCache
+
+
+class FakeRedis:
+    """Redis en memoria con la interfaz mínima de RedisService"""
+
+    def __init__(self):
+        self.redis_client = True
+        self.datos = {}
+
+    async def get(self, key):
+        return self.datos.get(key)
+
+    async def set(self, key, value, expire=None):
+        self.datos[key] = value
+        return True
+
+    async def delete(self, key):
+        return self.datos.pop(key, None) is not None
+
+
+class TestLRUCache:
+    """Test para el LRU en memoria"""
+
+    def test_desaloja_menos_usado(self):
+        """Al superar la capacidad se elimina la entrada menos usada"""
+        cache = LRUCache(2)
+        cache.set("a", 1, 60)
+        cache.set("b", 2, 60)
+        cache.get("a")
+        cache.set("c", 3, 60)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_expiracion(self):
+        """Las entradas expiradas no se devuelven"""
+        cache = LRUCache(2)
+        cache.set("a", 1, -1)
+        assert cache.get("a") is None
+
+
+class TestEntityCache:
+    """Test para la cache de dos niveles"""
+
+    def test_read_through_y_niveles(self):
+        """Primera lectura va a la fuente, luego L1; otro proceso lee de L2"""
+        redis = FakeRedis()
+        llamadas = []
+
+        async def cargar():
+            llamadas.append(1)
+            return {"_id": "fun_001", "fecha_hora_inicio": datetime(2024, 12, 20, 19, 30)}
+
+        async def escenario():
+            cache = EntityCache(redis)
+            primera = await cache.obtener("funcion", "fun_001", cargar)
+            await cache.obtener("funcion", "fun_001", cargar)
+
+            # Otro worker (L1 vacío) comparte L2
+            otro = EntityCache(redis)
+            desde_l2 = await otro.obtener("funcion", "fun_001", cargar)
+            return cache, primera, desde_l2
+
+        cache, primera, desde_l2 = asyncio.run(escenario())
+        assert len(llamadas) == 1
+        assert desde_l2 == primera
+        assert isinstance(desde_l2["fecha_hora_inicio"], datetime)
+        stats = cache.obtener_estadisticas()["entidades"]["funcion"]
+        assert stats["l1_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_devuelve_copias(self):
+        """Mutar el documento devuelto no altera la cache"""
+        async def cargar():
+            return {"_id": "fun_001", "asientos_ocupados": []}
+
+        async def escenario():
+            cache = EntityCache()
+            doc = await cache.obtener("funcion", "fun_001", cargar)
+            doc["asientos_ocupados"].append("A1")
+            return await cache.obtener("funcion", "fun_001", cargar)
+
+        assert asyncio.run(escenario())["asientos_ocupados"] == []
+
+    def test_cache_negativa_e_invalidacion(self):
+        """Los IDs inexistentes se cachean hasta que se invalidan"""
+        redis = FakeRedis()
+        documentos = {}
+        llamadas = []
+
+        async def cargar():
+            llamadas.append(1)
+            return documentos.get("pel_999")
+
+        async def escenario():
+            cache = EntityCache(redis)
+            assert await cache.obtener("pelicula", "pel_999", cargar) is None
+            assert await cache.obtener("pelicula", "pel_999", cargar) is None
+
+            documentos["pel_999"] = {"_id": "pel_999", "titulo": "Nueva"}
+            await cache.invalidar("pelicula", "pel_999")
+            return await cache.obtener("pelicula", "pel_999", cargar)
+
+        pelicula = asyncio.run(escenario())
+        assert pelicula["titulo"] == "Nueva"
+        assert len(llamadas) == 2
@@ -0,0 +1,89 @@
+"""
+Test para las entradas con QR pregenerado
+"""
+
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+from domain.entities.transaccion import EstadoTransaccion
+from services.qr_service import QRService
+from services.ticket_service import TicketService, clave_entrada
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+
+    async def pipeline_execute(self, operaciones):
+        for metodo, args, kwargs in operaciones:
+            if metodo == "hset":
+                self.hashes[args[0]] = dict(kwargs["mapping"])
+            elif metodo == "expire":
+                self.ttls[args[0]] = args[1]
+        return [True] * len(operaciones)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class FakeTransaccion:
+    def __init__(self, estado):
+        self.id = "tx-1"
+        self.cliente_id = "u1"
+        self.estado = estado
+        self.funcion_inicio = datetime.now() + timedelta(hours=2)
+
+
+class TestEntradasQR:
+    """Test para TicketService"""
+
+    def test_pregenera_lote_con_ttl_hasta_fin_de_funcion(self):
+        """Cada entrada guarda PNG, ETag fuerte y expira al terminar la función"""
+        redis = FakeRedis()
+        servicio = TicketService(redis, QRService(procesos=0))
+        expira = (datetime.now() + timedelta(hours=6)).isoformat()
+
+        asyncio.run(servicio.pregenerar_lote([
+            {"transaccion_id": "tx-1", "cliente_id": "u1", "expira": expira},
+            {"transaccion_id": "tx-2", "cliente_id": "u2", "expira": expira}
+        ]))
+
+        guardado = redis.hashes[clave_entrada("tx-1")]
+        png = base64.b64decode(guardado["png"])
+        assert png.startswith(b"\x89PNG")
+        assert guardado["etag"] == TicketService.etag(png)
+        assert guardado["etag"] != redis.hashes[clave_entrada("tx-2")]["etag"]
+        assert 6 * 3600 - 5 <= redis.ttls[clave_entrada("tx-1")] <= 6 * 3600
+
+    def test_regenera_una_sola_vez(self):
+        """Si falta el QR se regenera para la transacción confirmada y luego se reutiliza"""
+        redis = FakeRedis()
+        servicio = TicketService(redis, QRService(procesos=0))
+        cargas = []
+
+        async def cargar(transaccion_id):
+            cargas.append(transaccion_id)
+            return FakeTransaccion(EstadoTransaccion.CONFIRMADO)
+
+        async def escenario():
+            primera = await servicio.obtener_o_regenerar("tx-1", cargar)
+            segunda = await servicio.obtener_o_regenerar("tx-1", cargar)
+            return primera, segunda
+
+        primera, segunda = asyncio.run(escenario())
+
+        assert primera == segunda
+        assert cargas == ["tx-1"]
+        assert servicio.regeneradas == 1
+
+    def test_no_genera_para_transaccion_pendiente(self):
+        """Una transacción sin confirmar no tiene entrada"""
+        servicio = TicketService(FakeRedis(), QRService(procesos=0))
+
+        async def cargar(transaccion_id):
+            return FakeTransaccion(EstadoTransaccion.PENDIENTE)
+
+        assert asyncio.run(servicio.obtener_o_regenerar("tx-1", cargar)) is None
+        assert servicio.pregeneradas == 0
@@ -0,0 +1,120 @@
+"""
+Test para las claves de idempotencia de compra
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from services.idempotency_service import IdempotencyService
+
+
+class FakeRedis:
+    def __init__(self):
+        self.datos = {}
+
+    async def set_with_expiry(self, key, value, expire_seconds, only_if_not_exists=False):
+        if only_if_not_exists and key in self.datos:
+            return False
+        self.datos[key] = value
+        return True
+
+    async def set(self, key, value, expire=None):
+        self.datos[key] = value
+        return True
+
+    async def get(self, key):
+        return self.datos.get(key)
+
+    async def delete(self, key):
+        return 1 if self.datos.pop(key, None) is not None else 0
+
+
+class Operacion:
+    """Operación de compra simulada que cuenta sus ejecuciones"""
+
+    def __init__(self, demora=0.0, fallar=False):
+        self.ejecuciones = 0
+        self.demora = demora
+        self.fallar = fallar
+
+    async def __call__(self):
+        self.ejecuciones += 1
+        await asyncio.sleep(self.demora)
+        if self.fallar:
+            raise RuntimeError("pasarela caída")
+        return JSONResponse(
+            content={"transaccion_id": f"tx-{self.ejecuciones}", "total": 12.5},
+            status_code=202,
+            headers={"Location": "/api/v1/transacciones/tx-1/estado-pago"}
+        )
+
+
+class TestIdempotencia:
+    """Test para IdempotencyService.ejecutar"""
+
+    def test_reintento_repite_respuesta(self):
+        """El reintento devuelve los mismos bytes sin volver a ejecutar la compra"""
+        servicio = IdempotencyService(FakeRedis())
+        operacion = Operacion()
+        datos = {"funcion_id": "fun_001", "asientos": ["A1"]}
+
+        async def escenario():
+            primera = await servicio.ejecutar("clave-1", "u1:comprar", datos, operacion)
+            segunda = await servicio.ejecutar("clave-1", "u1:comprar", datos, operacion)
+            return primera, segunda
+
+        primera, segunda = asyncio.run(escenario())
+
+        assert operacion.ejecuciones == 1
+        assert segunda.body == primera.body
+        assert segunda.status_code == 202
+        assert segunda.headers["location"] == primera.headers["location"]
+        assert segunda.headers["idempotent-replayed"] == "true"
+
+    def test_duplicado_concurrente_espera(self):
+        """Un duplicado concurrente espera a la petición original"""
+        servicio = IdempotencyService(FakeRedis())
+        operacion = Operacion(demora=0.2)
+        datos = {"funcion_id": "fun_001", "asientos": ["A1"]}
+
+        async def escenario():
+            return await asyncio.gather(
+                servicio.ejecutar("clave-2", "u1:comprar", datos, operacion),
+                servicio.ejecutar("clave-2", "u1:comprar", datos, operacion)
+            )
+
+        primera, segunda = asyncio.run(escenario())
+
+        assert operacion.ejecuciones == 1
+        assert primera.body == segunda.body
+
+    def test_clave_con_otro_cuerpo(self):
+        """Reutilizar la clave con otra petición es un error"""
+        servicio = IdempotencyService(FakeRedis())
+        operacion = Operacion()
+
+        async def escenario():
+            await servicio.ejecutar("clave-3", "u1:comprar", {"asientos": ["A1"]}, operacion)
+            await servicio.ejecutar("clave-3", "u1:comprar", {"asientos": ["B2"]}, operacion)
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(escenario())
+        assert error.value.status_code == 422
+
+    def test_fallo_libera_la_clave(self):
+        """Si la compra falla la clave se libera y el reintento vuelve a ejecutar"""
+        redis = FakeRedis()
+        servicio = IdempotencyService(redis)
+        operacion = Operacion(fallar=True)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(servicio.ejecutar("clave-4", "u1:comprar", {}, operacion))
+        assert redis.datos == {}
+
+        operacion.fallar = False
+        respuesta = asyncio.run(servicio.ejecutar("clave-4", "u1:comprar", {}, operacion))
+        assert respuesta.status_code == 202
+        assert operacion.ejecuciones == 2
@@ -0,0 +1,115 @@
+"""
+Test para el logging estructurado con cola
+"""
+
+import io
+import json
+import logging
+import sys
+
+from config.settings import settings
+from infrastructure.utils import logs, tracing
+
+
+class Capturador(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.registros = []
+
+    def emit(self, record):
+        self.registros.append(record)
+
+
+class TestLogging:
+    """Test para infrastructure.utils.logs"""
+
+    def setup_method(self):
+        self._config = (settings.log_nivel, settings.log_formato, settings.log_niveles, settings.log_muestreo_debug)
+        self._handlers = logging.getLogger().handlers[:]
+        self._nivel = logging.getLogger().level
+
+    def teardown_method(self):
+        logs.detener_logging()
+        logs._modulos_explicitos.clear()
+        settings.log_nivel, settings.log_formato, settings.log_niveles, settings.log_muestreo_debug = self._config
+        raiz = logging.getLogger()
+        raiz.handlers = self._handlers
+        raiz.setLevel(self._nivel)
+
+    def crear_logger(self, nombre):
+        logger = logs.obtener_logger(nombre)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        capturador = Capturador()
+        logger.handlers = [capturador]
+        return logger, capturador
+
+    def test_formato_json_incluye_campos_extra(self):
+        logger, capturador = self.crear_logger("prueba.json")
+        logger.info("Compra completada", extra={"transaccion_id": "t1", "duracion_ms": 12.5})
+
+        evento = json.loads(logs.FormatoJSON().format(capturador.registros[0]))
+        assert evento["mensaje"] == "Compra completada"
+        assert evento["nivel"] == "INFO"
+        assert evento["logger"] == "prueba.json"
+        assert evento["transaccion_id"] == "t1"
+        assert evento["duracion_ms"] == 12.5
+
+    def test_muestreo_de_debug_antes_de_crear_el_registro(self):
+        logger, capturador = self.crear_logger("prueba.muestreo")
+        settings.log_muestreo_debug = 0
+
+        for _ in range(100):
+            logger.debug("Evento frecuente")
+        logger.debug("Evento siempre emitido", extra={"muestreo": 1})
+        logger.info("Evento informativo")
+        logger.info("Evento informativo muestreado", extra={"muestreo": 0})
+
+        assert [r.getMessage() for r in capturador.registros] == ["Evento siempre emitido", "Evento informativo"]
+
+    def test_cola_con_niveles_por_modulo_y_traza(self, monkeypatch):
+        salida = io.StringIO()
+        monkeypatch.setattr(sys, "stdout", salida)
+        settings.log_nivel = "INFO"
+        settings.log_formato = "json"
+        settings.log_niveles = "prueba.ruidoso=ERROR"
+        settings.log_muestreo_debug = 1
+
+        logs.configurar_logging()
+        ruidoso = logs.obtener_logger("prueba.ruidoso")
+        compra = logs.obtener_logger("prueba.compra")
+
+        ruidoso.warning("Descartado por nivel del módulo")
+        compra.debug("Descartado por nivel global")
+        monkeypatch.setattr(settings, "tracing_habilitado", True)
+        monkeypatch.setattr(settings, "tracing_muestreo", 1.0)
+        monkeypatch.setattr(tracing, "exportador_trazas", None)
+        with tracing.iniciar_traza("POST /compra") as traza:
+            compra.info("Compra completada", extra={"transaccion_id": "t1"})
+        logs.detener_logging()
+
+        eventos = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        assert len(eventos) == 1
+        assert eventos[0]["transaccion_id"] == "t1"
+        assert eventos[0]["traza_id"] == traza.id
+        assert logs.estadisticas_logging()["descartados"] == 0
+
+    def test_muestreo_solo_en_loggers_del_proyecto(self, monkeypatch):
+        """Los loggers de terceros no cambian de clase y LOG_NIVELES desactiva el muestreo de DEBUG"""
+        monkeypatch.setattr(sys, "stdout", io.StringIO())
+        settings.log_niveles = "prueba.detallado=DEBUG"
+        settings.log_muestreo_debug = 0
+
+        tercero = logging.getLogger("prueba.tercero")
+        assert type(tercero) is logging.Logger
+        assert tercero.findCaller()[0] != "(desconocido)"
+
+        detallado, capturador = self.crear_logger("prueba.detallado.modulo")
+        muestreado, capturador_muestreado = self.crear_logger("prueba.muestreado")
+        logs.configurar_logging()
+
+        detallado.debug("Con nivel explícito")
+        muestreado.debug("Muestreado")
+
+        assert [r.getMessage() for r in capturador.registros] == ["Con nivel explícito"]
+        assert capturador_muestreado.registros == []
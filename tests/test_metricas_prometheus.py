@@ -0,0 +1,93 @@
+"""
+Test para las métricas Prometheus (middleware HTTP, operaciones y gauges)
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from infrastructure.metrics.prometheus_metrics import (
+    MetricasHTTPMiddleware, instrumentar_operaciones, actualizar_gauges, exportar, REDIS_LATENCIA, REDIS_ERRORES
+)
+
+
+def valor(nombre, **etiquetas):
+    return REGISTRY.get_sample_value(nombre, etiquetas) or 0
+
+
+class FakeRedis:
+    async def pipeline_execute(self, operaciones):
+        return [7, 3, 1, 0][:len(operaciones)]
+
+
+class FakeWebSocketService:
+    active_connections = {"u1": None, "u2": None}
+    room_connections = {"fun_001": {"u1", "u2"}}
+
+
+class TestMetricasPrometheus:
+    """Test para infrastructure.metrics.prometheus_metrics"""
+
+    def test_middleware_usa_plantilla_de_ruta(self):
+        """Las URLs con parámetros se agrupan por la plantilla de la ruta"""
+        app = FastAPI()
+        app.add_middleware(MetricasHTTPMiddleware)
+
+        @app.get("/prueba/{item_id}")
+        async def prueba(item_id: str):
+            return {"id": item_id}
+
+        etiquetas = {"method": "GET", "route": "/prueba/{item_id}", "status": "200"}
+        antes = valor("http_requests_total", **etiquetas)
+
+        cliente = TestClient(app)
+        cliente.get("/prueba/1")
+        cliente.get("/prueba/2")
+        cliente.get("/no-existe")
+        exposicion = exportar().decode()
+
+        assert valor("http_requests_total", **etiquetas) - antes == 2
+        assert valor("http_requests_total", method="GET", route="sin_ruta", status="404") >= 1
+        assert 'route="/prueba/{item_id}"' in exposicion
+        assert "/prueba/1" not in exposicion
+
+    def test_instrumenta_metodos_async_publicos(self):
+        """Cada método async público se mide con su nombre como operación"""
+        @instrumentar_operaciones(REDIS_LATENCIA, REDIS_ERRORES, "redis")
+        class Servicio:
+            async def operacion_prueba(self):
+                return 1
+
+            async def operacion_fallida(self):
+                raise ValueError("falla")
+
+            async def _privada(self):
+                return 2
+
+        servicio = Servicio()
+
+        async def escenario():
+            await servicio.operacion_prueba()
+            await servicio._privada()
+            try:
+                await servicio.operacion_fallida()
+            except ValueError:
+                pass
+
+        antes = valor("cinemax_redis_operation_duration_seconds_count", operation="operacion_prueba")
+        asyncio.run(escenario())
+
+        assert valor("cinemax_redis_operation_duration_seconds_count", operation="operacion_prueba") - antes == 1
+        assert valor("cinemax_redis_operation_errors_total", operation="operacion_fallida") >= 1
+        assert valor("cinemax_redis_operation_duration_seconds_count", operation="_privada") == 0
+
+    def test_gauges_de_colas_y_websocket(self):
+        """Los gauges de correo y WebSocket se actualizan al hacer scrape"""
+        profundidad = asyncio.run(actualizar_gauges(FakeRedis(), FakeWebSocketService()))
+
+        assert profundidad == {"stream": 7, "prioridad": 3, "reintentos": 1, "dlq": 0}
+        assert valor("cinemax_email_queue_depth", queue="stream") == 7
+        assert valor("cinemax_websocket_connections") == 2
+        assert valor("cinemax_websocket_rooms") == 1
@@ -0,0 +1,169 @@
+"""
+Test para la instrumentación de comandos y el muestreo del keyspace de Redis
+"""
+
+import asyncio
+
+import pytest
+
+from infrastructure.cache.monitor_redis import MonitorRedis, OTROS, CLAVE_MUESTREADOR
+
+PREFIJOS = ["selection:", "sala:asientos:", "reserva:", "email:"]
+
+
+class FakePipeline:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.command_stack = []
+
+    def memory_usage(self, clave):
+        self.command_stack.append((("MEMORY USAGE", clave), {}))
+
+    def ttl(self, clave):
+        self.command_stack.append((("TTL", clave), {}))
+
+    def setbit(self, clave, posicion, valor):
+        self.command_stack.append((("SETBIT", clave, posicion, valor), {}))
+
+    async def execute(self, raise_on_error=True):
+        resultados = [self.cliente.responder(args) for args, _ in self.command_stack]
+        self.command_stack = []
+        return resultados
+
+
+class FakeRedis:
+    """Cliente con la misma ruta que redis-py: cada comando pasa por execute_command"""
+
+    def __init__(self, claves=None):
+        # clave -> (bytes, ttl)
+        self.claves = claves or {}
+        self.valores = {}
+        self.pipelines = 0
+
+    def responder(self, args):
+        nombre, clave = args[0], args[1]
+        if nombre == "GET":
+            return self.valores.get(clave)
+        if nombre == "MEMORY USAGE":
+            return self.claves[clave][0] if clave in self.claves else None
+        if nombre == "TTL":
+            return self.claves[clave][1] if clave in self.claves else -2
+        return 0
+
+    async def execute_command(self, *args, **options):
+        if args[0] == "FALLA":
+            raise ConnectionError("sin conexión")
+        return self.responder(args) if len(args) > 1 else "PONG"
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        self.pipelines += 1
+        return FakePipeline(self)
+
+    async def get(self, clave):
+        return await self.execute_command("GET", clave)
+
+    async def set(self, clave, valor, ex=None, nx=False):
+        if nx and clave in self.valores:
+            return None
+        self.valores[clave] = valor
+        return True
+
+    async def expire(self, clave, segundos):
+        return clave in self.valores
+
+    async def delete(self, clave):
+        return int(self.valores.pop(clave, None) is not None)
+
+    async def scan(self, cursor=0, count=None):
+        claves = list(self.claves)
+        siguiente = cursor + count
+        return (siguiente if siguiente < len(claves) else 0), claves[cursor:siguiente]
+
+    async def dbsize(self):
+        return len(self.claves)
+
+
+class TestMonitorRedis:
+    """Test para infrastructure.cache.monitor_redis"""
+
+    def test_instrumenta_comandos_pipelines_y_prefijos(self):
+        monitor = MonitorRedis(prefijos=PREFIJOS, intervalo=0)
+        cliente = monitor.instrumentar(FakeRedis())
+        assert monitor.instrumentar(cliente) is cliente
+
+        async def escenario():
+            await cliente.get("selection:fun_1:A1")
+            await cliente.get("sala:asientos:fun_1")
+            await cliente.execute_command("PING")
+            with pytest.raises(ConnectionError):
+                await cliente.execute_command("FALLA", "reserva:1")
+            pipe = cliente.pipeline(transaction=False)
+            for posicion in range(3):
+                pipe.setbit("sala:asientos:fun_1", posicion, 1)
+            await pipe.execute()
+
+        asyncio.run(escenario())
+        estadisticas = monitor.obtener_estadisticas()
+
+        assert estadisticas["comandos"]["GET"]["conteo"] == 2
+        assert estadisticas["comandos"]["FALLA"]["errores"] == 1
+        assert estadisticas["pipelines"]["conteo"] == 1
+        assert estadisticas["pipelines"]["comandos_max"] == 3
+        # Los comandos de un pipeline cuentan por prefijo pero no en el histograma por comando
+        assert "SETBIT" not in estadisticas["comandos"]
+        assert estadisticas["comandos_por_prefijo"] == {"sala:asientos:": 4, "selection:": 1, "reserva:": 1}
+
+    def test_muestreo_agrupa_por_prefijo_sin_contar_sus_pipelines(self):
+        claves = {
+            "selection:fun_1:A1": (80, 300),
+            "selection:fun_1:A2": (90, -1),
+            "sala:asientos:fun_1": (120, -1),
+            "reserva:abc": (200, 600),
+            "email:queue": (5000, -1),
+            "funcion:fun_1": (150, -1),
+        }
+        monitor = MonitorRedis(prefijos=PREFIJOS, intervalo=0, lote=2, top=1)
+        cliente = monitor.instrumentar(FakeRedis(claves))
+
+        muestra = asyncio.run(monitor.muestrear(cliente))
+
+        assert muestra["completo"] and muestra["claves_escaneadas"] == 6
+        selection = muestra["prefijos"]["selection:"]
+        assert (selection["claves"], selection["bytes"], selection["sin_ttl"]) == (2, 170, 1)
+        assert selection["mayores"] == [{"clave": "selection:fun_1:A2", "bytes": 90}]
+        assert selection["variacion_claves"] is None
+        assert muestra["prefijos"][OTROS]["claves"] == 1
+        assert monitor.pipelines.conteo == 0
+
+        claves.update({"selection:fun_2:B1": (80, -1), "selection:fun_2:B2": (80, -1)})
+        segunda = asyncio.run(monitor.muestrear(cliente))
+        assert segunda["prefijos"]["selection:"]["variacion_claves"] == 2
+        assert segunda["prefijos"]["selection:"]["sin_ttl"] == 3
+
+    def test_muestreo_truncado_extrapola_con_dbsize(self):
+        claves = {f"reserva:{i}": (100, 60) for i in range(20)}
+        monitor = MonitorRedis(prefijos=PREFIJOS, intervalo=0, lote=4, max_claves=10)
+
+        muestra = asyncio.run(monitor.muestrear(FakeRedis(claves)))
+
+        assert not muestra["completo"]
+        assert muestra["claves_escaneadas"] == 10
+        assert muestra["prefijos"]["reserva:"]["claves"] == 20
+        assert muestra["prefijos"]["reserva:"]["bytes"] == 2000
+
+    def test_un_solo_muestreador_entre_procesos(self):
+        """El lock en Redis elige un muestreador y al detenerse lo cede"""
+        cliente = FakeRedis()
+        api, otro_worker = MonitorRedis(prefijos=PREFIJOS, intervalo=0), MonitorRedis(prefijos=PREFIJOS, intervalo=0)
+        otro_worker.identidad = "otro-worker"
+
+        async def escenario():
+            await api.iniciar(cliente)
+            await otro_worker.iniciar(cliente)
+            elegidos = [await api._es_muestreador(), await otro_worker._es_muestreador(), await api._es_muestreador()]
+            await api.detener()
+            elegidos.append(await otro_worker._es_muestreador())
+            return elegidos
+
+        assert asyncio.run(escenario()) == [True, False, True, True]
+        assert cliente.valores[CLAVE_MUESTREADOR] == "otro-worker"
@@ -0,0 +1,58 @@
+"""
+Test para el perfilador por muestreo
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from infrastructure.utils.perfilador import perfilar, PerfilEnCurso
+
+
+def trabajo_cpu(detener: threading.Event):
+    while not detener.is_set():
+        sum(i * i for i in range(1000))
+
+
+async def espera_larga():
+    await asyncio.sleep(10)
+
+
+class TestPerfilador:
+    """Test para infrastructure.utils.perfilador"""
+
+    def test_muestrea_hilos_y_tareas(self):
+        async def escenario():
+            detener = threading.Event()
+            hilo = threading.Thread(target=trabajo_cpu, args=(detener,), name="trabajo")
+            hilo.start()
+            tarea = asyncio.create_task(espera_larga())
+            try:
+                return await perfilar(0.5, hz=200)
+            finally:
+                detener.set()
+                hilo.join()
+                tarea.cancel()
+
+        perfil = asyncio.run(escenario())
+        colapsado = perfil.colapsado()
+        resumen = perfil.resumen()
+
+        assert perfil.muestras > 20
+        assert perfil.muestras_tareas > 0
+        assert any(linea.startswith("hilo:trabajo;") for linea in colapsado.splitlines())
+        assert "asyncio;tarea:espera_larga;espera_larga (tests/test_perfilador.py" in colapsado
+        assert all(linea.rsplit(" ", 1)[1].isdigit() for linea in colapsado.splitlines())
+        funciones = {f["funcion"].split(" ")[0]: f for f in resumen["top_funciones"]}
+        assert funciones["trabajo_cpu"]["inclusivas"] > 0
+
+    def test_un_perfil_a_la_vez(self):
+        async def escenario():
+            primero = asyncio.create_task(perfilar(0.3, hz=50))
+            await asyncio.sleep(0.05)
+            with pytest.raises(PerfilEnCurso):
+                await perfilar(0.1)
+            return await primero
+
+        assert asyncio.run(escenario()).muestras > 0
@@ -0,0 +1,440 @@
+"""
+Test para el pipeline de compra (lecturas en paralelo y escrituras en lote)
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from domain.entities.transaccion import MetodoPago, EstadoTransaccion
+from domain.entities.usuario import UsuarioResponse
+from infrastructure.utils.latencias import Cronometro, RegistroLatencias
+from use_cases.comprar_entrada_use_case import ComprarEntradaUseCase, PagoEnCurso
+
+
+class Registro:
+    """Acumula las llamadas hechas a los fakes"""
+
+    def __init__(self):
+        self.llamadas = []
+
+
+class FakeUsuarioRepo:
+    async def obtener_usuario_por_id(self, usuario_id):
+        return UsuarioResponse(
+            id=usuario_id, email="cliente@cine.com", nombre="Ana", apellido="Pérez",
+            fecha_registro=datetime(2024, 1, 1), activo=True
+        )
+
+
+class FakeTransaccionRepo:
+    def __init__(self, registro):
+        self.registro = registro
+        self.transacciones = {}
+        self.reclamos = {}
+        self.autorizaciones = {}
+
+    async def verificar_asientos_disponibles(self, funcion_id, asientos):
+        return True
+
+    async def crear_transaccion(self, transaccion):
+        self.transacciones[transaccion.id] = transaccion
+        return transaccion
+
+    async def obtener_transaccion_por_id(self, transaccion_id):
+        return self.transacciones.get(transaccion_id)
+
+    async def finalizar_pago(self, transaccion_id, propietario, estado, observacion=None, session=None):
+        transaccion = self.transacciones[transaccion_id]
+        if transaccion.estado != EstadoTransaccion.PROCESANDO or self.reclamos.get(transaccion_id, (None,))[0] != propietario:
+            return False
+        self.registro.llamadas.append(("estado", estado))
+        transaccion.estado = estado
+        del self.reclamos[transaccion_id]
+        return True
+
+    async def cancelar_si_no_reclamada(self, transaccion_id, observacion=None):
+        transaccion = self.transacciones[transaccion_id]
+        reclamo = self.reclamos.get(transaccion_id)
+        sin_reclamo = reclamo is None or reclamo[1] < datetime.now()
+        cobrada = self.autorizaciones.get(transaccion_id, {}).get("exitoso")
+        if cobrada or transaccion.estado not in (EstadoTransaccion.PENDIENTE, EstadoTransaccion.PROCESANDO):
+            return False
+        if transaccion.estado == EstadoTransaccion.PROCESANDO and not sin_reclamo:
+            return False
+        transaccion.estado = EstadoTransaccion.CANCELADO
+        self.reclamos.pop(transaccion_id, None)
+        return True
+
+    async def reclamar_para_pago(self, transaccion_id, propietario, lease_segundos):
+        transaccion = self.transacciones.get(transaccion_id)
+        if not transaccion:
+            return None
+        reclamo = self.reclamos.get(transaccion_id)
+        vencido = transaccion.estado == EstadoTransaccion.PROCESANDO and reclamo and reclamo[1] < datetime.now()
+        if transaccion.estado != EstadoTransaccion.PENDIENTE and not vencido:
+            return None
+        transaccion.estado = EstadoTransaccion.PROCESANDO
+        self.reclamos[transaccion_id] = (propietario, datetime.now() + timedelta(seconds=lease_segundos))
+        documento = transaccion.model_dump(by_alias=True)
+        if transaccion_id in self.autorizaciones:
+            documento["autorizacion_pago"] = self.autorizaciones[transaccion_id]
+        return documento
+
+    async def registrar_autorizacion(self, transaccion_id, propietario, resultado_pago):
+        if self.reclamos.get(transaccion_id, (None,))[0] != propietario:
+            return False
+        self.autorizaciones[transaccion_id] = resultado_pago
+        return True
+
+    async def liberar_reclamo(self, transaccion_id, propietario):
+        transaccion = self.transacciones[transaccion_id]
+        if transaccion.estado != EstadoTransaccion.PROCESANDO or self.reclamos.get(transaccion_id, (None,))[0] != propietario:
+            return False
+        transaccion.estado = EstadoTransaccion.PENDIENTE
+        del self.reclamos[transaccion_id]
+        return True
+
+
+class FakeSeleccionRepo:
+    def __init__(self, registro):
+        self.registro = registro
+
+    async def actualizar_estado_selecciones(self, usuario_id, funcion_id, asientos, estado, fecha):
+        self.registro.llamadas.append(("selecciones", estado, tuple(asientos)))
+        return len(asientos)
+
+
+class FakeMongo:
+    def __init__(self, registro):
+        self.registro = registro
+
+    async def obtener_funcion(self, funcion_id):
+        return {"_id": funcion_id, "pelicula_id": "pel_001", "fecha_hora_inicio": datetime(2024, 12, 20, 19, 30)}
+
+    async def obtener_pelicula(self, pelicula_id):
+        return {"_id": pelicula_id, "generos": ["accion"]}
+
+    async def agregar_asientos_ocupados(self, funcion_id, asientos):
+        self.registro.llamadas.append(("ocupados_mongo", tuple(asientos)))
+        return True
+
+
+class FakeRedis:
+    def __init__(self, registro):
+        self.registro = registro
+        self.retenciones = {}
+        self.estados = {}
+        self.streams = {}
+
+    async def get_asientos_ocupados(self, funcion_id):
+        return []
+
+    async def asientos_retenidos(self, funcion_id, asientos):
+        return [a for a in asientos if (funcion_id, a) in self.retenciones]
+
+    async def retener_asientos(self, funcion_id, asientos, propietario, ttl_segundos):
+        if any((funcion_id, a) in self.retenciones for a in asientos):
+            return False
+        for a in asientos:
+            self.retenciones[(funcion_id, a)] = propietario
+        return True
+
+    async def soltar_asientos(self, funcion_id, asientos, propietario):
+        for a in asientos:
+            if self.retenciones.get((funcion_id, a)) == propietario:
+                del self.retenciones[(funcion_id, a)]
+
+    async def renovar_retencion(self, funcion_id, asientos, propietario, ttl_segundos):
+        for a in asientos:
+            self.retenciones.setdefault((funcion_id, a), propietario)
+        return all(self.retenciones[(funcion_id, a)] == propietario for a in asientos)
+
+    async def guardar_estado_pago(self, transaccion_id, estado):
+        self.estados[transaccion_id] = estado
+        return True
+
+    async def obtener_estado_pago(self, transaccion_id):
+        return self.estados.get(transaccion_id)
+
+    async def liberar_asientos_usuario(self, funcion_id, asientos, usuario_id):
+        self.registro.llamadas.append(("liberar_redis", tuple(asientos)))
+        return len(asientos)
+
+    async def marcar_asientos_ocupados(self, funcion_id, asientos):
+        self.registro.llamadas.append(("ocupados_redis", tuple(asientos)))
+        return True
+
+    async def xadd(self, stream, campos):
+        self.registro.llamadas.append(("evento", stream))
+        self.streams.setdefault(stream, []).append(campos)
+        return "1-0"
+
+
+class FakeOutbox:
+    def __init__(self, registro):
+        self.registro = registro
+        self.eventos = []
+
+    async def registrar(self, eventos, confirmar):
+        self.registro.llamadas.append(("outbox", len(eventos)))
+        self.eventos.extend(eventos)
+        return await confirmar(None)
+
+
+class UseCaseDePrueba(ComprarEntradaUseCase):
+    """Caso de uso con dependencias en memoria y pago determinista"""
+
+    def __init__(self, registro, pago_exitoso=True, outbox=False):
+        self.registro = registro
+        self.pago_exitoso = pago_exitoso
+        self.cobros = 0
+        self.outbox_repo = FakeOutbox(registro) if outbox else None
+        self.mongodb_service = FakeMongo(registro)
+        self.redis_service = FakeRedis(registro)
+        self.usuario_repo = FakeUsuarioRepo()
+        self.transaccion_repo = FakeTransaccionRepo(registro)
+        self.seleccion_repo = FakeSeleccionRepo(registro)
+
+    async def _procesar_pago(self, transaccion):
+        self.cobros += 1
+        await asyncio.sleep(0)
+        if self.pago_exitoso:
+            return {"exitoso": True, "codigo_autorizacion": "AUTH1", "mensaje": "ok"}
+        return {"exitoso": False, "mensaje": "rechazada"}
+
+    async def _enviar_correo_confirmacion(self, *args):
+        self.registro.llamadas.append(("correo",))
+
+
+class TestPipelineCompra:
+    """Test para ComprarEntradaUseCase.ejecutar"""
+
+    def test_compra_exitosa_escrituras_en_lote(self):
+        """Cada efecto se ejecuta una sola vez y en lote para todos los asientos"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+        asientos = ["A1", "A2", "C5"]
+
+        resultado = asyncio.run(use_case.ejecutar("u1", "fun_001", asientos, MetodoPago.TARJETA_CREDITO))
+
+        assert resultado["estado"] == EstadoTransaccion.CONFIRMADO
+        nombres = [llamada[0] for llamada in registro.llamadas]
+        assert nombres.count("selecciones") == 1
+        assert nombres.count("liberar_redis") == 1
+        assert nombres.count("ocupados_mongo") == 1
+        assert nombres.count("ocupados_redis") == 1
+        assert nombres.count("evento") == 1
+        assert nombres.count("correo") == 1
+        # La liberación de reservas precede al marcado de ocupados (mismo bitmap)
+        assert nombres.index("liberar_redis") < nombres.index("ocupados_redis")
+
+    def test_pago_fallido_libera_selecciones(self):
+        """Si el pago falla las selecciones se cancelan sin confirmar antes"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro, pago_exitoso=False)
+
+        resultado = asyncio.run(use_case.ejecutar("u1", "fun_001", ["D1"], MetodoPago.TARJETA_CREDITO))
+
+        assert resultado["estado"] == EstadoTransaccion.FALLIDO
+        selecciones = [llamada for llamada in registro.llamadas if llamada[0] == "selecciones"]
+        assert selecciones == [("selecciones", "cancelada", ("D1",))]
+
+    def test_compra_con_outbox(self):
+        """Con outbox la venta y el correo se registran como un evento en vez de publicarse"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro, outbox=True)
+
+        resultado = asyncio.run(use_case.ejecutar("u1", "fun_001", ["B3", "B4"], MetodoPago.TARJETA_CREDITO))
+
+        assert resultado["estado"] == EstadoTransaccion.CONFIRMADO
+        nombres = [llamada[0] for llamada in registro.llamadas]
+        assert nombres.count("outbox") == 1
+        assert "evento" not in nombres
+        assert "correo" not in nombres
+        # La confirmación se escribe junto con el outbox y los asientos se consolidan igual
+        assert nombres.index("outbox") < nombres.index("estado") < nombres.index("ocupados_redis")
+
+        evento = use_case.outbox_repo.eventos[0]
+        assert evento["transaccion_id"] == resultado["transaccion_id"]
+        assert evento["venta"]["cantidad_asientos"] == 2
+        assert evento["correo"]["to"] == "cliente@cine.com"
+
+
+class TestPagoAsincrono:
+    """Test para el modo de pago asíncrono"""
+
+    def test_reserva_pendiente_y_pago_en_worker(self):
+        """La reserva deja la transacción pendiente y el worker la confirma"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1", "A2"], MetodoPago.TARJETA_CREDITO)
+            estado_inicial = dict(use_case.redis_service.estados[pendiente["transaccion_id"]])
+            retenidos = dict(use_case.redis_service.retenciones)
+
+            final = await use_case.completar_pago(pendiente["transaccion_id"])
+            repetido = await use_case.completar_pago(pendiente["transaccion_id"])
+            return pendiente, estado_inicial, retenidos, final, repetido
+
+        pendiente, estado_inicial, retenidos, final, repetido = asyncio.run(escenario())
+
+        assert pendiente["estado"] == EstadoTransaccion.PENDIENTE
+        transaccion_id = pendiente["transaccion_id"]
+        assert pendiente["url_estado"].endswith(f"/{transaccion_id}/estado-pago")
+        assert estado_inicial["estado"] == "pendiente"
+        assert len(retenidos) == 2
+        assert use_case.redis_service.streams["stream:pagos"][0]["transaccion_id"] == transaccion_id
+
+        assert final["estado"] == EstadoTransaccion.CONFIRMADO
+        assert use_case.redis_service.estados[transaccion_id]["estado"] == "confirmado"
+        assert use_case.redis_service.retenciones == {}
+        # Una reentrega del mensaje no vuelve a cobrar
+        assert repetido is None
+
+    def test_asientos_retenidos_no_disponibles(self):
+        """Un asiento retenido por un pago pendiente no puede volver a reservarse"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+        use_case.redis_service.retenciones[("fun_001", "A1")] = "otra_tx"
+
+        async def escenario():
+            try:
+                await use_case.ejecutar_asincrono("u1", "fun_001", ["A1"], MetodoPago.TARJETA_CREDITO)
+            except Exception as e:
+                return e
+
+        error = asyncio.run(escenario())
+        assert error.status_code == 409
+
+    def test_reentrega_concurrente_cobra_una_vez(self):
+        """Dos workers con el mismo mensaje: solo el que reclama la transacción cobra"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1"], MetodoPago.TARJETA_CREDITO)
+            return await asyncio.gather(
+                use_case.completar_pago(pendiente["transaccion_id"]),
+                use_case.completar_pago(pendiente["transaccion_id"]),
+                return_exceptions=True
+            )
+
+        primero, segundo = asyncio.run(escenario())
+
+        assert primero["estado"] == EstadoTransaccion.CONFIRMADO
+        # El segundo intento no confirma el mensaje mientras el reclamo está vigente
+        assert isinstance(segundo, PagoEnCurso)
+        assert use_case.cobros == 1
+
+    def test_fallo_tras_cobro_reutiliza_autorizacion(self):
+        """Si finalizar falla después del cobro, las retenciones siguen y el reintento no cobra de nuevo"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+        finalizar = use_case._finalizar
+        fallos = []
+
+        async def finalizar_con_fallo(*args):
+            if not fallos:
+                fallos.append(True)
+                raise ConnectionError("mongo no disponible")
+            return await finalizar(*args)
+
+        use_case._finalizar = finalizar_con_fallo
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1", "A2"], MetodoPago.TARJETA_CREDITO)
+            transaccion_id = pendiente["transaccion_id"]
+            try:
+                await use_case.completar_pago(transaccion_id)
+            except ConnectionError:
+                pass
+            retenidos = dict(use_case.redis_service.retenciones)
+            estado = use_case.transaccion_repo.transacciones[transaccion_id].estado
+            final = await use_case.completar_pago(transaccion_id)
+            return retenidos, estado, final
+
+        retenidos, estado, final = asyncio.run(escenario())
+
+        assert len(retenidos) == 2
+        assert estado == EstadoTransaccion.PENDIENTE
+        assert final["estado"] == EstadoTransaccion.CONFIRMADO
+        assert use_case.cobros == 1
+        assert use_case.redis_service.retenciones == {}
+
+    def test_retencion_tomada_por_otra_compra_no_cobra(self):
+        """Si la retención venció y otra compra tomó el asiento, la transacción falla sin cobrar"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1"], MetodoPago.TARJETA_CREDITO)
+            use_case.redis_service.retenciones[("fun_001", "A1")] = "otra_tx"
+            return await use_case.completar_pago(pendiente["transaccion_id"])
+
+        final = asyncio.run(escenario())
+
+        assert final["estado"] == EstadoTransaccion.FALLIDO
+        assert use_case.cobros == 0
+        assert use_case.redis_service.retenciones == {("fun_001", "A1"): "otra_tx"}
+
+    def test_cancelar_durante_el_pago(self):
+        """Una cancelación con el reclamo vigente responde 409 y el pago se confirma"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+        procesar_pago = use_case._procesar_pago
+        cancelaciones = []
+
+        async def cancelar_mientras_cobra(transaccion):
+            try:
+                await use_case.cancelar_transaccion(transaccion.id, "u1")
+            except Exception as e:
+                cancelaciones.append(e)
+            return await procesar_pago(transaccion)
+
+        use_case._procesar_pago = cancelar_mientras_cobra
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1"], MetodoPago.TARJETA_CREDITO)
+            return await use_case.completar_pago(pendiente["transaccion_id"])
+
+        final = asyncio.run(escenario())
+
+        assert cancelaciones[0].status_code == 409
+        assert final["estado"] == EstadoTransaccion.CONFIRMADO
+        assert use_case.cobros == 1
+
+    def test_cancelar_pendiente_impide_el_cobro(self):
+        """Una transacción cancelada antes del reclamo no se cobra al llegar al worker"""
+        registro = Registro()
+        use_case = UseCaseDePrueba(registro)
+
+        async def escenario():
+            pendiente = await use_case.ejecutar_asincrono("u1", "fun_001", ["A1"], MetodoPago.TARJETA_CREDITO)
+            cancelada = await use_case.cancelar_transaccion(pendiente["transaccion_id"], "u1")
+            final = await use_case.completar_pago(pendiente["transaccion_id"])
+            return cancelada, final
+
+        cancelada, final = asyncio.run(escenario())
+
+        assert cancelada["estado"] == EstadoTransaccion.CANCELADO
+        assert final is None
+        assert use_case.cobros == 0
+
+
+class TestLatencias:
+    """Test para el desglose de latencias por paso"""
+
+    def test_percentiles(self):
+        """Registra pasos y total y calcula percentiles"""
+        registro = RegistroLatencias(ventana=10)
+        for _ in range(3):
+            cronometro = Cronometro()
+            cronometro.marcar("lecturas")
+            cronometro.marcar("pago")
+            registro.registrar(cronometro)
+
+        estadisticas = registro.obtener_estadisticas()
+        assert set(estadisticas) == {"lecturas", "pago", "total"}
+        assert estadisticas["pago"]["muestras"] == 3
+        assert estadisticas["total"]["p50"] <= estadisticas["total"]["max"]
@@ -0,0 +1,91 @@
+"""
+Test para el servicio de QR (pool de procesos, cache y lotes)
+"""
+
+import asyncio
+import base64
+
+from services.qr_service import QRService
+
+
+class FakeRedis:
+    def __init__(self):
+        self.datos = {}
+        self.pipelines = 0
+
+    async def pipeline_execute(self, operaciones):
+        self.pipelines += 1
+        resultados = []
+        for metodo, args, kwargs in operaciones:
+            if metodo == "get":
+                resultados.append(self.datos.get(args[0]))
+            else:
+                self.datos[args[0]] = args[1]
+                resultados.append(True)
+        return resultados
+
+
+class TestQRService:
+    """Test para QRService"""
+
+    def test_render_en_pool_de_procesos_y_cache(self):
+        """El PNG se genera en otro proceso y la segunda vez sale de la LRU"""
+        servicio = QRService(procesos=1)
+
+        async def escenario():
+            try:
+                primero = await servicio.generar("tx-1")
+                segundo = await servicio.generar("tx-1")
+            finally:
+                await servicio.cerrar()
+            return primero, segundo
+
+        primero, segundo = asyncio.run(escenario())
+
+        assert base64.b64decode(primero).startswith(b"\x89PNG")
+        assert segundo == primero
+        assert servicio.renders == 1
+        assert servicio.l1_hits == 1
+
+    def test_svg_y_persistencia_en_redis(self):
+        """El SVG se guarda en Redis y otra instancia lo reutiliza sin renderizar"""
+        redis = FakeRedis()
+        servicio = QRService(redis_service=redis, procesos=0)
+        otro = QRService(redis_service=redis, procesos=0)
+
+        svg = asyncio.run(servicio.generar("tx-2", "svg"))
+        copia = asyncio.run(otro.generar("tx-2", "svg"))
+
+        assert "<svg" in svg
+        assert copia == svg
+        assert otro.renders == 0
+        assert otro.l2_hits == 1
+
+    def test_concurrentes_se_agrupan(self):
+        """Peticiones idénticas simultáneas producen un único render"""
+        servicio = QRService(procesos=0)
+
+        async def escenario():
+            return await asyncio.gather(*[servicio.generar("tx-3") for _ in range(5)])
+
+        resultados = asyncio.run(escenario())
+
+        assert len(set(resultados)) == 1
+        assert servicio.renders == 1
+
+    def test_lote_solo_renderiza_faltantes(self):
+        """En un lote se reutiliza lo cacheado y se respeta el orden"""
+        redis = FakeRedis()
+        servicio = QRService(redis_service=redis, procesos=0)
+
+        async def escenario():
+            individual = await servicio.generar("A1")
+            lote = await servicio.generar_lote(["A1", "A2", "A3", "A2"])
+            return individual, lote
+
+        individual, lote = asyncio.run(escenario())
+
+        assert lote[0] == individual
+        assert lote[1] == lote[3] != lote[2]
+        assert servicio.renders == 3
+        assert len(redis.datos) == 3
@@ -0,0 +1,215 @@
+"""
+Test para el cálculo de buckets de rollups de ventas
+"""
+
+import asyncio
+from datetime import datetime
+
+from services import rollup_service
+from services.rollup_service import RollupService, parsear_fecha, inicio_bucket, rango_consulta
+
+
+class TestBuckets:
+    """Test para el cálculo de buckets"""
+
+    def test_parsear_fecha(self):
+        """Acepta strings ISO (con o sin Z) y datetimes"""
+        assert parsear_fecha("2024-12-20T10:30:00Z") == datetime(2024, 12, 20, 10, 30)
+        assert parsear_fecha(datetime(2024, 12, 20, 10, 30)) == datetime(2024, 12, 20, 10, 30)
+        assert parsear_fecha("no-es-fecha") is None
+        assert parsear_fecha(None) is None
+
+    def test_inicio_bucket(self):
+        """Trunca la fecha según la granularidad"""
+        fecha = datetime(2024, 12, 20, 10, 45, 12)
+        assert inicio_bucket(fecha, "hora") == datetime(2024, 12, 20, 10)
+        assert inicio_bucket(fecha, "dia") == datetime(2024, 12, 20)
+
+    def test_rango_dias_completos(self):
+        """Un rango de fechas sin hora usa buckets diarios e incluye el último día"""
+        granularidad, inicio, fin = rango_consulta("2024-12-01", "2024-12-31")
+        assert granularidad == "dia"
+        assert inicio == datetime(2024, 12, 1)
+        assert fin == datetime(2025, 1, 1)
+
+    def test_rango_parcial(self):
+        """Un rango con horas usa buckets por hora"""
+        granularidad, inicio, fin = rango_consulta(
+            datetime(2024, 12, 1, 10, 15), datetime(2024, 12, 1, 18, 30)
+        )
+        assert granularidad == "hora"
+        assert inicio == datetime(2024, 12, 1, 10)
+        assert fin == datetime(2024, 12, 1, 19)
+
+
+class TestAcumulacion:
+    """Test para la acumulación de ventas en buckets"""
+
+    def test_acumular_ventas(self):
+        """Cada venta suma en un bucket por hora y uno por día"""
+        acumulado = {}
+        fecha = datetime(2024, 12, 20, 10, 30)
+        RollupService._acumular(acumulado, fecha, "pel_001", "fun_001", "web", 100.0, 2)
+        RollupService._acumular(acumulado, fecha, "pel_001", "fun_001", "web", 50.0, 1)
+
+        assert len(acumulado) == 2
+        bucket_dia = acumulado[("dia", datetime(2024, 12, 20), "pel_001", "fun_001", "web")]
+        assert bucket_dia["total_ventas"] == 150.0
+        assert bucket_dia["total_transacciones"] == 2
+        assert bucket_dia["total_asientos"] == 3
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.claves = {}
+        self.pausas = []
+
+    async def mget(self, claves):
+        return [self.claves.get(clave) for clave in claves]
+
+    async def pipeline_execute(self, operaciones):
+        for comando, args, kwargs in operaciones:
+            assert comando == "set" and kwargs["ex"] > 0
+            self.claves[args[0]] = args[1]
+        return [True] * len(operaciones)
+
+    async def exists(self, clave):
+        return clave in self.claves
+
+    async def set_with_expiry(self, clave, valor, expire_seconds, only_if_not_exists=False):
+        self.pausas.append(clave)
+        self.claves[clave] = valor
+        return True
+
+    async def delete(self, clave):
+        return 1 if self.claves.pop(clave, None) else 0
+
+
+class FakeCursor:
+    def __init__(self, documentos):
+        self.documentos = documentos
+
+    def batch_size(self, n):
+        return self
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        for documento in self.documentos:
+            yield documento
+
+
+class FakeColeccion:
+    def __init__(self, documentos=None):
+        self.documentos = documentos or []
+        self.filtros = []
+        self.escrituras = []
+        self.borrados = []
+        self.fallar = False
+
+    def find(self, filtro, proyeccion=None):
+        self.filtros.append(filtro)
+        return FakeCursor(self.documentos)
+
+    async def bulk_write(self, operaciones, ordered=True):
+        if self.fallar:
+            raise ConnectionError("mongo caído")
+        self.escrituras.extend(operaciones)
+
+    async def delete_many(self, filtro):
+        self.borrados.append(filtro)
+
+
+class FakeColeccionEstado:
+    def __init__(self):
+        self.documentos = {}
+
+    async def find_one(self, filtro):
+        return self.documentos.get(filtro["_id"])
+
+    async def update_one(self, filtro, actualizacion, upsert=False):
+        self.documentos.setdefault(filtro["_id"], {}).update(actualizacion["$set"])
+
+
+class FakeMongoService:
+    def __init__(self, transacciones=None):
+        self.database = type("Database", (), {})()
+        self.database.rollups_ventas = FakeColeccion()
+        self.database.rollups_estado = FakeColeccionEstado()
+        self.database.transacciones = FakeColeccion(transacciones)
+
+
+def evento(transaccion_id):
+    return {"tipo": "venta_confirmada", "transaccion_id": transaccion_id, "pelicula_id": "pel_001",
+            "funcion_id": "fun_001", "monto": "100", "cantidad_asientos": "2",
+            "fecha_creacion": "2024-12-20T10:30:00"}
+
+
+class TestConsumo:
+    """Test para la deduplicación y la reconstrucción"""
+
+    def test_marca_procesadas_solo_despues_de_escribir(self):
+        redis_service = FakeRedisService()
+        servicio = RollupService(FakeMongoService(), redis_service)
+
+        servicio.collection.fallar = True
+        try:
+            asyncio.run(servicio.procesar_eventos([evento("t1"), evento("t2")]))
+        except ConnectionError:
+            pass
+        # El lote fallido no quedó marcado: la reentrega lo aplica
+        assert redis_service.claves == {}
+
+        servicio.collection.fallar = False
+        assert asyncio.run(servicio.procesar_eventos([evento("t1"), evento("t2"), evento("t2")])) == 2
+        assert set(redis_service.claves) == {"rollup:procesado:t1", "rollup:procesado:t2"}
+        assert asyncio.run(servicio.procesar_eventos([evento("t1")])) == 0
+
+    def test_lote_no_se_aplica_durante_una_reconstruccion(self):
+        redis_service = FakeRedisService()
+        redis_service.claves["rollup:pausa"] = "otro"
+        servicio = RollupService(FakeMongoService(), redis_service)
+
+        assert asyncio.run(servicio._procesar_lote([("1-0", evento("t1"))])) is False
+        assert servicio.collection.escrituras == []
+
+    def test_reconstruir_filtra_en_mongo_pausa_y_marca_recientes(self, monkeypatch):
+        monkeypatch.setattr(rollup_service.settings, "rollups_pausa_espera", 0)
+        reciente = datetime.now().replace(microsecond=0)
+        mongo = FakeMongoService([
+            {"_id": "t1", "pelicula_id": "pel_001", "funcion_id": "fun_001", "total": 100,
+             "cantidad_asientos": 2, "fecha_creacion": reciente},
+            {"_id": "t0", "pelicula_id": "pel_001", "funcion_id": "fun_001", "total": 50,
+             "cantidad_asientos": 1, "fecha_creacion": datetime(2020, 1, 1)},
+        ])
+        redis_service = FakeRedisService()
+        servicio = RollupService(mongo, redis_service)
+
+        resultado = asyncio.run(servicio.reconstruir(datetime(2019, 6, 1, 15)))
+
+        assert mongo.database.transacciones.filtros[0]["fecha_creacion"] == {"$gte": datetime(2019, 6, 1)}
+        assert resultado == {"transacciones": 2, "buckets": 4}
+        assert redis_service.pausas == ["rollup:pausa"] and "rollup:pausa" not in redis_service.claves
+        assert "rollup:procesado:t1" in redis_service.claves
+        assert "rollup:procesado:t0" not in redis_service.claves
+
+    def test_cubre_solo_lo_reconstruido(self, monkeypatch):
+        """Sin reconstrucción las consultas van a las transacciones; el alcance más amplio se conserva"""
+        monkeypatch.setattr(rollup_service.settings, "rollups_pausa_espera", 0)
+        servicio = RollupService(FakeMongoService(), FakeRedisService())
+
+        async def escenario():
+            antes = await servicio.cubre("2024-12-01")
+            await servicio.reconstruir(datetime(2024, 12, 1))
+            parcial = (await servicio.cubre("2024-12-01"), await servicio.cubre("2024-11-30"), await servicio.cubre())
+            await servicio.reconstruir()
+            await servicio.reconstruir(datetime(2024, 12, 10))
+            return antes, parcial, await servicio.cubre(), await servicio.cubre("2020-01-01")
+
+        antes, parcial, historico, antiguo = asyncio.run(escenario())
+
+        assert antes is False
+        assert parcial == (True, False, False)
+        assert historico is True and antiguo is True
+        assert servicio.estado.documentos["ventas"]["desde"] is None
@@ -0,0 +1,54 @@
+"""
+Test para el monitor de salud del event loop
+"""
+
+import asyncio
+import time
+
+from infrastructure.utils.salud_loop import MonitorLoop
+
+
+def hash_bloqueante():
+    # Simula bcrypt/smtplib: trabajo síncrono dentro del loop
+    time.sleep(0.15)
+
+
+class TestSaludLoop:
+    """Test para infrastructure.utils.salud_loop"""
+
+    def test_loop_sano(self):
+        async def escenario():
+            monitor = MonitorLoop(intervalo=0.01, ventana=50, degradado_ms=100, detector=True, bloqueo_ms=50)
+            await monitor.iniciar()
+            await asyncio.sleep(0.2)
+            await monitor.detener()
+            return monitor
+
+        monitor = asyncio.run(escenario())
+
+        assert monitor.obtener_estado()["estado"] == "ok"
+        assert len(monitor.lags) > 5
+        assert not monitor.bloqueos
+
+    def test_detecta_bloqueo_con_pila_y_degrada(self):
+        async def escenario():
+            monitor = MonitorLoop(intervalo=0.01, ventana=5, degradado_ms=50, detector=True, bloqueo_ms=50)
+            await monitor.iniciar()
+            await asyncio.sleep(0.05)
+            hash_bloqueante()
+            hash_bloqueante()
+            await asyncio.sleep(0.05)
+            estado = monitor.obtener_estado()
+            await monitor.detener()
+            return monitor, estado
+
+        monitor, estado = asyncio.run(escenario())
+        estadisticas = monitor.obtener_estadisticas()
+
+        assert estado["estado"] == "degradado"
+        assert estadisticas["lag_max_ms"] >= 100
+        assert estadisticas["detector"]["total"] >= 1
+        bloqueo = monitor.bloqueos[0]
+        assert bloqueo["duracion_ms"] >= 100
+        assert "hash_bloqueante" in bloqueo["origen"]
+        assert bloqueo["origen"].startswith("tests/test_salud_loop.py")
@@ -0,0 +1,64 @@
+"""
+Test para la coalescencia de lecturas concurrentes
+"""
+
+import asyncio
+
+from infrastructure.utils.single_flight import SingleFlight, single_flight
+
+
+class FakeServicio:
+    """Servicio con una lectura lenta decorada"""
+
+    def __init__(self):
+        self.lecturas = 0
+
+    @single_flight("test.obtener")
+    async def obtener(self, entidad_id: str):
+        self.lecturas += 1
+        await asyncio.sleep(0.01)
+        return {"_id": entidad_id, "asientos": []}
+
+
+class TestSingleFlight:
+    """Test para el utilitario single-flight"""
+
+    def test_coalesce_llamadas_concurrentes(self):
+        """Llamadas concurrentes con la misma clave ejecutan una sola carga"""
+        servicio = FakeServicio()
+
+        async def escenario():
+            return await asyncio.gather(*[servicio.obtener("fun_001") for _ in range(10)])
+
+        resultados = asyncio.run(escenario())
+        assert servicio.lecturas == 1
+        assert all(r == {"_id": "fun_001", "asientos": []} for r in resultados)
+        assert FakeServicio.obtener.single_flight.coalescidas >= 9
+
+    def test_resultados_independientes(self):
+        """Cada llamador coalescido recibe su propia copia"""
+        servicio = FakeServicio()
+
+        async def escenario():
+            return await asyncio.gather(servicio.obtener("fun_002"), servicio.obtener("fun_002"))
+
+        primero, segundo = asyncio.run(escenario())
+        primero["asientos"].append("A1")
+        assert segundo["asientos"] == []
+
+    def test_claves_distintas_no_se_coalescen(self):
+        """Claves distintas ejecutan cargas separadas; llamadas secuenciales también"""
+        grupo = SingleFlight("test")
+        cargas = []
+
+        async def cargar(valor):
+            cargas.append(valor)
+            return valor
+
+        async def escenario():
+            await asyncio.gather(grupo.hacer("a", lambda: cargar("a")), grupo.hacer("b", lambda: cargar("b")))
+            await grupo.hacer("a", lambda: cargar("a"))
+
+        asyncio.run(escenario())
+        assert len(cargas) == 3
+        assert grupo.obtener_estadisticas()["coalescidas"] == 0
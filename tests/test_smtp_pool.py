@@ -0,0 +1,65 @@
+"""
+Test para el pool SMTP persistente contra el sink local
+"""
+
+import asyncio
+from email.message import EmailMessage
+
+from infrastructure.mail.smtp_pool import SMTPPool
+from infrastructure.mail.smtp_sink import SMTPSink
+
+
+def crear_mensaje(i: int) -> EmailMessage:
+    mensaje = EmailMessage()
+    mensaje["From"] = "noreply@cinemax.com"
+    mensaje["To"] = f"cliente{i}@cine.com"
+    mensaje["Subject"] = f"Confirmación {i}"
+    mensaje.set_content("Gracias por su compra")
+    return mensaje
+
+
+class TestSMTPPool:
+    """Test para SMTPPool"""
+
+    def test_reutiliza_conexiones(self):
+        """Muchos envíos concurrentes usan como mucho ``tamano`` sesiones"""
+        async def escenario():
+            sink = SMTPSink(port=0, guardar=1)
+            puerto = await sink.iniciar()
+            pool = SMTPPool("127.0.0.1", puerto, usuario="u", password="p", use_tls=False, tamano=2, timeout=5)
+            try:
+                await asyncio.gather(*[pool.enviar(crear_mensaje(i)) for i in range(20)])
+                return sink.mensajes, sink.conexiones, sink.recibidos, pool.obtener_estadisticas()
+            finally:
+                await pool.cerrar()
+                await sink.detener()
+
+        mensajes, conexiones, recibidos, estadisticas = asyncio.run(escenario())
+
+        assert mensajes == 20
+        assert conexiones <= 2
+        assert b"Gracias por su compra" in recibidos[0]
+        assert estadisticas["enviados"] == 20
+        assert estadisticas["errores"] == 0
+
+    def test_reconecta_si_el_servidor_cierra(self):
+        """Una sesión cerrada por el servidor se reabre y el envío no se pierde"""
+        async def escenario():
+            sink = SMTPSink(port=0)
+            puerto = await sink.iniciar()
+            pool = SMTPPool("127.0.0.1", puerto, use_tls=False, tamano=1, timeout=5)
+            try:
+                await pool.enviar(crear_mensaje(1))
+                sink.desconectar_clientes()
+                await asyncio.sleep(0.05)
+                await pool.enviar(crear_mensaje(2))
+                return sink.mensajes, pool.obtener_estadisticas()
+            finally:
+                await pool.cerrar()
+                await sink.detener()
+
+        mensajes, estadisticas = asyncio.run(escenario())
+
+        assert mensajes == 2
+        assert estadisticas["reconexiones"] == 1
+        assert estadisticas["enviados"] == 2
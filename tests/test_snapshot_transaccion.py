@@ -0,0 +1,33 @@
+"""
+Test para el snapshot desnormalizado de película y función en transacciones
+"""
+
+from datetime import datetime
+
+from domain.entities.transaccion import calcular_snapshot_funcion
+
+
+class TestSnapshotFuncion:
+    """Test para el cálculo de campos desnormalizados"""
+
+    def test_snapshot_desde_string(self):
+        """Parsea fechas ISO y usa la convención de $dayOfWeek (domingo = 1)"""
+        snapshot = calcular_snapshot_funcion("2024-12-22T19:30:00Z", ["accion", "drama"])
+        assert snapshot["funcion_inicio"] == datetime(2024, 12, 22, 19, 30)
+        assert snapshot["funcion_hora"] == 19
+        assert snapshot["funcion_dia_semana"] == 1  # domingo
+        assert snapshot["generos"] == ["accion", "drama"]
+
+    def test_snapshot_desde_datetime(self):
+        """Acepta datetime directamente"""
+        snapshot = calcular_snapshot_funcion(datetime(2024, 12, 21, 15, 0))
+        assert snapshot["funcion_hora"] == 15
+        assert snapshot["funcion_dia_semana"] == 7  # sábado
+        assert snapshot["generos"] == []
+
+    def test_snapshot_sin_funcion(self):
+        """Sin fecha de función los campos quedan en None"""
+        snapshot = calcular_snapshot_funcion(None, ["terror"])
+        assert snapshot["funcion_inicio"] is None
+        assert snapshot["funcion_hora"] is None
+        assert snapshot["funcion_dia_semana"] is None
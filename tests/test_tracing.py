@@ -0,0 +1,119 @@
+"""
+Test para las trazas basadas en contextvars
+"""
+
+import asyncio
+import json
+
+from config.settings import settings
+from infrastructure.utils import tracing
+from infrastructure.utils.latencias import Cronometro
+from infrastructure.utils.tracing import ExportadorTrazas, iniciar_traza, span, trazar, trazar_metodos
+
+
+@trazar_metodos("repo.prueba")
+class RepoDePrueba:
+    async def obtener(self, id):
+        await asyncio.sleep(0)
+        return {"id": id}
+
+
+@trazar("compra.pago")
+async def pagar():
+    await asyncio.sleep(0.002)
+    return True
+
+
+def nombres(nodo):
+    return [hijo["nombre"] for hijo in nodo.get("hijos", [])]
+
+
+class TestTracing:
+    """Test para infrastructure.utils.tracing"""
+
+    def setup_method(self):
+        self._exportador = tracing.exportador_trazas
+        tracing.exportador_trazas = None
+
+    def teardown_method(self):
+        tracing.exportador_trazas = self._exportador
+
+    def test_arbol_de_spans_con_pasos_y_gather(self, monkeypatch):
+        """Los pasos del cronómetro son padres de las operaciones ejecutadas en el paso"""
+        monkeypatch.setattr(settings, "tracing_muestreo", 1.0)
+        repo = RepoDePrueba()
+
+        @trazar("compra.ejecutar")
+        async def ejecutar():
+            cronometro = Cronometro()
+            await asyncio.gather(repo.obtener("u1"), repo.obtener("f1"))
+            cronometro.marcar("lecturas")
+            await pagar()
+            cronometro.marcar("pago")
+
+        async def escenario():
+            with iniciar_traza("POST /comprar") as traza:
+                await ejecutar()
+            return traza
+
+        traza = asyncio.run(escenario()).a_dict()
+        compra = traza["raiz"]["hijos"][0]
+
+        assert compra["nombre"] == "compra.ejecutar"
+        assert nombres(compra)[:2] == ["lecturas", "pago"]
+        assert nombres(compra["hijos"][0]) == ["repo.prueba.obtener", "repo.prueba.obtener"]
+        assert nombres(compra["hijos"][1]) == ["compra.pago"]
+        assert compra["hijos"][1]["duracion_ms"] >= 2
+
+    def test_sin_muestreo_no_hay_spans(self, monkeypatch):
+        """Las peticiones no muestreadas no crean spans"""
+        monkeypatch.setattr(settings, "tracing_muestreo", 0.0)
+
+        async def escenario():
+            with iniciar_traza("GET /") as traza:
+                with span("interno") as actual:
+                    return traza, actual, Cronometro()._span
+
+        assert asyncio.run(escenario()) == (None, None, None)
+
+    def test_errores_y_exportacion(self, monkeypatch, tmp_path):
+        """Un error marca el span y la traza se exporta a JSON lines y OTLP"""
+        monkeypatch.setattr(settings, "tracing_muestreo", 1.0)
+        monkeypatch.setattr(settings, "tracing_archivo", str(tmp_path / "trazas.jsonl"))
+
+        traza = None
+        try:
+            with iniciar_traza("GET /falla") as traza:
+                with span("redis.get"):
+                    raise ValueError("sin conexión")
+        except ValueError:
+            pass
+
+        exportador = ExportadorTrazas("json")
+        exportador.exportar(traza)
+        exportador.cerrar()
+
+        linea = json.loads((tmp_path / "trazas.jsonl").read_text().splitlines()[0])
+        assert linea["raiz"]["hijos"][0]["error"] == "ValueError: sin conexión"
+        assert exportador.exportadas == 1
+
+        otlp = tracing._spans_otlp(traza)
+        assert otlp[1]["parentSpanId"] == otlp[0]["spanId"]
+        assert otlp[1]["status"]["code"] == 2
+
+    def test_archivo_rota_por_tamano(self, monkeypatch, tmp_path):
+        """El exportador json rota el archivo al superar el tamaño máximo"""
+        archivo = tmp_path / "trazas.jsonl"
+        monkeypatch.setattr(settings, "tracing_muestreo", 1.0)
+        monkeypatch.setattr(settings, "tracing_archivo", str(archivo))
+        monkeypatch.setattr(settings, "tracing_archivo_max_bytes", 1)
+        monkeypatch.setattr(settings, "tracing_archivo_respaldos", 2)
+
+        exportador = ExportadorTrazas("json")
+        for _ in range(4):
+            with iniciar_traza("GET /peliculas") as traza:
+                pass
+            exportador._escribir([traza])
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["trazas.jsonl", "trazas.jsonl.1", "trazas.jsonl.2"]
+        assert len(archivo.read_text().splitlines()) == 1
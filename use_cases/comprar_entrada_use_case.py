@@ -5,6 +5,7 @@ Caso de uso para comprar entradas
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
 
 from domain.entities.transaccion import Transaccion, DetalleAsiento, DetallePago, MetodoPago, EstadoTransaccion
 from domain.entities.usuario import Usuario, UsuarioResponse
@@ -12,10 +13,31 @@ from domain.repositories.transaccion_repository import TransaccionRepository
 from domain.repositories.usuario_repository import UsuarioRepository
 from infrastructure.database.mongodb_service import MongoDBService
 from domain.repositories.seleccion_asiento_repository import SeleccionAsientoRepository
-from services.global_services import get_mongodb_service
+from domain.repositories.outbox_repository import OutboxRepository
+from services.global_services import get_mongodb_service, get_redis_service, get_outbox_relay_service
 from infrastructure.cache.redis_service import RedisService
 from services.email_service import email_service
+from services.ticket_service import ticket_service, expiracion_entrada
+from services.payment_gateway import payment_gateway
+from config.settings import settings
+from infrastructure.utils.latencias import Cronometro, RegistroLatencias
+from infrastructure.utils.tracing import trazar
+from infrastructure.utils.logs import obtener_logger
 import asyncio
+import uuid
+
+
+logger = obtener_logger(__name__)
+
+
+STREAM_PAGOS = "stream:pagos"
+
+# Desglose de latencias por paso de las compras recientes
+registro_latencias_compra = RegistroLatencias()
+
+
+class PagoEnCurso(Exception):
+    """Otro worker tiene reclamada la transacción; se reintenta al vencer su reclamo"""
 
 
 class ComprarEntradaUseCase:
@@ -23,13 +45,19 @@ class ComprarEntradaUseCase:
     
     def __init__(self):
         self.mongodb_service = get_mongodb_service()
-        self.redis_service = RedisService()
+        self.redis_service = get_redis_service() or RedisService()
         
         if self.mongodb_service:
             self.transaccion_repo = TransaccionRepository(self.mongodb_service.database)
             self.usuario_repo = UsuarioRepository(self.mongodb_service.database)
             self.seleccion_repo = SeleccionAsientoRepository(self.mongodb_service.database)
+        
+        # Outbox transaccional para los efectos posteriores a la confirmación
+        self.outbox_repo = None
+        if self.mongodb_service and settings.outbox_habilitado:
+            self.outbox_repo = OutboxRepository(self.mongodb_service.database, self.mongodb_service.client)
     
+    @trazar("compra.ejecutar")
     async def ejecutar(
         self,
         usuario_id: str,
@@ -38,164 +66,98 @@ class ComprarEntradaUseCase:
         metodo_pago: MetodoPago,
         datos_pago: Dict[str, Any] = None
     ) -> Dict[str, Any]:
-        """Ejecutar la compra de entradas"""
+        """Ejecutar la compra de entradas (pago en línea dentro del request)"""
+        
+        cronometro = Cronometro()
         
         try:
-            # 1. Validar que el usuario existe
-            usuario = await self.usuario_repo.obtener_usuario_por_id(usuario_id)
-            if not usuario:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Usuario no encontrado"
-                )
-            
-            # 2. Validar que la función existe
-            funcion = await self.mongodb_service.obtener_funcion(funcion_id)
-            if not funcion:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Función no encontrada"
-                )
+            usuario, transaccion_creada = await self._reservar(
+                usuario_id, funcion_id, asientos, metodo_pago, datos_pago, cronometro
+            )
             
-            # 3. Validar que los asientos están disponibles
-            asientos_disponibles = await self._verificar_disponibilidad_asientos(funcion_id, asientos)
-            if not asientos_disponibles:
+            # 10. Reclamar y procesar pago
+            # El reclamo impide cancelar la transacción mientras se cobra; las
+            # selecciones temporales siguen vigentes hasta conocer el resultado
+            propietario = uuid.uuid4().hex
+            reclamada = await self.transaccion_repo.reclamar_para_pago(
+                transaccion_creada.id, propietario, settings.pagos_lease_segundos
+            )
+            if reclamada is None:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
-                    detail="Uno o más asientos no están disponibles"
+                    detail="La transacción ya no está pendiente de pago"
                 )
+            resultado_pago = await self._procesar_pago(transaccion_creada)
+            cronometro.marcar("pago")
             
-            # 4. Obtener información de la película
-            pelicula = await self.mongodb_service.obtener_pelicula(funcion.get("pelicula_id"))
-            
-            # 5. Crear detalles de asientos
-            detalles_asientos = await self._crear_detalles_asientos(asientos, funcion_id)
-            
-            # 6. Crear detalle de pago
-            detalle_pago = self._crear_detalle_pago(metodo_pago, datos_pago)
-            
-            # 7. Crear transacción con totales calculados
-            # Calcular subtotal antes de crear la transacción
-            subtotal = sum(asiento.precio_unitario for asiento in detalles_asientos)
-            cantidad_asientos = len(detalles_asientos)
-            
-            # Calcular impuestos (19% IVA)
-            impuestos = subtotal * 0.19
-            
-            # Total inicial (sin descuentos)
-            total = subtotal + impuestos
-            
-            transaccion = Transaccion(
-                cliente_id=usuario_id,
-                pelicula_id=funcion.get("pelicula_id"),
-                funcion_id=funcion_id,
-                asientos=detalles_asientos,
-                pago=detalle_pago,
-                subtotal=subtotal,
-                cantidad_asientos=cantidad_asientos,
-                total=total,
-                impuestos=impuestos,
-                fecha_vencimiento=datetime.now() + timedelta(minutes=30),  # 30 minutos para pagar
-                ip_origen=datos_pago.get("ip_origen") if datos_pago else None,
-                user_agent=datos_pago.get("user_agent") if datos_pago else None,
-                canal_venta=datos_pago.get("canal_venta", "web") if datos_pago else "web"
+            # 11. Actualizar estado y efectos posteriores
+            estado_final = await self._finalizar(
+                usuario, transaccion_creada, asientos, resultado_pago, propietario, cronometro
             )
             
-            # 8. Aplicar descuentos y recalcular totales
-            await self._aplicar_descuentos(transaccion, usuario)
-            transaccion.calcular_totales()
-            
-            # 9. Aplicar descuentos si corresponde
-            await self._aplicar_descuentos(transaccion, usuario)
+            registro_latencias_compra.registrar(cronometro)
+            logger.info("Compra completada", extra={
+                "transaccion_id": transaccion_creada.id,
+                "estado": estado_final,
+                "duracion_ms": cronometro.total(),
+                "pasos_ms": cronometro.pasos
+            })
             
-            # 10. Guardar transacción
-            transaccion_creada = await self.transaccion_repo.crear_transaccion(transaccion)
-            if not transaccion_creada:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Error al crear la transacción"
-                )
+            # 12. Generar respuesta
+            return self._generar_respuesta(transaccion_creada, estado_final, asientos, resultado_pago)
             
-            # 11. Confirmar selecciones temporales (se marcarán como confirmadas después del pago)
-            await self._confirmar_selecciones_temporales(usuario_id, funcion_id, asientos)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error interno del servidor: {str(e)}"
+            )
+    
+    @trazar("compra.ejecutar_asincrono")
+    async def ejecutar_asincrono(
+        self,
+        usuario_id: str,
+        funcion_id: str,
+        asientos: List[str],
+        metodo_pago: MetodoPago,
+        datos_pago: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Reservar asientos y encolar el pago (modo asíncrono)
+        
+        Persiste la transacción en estado ``pendiente``, retiene los asientos
+        y publica la orden de pago en ``stream:pagos``. El pool de workers de
+        pago la confirma o la marca como fallida.
+        """
+        cronometro = Cronometro()
+        
+        try:
+            usuario, transaccion_creada = await self._reservar(
+                usuario_id, funcion_id, asientos, metodo_pago, datos_pago, cronometro,
+                retener=True
+            )
             
-            # 12. Procesar pago (simulado)
-            resultado_pago = await self._procesar_pago(transaccion_creada)
+            await self.redis_service.guardar_estado_pago(transaccion_creada.id, {
+                "transaccion_id": transaccion_creada.id,
+                "cliente_id": usuario_id,
+                "estado": EstadoTransaccion.PENDIENTE.value
+            })
+            await self.redis_service.xadd(STREAM_PAGOS, {
+                "transaccion_id": transaccion_creada.id,
+                "usuario_id": usuario_id,
+                "timestamp": datetime.now().isoformat()
+            })
+            cronometro.marcar("encolar_pago")
             
-            # 13. Actualizar estado según resultado del pago
-            if resultado_pago["exitoso"]:
-                await self.transaccion_repo.actualizar_estado_transaccion(
-                    transaccion_creada.id,
-                    EstadoTransaccion.CONFIRMADO,
-                    f"Pago procesado exitosamente. Código: {resultado_pago['codigo_autorizacion']}"
-                )
-                estado_final = EstadoTransaccion.CONFIRMADO
-                
-                # 13.1. Confirmar selecciones temporales
-                try:
-                    await self._confirmar_selecciones_temporales(usuario_id, funcion_id, asientos)
-                    print(f"✅ Selecciones temporales confirmadas para asientos: {asientos}")
-                except Exception as e:
-                    print(f"⚠️  Error confirmando selecciones temporales: {e}")
-                
-                # 13.2. Marcar asientos como ocupados en la función
-                try:
-                    await self._marcar_asientos_ocupados(funcion_id, asientos)
-                    print(f"✅ Asientos marcados como ocupados: {asientos}")
-                except Exception as e:
-                    print(f"⚠️  Error marcando asientos como ocupados: {e}")
-                    # No fallar la transacción por error al marcar asientos
-                
-                # 13.3. Enviar correo de confirmación usando Redis
-                try:
-                    # Preparar datos para el correo
-                    transaccion_data = {
-                        "transaccion_id": transaccion_creada.id,
-                        "numero_factura": transaccion_creada.numero_factura,
-                        "estado": estado_final,
-                        "total": transaccion_creada.total,
-                        "asientos": asientos,
-                        "fecha_vencimiento": transaccion_creada.fecha_vencimiento.isoformat(),
-                        "resultado_pago": resultado_pago,
-                        "resumen": transaccion_creada.generar_resumen(),
-                        "codigo_qr": transaccion_creada.id  # O el QR real si lo tienes
-                    }
-                    
-                    # Enviar correo de confirmación
-                    await email_service.enviar_correo_confirmacion_compra(
-                        email=usuario.email,
-                        transaccion_data=transaccion_data
-                    )
-                    
-                except Exception as e:
-                    print(f"⚠️  Error enviando correo de confirmación: {e}")
-                    # No fallar la transacción por error de correo
-                
-            else:
-                await self.transaccion_repo.actualizar_estado_transaccion(
-                    transaccion_creada.id,
-                    EstadoTransaccion.FALLIDO,
-                    f"Error en el pago: {resultado_pago['mensaje']}"
-                )
-                estado_final = EstadoTransaccion.FALLIDO
-                
-                # Si el pago falla, liberar las selecciones temporales
-                try:
-                    await self._liberar_selecciones_temporales(usuario_id, funcion_id, asientos)
-                    print(f"⚠️  Selecciones temporales liberadas por pago fallido: {asientos}")
-                except Exception as e:
-                    print(f"⚠️  Error liberando selecciones temporales: {e}")
-            
-            # 14. Generar respuesta
             return {
                 "transaccion_id": transaccion_creada.id,
                 "numero_factura": transaccion_creada.numero_factura,
-                "estado": estado_final,
+                "estado": EstadoTransaccion.PENDIENTE,
                 "total": transaccion_creada.total,
                 "asientos": asientos,
                 "fecha_vencimiento": transaccion_creada.fecha_vencimiento.isoformat(),
-                "resultado_pago": resultado_pago,
-                "resumen": transaccion_creada.generar_resumen()
+                "url_estado": f"/api/v1/transacciones/{transaccion_creada.id}/estado-pago"
             }
             
         except HTTPException:
@@ -206,24 +168,391 @@ class ComprarEntradaUseCase:
                 detail=f"Error interno del servidor: {str(e)}"
             )
     
+    @trazar("compra.completar_pago")
+    async def completar_pago(self, transaccion_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Procesar el pago de una transacción pendiente (usado por los workers)
+        
+        La transacción se reclama atómicamente antes de cobrar y la
+        autorización se guarda antes de finalizar: un reintento (XAUTOCLAIM o
+        fallo después del cobro) reutiliza la autorización en vez de cobrar
+        otra vez. Las retenciones de asientos solo se sueltan con un
+        resultado definitivo (confirmada o fallida).
+        
+        Returns:
+            La respuesta final de la compra, o None si la transacción no
+            existe o ya fue procesada (reentrega del mensaje)
+        
+        Raises:
+            PagoEnCurso: otro intento tiene el reclamo vigente; el mensaje
+            no debe confirmarse
+        """
+        propietario = uuid.uuid4().hex
+        documento = await self.transaccion_repo.reclamar_para_pago(
+            transaccion_id, propietario, settings.pagos_lease_segundos
+        )
+        if documento is None:
+            transaccion = await self.transaccion_repo.obtener_transaccion_por_id(transaccion_id)
+            if transaccion and transaccion.estado == EstadoTransaccion.PROCESANDO:
+                raise PagoEnCurso(transaccion_id)
+            return None
+        
+        transaccion = Transaccion(**documento)
+        resultado_pago = documento.get("autorizacion_pago")
+        cronometro = Cronometro()
+        asientos = transaccion.obtener_codigos_asientos()
+        
+        try:
+            usuario = await self.usuario_repo.obtener_usuario_por_id(transaccion.cliente_id)
+            retenidos = await self.redis_service.renovar_retencion(
+                transaccion.funcion_id, asientos, transaccion.id, settings.pagos_retencion_segundos
+            )
+            
+            if resultado_pago is None:
+                if retenidos:
+                    resultado_pago = await self._procesar_pago(transaccion)
+                else:
+                    # La retención venció y otra compra tomó algún asiento: no se cobra
+                    resultado_pago = {
+                        "exitoso": False,
+                        "mensaje": "La retención de los asientos venció",
+                        "fecha_procesamiento": datetime.now()
+                    }
+                cronometro.marcar("pago")
+                
+                if not await self.transaccion_repo.registrar_autorizacion(transaccion.id, propietario, resultado_pago):
+                    raise RuntimeError(f"Se perdió el reclamo de la transacción {transaccion.id}")
+            
+            estado_final = await self._finalizar(usuario, transaccion, asientos, resultado_pago, propietario, cronometro)
+        except Exception:
+            # Sin resultado definitivo: las retenciones se mantienen para el reintento
+            await self.transaccion_repo.liberar_reclamo(transaccion.id, propietario)
+            raise
+        
+        registro_latencias_compra.registrar(cronometro)
+        await self.redis_service.soltar_asientos(transaccion.funcion_id, asientos, transaccion.id)
+        
+        respuesta = self._generar_respuesta(transaccion, estado_final, asientos, resultado_pago)
+        await self.redis_service.guardar_estado_pago(transaccion.id, {
+            **jsonable_encoder(respuesta),
+            "cliente_id": transaccion.cliente_id
+        })
+        return respuesta
+    
+    async def _reservar(
+        self,
+        usuario_id: str,
+        funcion_id: str,
+        asientos: List[str],
+        metodo_pago: MetodoPago,
+        datos_pago: Optional[Dict[str, Any]],
+        cronometro: Cronometro,
+        retener: bool = False
+    ):
+        """Validar la compra y persistir la transacción pendiente (pasos 1-9)"""
+        # 1-4. Lecturas independientes en paralelo: usuario, función (+ película)
+        # y disponibilidad de asientos
+        usuario, (funcion, pelicula), asientos_disponibles = await asyncio.gather(
+            self.usuario_repo.obtener_usuario_por_id(usuario_id),
+            self._obtener_funcion_y_pelicula(funcion_id),
+            self._verificar_disponibilidad_asientos(funcion_id, asientos)
+        )
+        cronometro.marcar("lecturas")
+        
+        # 1. Validar que el usuario existe
+        if not usuario:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado"
+            )
+        
+        # 2. Validar que la función existe
+        if not funcion:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Función no encontrada"
+            )
+        
+        # 3. Validar que los asientos están disponibles
+        if not asientos_disponibles:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Uno o más asientos no están disponibles"
+            )
+        
+        # 5. Crear detalles de asientos
+        detalles_asientos = await self._crear_detalles_asientos(asientos, funcion_id)
+        
+        # 6. Crear detalle de pago
+        detalle_pago = self._crear_detalle_pago(metodo_pago, datos_pago)
+        
+        # 7. Crear transacción con totales calculados
+        # Calcular subtotal antes de crear la transacción
+        subtotal = sum(asiento.precio_unitario for asiento in detalles_asientos)
+        cantidad_asientos = len(detalles_asientos)
+        
+        # Calcular impuestos (19% IVA)
+        impuestos = subtotal * 0.19
+        
+        # Total inicial (sin descuentos)
+        total = subtotal + impuestos
+        
+        transaccion = Transaccion(
+            cliente_id=usuario_id,
+            pelicula_id=funcion.get("pelicula_id"),
+            funcion_id=funcion_id,
+            asientos=detalles_asientos,
+            pago=detalle_pago,
+            subtotal=subtotal,
+            cantidad_asientos=cantidad_asientos,
+            total=total,
+            impuestos=impuestos,
+            fecha_vencimiento=datetime.now() + timedelta(minutes=30),  # 30 minutos para pagar
+            ip_origen=datos_pago.get("ip_origen") if datos_pago else None,
+            user_agent=datos_pago.get("user_agent") if datos_pago else None,
+            canal_venta=datos_pago.get("canal_venta", "web") if datos_pago else "web"
+        )
+        
+        # 7.1. Snapshot de géneros y horario (analítica sin $lookup)
+        transaccion.registrar_snapshot_funcion(
+            funcion.get("fecha_hora_inicio"),
+            pelicula.get("generos", []) if pelicula else []
+        )
+        
+        # 8. Aplicar descuentos y recalcular totales
+        await self._aplicar_descuentos(transaccion, usuario)
+        transaccion.calcular_totales()
+        cronometro.marcar("preparacion")
+        
+        # 8.1. Retener los asientos mientras el pago está pendiente (modo asíncrono)
+        if retener:
+            retenidos = await self.redis_service.retener_asientos(
+                funcion_id, asientos, transaccion.id, settings.pagos_retencion_segundos
+            )
+            if not retenidos:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Uno o más asientos no están disponibles"
+                )
+        
+        # 9. Guardar transacción
+        transaccion_creada = await self.transaccion_repo.crear_transaccion(transaccion)
+        if not transaccion_creada:
+            if retener:
+                await self.redis_service.soltar_asientos(funcion_id, asientos, transaccion.id)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error al crear la transacción"
+            )
+        cronometro.marcar("guardar_transaccion")
+        
+        return usuario, transaccion_creada
+    
+    async def _finalizar(
+        self,
+        usuario: UsuarioResponse,
+        transaccion: Transaccion,
+        asientos: List[str],
+        resultado_pago: Dict[str, Any],
+        propietario: str,
+        cronometro: Cronometro
+    ) -> EstadoTransaccion:
+        """Actualizar el estado según el pago y aplicar los efectos posteriores (paso 11)"""
+        usuario_id = transaccion.cliente_id
+        funcion_id = transaccion.funcion_id
+        
+        if resultado_pago["exitoso"]:
+            estado_final = EstadoTransaccion.CONFIRMADO
+            
+            if self.outbox_repo:
+                # 11.1. Confirmación + outbox en una sola escritura; el relay
+                # publica evento de venta, ranking y correo en lotes
+                evento = self._construir_evento_outbox(usuario, transaccion, estado_final, asientos, resultado_pago)
+                await self.outbox_repo.registrar(
+                    [evento],
+                    lambda session: self._confirmar_transaccion(transaccion, resultado_pago, propietario, session)
+                )
+                relay = get_outbox_relay_service()
+                if relay:
+                    relay.notificar()
+                cronometro.marcar("actualizar_estado")
+                
+                # 11.2. Asientos (selecciones + ocupados)
+                await self._consolidar_asientos(usuario_id, funcion_id, asientos)
+                cronometro.marcar("post_confirmacion")
+                return estado_final
+            
+            await self._confirmar_transaccion(transaccion, resultado_pago, propietario)
+            cronometro.marcar("actualizar_estado")
+            
+            # QR de la entrada fuera de la petición
+            ticket_service.pregenerar_en_segundo_plano(transaccion.id, transaccion.cliente_id, transaccion.funcion_inicio)
+            
+            # 11.1-11.4. Sin outbox: efectos posteriores en paralelo
+            # (asientos, evento de venta y correo). Ninguno hace fallar la transacción.
+            tareas = [
+                self._consolidar_asientos(usuario_id, funcion_id, asientos),
+                self._ejecutar_sin_fallar(
+                    "publicando evento de venta",
+                    self._publicar_evento_venta(transaccion)
+                )
+            ]
+            if usuario:
+                tareas.append(self._ejecutar_sin_fallar(
+                    "enviando correo de confirmación",
+                    self._enviar_correo_confirmacion(usuario, transaccion, estado_final, asientos, resultado_pago)
+                ))
+            await asyncio.gather(*tareas)
+            cronometro.marcar("post_confirmacion")
+            
+        else:
+            marcada = await self.transaccion_repo.finalizar_pago(
+                transaccion.id,
+                propietario,
+                EstadoTransaccion.FALLIDO,
+                f"Error en el pago: {resultado_pago['mensaje']}"
+            )
+            if not marcada:
+                raise RuntimeError(f"Se perdió el reclamo de la transacción {transaccion.id}")
+            estado_final = EstadoTransaccion.FALLIDO
+            cronometro.marcar("actualizar_estado")
+            
+            # Si el pago falla, liberar las selecciones temporales
+            await self._ejecutar_sin_fallar(
+                "liberando selecciones temporales",
+                self._liberar_selecciones_temporales(usuario_id, funcion_id, asientos)
+            )
+            cronometro.marcar("post_confirmacion")
+        
+        return estado_final
+    
+    def _generar_respuesta(
+        self,
+        transaccion: Transaccion,
+        estado_final: EstadoTransaccion,
+        asientos: List[str],
+        resultado_pago: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Respuesta de la compra (mismo formato en modo síncrono y asíncrono)"""
+        return {
+            "transaccion_id": transaccion.id,
+            "numero_factura": transaccion.numero_factura,
+            "estado": estado_final,
+            "total": transaccion.total,
+            "asientos": asientos,
+            "fecha_vencimiento": transaccion.fecha_vencimiento.isoformat(),
+            "resultado_pago": resultado_pago,
+            "resumen": transaccion.generar_resumen()
+        }
+    
+    async def _obtener_funcion_y_pelicula(self, funcion_id: str):
+        """Obtener la función y su película (la película depende de pelicula_id)"""
+        funcion = await self.mongodb_service.obtener_funcion(funcion_id)
+        if not funcion:
+            return None, None
+        pelicula = await self.mongodb_service.obtener_pelicula(funcion.get("pelicula_id"))
+        return funcion, pelicula
+    
+    async def _consolidar_asientos(self, usuario_id: str, funcion_id: str, asientos: List[str]) -> None:
+        """Confirmar selecciones y luego marcar ocupados (ambos tocan el bitmap, el orden importa)"""
+        await self._ejecutar_sin_fallar(
+            "confirmando selecciones temporales",
+            self._confirmar_selecciones_temporales(usuario_id, funcion_id, asientos)
+        )
+        await self._ejecutar_sin_fallar(
+            "marcando asientos como ocupados",
+            self._marcar_asientos_ocupados(funcion_id, asientos)
+        )
+    
+    async def _ejecutar_sin_fallar(self, descripcion: str, operacion) -> None:
+        """Ejecutar un efecto secundario registrando el error sin propagarlo"""
+        try:
+            await operacion
+        except Exception as e:
+            logger.warning(f"Error {descripcion}", extra={"error": str(e)})
+    
+    async def _confirmar_transaccion(self, transaccion: Transaccion, resultado_pago: Dict[str, Any], propietario: str, session=None) -> None:
+        """Marcar la transacción como confirmada (solo si el reclamo de pago sigue siendo propio)"""
+        actualizada = await self.transaccion_repo.finalizar_pago(
+            transaccion.id,
+            propietario,
+            EstadoTransaccion.CONFIRMADO,
+            f"Pago procesado exitosamente. Código: {resultado_pago['codigo_autorizacion']}",
+            session=session
+        )
+        if not actualizada:
+            raise Exception(f"No se pudo confirmar la transacción {transaccion.id}")
+    
+    def _datos_correo(
+        self,
+        transaccion: Transaccion,
+        estado_final: EstadoTransaccion,
+        asientos: List[str],
+        resultado_pago: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Datos de la transacción para el correo de confirmación"""
+        return {
+            **self._generar_respuesta(transaccion, estado_final, asientos, resultado_pago),
+            "codigo_qr": transaccion.id  # O el QR real si lo tienes
+        }
+    
+    def _construir_evento_outbox(
+        self,
+        usuario: Optional[UsuarioResponse],
+        transaccion: Transaccion,
+        estado_final: EstadoTransaccion,
+        asientos: List[str],
+        resultado_pago: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Evento de outbox con todo lo que el relay necesita publicar"""
+        return {
+            "tipo": "venta_confirmada",
+            "transaccion_id": transaccion.id,
+            "venta": self._construir_evento_venta(transaccion),
+            "entrada": {
+                "transaccion_id": transaccion.id,
+                "cliente_id": transaccion.cliente_id,
+                "expira": expiracion_entrada(transaccion.funcion_inicio).isoformat()
+            },
+            "correo": email_service.construir_correo_confirmacion(
+                usuario.email,
+                self._datos_correo(transaccion, estado_final, asientos, resultado_pago)
+            ) if usuario else None
+        }
+    
+    @trazar("compra.encolar_correo")
+    async def _enviar_correo_confirmacion(
+        self,
+        usuario: UsuarioResponse,
+        transaccion: Transaccion,
+        estado_final: EstadoTransaccion,
+        asientos: List[str],
+        resultado_pago: Dict[str, Any]
+    ) -> None:
+        """Encolar el correo de confirmación de compra"""
+        await email_service.enviar_correo_confirmacion_compra(
+            email=usuario.email,
+            transaccion_data=self._datos_correo(transaccion, estado_final, asientos, resultado_pago)
+        )
+    
     async def _verificar_disponibilidad_asientos(self, funcion_id: str, asientos: List[str]) -> bool:
         """Verificar que los asientos están disponibles"""
         try:
-            # Verificar en transacciones confirmadas
-            asientos_disponibles = await self.transaccion_repo.verificar_asientos_disponibles(funcion_id, asientos)
+            # Transacciones confirmadas, selecciones temporales (Redis)
+            # y retenciones de pagos pendientes
+            asientos_disponibles, asientos_ocupados_redis, asientos_retenidos = await asyncio.gather(
+                self.transaccion_repo.verificar_asientos_disponibles(funcion_id, asientos),
+                self.redis_service.get_asientos_ocupados(funcion_id),
+                self.redis_service.asientos_retenidos(funcion_id, asientos)
+            )
             if not asientos_disponibles:
                 return False
             
-            # Verificar en Redis (selecciones temporales)
-            asientos_ocupados_redis = await self.redis_service.get_asientos_ocupados(funcion_id)
-            for asiento in asientos:
-                if asiento in asientos_ocupados_redis:
-                    return False
-            
-            return True
+            ocupados = set(asientos_ocupados_redis) | set(asientos_retenidos)
+            return not any(asiento in ocupados for asiento in asientos)
             
         except Exception as e:
-            print(f"Error verificando disponibilidad: {e}")
+            logger.warning("Error verificando disponibilidad", extra={"funcion_id": funcion_id, "error": str(e)})
             return False
     
     async def _crear_detalles_asientos(self, asientos: List[str], funcion_id: str) -> List[DetalleAsiento]:
@@ -284,43 +613,35 @@ class ComprarEntradaUseCase:
     async def _confirmar_selecciones_temporales(self, usuario_id: str, funcion_id: str, asientos: List[str]) -> None:
         """Confirmar selecciones temporales del usuario (pago exitoso)"""
         try:
-            from datetime import datetime
-            
-            # Marcar como confirmadas en la base de datos
-            for asiento in asientos:
-                await self.seleccion_repo.actualizar_estado_seleccion(
-                    usuario_id, funcion_id, asiento, "confirmada", datetime.now()
-                )
-            
-            # Liberar de Redis (ya no son temporales)
-            for asiento in asientos:
-                await self.redis_service.liberar_asiento(funcion_id, asiento, usuario_id)
+            # Una actualización en MongoDB y un pipeline en Redis, en paralelo
+            await asyncio.gather(
+                self.seleccion_repo.actualizar_estado_selecciones(
+                    usuario_id, funcion_id, asientos, "confirmada", datetime.now()
+                ),
+                # Liberar de Redis (ya no son temporales)
+                self.redis_service.liberar_asientos_usuario(funcion_id, asientos, usuario_id)
+            )
                 
-            print(f"✅ Selecciones confirmadas para usuario {usuario_id}, asientos: {asientos}")
+            logger.debug("Selecciones confirmadas", extra={"usuario_id": usuario_id, "funcion_id": funcion_id, "asientos": asientos})
                 
         except Exception as e:
-            print(f"❌ Error confirmando selecciones temporales: {e}")
+            logger.error("Error confirmando selecciones temporales", extra={"usuario_id": usuario_id, "error": str(e)})
             raise
     
     async def _liberar_selecciones_temporales(self, usuario_id: str, funcion_id: str, asientos: List[str]) -> None:
         """Liberar selecciones temporales del usuario (pago fallido)"""
         try:
-            from datetime import datetime
-            
-            # Marcar como canceladas en la base de datos
-            for asiento in asientos:
-                await self.seleccion_repo.actualizar_estado_seleccion(
-                    usuario_id, funcion_id, asiento, "cancelada", datetime.now()
-                )
-            
-            # Liberar de Redis
-            for asiento in asientos:
-                await self.redis_service.liberar_asiento(funcion_id, asiento, usuario_id)
+            await asyncio.gather(
+                self.seleccion_repo.actualizar_estado_selecciones(
+                    usuario_id, funcion_id, asientos, "cancelada", datetime.now()
+                ),
+                self.redis_service.liberar_asientos_usuario(funcion_id, asientos, usuario_id)
+            )
                 
-            print(f"⚠️  Selecciones liberadas para usuario {usuario_id}, asientos: {asientos}")
+            logger.info("Selecciones liberadas", extra={"usuario_id": usuario_id, "funcion_id": funcion_id, "asientos": asientos})
                 
         except Exception as e:
-            print(f"❌ Error liberando selecciones temporales: {e}")
+            logger.error("Error liberando selecciones temporales", extra={"usuario_id": usuario_id, "error": str(e)})
             raise
     
     async def _limpiar_selecciones_temporales(self, usuario_id: str, funcion_id: str, asientos: List[str]) -> None:
@@ -337,69 +658,46 @@ class ComprarEntradaUseCase:
                 )
                 
         except Exception as e:
-            print(f"Error limpiando selecciones temporales: {e}")
+            logger.warning("Error limpiando selecciones temporales", extra={"usuario_id": usuario_id, "error": str(e)})
     
+    @trazar("compra.pago")
     async def _procesar_pago(self, transaccion: Transaccion) -> Dict[str, Any]:
-        """Procesar el pago (simulado)"""
-        try:
-            # Simular procesamiento de pago
-            import random
-            import time
-            
-            # Simular delay de procesamiento
-            await asyncio.sleep(1)
-            
-            # Simular éxito/fallo (90% éxito)
-            exito = random.random() < 0.9
-            
-            if exito:
-                codigo_autorizacion = f"AUTH{int(time.time())}{random.randint(1000, 9999)}"
-                return {
-                    "exitoso": True,
-                    "codigo_autorizacion": codigo_autorizacion,
-                    "mensaje": "Pago procesado exitosamente",
-                    "fecha_procesamiento": datetime.now().isoformat()
-                }
-            else:
-                return {
-                    "exitoso": False,
-                    "mensaje": "Tarjeta rechazada - fondos insuficientes",
-                    "fecha_procesamiento": datetime.now().isoformat()
-                }
-                
-        except Exception as e:
-            return {
-                "exitoso": False,
-                "mensaje": f"Error procesando pago: {str(e)}",
-                "fecha_procesamiento": datetime.now().isoformat()
-            }
+        """Procesar el pago con la pasarela configurada"""
+        return await payment_gateway.autorizar(transaccion.id, transaccion.total)
+    
+    def _construir_evento_venta(self, transaccion: Transaccion) -> Dict[str, Any]:
+        """Evento de venta para stream:ventas"""
+        return {
+            "tipo": "venta_confirmada",
+            "transaccion_id": transaccion.id,
+            "cliente_id": transaccion.cliente_id,
+            "pelicula_id": transaccion.pelicula_id,
+            "funcion_id": transaccion.funcion_id,
+            "canal_venta": transaccion.canal_venta,
+            "monto": transaccion.total,
+            "cantidad_asientos": transaccion.cantidad_asientos,
+            "fecha_creacion": transaccion.fecha_creacion.isoformat(),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    @trazar("compra.publicar_evento_venta")
+    async def _publicar_evento_venta(self, transaccion: Transaccion) -> None:
+        """Publica evento de venta en Redis Streams (stream:ventas)"""
+        await self.redis_service.xadd("stream:ventas", self._construir_evento_venta(transaccion))
     
     async def _marcar_asientos_ocupados(self, funcion_id: str, asientos: List[str]) -> None:
         """Marcar asientos como ocupados en la función"""
         try:
-            # Obtener la función actual
-            funcion = await self.mongodb_service.obtener_funcion(funcion_id)
-            if not funcion:
-                raise Exception(f"Función {funcion_id} no encontrada")
-            
-            # Actualizar asientos ocupados en la función
-            asientos_ocupados_actuales = funcion.get("asientos_ocupados", [])
-            asientos_ocupados_actuales.extend(asientos)
-            
-            # Actualizar en MongoDB
-            await self.mongodb_service.actualizar_funcion(
-                funcion_id,
-                {"asientos_ocupados": asientos_ocupados_actuales}
+            # $addToSet atómico en MongoDB y pipeline en Redis, en paralelo
+            await asyncio.gather(
+                self.mongodb_service.agregar_asientos_ocupados(funcion_id, asientos),
+                self.redis_service.marcar_asientos_ocupados(funcion_id, asientos)
             )
             
-            # También marcar como ocupados en Redis para consistencia
-            for asiento in asientos:
-                await self.redis_service.marcar_asiento_ocupado(funcion_id, asiento)
-            
-            print(f"✅ Asientos {asientos} marcados como ocupados en función {funcion_id}")
+            logger.debug("Asientos marcados como ocupados", extra={"funcion_id": funcion_id, "asientos": asientos})
             
         except Exception as e:
-            print(f"❌ Error marcando asientos como ocupados: {e}")
+            logger.error("Error marcando asientos como ocupados", extra={"funcion_id": funcion_id, "error": str(e)})
             raise
     
     async def obtener_historial_compras(self, usuario_id: str, limit: int = 20) -> List[Dict[str, Any]]:
@@ -423,7 +721,7 @@ class ComprarEntradaUseCase:
             return historial
             
         except Exception as e:
-            print(f"Error obteniendo historial de compras: {e}")
+            logger.warning("Error obteniendo historial de compras", extra={"usuario_id": usuario_id, "error": str(e)})
             return []
     
     async def cancelar_transaccion(self, transaccion_id: str, usuario_id: str) -> Dict[str, Any]:
@@ -449,12 +747,17 @@ class ComprarEntradaUseCase:
                     detail="La transacción no puede ser cancelada"
                 )
             
-            # Actualizar estado
-            await self.transaccion_repo.actualizar_estado_transaccion(
+            # Actualizar estado de forma condicional: no se cancela una
+            # transacción con un reclamo de pago vigente ni ya cobrada
+            cancelada = await self.transaccion_repo.cancelar_si_no_reclamada(
                 transaccion_id,
-                EstadoTransaccion.CANCELADO,
                 "Transacción cancelada por el usuario"
             )
+            if not cancelada:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="El pago de la transacción está en curso o ya fue procesado"
+                )
             
             return {
                 "mensaje": "Transacción cancelada exitosamente",